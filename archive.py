@@ -0,0 +1,165 @@
+# Модуль для архивации записей закрытых лет.
+#
+# Записи закрытого года (раньше текущего) переносятся из таблицы расходов в отдельный файл
+# архива рядом с базой данных (например, 'expensetracker.2021.db'), а в таблице archives
+# остается строка с переносимым остатком - балансом перенесенных записей в базовой валюте.
+# После архивации запросы к таблице расходов обрабатывают только записи открытых лет:
+# баланс складывается из этих записей и переносимых остатков, а архив года подключается
+# (ATTACH) только для списка записей с фильтром по дате из этого года (см. connection.Data).
+#
+# Перенос выполняется двумя транзакциями: записи копируются в архив, затем из таблицы расходов
+# удаляются записи, которые есть в архиве. В режиме WAL транзакция над несколькими файлами
+# атомарна только для каждого файла в отдельности, поэтому одна общая транзакция после сбоя
+# могла бы оставить записи удаленными, но не скопированными; при таком порядке сбой между
+# транзакциями оставляет записи в обоих файлах, и повторная архивация года копирует их заново
+# (INSERT OR REPLACE по номеру записи) и удаляет. Суммы бюджетов
+# за архивные месяцы сохраняются: на время удаления перенесенных записей триггер,
+# уменьшающий суммы, отключается. Записи, добавленные задним числом в уже архивированный год,
+# переносятся в тот же архив при повторной архивации года. Архивные записи не изменяются.
+# В журнал изменений перенос записывается операцией 'archive', а не удалением записей,
+# а в deleted_entries перенесенные записи не попадают: архивные годы не синхронизируются.
+# Номера записей в архиве сохраняются, поэтому ссылки на вложения, строки разделенных записей и метки
+# остаются в основной базе данных.
+#
+# Запуск модуля архивирует все закрытые годы до указанного включительно: python archive.py 2022
+
+
+import datetime
+import os
+import sys
+
+from PyQt6 import QtCore
+
+from currency import BASE_CURRENCY
+
+
+def archivePath(db_path, year):
+    """
+    Возвращает путь к файлу архива года.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        year (int): Год архива.
+
+    Returns:
+        str: Путь к файлу архива рядом с базой данных.
+    """
+    base, extension = os.path.splitext(db_path)
+    return f"{base}.{year}{extension or '.db'}"
+
+
+class Archiver:
+    def __init__(self, conn):
+        """
+        Инициализирует архивацию записей.
+
+        Args:
+            conn (Data): Объект для работы с базой данных.
+        """
+        super(Archiver, self).__init__()
+        self.conn = conn
+
+    def getArchivableYears(self):
+        """
+        Возвращает закрытые годы, записи которых есть в таблице расходов.
+
+        Returns:
+            list: Годы по возрастанию.
+        """
+        query = self.conn.executeQuery("SELECT DISTINCT CAST(substr(date, 7, 4) AS INTEGER) FROM expenses "
+                                       "WHERE CAST(substr(date, 7, 4) AS INTEGER) < ? ORDER BY 1",
+                                       [datetime.date.today().year])
+        years = []
+        while query.next():
+            years.append(query.value(0))
+        return years
+
+    def archiveYear(self, year):
+        """
+        Переносит записи года в архив и сохраняет переносимый остаток.
+
+        Args:
+            year (int): Закрытый год.
+
+        Returns:
+            int: Количество перенесенных записей или None, если перенос не выполнен.
+
+        Raises:
+            ValueError: Если год еще не закрыт.
+        """
+        # Модуль connection импортируется при вызове, как в модуле recurring
+        from connection import (ATTACHMENT_TRIGGERS, BALANCE_GROUPS, BUDGET_TRIGGERS, CHANGE_TRIGGERS, SPLIT_TRIGGERS,
+                                SYNC_TRIGGERS, TAG_TRIGGERS, TransactionError)
+
+        if year >= datetime.date.today().year:
+            raise ValueError(f"Год {year} еще не закрыт")
+        path = archivePath(self.conn.db_path, year)
+        schema = self.conn.attachArchive(year, path)
+        if schema is None:
+            return None
+
+        condition = "WHERE substr(date, 7, 4) = ?"
+        # Удаляются только скопированные записи: запись, добавленная между транзакциями, остается
+        archived = f"{condition} AND id IN (SELECT id FROM {schema}.expenses)"
+        triggers = (BUDGET_TRIGGERS + CHANGE_TRIGGERS + SYNC_TRIGGERS + ATTACHMENT_TRIGGERS +
+                    SPLIT_TRIGGERS + TAG_TRIGGERS)
+        delete_triggers = {name: next(query_text for query_text in triggers if f"EXISTS {name} " in query_text)
+                           for name in ("budget_status_delete", "changes_delete", "sync_delete", "attachments_delete",
+                                        "split_delete", "entry_tags_delete")}
+        try:
+            with self.conn.transaction():
+                self.conn.executeQuery(f"CREATE TABLE IF NOT EXISTS {schema}.expenses ("
+                                       "id integer PRIMARY KEY NOT NULL,"
+                                       "description VARCHAR(32) NOT NULL,"
+                                       "value integer NOT NULL,"
+                                       "category VARCHAR(32) NOT NULL,"
+                                       "date DATE NOT NULL,"
+                                       f"currency VARCHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}',"
+                                       "fingerprint integer)")
+                self.conn.executeQuery(
+                    f"INSERT OR REPLACE INTO {schema}.expenses "
+                    "(id, description, value, category, date, currency, fingerprint) "
+                    f"SELECT id, description, value, category, date, currency, fingerprint FROM expenses {condition}",
+                    [str(year)])
+
+            with self.conn.transaction():
+                balance = self.conn.rates.convertGroups(
+                    self.conn.executeQuery(BALANCE_GROUPS.format(archived), [BASE_CURRENCY, str(year)]))
+                self.conn.executeQuery(f"INSERT INTO changes (entry_id, operation) "
+                                       f"SELECT id, 'archive' FROM expenses {archived}", [str(year)])
+                for name in delete_triggers:
+                    self.conn.executeQuery(f"DROP TRIGGER {name}")
+                query = self.conn.executeQuery(f"DELETE FROM expenses {archived}", [str(year)])
+                rows = max(query.numRowsAffected(), 0)
+                for query_text in delete_triggers.values():
+                    self.conn.executeQuery(query_text)
+
+                self.conn.executeQuery(
+                    "INSERT INTO archives (year, path, rows, balance) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (year) DO UPDATE SET rows = rows + excluded.rows, "
+                    "balance = balance + excluded.balance",
+                    [year, os.path.basename(path), rows, balance])
+        except TransactionError:
+            return None
+        return rows
+
+    def archiveUntil(self, year):
+        """
+        Переносит в архивы записи всех закрытых лет до заданного включительно.
+
+        Args:
+            year (int): Последний архивируемый год.
+
+        Returns:
+            dict: Словарь {год: количество перенесенных записей или None при ошибке}.
+        """
+        return {archived: self.archiveYear(archived) for archived in self.getArchivableYears() if archived <= year}
+
+
+if __name__ == '__main__':
+    from connection import Data
+
+    app = QtCore.QCoreApplication(sys.argv)
+    archiver = Archiver(Data())
+    for year, rows in archiver.archiveUntil(int(sys.argv[1])).items():
+        print(f"{year}: перенесено записей - {rows}")
@@ -0,0 +1,528 @@
+# Модуль для хранения вложений записей (фотографий чеков) и их миниатюр.
+#
+# Файлы вложений не хранятся в базе данных: AttachmentStore копирует их в каталог
+# '<база данных>.attachments/objects' под именем, равным хешу SHA-256 содержимого,
+# а в таблице attachments остаются только номер записи, хеш и исходное имя файла.
+# Один и тот же файл, прикрепленный к нескольким записям, хранится один раз. Копия
+# записывается во временный файл и переименовывается, поэтому прерванная запись
+# не оставляет под хешем неполный файл. Файлы без ссылок удаляются при откреплении
+# вложения или удалении записи, а также командой 'python attachments.py --gc'.
+#
+# ThumbnailCache создает миниатюры в пуле фоновых потоков: изображение декодируется
+# сразу в уменьшенном размере (QImageReader.setScaledSize), миниатюра сохраняется в каталог
+# 'thumbnails' и сигналом ready сообщается окну. Последние использованные миниатюры
+# хранятся в памяти, а на диске кэш ограничен размером THUMBNAIL_CACHE_LIMIT: время
+# изменения файла обновляется при каждом чтении, и при переполнении удаляются файлы,
+# которые дольше всего не использовались. Отрисовка таблицы не ждет ни чтения с диска,
+# ни декодирования: пока миниатюры нет, запись показывается без нее.
+#
+# AttachmentList - список вложений в окнах добавления и изменения записи: показывает
+# миниатюры сохраненных вложений и имена выбранных файлов, которые прикрепляются
+# к записи при ее сохранении.
+#
+# Вложения не синхронизируются (см. модуль sync) и не входят в резервные копии базы данных.
+#
+# Запуск модуля удаляет файлы вложений, на которые не ссылается ни одна запись:
+#     python attachments.py --gc [--db expensetracker.db]
+
+
+import argparse
+import collections
+import hashlib
+import os
+import shutil
+import sys
+
+from PyQt6.QtCore import QObject, QRunnable, QSize, QThreadPool, QUrl, Qt, pyqtSignal
+from PyQt6.QtGui import QDesktopServices, QIcon, QImage, QImageReader, QPixmap
+from PyQt6.QtWidgets import QAbstractItemView, QListView, QListWidget, QListWidgetItem
+
+from paths import DB_PATH
+
+
+# Размер порции при вычислении хеша файла в байтах
+HASH_CHUNK = 1 << 20
+
+# Наибольшая сторона миниатюры в пикселях
+THUMBNAIL_SIZE = 64
+
+# Наибольший размер кэша миниатюр на диске в байтах
+THUMBNAIL_CACHE_LIMIT = 64 * 1024 * 1024
+
+# Доля THUMBNAIL_CACHE_LIMIT, до которой очищается переполненный кэш
+THUMBNAIL_CACHE_TRIM = 0.75
+
+# Количество миниатюр, хранящихся в памяти
+MEMORY_THUMBNAILS = 512
+
+# Количество потоков, создающих миниатюры
+THUMBNAIL_THREADS = 2
+
+# Фильтр окна выбора файлов вложений
+IMAGE_FILTER = "Изображения (*.jpg *.jpeg *.png *.bmp *.gif *.webp);;Все файлы (*)"
+
+
+def attachmentDirectory(db_path):
+    """
+    Возвращает каталог вложений базы данных.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+
+    Returns:
+        str: Путь к каталогу рядом с базой данных.
+    """
+    return os.path.splitext(db_path)[0] + ".attachments"
+
+
+def fileHash(path):
+    """
+    Вычисляет хеш содержимого файла.
+
+    Args:
+        path (str): Путь к файлу.
+
+    Returns:
+        str: Хеш SHA-256 в шестнадцатеричном виде.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AttachmentStore:
+    def __init__(self, conn, directory):
+        """
+        Инициализирует хранилище вложений.
+
+        Args:
+            conn (Data): Объект для работы с базой данных.
+            directory (str): Каталог вложений (см. attachmentDirectory).
+        """
+        super(AttachmentStore, self).__init__()
+        self.conn = conn
+        self.directory = directory
+
+    def objectPath(self, attachment):
+        """
+        Возвращает путь к файлу вложения.
+
+        Args:
+            attachment (str): Хеш вложения.
+
+        Returns:
+            str: Путь к файлу; первые два символа хеша - имя подкаталога.
+        """
+        return os.path.join(self.directory, "objects", attachment[:2], attachment[2:])
+
+    def storeFile(self, path):
+        """
+        Копирует файл в хранилище, если файла с таким содержимым там еще нет.
+
+        Args:
+            path (str): Путь к файлу.
+
+        Returns:
+            str: Хеш вложения или None, если файл не удалось прочитать или скопировать.
+        """
+        try:
+            attachment = fileHash(path)
+            target = self.objectPath(attachment)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                temporary = f"{target}.{os.getpid()}.tmp"
+                shutil.copyfile(path, temporary)
+                os.replace(temporary, target)
+        except OSError as error:
+            print(error)
+            return None
+        return attachment
+
+    def attach(self, entry_id, path):
+        """
+        Прикрепляет файл к записи.
+
+        Args:
+            entry_id (int): ID записи.
+            path (str): Путь к файлу.
+
+        Returns:
+            str: Хеш вложения или None, если вложение не сохранено.
+        """
+        attachment = self.storeFile(path)
+        if attachment is None:
+            return None
+        query = self.conn.executeQuery("INSERT OR IGNORE INTO attachments (entry_id, hash, name) VALUES (?, ?, ?)",
+                                       [entry_id, attachment, os.path.basename(path)])
+        return attachment if query.isActive() else None
+
+    def detach(self, entry_id, attachment):
+        """
+        Открепляет вложение от записи и удаляет его файл, если других ссылок на него нет.
+
+        Args:
+            entry_id (int): ID записи.
+            attachment (str): Хеш вложения.
+
+        Returns:
+            bool: True, если вложение откреплено.
+        """
+        query = self.conn.executeQuery("DELETE FROM attachments WHERE entry_id = ? AND hash = ?",
+                                       [entry_id, attachment])
+        if not query.isActive():
+            return False
+        self.removeUnreferenced([attachment])
+        return True
+
+    def getAttachments(self, entry_id):
+        """
+        Возвращает вложения записи.
+
+        Args:
+            entry_id (int): ID записи.
+
+        Returns:
+            list: Пары (хеш, исходное имя файла) в порядке имени.
+        """
+        query = self.conn.executeQuery("SELECT hash, name FROM attachments WHERE entry_id = ? ORDER BY name, hash",
+                                       [entry_id])
+        attachments = []
+        while query.next():
+            attachments.append((query.value(0), query.value(1)))
+        return attachments
+
+    def getEntryHashes(self):
+        """
+        Возвращает по одному вложению каждой записи с вложениями для миниатюр в таблице записей.
+
+        Returns:
+            dict: Словарь {ID записи: хеш вложения}.
+        """
+        # Хеш берется из строки с наименьшим именем файла (см. min/max в документации SQLite)
+        query = self.conn.executeQuery("SELECT entry_id, hash, MIN(name) FROM attachments GROUP BY entry_id")
+        hashes = {}
+        while query.next():
+            hashes[query.value(0)] = query.value(1)
+        return hashes
+
+    def removeUnreferenced(self, attachments):
+        """
+        Удаляет файлы вложений, на которые не ссылается ни одна запись.
+
+        Args:
+            attachments (iterable): Хеши проверяемых вложений.
+
+        Returns:
+            int: Количество удаленных файлов.
+        """
+        removed = 0
+        for attachment in set(attachments):
+            query = self.conn.executeQuery("SELECT 1 FROM attachments WHERE hash = ? LIMIT 1", [attachment])
+            if query.next() or not query.isActive():
+                continue
+            try:
+                os.remove(self.objectPath(attachment))
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as error:
+                print(error)
+        return removed
+
+    def collectGarbage(self):
+        """
+        Удаляет все файлы хранилища, на которые не ссылается ни одна запись.
+
+        Returns:
+            int: Количество удаленных файлов или None, если ссылки не удалось прочитать.
+        """
+        query = self.conn.executeQuery("SELECT DISTINCT hash FROM attachments")
+        if not query.isActive():
+            return None
+        referenced = set()
+        while query.next():
+            referenced.add(query.value(0))
+
+        removed = 0
+        objects = os.path.join(self.directory, "objects")
+        for prefix in os.listdir(objects) if os.path.isdir(objects) else []:
+            for name in os.listdir(os.path.join(objects, prefix)):
+                if prefix + name not in referenced:
+                    os.remove(os.path.join(objects, prefix, name))
+                    removed += 1
+        return removed
+
+
+class ThumbnailSignals(QObject):
+    # Сигнал о готовой миниатюре: хеш вложения, изображение (пустое, если файл не удалось
+    # прочитать) и количество байт, записанных в кэш на диске
+    finished = pyqtSignal(str, QImage, int)
+
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, attachment, source, cache_path, size, signals):
+        """
+        Инициализирует создание миниатюры вложения.
+
+        Args:
+            attachment (str): Хеш вложения.
+            source (str): Путь к файлу вложения.
+            cache_path (str): Путь к миниатюре в кэше на диске.
+            size (int): Наибольшая сторона миниатюры в пикселях.
+            signals (ThumbnailSignals): Объект, сигналом которого сообщается результат.
+        """
+        super(ThumbnailTask, self).__init__()
+        self.attachment = attachment
+        self.source = source
+        self.cache_path = cache_path
+        self.size = size
+        self.signals = signals
+
+    def run(self):
+        """
+        Читает миниатюру из кэша на диске или создает ее из файла вложения.
+        """
+        written = 0
+        image = QImage()
+        if os.path.exists(self.cache_path):
+            try:
+                # Время изменения - время последнего использования для очистки кэша
+                os.utime(self.cache_path)
+                image = QImage(self.cache_path)
+            except OSError:
+                pass
+        if image.isNull():
+            reader = QImageReader(self.source)
+            reader.setAutoTransform(True)
+            if reader.size().isValid():
+                reader.setScaledSize(reader.size().scaled(self.size, self.size, Qt.AspectRatioMode.KeepAspectRatio))
+            image = reader.read()
+            if not image.isNull():
+                temporary = f"{self.cache_path}.{id(self)}.tmp"
+                if image.save(temporary, "PNG"):
+                    try:
+                        os.replace(temporary, self.cache_path)
+                        written = os.path.getsize(self.cache_path)
+                    except OSError as error:
+                        print(error)
+        self.signals.finished.emit(self.attachment, image, written)
+
+
+class ThumbnailCache(QObject):
+    # Сигнал о том, что миниатюра вложения готова
+    ready = pyqtSignal(str)
+
+    def __init__(self, store, size=THUMBNAIL_SIZE, limit=THUMBNAIL_CACHE_LIMIT, parent=None):
+        """
+        Инициализирует кэш миниатюр вложений.
+
+        Args:
+            store (AttachmentStore): Хранилище вложений.
+            size (int, optional): Наибольшая сторона миниатюры в пикселях.
+            limit (int, optional): Наибольший размер кэша на диске в байтах.
+            parent (QObject, optional): Родительский объект.
+        """
+        super(ThumbnailCache, self).__init__(parent)
+        self.store = store
+        self.size = size
+        self.limit = limit
+        self.directory = os.path.join(store.directory, "thumbnails")
+        self.memory = collections.OrderedDict()
+        self.pending = set()
+        self.disk_usage = None
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(THUMBNAIL_THREADS)
+        self.signals = ThumbnailSignals(self)
+        self.signals.finished.connect(self.finishThumbnail)
+
+    def cachePath(self, attachment):
+        """
+        Возвращает путь к миниатюре вложения в кэше на диске.
+
+        Args:
+            attachment (str): Хеш вложения.
+
+        Returns:
+            str: Путь к файлу миниатюры.
+        """
+        return os.path.join(self.directory, f"{attachment}_{self.size}.png")
+
+    def pixmap(self, attachment):
+        """
+        Возвращает миниатюру вложения, не дожидаясь ее создания.
+
+        Args:
+            attachment (str): Хеш вложения.
+
+        Returns:
+            QPixmap: Миниатюра (пустая, если файл не удалось прочитать) или None, если
+            миниатюра еще создается; о ее готовности сообщит сигнал ready.
+        """
+        pixmap = self.memory.get(attachment)
+        if pixmap is not None:
+            self.memory.move_to_end(attachment)
+            return pixmap
+        if attachment not in self.pending:
+            self.pending.add(attachment)
+            os.makedirs(self.directory, exist_ok=True)
+            self.pool.start(ThumbnailTask(attachment, self.store.objectPath(attachment), self.cachePath(attachment),
+                                          self.size, self.signals))
+        return None
+
+    def finishThumbnail(self, attachment, image, written):
+        """
+        Сохраняет созданную миниатюру в памяти и сообщает о ее готовности.
+
+        Args:
+            attachment (str): Хеш вложения.
+            image (QImage): Миниатюра или пустое изображение.
+            written (int): Количество байт, записанных в кэш на диске.
+        """
+        self.pending.discard(attachment)
+        self.memory[attachment] = QPixmap.fromImage(image)
+        while len(self.memory) > MEMORY_THUMBNAILS:
+            self.memory.popitem(last=False)
+        if written:
+            if self.disk_usage is None:
+                self.disk_usage = sum(entry.stat().st_size for entry in os.scandir(self.directory))
+            else:
+                self.disk_usage += written
+            if self.disk_usage > self.limit:
+                self.trim()
+        self.ready.emit(attachment)
+
+    def trim(self):
+        """
+        Удаляет из кэша на диске миниатюры, которые дольше всего не использовались,
+        пока размер кэша не уменьшится до доли THUMBNAIL_CACHE_TRIM от предела.
+        """
+        # Временные файлы еще записываются потоками миниатюр
+        entries = sorted((entry for entry in os.scandir(self.directory) if not entry.name.endswith(".tmp")),
+                         key=lambda entry: entry.stat().st_mtime)
+        self.disk_usage = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self.disk_usage <= self.limit * THUMBNAIL_CACHE_TRIM:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self.disk_usage -= size
+            except OSError as error:
+                print(error)
+
+    def wait(self):
+        """
+        Ожидает завершения создания всех запрошенных миниатюр.
+        """
+        self.pool.waitForDone()
+
+
+class AttachmentList(QListWidget):
+    # Роли данных элемента: хеш сохраненного вложения и путь к новому файлу
+    HASH_ROLE = Qt.ItemDataRole.UserRole
+    PATH_ROLE = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, thumbnails, parent=None):
+        """
+        Инициализирует список вложений окна записи.
+
+        Args:
+            thumbnails (ThumbnailCache): Кэш миниатюр вложений.
+            parent (QWidget, optional): Родительский виджет.
+        """
+        super(AttachmentList, self).__init__(parent)
+        self.thumbnails = thumbnails
+        self.initial = set()
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.setMaximumHeight(THUMBNAIL_SIZE + 48)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.itemDoubleClicked.connect(self.openItem)
+        self.thumbnails.ready.connect(self.updateThumbnail)
+
+    def addAttachment(self, name, attachment=None, path=None):
+        """
+        Добавляет в список сохраненное вложение или новый файл.
+
+        Args:
+            name (str): Имя файла.
+            attachment (str, optional): Хеш сохраненного вложения.
+            path (str, optional): Путь к новому файлу.
+        """
+        item = QListWidgetItem(name, self)
+        item.setToolTip(name)
+        item.setData(self.HASH_ROLE, attachment)
+        item.setData(self.PATH_ROLE, path)
+        if attachment is not None:
+            self.initial.add(attachment)
+            self.updateThumbnail(attachment)
+
+    def updateThumbnail(self, attachment):
+        """
+        Показывает миниатюру вложения, если она готова.
+
+        Args:
+            attachment (str): Хеш вложения.
+        """
+        items = [self.item(row) for row in range(self.count()) if self.item(row).data(self.HASH_ROLE) == attachment]
+        pixmap = self.thumbnails.pixmap(attachment) if items else None
+        if pixmap is None or pixmap.isNull():
+            return
+        for item in items:
+            item.setIcon(QIcon(pixmap))
+
+    def removeSelected(self):
+        """
+        Убирает выбранные вложения из списка.
+        """
+        for item in self.selectedItems():
+            self.takeItem(self.row(item))
+
+    def attachments(self):
+        """
+        Возвращает сохраненные вложения, оставшиеся в списке.
+
+        Returns:
+            set: Хеши вложений.
+        """
+        return {self.item(row).data(self.HASH_ROLE) for row in range(self.count())} - {None}
+
+    def paths(self):
+        """
+        Возвращает новые файлы из списка.
+
+        Returns:
+            list: Пути к файлам.
+        """
+        return [self.item(row).data(self.PATH_ROLE) for row in range(self.count())
+                if self.item(row).data(self.PATH_ROLE) is not None]
+
+    def openItem(self, item):
+        """
+        Открывает файл вложения в программе просмотра.
+
+        Args:
+            item (QListWidgetItem): Элемент списка.
+        """
+        path = item.data(self.PATH_ROLE) or self.thumbnails.store.objectPath(item.data(self.HASH_ROLE))
+        QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Вложения записей")
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы данных")
+    parser.add_argument("--gc", action="store_true", help="удалить файлы вложений, на которые нет ссылок")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication(sys.argv)
+    from connection import Data
+
+    if args.gc:
+        removed = AttachmentStore(Data(args.db), attachmentDirectory(args.db)).collectGarbage()
+        if removed is None:
+            sys.exit("Не удалось прочитать ссылки на вложения")
+        print(f"Удалено файлов: {removed}")
@@ -0,0 +1,381 @@
+# Модуль для резервного копирования базы данных без остановки приложения.
+#
+# Полная копия создается через backup API SQLite порциями по BACKUP_PAGES страниц: между
+# порциями блокировка базы данных освобождается, поэтому приложение и сторонние скрипты
+# продолжают писать во время копирования. Запись другим соединением заставляет backup API
+# начать копирование заново; после MAX_RESTARTS таких перезапусков оставшаяся копия делается
+# одним шагом под блокировкой чтения, чтобы частая запись не откладывала копию бесконечно.
+# Рядом с полной копией сохраняется манифест - хеши ее страниц.
+#
+# Копия изменений сохраняет только страницы, хеши которых отличаются от последнего манифеста,
+# и обновляет манифест. В режиме журнала отката страницы читаются из файла базы данных под
+# блокировкой чтения (журнал гарантирует, что файл при этом не меняется). В режиме WAL часть
+# записей еще в журнале, а файл меняют контрольные точки, поэтому страницы читаются
+# из согласованной копии, которую backup API создает рядом с цепочкой и которая удаляется
+# после сравнения. Полная копия и ее копии изменений образуют цепочку
+# в каталоге '<база данных>.backups':
+#     20250301-120000.db            полная копия
+#     20250301-120000.pages         манифест: размер страницы, количество страниц, хеши страниц
+#     20250301-120000.0001.delta    копия изменений: номер и содержимое каждой измененной страницы
+# Восстановление копирует полную копию и накладывает копии изменений по порядку.
+#
+# Модуль использует backup API из стандартного модуля sqlite3 (QtSql его не предоставляет),
+# поэтому приложение запускает копирование отдельным процессом (см. main.py): две разные
+# библиотеки SQLite в одном процессе снимают блокировки друг друга при закрытии файла.
+#
+# Запуск модуля:
+#     python backup.py full|incremental|list [--db expensetracker.db] [--progress]
+#     python backup.py restore restored.db [--chain 20250301-120000] [--step 3]
+
+
+import argparse
+import datetime
+import glob
+import hashlib
+import os
+import shutil
+import sqlite3
+import struct
+import sys
+import time
+
+from paths import DB_PATH
+
+
+# Количество страниц, копируемых за один шаг backup API
+BACKUP_PAGES = 1024
+
+# Количество перезапусков пошагового копирования из-за записи в базу данных,
+# после которого копия делается одним шагом
+MAX_RESTARTS = 3
+
+# Время ожидания блокировки базы данных в секундах (как BUSY_TIMEOUT_MS в модуле connection)
+BUSY_TIMEOUT = 5.0
+
+# Заголовок манифеста: сигнатура, размер страницы, количество страниц
+MANIFEST_HEADER = struct.Struct("<8sII")
+MANIFEST_MAGIC = b"ETPAGES\x01"
+
+# Заголовок копии изменений: сигнатура, размер страницы, количество страниц базы данных;
+# за ним следуют записи из номера страницы и ее содержимого
+DELTA_HEADER = struct.Struct("<8sII")
+DELTA_MAGIC = b"ETDELTA\x01"
+DELTA_PAGE = struct.Struct("<I")
+
+# Длина хеша страницы в байтах
+HASH_SIZE = 16
+
+
+def backupDirectory(db_path):
+    """
+    Возвращает каталог резервных копий базы данных.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+
+    Returns:
+        str: Путь к каталогу рядом с базой данных.
+    """
+    return os.path.splitext(db_path)[0] + ".backups"
+
+
+def pageHash(page):
+    """
+    Возвращает хеш страницы базы данных.
+
+    Args:
+        page (bytes): Содержимое страницы.
+
+    Returns:
+        bytes: Хеш длиной HASH_SIZE байт.
+    """
+    return hashlib.blake2b(page, digest_size=HASH_SIZE).digest()
+
+
+class BackupRestarted(Exception):
+    """
+    Пошаговое копирование слишком часто начиналось заново из-за записи в базу данных.
+    """
+
+
+class Backup:
+    def __init__(self, db_path=DB_PATH, directory=None):
+        """
+        Инициализирует резервное копирование базы данных.
+
+        Args:
+            db_path (str, optional): Путь к файлу базы данных.
+            directory (str, optional): Каталог резервных копий; по умолчанию '<база данных>.backups'.
+        """
+        super(Backup, self).__init__()
+        self.db_path = db_path
+        self.directory = directory or backupDirectory(db_path)
+
+    def connect(self, path):
+        """
+        Открывает соединение с базой данных через модуль sqlite3.
+
+        Args:
+            path (str): Путь к файлу базы данных.
+
+        Returns:
+            sqlite3.Connection: Соединение в режиме автофиксации.
+        """
+        return sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+
+    def getChains(self):
+        """
+        Возвращает цепочки резервных копий.
+
+        Returns:
+            dict: Словарь {имя цепочки: список путей к копиям изменений по порядку},
+            упорядоченный по времени создания полной копии.
+        """
+        chains = {}
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.db"))):
+            name = os.path.basename(path)[:-len(".db")]
+            chains[name] = sorted(glob.glob(os.path.join(self.directory, f"{name}.[0-9]*.delta")))
+        return chains
+
+    def copyDatabase(self, path, progress=None):
+        """
+        Копирует базу данных через backup API порциями по BACKUP_PAGES страниц.
+
+        Копия согласована: в нее попадают и записи, еще не перенесенные из журнала WAL.
+
+        Args:
+            path (str): Путь к копии; файл записывается под временным именем и заменяется атомарно.
+            progress (callable, optional): Функция progress(скопировано страниц, всего страниц),
+                вызываемая после каждого шага копирования.
+        """
+        restarts = []
+        copied = []
+
+        def report(status, remaining, total):
+            # Количество оставшихся страниц растет, только если копирование началось заново
+            if copied and total - remaining < copied[-1]:
+                restarts.append(remaining)
+                if len(restarts) > MAX_RESTARTS:
+                    raise BackupRestarted()
+            copied.append(total - remaining)
+            if progress is not None:
+                progress(total - remaining, total)
+
+        source = self.connect(self.db_path)
+        target = self.connect(path + ".tmp")
+        try:
+            try:
+                source.backup(target, pages=BACKUP_PAGES, progress=report)
+            except BackupRestarted:
+                source.backup(target, pages=-1, progress=report)
+        finally:
+            target.close()
+            source.close()
+        os.replace(path + ".tmp", path)
+
+    def full(self, progress=None):
+        """
+        Создает полную копию базы данных и начинает новую цепочку.
+
+        Args:
+            progress (callable, optional): Функция progress(скопировано страниц, всего страниц),
+                вызываемая после каждого шага копирования.
+
+        Returns:
+            str: Путь к полной копии.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        name = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, name + ".db")
+        if os.path.exists(path):
+            # Две копии за одну секунду получают разные имена
+            name += datetime.datetime.now().strftime("-%f")
+            path = os.path.join(self.directory, name + ".db")
+
+        self.copyDatabase(path, progress)
+
+        with open(path, "rb") as backup:
+            page_size = struct.unpack(">H", backup.read(18)[16:])[0]
+            # Размер страницы 65536 записывается в заголовке как 1
+            page_size = 65536 if page_size == 1 else page_size
+            backup.seek(0)
+            hashes = []
+            while True:
+                page = backup.read(page_size)
+                if not page:
+                    break
+                hashes.append(pageHash(page))
+        self.writeManifest(name, page_size, hashes)
+        return path
+
+    def incremental(self):
+        """
+        Сохраняет страницы, изменившиеся после последней копии, в копию изменений последней цепочки.
+        Если цепочки нет или размер страницы изменился, создает полную копию.
+
+        Returns:
+            str: Путь к созданной копии или None, если база данных не изменилась.
+        """
+        chains = self.getChains()
+        manifest = self.readManifest(next(reversed(chains))) if chains else None
+        if manifest is None:
+            return self.full()
+        name, page_size, hashes = manifest
+
+        pages_path = self.db_path
+        source = self.connect(self.db_path)
+        try:
+            if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+                source.close()
+                pages_path = os.path.join(self.directory, f"{name}.snapshot")
+                self.copyDatabase(pages_path)
+                source = self.connect(pages_path)
+
+            # Блокировка чтения держится до конца чтения файла: запись другими соединениями ждет
+            source.execute("BEGIN")
+            page_count = source.execute("PRAGMA page_count").fetchone()[0]
+            if source.execute("PRAGMA page_size").fetchone()[0] != page_size:
+                source.execute("COMMIT")
+                source.close()
+                return self.full()
+            changed = []
+            new_hashes = []
+            with open(pages_path, "rb") as database:
+                for index in range(page_count):
+                    page = database.read(page_size)
+                    page_hash = pageHash(page)
+                    new_hashes.append(page_hash)
+                    if index >= len(hashes) or hashes[index] != page_hash:
+                        changed.append((index, page))
+            source.execute("COMMIT")
+        finally:
+            source.close()
+            if pages_path != self.db_path and os.path.exists(pages_path):
+                os.remove(pages_path)
+
+        if not changed and page_count == len(hashes):
+            return None
+        path = os.path.join(self.directory, f"{name}.{len(self.getChains()[name]) + 1:04d}.delta")
+        with open(path + ".tmp", "wb") as delta:
+            delta.write(DELTA_HEADER.pack(DELTA_MAGIC, page_size, page_count))
+            for index, page in changed:
+                delta.write(DELTA_PAGE.pack(index))
+                delta.write(page)
+            delta.flush()
+            os.fsync(delta.fileno())
+        os.replace(path + ".tmp", path)
+        self.writeManifest(name, page_size, new_hashes)
+        return path
+
+    def restore(self, target_path, chain=None, step=None):
+        """
+        Восстанавливает базу данных из цепочки резервных копий в новый файл.
+
+        Args:
+            target_path (str): Путь к восстановленной базе данных; файл не должен существовать.
+            chain (str, optional): Имя цепочки; по умолчанию последняя цепочка.
+            step (int, optional): Количество накладываемых копий изменений; по умолчанию все.
+
+        Returns:
+            bool: True, если база данных восстановлена.
+        """
+        chains = self.getChains()
+        if not chains:
+            print("Резервных копий нет")
+            return False
+        chain = chain or next(reversed(chains))
+        if chain not in chains:
+            print(f"Цепочка {chain} не найдена")
+            return False
+        if os.path.exists(target_path):
+            print(f"Файл {target_path} уже существует")
+            return False
+
+        shutil.copyfile(os.path.join(self.directory, chain + ".db"), target_path + ".tmp")
+        with open(target_path + ".tmp", "r+b") as target:
+            for path in chains[chain][:step]:
+                with open(path, "rb") as delta:
+                    magic, page_size, page_count = DELTA_HEADER.unpack(delta.read(DELTA_HEADER.size))
+                    if magic != DELTA_MAGIC:
+                        print(f"Файл {path} не является копией изменений")
+                        target.close()
+                        os.remove(target_path + ".tmp")
+                        return False
+                    while True:
+                        record = delta.read(DELTA_PAGE.size)
+                        if not record:
+                            break
+                        target.seek(DELTA_PAGE.unpack(record)[0] * page_size)
+                        target.write(delta.read(page_size))
+                target.truncate(page_count * page_size)
+        os.replace(target_path + ".tmp", target_path)
+        return True
+
+    def readManifest(self, name):
+        """
+        Читает манифест цепочки.
+
+        Args:
+            name (str): Имя цепочки.
+
+        Returns:
+            tuple: Имя цепочки, размер страницы и список хешей страниц
+            или None, если манифест отсутствует или поврежден.
+        """
+        try:
+            with open(os.path.join(self.directory, name + ".pages"), "rb") as manifest:
+                magic, page_size, page_count = MANIFEST_HEADER.unpack(manifest.read(MANIFEST_HEADER.size))
+                data = manifest.read()
+        except (OSError, struct.error):
+            return None
+        if magic != MANIFEST_MAGIC or len(data) != page_count * HASH_SIZE:
+            return None
+        return name, page_size, [data[offset:offset + HASH_SIZE] for offset in range(0, len(data), HASH_SIZE)]
+
+    def writeManifest(self, name, page_size, hashes):
+        """
+        Записывает манифест цепочки.
+
+        Args:
+            name (str): Имя цепочки.
+            page_size (int): Размер страницы базы данных.
+            hashes (list): Хеши страниц.
+        """
+        path = os.path.join(self.directory, name + ".pages")
+        with open(path + ".tmp", "wb") as manifest:
+            manifest.write(MANIFEST_HEADER.pack(MANIFEST_MAGIC, page_size, len(hashes)))
+            manifest.write(b"".join(hashes))
+        os.replace(path + ".tmp", path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Резервное копирование базы данных")
+    parser.add_argument("command", choices=["full", "incremental", "list", "restore"])
+    parser.add_argument("target", nargs="?", help="путь к восстановленной базе данных (для restore)")
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы данных")
+    parser.add_argument("--chain", help="имя цепочки для восстановления")
+    parser.add_argument("--step", type=int, help="количество накладываемых копий изменений")
+    parser.add_argument("--progress", action="store_true", help="выводить ход копирования построчно")
+    args = parser.parse_args()
+
+    backup = Backup(args.db)
+    started = time.perf_counter()
+    if args.command == "full":
+        path = backup.full((lambda done, total: print(f"progress {done} {total}", flush=True))
+                           if args.progress else None)
+        print(f"Полная копия: {path} ({time.perf_counter() - started:.2f} с)")
+    elif args.command == "incremental":
+        path = backup.incremental()
+        if path is None:
+            print("База данных не изменилась после последней копии")
+        else:
+            print(f"Копия: {path} ({time.perf_counter() - started:.2f} с)")
+    elif args.command == "list":
+        for name, deltas in backup.getChains().items():
+            print(f"{name}: копий изменений - {len(deltas)}")
+    else:
+        if args.target is None:
+            sys.exit("Укажите путь к восстановленной базе данных")
+        if not backup.restore(args.target, args.chain, args.step):
+            sys.exit(1)
+        print(f"База данных восстановлена в {args.target}")
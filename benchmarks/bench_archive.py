@@ -0,0 +1,101 @@
+# Бенчмарк архивации закрытых лет (модуль archive).
+#
+# Измеряет время подсчета баланса, списка записей с фильтром по категории и списка записей
+# с фильтром по дате архивного года на синтетической базе данных из генератора ledger.py
+# до и после переноса в архивы всех лет, кроме последнего, а также время самой архивации.
+# Синтетические записи охватывают пять закрытых лет. Проверяется, что баланс после
+# архивации не изменился.
+#
+# Запуск: python benchmarks/bench_archive.py --rows 1000000
+
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def measure(function, runs):
+    """
+    Измеряет медианное время выполнения функции.
+
+    Args:
+        function (callable): Измеряемая функция.
+        runs (int): Количество запусков.
+
+    Returns:
+        float: Медианное время в миллисекундах.
+    """
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def measureQueries(conn, date, runs):
+    """
+    Измеряет время запросов, на которые влияет архивация.
+
+    Args:
+        conn (Data): Объект для работы с базой данных.
+        date (str): Дата архивного года для фильтра в формате 'DD.MM.YYYY'.
+        runs (int): Количество запусков каждого запроса.
+
+    Returns:
+        dict: Медианное время запросов в миллисекундах.
+    """
+    def fetchAll(query):
+        while query.next():
+            pass
+
+    return {
+        "getBalance": measure(conn.getBalance, runs),
+        "filter_category": measure(lambda: fetchAll(conn.getTableWithFilters(True, False, "", "Транспорт")), runs),
+        "filter_archived_date": measure(lambda: fetchAll(conn.getTableWithFilters(False, True, date, "")), runs),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк архивации закрытых лет")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    parser.add_argument("--runs", type=int, default=5, help="количество запусков каждого запроса")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from archive import Archiver
+    from connection import Data
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = Data(copyLedger(args.rows, directory))
+        archiver = Archiver(conn)
+        years = archiver.getArchivableYears()
+        date = f"15.06.{years[0]}"
+        balance = conn.getBalance()
+        before = measureQueries(conn, date, args.runs)
+        started = time.perf_counter()
+        archived = archiver.archiveUntil(years[-2] if len(years) > 1 else years[-1])
+        archive_seconds = time.perf_counter() - started
+        balance_matches = conn.getBalance() == balance
+        after = measureQueries(conn, date, args.runs)
+
+    print(json.dumps({
+        "benchmark": "archive",
+        "rows": args.rows,
+        "archived_rows": sum(rows or 0 for rows in archived.values()),
+        "archive_seconds": archive_seconds,
+        "before_ms": before,
+        "after_ms": after,
+        "balance_matches": balance_matches,
+    }, ensure_ascii=False, indent=2))
@@ -0,0 +1,190 @@
+# Бенчмарк вложений и миниатюр (модуль attachments).
+#
+# Создает --images синтетических фотографий чеков размером --width x --height и измеряет:
+# - время сохранения вложений и повторного прикрепления тех же файлов (без новых копий);
+# - рост файла базы данных на одно вложение против хранения файла в BLOB-колонке;
+# - создание миниатюр в пуле потоков (сигнал ready) против уменьшения полных изображений
+#   по одному в основном потоке, как без кэша;
+# - чтение миниатюр из кэша на диске новым экземпляром кэша и из памяти;
+# - 99-й процентиль и наибольшее время вызова ThumbnailCache.pixmap, который выполняется
+#   при отрисовке ячейки;
+# - размер кэша на диске после очистки при заниженном пределе.
+#
+# Запуск: python benchmarks/bench_attachments.py --images 100
+
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def createImages(directory, count, width, height):
+    """
+    Создает фотографии чеков: плавный цветной шум с текстом, сохраненные в JPEG.
+
+    Args:
+        directory (str): Каталог для файлов.
+        count (int): Количество файлов.
+        width (int): Ширина изображения в пикселях.
+        height (int): Высота изображения в пикселях.
+
+    Returns:
+        list: Пути к файлам.
+    """
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtGui import QColor, QFont, QImage, QPainter
+
+    paths = []
+    for number in range(count):
+        noise = QImage(os.urandom(width // 16 * height // 16 * 3), width // 16, height // 16, width // 16 * 3,
+                       QImage.Format.Format_RGB888)
+        image = noise.scaled(width, height, transformMode=Qt.TransformationMode.SmoothTransformation)
+        painter = QPainter(image)
+        painter.setPen(QColor(20, 20, 20))
+        painter.setFont(QFont("Sans", height // 40))
+        for line in range(20):
+            painter.drawText(width // 10, height // 20 * (line + 1), f"Чек {number} строка {line} 123,45")
+        painter.end()
+        path = os.path.join(directory, f"receipt{number}.jpg")
+        image.save(path, "JPEG", 85)
+        paths.append(path)
+    return paths
+
+
+def waitReady(app, cache, attachments):
+    """
+    Запрашивает миниатюры и обрабатывает события, пока все они не будут готовы.
+
+    Args:
+        app (QGuiApplication): Приложение.
+        cache (ThumbnailCache): Кэш миниатюр.
+        attachments (list): Хеши вложений.
+
+    Returns:
+        tuple: Время в секундах и список времен вызовов pixmap в миллисекундах.
+    """
+    started = time.perf_counter()
+    calls = []
+    missing = set(attachments)
+    while missing:
+        for attachment in list(missing):
+            call_started = time.perf_counter()
+            pixmap = cache.pixmap(attachment)
+            calls.append((time.perf_counter() - call_started) * 1000)
+            if pixmap is not None:
+                missing.discard(attachment)
+        app.processEvents()
+        time.sleep(0.001)
+    return time.perf_counter() - started, calls
+
+
+def fileSize(path):
+    """
+    Возвращает размер файла базы данных вместе с журналом WAL.
+
+    Args:
+        path (str): Путь к файлу базы данных.
+
+    Returns:
+        int: Размер в байтах.
+    """
+    return sum(os.path.getsize(name) for name in (path, path + "-wal") if os.path.exists(name))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк вложений и миниатюр")
+    parser.add_argument("--images", type=int, default=100, help="количество изображений")
+    parser.add_argument("--width", type=int, default=3000, help="ширина изображения в пикселях")
+    parser.add_argument("--height", type=int, default=4000, help="высота изображения в пикселях")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtCore import Qt
+    from PyQt6.QtGui import QGuiApplication, QImage
+
+    app = QGuiApplication([])
+    from attachments import THUMBNAIL_SIZE, AttachmentStore, ThumbnailCache, attachmentDirectory
+    from connection import Data
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = createImages(directory, args.images, args.width, args.height)
+        image_mb = sum(os.path.getsize(path) for path in paths) / 2 ** 20
+
+        db_path = os.path.join(directory, "ledger.db")
+        conn = Data(db_path)
+        entries = [conn.insertEntry(f"Покупка {number}", 12345, "Прочее", "15.06.2024")
+                   for number in range(args.images * 2)]
+        store = AttachmentStore(conn, attachmentDirectory(db_path))
+
+        size_before = fileSize(db_path)
+        started = time.perf_counter()
+        attachments = [store.attach(entry_id, path) for entry_id, path in zip(entries, paths)]
+        attach_seconds = time.perf_counter() - started
+        db_growth = (fileSize(db_path) - size_before) / args.images
+
+        # Те же файлы прикрепляются к другим записям: копии не создаются
+        started = time.perf_counter()
+        for entry_id, path in zip(entries[args.images:], paths):
+            store.attach(entry_id, path)
+        dedup_seconds = time.perf_counter() - started
+        stored_files = sum(len(files) for _, _, files in os.walk(os.path.join(store.directory, "objects")))
+
+        # Для сравнения те же файлы в BLOB-колонке
+        conn.executeQuery("CREATE TABLE inline_attachments (entry_id integer, data BLOB)")
+        size_before = fileSize(db_path)
+        for entry_id, path in zip(entries, paths):
+            with open(path, "rb") as source:
+                conn.executeQuery("INSERT INTO inline_attachments VALUES (?, ?)", [entry_id, source.read()])
+        inline_growth = (fileSize(db_path) - size_before) / args.images
+
+        # Уменьшение полных изображений по одному в основном потоке
+        started = time.perf_counter()
+        for path in paths:
+            QImage(path).scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.AspectRatioMode.KeepAspectRatio,
+                                Qt.TransformationMode.SmoothTransformation)
+        blocking_seconds = time.perf_counter() - started
+
+        cache = ThumbnailCache(store)
+        cold_seconds, cold_calls = waitReady(app, cache, attachments)
+        memory_seconds, memory_calls = waitReady(app, cache, attachments)
+        cache.wait()
+        warm = ThumbnailCache(store)
+        warm_seconds, warm_calls = waitReady(app, warm, attachments)
+        warm.wait()
+        disk_bytes = sum(entry.stat().st_size for entry in os.scandir(cache.directory))
+
+        # Миниатюры другого размера в том же каталоге при заниженном пределе: кэш очищается
+        # до доли предела, начиная с давно не использованных миниатюр
+        small = ThumbnailCache(store, size=THUMBNAIL_SIZE * 2, limit=disk_bytes // 4)
+        waitReady(app, small, attachments)
+        small.wait()
+        trimmed_bytes = sum(entry.stat().st_size for entry in os.scandir(small.directory))
+        conn.close()
+
+    calls = cold_calls + memory_calls + warm_calls
+    print(json.dumps({
+        "benchmark": "attachments",
+        "images": args.images,
+        "image_size": f"{args.width}x{args.height}",
+        "images_mb": image_mb,
+        "attach_ms_per_image": attach_seconds / args.images * 1000,
+        "dedup_ms_per_image": dedup_seconds / args.images * 1000,
+        "stored_files": stored_files,
+        "db_bytes_per_attachment": db_growth,
+        "inline_blob_bytes_per_attachment": inline_growth,
+        "thumbnails_blocking_seconds": blocking_seconds,
+        "thumbnails_pool_seconds": cold_seconds,
+        "thumbnails_disk_cache_seconds": warm_seconds,
+        "thumbnails_memory_seconds": memory_seconds,
+        "pixmap_call_p99_ms": sorted(calls)[int(len(calls) * 0.99)],
+        "pixmap_call_max_ms": max(calls),
+        "thumbnail_cache_bytes": disk_bytes,
+        "trimmed_cache_limit_bytes": disk_bytes // 4,
+        "trimmed_cache_bytes": trimmed_bytes,
+    }, ensure_ascii=False, indent=2))
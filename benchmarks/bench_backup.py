@@ -0,0 +1,100 @@
+# Бенчмарк резервного копирования (модуль backup).
+#
+# На синтетической базе данных из генератора ledger.py измеряет время и скорость полной копии,
+# наибольшую задержку добавления записи приложением во время полной копии (копирование
+# выполняется отдельным процессом, как из меню приложения), время и размер копии изменений
+# после добавления записей и время восстановления. Проверяется, что восстановленная база
+# данных совпадает с исходной.
+#
+# Запуск: python benchmarks/bench_backup.py --rows 1000000
+
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def checksum(conn):
+    """
+    Возвращает количество и контрольную сумму записей таблицы расходов.
+
+    Args:
+        conn (Data): Объект для работы с базой данных.
+
+    Returns:
+        tuple: Количество записей и сумма произведений идентификаторов на суммы.
+    """
+    query = conn.executeQuery("SELECT COUNT(*), SUM(id * value) FROM expenses")
+    query.next()
+    return query.value(0), query.value(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк резервного копирования")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    parser.add_argument("--entries", type=int, default=1000,
+                        help="количество записей, добавляемых перед копией изменений")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from backup import Backup
+    from connection import Data
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = copyLedger(args.rows, directory)
+        size_mb = os.path.getsize(db_path) / 2 ** 20
+        conn = Data(db_path)
+        backup = Backup(db_path)
+
+        # Полная копия отдельным процессом; приложение тем временем добавляет записи
+        started = time.perf_counter()
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "backup.py"), "full", "--db", db_path],
+                                   stdout=subprocess.DEVNULL, cwd=ROOT)
+        latencies = []
+        while process.poll() is None:
+            insert_started = time.perf_counter()
+            conn.insertEntry("Бенчмарк", 12345, "Прочее", "15.06.2024")
+            latencies.append(time.perf_counter() - insert_started)
+            time.sleep(0.01)
+        full_seconds = time.perf_counter() - started
+
+        for number in range(args.entries):
+            conn.insertEntry(f"Бенчмарк {number}", 12345, "Прочее", "15.06.2024")
+        started = time.perf_counter()
+        delta_path = backup.incremental()
+        incremental_seconds = time.perf_counter() - started
+
+        restored_path = os.path.join(directory, "restored.db")
+        started = time.perf_counter()
+        backup.restore(restored_path)
+        restore_seconds = time.perf_counter() - started
+        expected = checksum(conn)
+        conn.close()
+        restored = Data(restored_path, connection_name="restored")
+        restored_matches = checksum(restored) == expected
+        restored.close()
+
+        print(json.dumps({
+            "benchmark": "backup",
+            "rows": args.rows,
+            "size_mb": size_mb,
+            "full_seconds": full_seconds,
+            "full_mb_per_second": size_mb / full_seconds,
+            "inserts_during_full": len(latencies),
+            "max_insert_latency_ms": max(latencies, default=0) * 1000,
+            "incremental_seconds": incremental_seconds,
+            "incremental_mb": os.path.getsize(delta_path) / 2 ** 20,
+            "restore_seconds": restore_seconds,
+            "restored_matches": restored_matches,
+        }, ensure_ascii=False, indent=2))
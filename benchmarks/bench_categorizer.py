@@ -0,0 +1,80 @@
+# Бенчмарк модели определения категорий (модуль categorizer).
+#
+# Обучает модель на синтетической базе данных из генератора ledger.py, кроме отложенной
+# выборки, и измеряет время обучения, скорость определения категорий (строк в секунду)
+# для отдельных описаний и для пакетной разметки, а также точность на отложенной выборке.
+# Чтобы повторяющиеся описания не ускоряли пакетную разметку, к описаниям добавляются
+# случайные номера операций, как в банковских выписках.
+#
+# Запуск: python benchmarks/bench_categorizer.py --rows 100000
+
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк модели определения категорий")
+    parser.add_argument("--rows", type=int, default=100000, help="количество записей в базе данных")
+    parser.add_argument("--holdout", type=float, default=0.1, help="доля записей для проверки точности")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from categorizer import Categorizer
+    from connection import Data
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = copyLedger(args.rows, directory)
+        # Отложенная выборка - последние записи, которые удаляются из базы данных до обучения
+        holdout_size = int(args.rows * args.holdout)
+        with sqlite3.connect(db_path) as conn:
+            holdout = conn.execute("SELECT description, category FROM expenses ORDER BY id DESC LIMIT ?",
+                                   [holdout_size]).fetchall()
+            conn.execute("DELETE FROM expenses WHERE id > ?", [args.rows - holdout_size])
+
+        data = Data(db_path)
+        categorizer = Categorizer(data)
+        started = time.perf_counter()
+        trained = categorizer.rebuild()
+        train_seconds = time.perf_counter() - started
+
+        rng = random.Random(0)
+        descriptions = [f"{description} {rng.randint(100000, 999999)}" for description, _ in holdout]
+        started = time.perf_counter()
+        suggestions = [categorizer.suggest(description) for description in descriptions]
+        suggest_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        categorizer.categorize(descriptions)
+        batch_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        categorizer.save()
+        save_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        Categorizer(data)
+        load_seconds = time.perf_counter() - started
+
+    correct = sum(suggestion[0] == category for suggestion, (_, category) in zip(suggestions, holdout))
+    print(json.dumps({
+        "benchmark": "categorizer",
+        "trained_rows": trained,
+        "train_rows_per_second": trained / train_seconds,
+        "suggest_rows_per_second": len(descriptions) / suggest_seconds,
+        "batch_rows_per_second": len(descriptions) / batch_seconds,
+        "accuracy": correct / len(holdout),
+        "save_seconds": save_seconds,
+        "load_seconds": load_seconds,
+    }, ensure_ascii=False, indent=2))
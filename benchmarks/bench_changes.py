@@ -0,0 +1,97 @@
+# Бенчмарк журнала изменений (модуль changes).
+#
+# На синтетической базе данных из генератора ledger.py измеряет:
+# - замедление добавления записей триггерами журнала (в сравнении с копией базы без них);
+# - время синхронизации потребителя после --edits изменений записей: чтение изменений после
+#   курсора против повторного чтения всей таблицы расходов, как это делали отчеты без журнала.
+#
+# Запуск: python benchmarks/bench_changes.py --rows 1000000 --edits 1000
+
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def measureInserts(conn, entries):
+    """
+    Измеряет время добавления записей по одной.
+
+    Args:
+        conn (Data): Объект для работы с базой данных.
+        entries (int): Количество записей.
+
+    Returns:
+        float: Время в секундах.
+    """
+    started = time.perf_counter()
+    for number in range(entries):
+        conn.insertEntry(f"Бенчмарк {number}", 12345, "Прочее", "15.06.2024")
+    return time.perf_counter() - started
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк журнала изменений")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    parser.add_argument("--edits", type=int, default=1000, help="количество изменений перед синхронизацией")
+    parser.add_argument("--inserts", type=int, default=2000, help="количество записей для замера добавления")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from changes import ChangeFeed
+    from connection import Data
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        conn = Data(copyLedger(args.rows, directory))
+        plain = Data(copyLedger(args.rows, tempfile.mkdtemp(dir=directory)), connection_name="plain")
+        for name in ("changes_insert", "changes_update", "changes_delete"):
+            plain.executeQuery(f"DROP TRIGGER {name}")
+        plain_insert_seconds = measureInserts(plain, args.inserts)
+        plain.close()
+        insert_seconds = measureInserts(conn, args.inserts)
+
+        feed = ChangeFeed(conn)
+        cursor = feed.lastCursor()
+        query = conn.executeQuery("SELECT MAX(id) FROM expenses")
+        query.next()
+        max_id = query.value(0)
+        with conn.transaction():
+            for entry_id in rng.sample(range(1, max_id + 1), args.edits):
+                conn.executeQuery("UPDATE expenses SET value = value + 1 WHERE id = ?", [entry_id])
+
+        started = time.perf_counter()
+        changes = list(feed.iterChanges(cursor))
+        feed_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        query = conn.executeQuery("SELECT id, description, value, category, date, currency FROM expenses")
+        rescanned = 0
+        while query.next():
+            rescanned += 1
+        rescan_seconds = time.perf_counter() - started
+        conn.close()
+
+    print(json.dumps({
+        "benchmark": "changes",
+        "rows": args.rows,
+        "insert_ms_with_log": insert_seconds / args.inserts * 1000,
+        "insert_ms_without_log": plain_insert_seconds / args.inserts * 1000,
+        "edits": args.edits,
+        "changes_read": len(changes),
+        "feed_sync_seconds": feed_seconds,
+        "rescan_rows": rescanned,
+        "rescan_seconds": rescan_seconds,
+        "speedup": rescan_seconds / feed_seconds,
+    }, ensure_ascii=False, indent=2))
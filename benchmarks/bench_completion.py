@@ -0,0 +1,57 @@
+# Бенчмарк автодополнения описаний (модуль completion).
+#
+# Строит индекс описаний по синтетической базе данных из генератора ledger.py и измеряет
+# время построения и задержку поиска вариантов для всех начал описаний длиной от 1 до 4
+# символов, как при вводе описания по одному символу.
+#
+# Запуск: python benchmarks/bench_completion.py --rows 100000
+
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк автодополнения описаний")
+    parser.add_argument("--rows", type=int, default=100000, help="количество записей в базе данных")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from completion import DescriptionIndex
+    from connection import Data
+
+    with tempfile.TemporaryDirectory() as directory:
+        data = Data(copyLedger(args.rows, directory))
+        index = DescriptionIndex()
+        started = time.perf_counter()
+        index.refresh(data)
+        build_seconds = time.perf_counter() - started
+
+    prefixes = sorted({stats["text"][:length] for stats in index.descriptions.values() for length in range(1, 5)})
+    latencies = []
+    for prefix in prefixes:
+        started = time.perf_counter()
+        index.complete(prefix)
+        latencies.append(time.perf_counter() - started)
+
+    print(json.dumps({
+        "benchmark": "completion",
+        "rows": args.rows,
+        "descriptions": len(index.descriptions),
+        "build_seconds": build_seconds,
+        "prefixes": len(prefixes),
+        "complete_median_ms": statistics.median(latencies) * 1000,
+        "complete_max_ms": max(latencies) * 1000,
+    }, ensure_ascii=False, indent=2))
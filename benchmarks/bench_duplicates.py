@@ -0,0 +1,107 @@
+# Бенчмарк поиска повторяющихся записей (модуль duplicates).
+#
+# Добавляет в синтетическую базу данных из генератора ledger.py заданную долю искаженных
+# повторов существующих записей (другой регистр, номер операции в описании, дата списания
+# на 0-2 дня позже) и измеряет время вычисления отпечатков всех записей, время поиска
+# похожих записей и долю найденных повторов. Для сравнения выводится количество
+# сравнений, которое потребовалось бы при попарном сравнении всех записей.
+#
+# Запуск: python benchmarks/bench_duplicates.py --rows 100000
+
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def distort(description, rng):
+    """
+    Искажает описание записи так, как оно могло бы выглядеть в банковской выписке.
+
+    Args:
+        description (str): Описание записи.
+        rng (random.Random): Генератор случайных чисел.
+
+    Returns:
+        str: Искаженное описание.
+    """
+    variant = rng.randrange(3)
+    if variant == 0:
+        return description.upper()
+    if variant == 1:
+        return f"{description} {rng.randint(1000, 9999)}"
+    return f"Оплата {description}"
+
+
+def injectDuplicates(db_path, ratio, seed=0):
+    """
+    Добавляет в базу данных искаженные повторы случайных записей.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        ratio (float): Доля повторяемых записей.
+        seed (int, optional): Зерно генератора случайных чисел.
+
+    Returns:
+        set: Пары идентификаторов (исходная запись, повтор).
+    """
+    rng = random.Random(seed)
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT id, description, value, category, date FROM expenses").fetchall()
+        pairs = set()
+        for entry_id, description, value, category, date in rng.sample(rows, int(len(rows) * ratio)):
+            day = datetime.datetime.strptime(date, "%d.%m.%Y") + datetime.timedelta(rng.randint(0, 2))
+            cursor = conn.execute("INSERT INTO expenses (description, value, category, date) VALUES (?, ?, ?, ?)",
+                                  [distort(description, rng), value, category, day.strftime("%d.%m.%Y")])
+            pairs.add((entry_id, cursor.lastrowid))
+        # Отпечатки всех записей вычисляются заново при открытии базы данных
+        conn.execute("UPDATE expenses SET fingerprint = NULL")
+    return pairs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска повторяющихся записей")
+    parser.add_argument("--rows", type=int, default=100000, help="количество записей в базе данных")
+    parser.add_argument("--ratio", type=float, default=0.01, help="доля записей, к которым добавляется повтор")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from connection import Data
+    from duplicates import DuplicateFinder
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = copyLedger(args.rows, directory)
+        injected = injectDuplicates(db_path, args.ratio)
+        total_rows = args.rows + len(injected)
+
+        started = time.perf_counter()
+        data = Data(db_path)
+        open_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        candidates = DuplicateFinder(data).findCandidates()
+        find_seconds = time.perf_counter() - started
+
+    found = {(candidate["first"]["id"], candidate["second"]["id"]) for candidate in candidates}
+    print(json.dumps({
+        "benchmark": "duplicates",
+        "rows": total_rows,
+        "injected": len(injected),
+        "fingerprint_rows_per_second": total_rows / open_seconds,
+        "find_seconds": find_seconds,
+        "candidates": len(candidates),
+        "recall": len(injected & found) / len(injected) if injected else 1.0,
+        "pairwise_comparisons": total_rows * (total_rows - 1) // 2,
+    }, ensure_ascii=False, indent=2))
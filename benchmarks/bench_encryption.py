@@ -0,0 +1,129 @@
+# Бенчмарк хранения базы данных в зашифрованном виде (модуль encryption).
+#
+# На синтетической базе данных из генератора ledger.py измеряет скорость шифрования файла
+# целиком (создание), расшифровки (открытие при запуске) и сохранения после добавления
+# нескольких записей и проверяет цели, заявленные в модуле encryption: расшифровка и полное
+# шифрование - не меньше 100 МБ/с. Рабочая копия открывается, как в приложении, в режиме
+# журнала отката (DELETE), иначе добавленные записи остались бы в журнале WAL и сохранение
+# не нашло бы измененных страниц; если сохранение не зашифровало ни одной страницы, бенчмарк
+# завершается ошибкой. Для справки выводится отношение времени запросов к рабочей копии
+# (журнал отката) и к незашифрованной базе (журнал WAL): рабочая копия - обычный
+# незашифрованный файл, поэтому отношение показывает цену режима журнала, а не шифрования.
+# Требует пакета cryptography.
+#
+# Запуск: python benchmarks/bench_encryption.py --rows 1000000
+
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def measure(function, runs):
+    """
+    Измеряет медианное время выполнения функции.
+
+    Args:
+        function (callable): Измеряемая функция.
+        runs (int): Количество запусков.
+
+    Returns:
+        float: Медианное время в секундах.
+    """
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def measureQueries(db_path, name, runs, journal_mode=None):
+    """
+    Измеряет суммарное медианное время добавления записи и подсчета баланса.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        name (str): Имя соединения Qt.
+        runs (int): Количество запусков.
+        journal_mode (str, optional): Режим журнала соединения; по умолчанию - как у приложения.
+
+    Returns:
+        float: Время в секундах.
+    """
+    from connection import JOURNAL_MODE, Data
+
+    conn = Data(db_path, connection_name=name, journal_mode=journal_mode or JOURNAL_MODE)
+    seconds = (measure(lambda: conn.insertEntry("Бенчмарк", 12345, "Прочее", "15.06.2024"), runs * 10) +
+               measure(conn.getBalance, runs))
+    conn.close()
+    return seconds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк зашифрованного хранения базы данных")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    parser.add_argument("--runs", type=int, default=3, help="количество запусков каждого измерения")
+    parser.add_argument("--entries", type=int, default=100, help="количество записей, добавляемых перед сохранением")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from connection import Data
+    from encryption import AESGCM, EncryptedLedger
+
+    if AESGCM is None:
+        sys.exit("Для бенчмарка установите пакет cryptography")
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = copyLedger(args.rows, directory)
+        size = os.path.getsize(db_path)
+        encrypted_path = db_path + ".enc"
+        create_seconds = measure(
+            lambda: EncryptedLedger(encrypted_path, "benchmark", create=True, source_path=db_path).close(), args.runs)
+        ledgers = []
+        open_seconds = measure(lambda: ledgers.append(EncryptedLedger(encrypted_path, "benchmark")), args.runs)
+        for ledger in ledgers[1:]:
+            ledger.removeWorkingCopy()
+        ledger = ledgers[0]
+        plain_query_seconds = measureQueries(db_path, "plain", args.runs)
+        working_query_seconds = measureQueries(ledger.working_path, "working", args.runs, "DELETE")
+
+        conn = Data(ledger.working_path, connection_name="encrypted", journal_mode="DELETE")
+        save_seconds = []
+        pages = []
+        for run in range(args.runs):
+            with conn.transaction():
+                for number in range(args.entries):
+                    conn.insertEntry(f"Бенчмарк {run}-{number}", 12345, "Прочее", "15.06.2024")
+            started = time.perf_counter()
+            pages.append(ledger.save())
+            save_seconds.append(time.perf_counter() - started)
+        conn.close()
+        ledger.close()
+
+    if not all(pages):
+        sys.exit(f"Сохранение после добавления записей не зашифровало страниц: {pages}")
+    incremental_seconds = statistics.median(save_seconds)
+    size_mb = size / 2 ** 20
+    print(json.dumps({
+        "benchmark": "encryption",
+        "rows": args.rows,
+        "size_mb": size_mb,
+        "create_mb_per_second": size_mb / create_seconds,
+        "open_mb_per_second": size_mb / open_seconds,
+        "incremental_save_seconds": incremental_seconds,
+        "incremental_pages": statistics.median(pages),
+        "working_copy_delete_vs_plain_wal_query_ratio": working_query_seconds / plain_query_seconds,
+        "within_target": size_mb / open_seconds >= 100 and size_mb / create_seconds >= 100,
+    }, ensure_ascii=False, indent=2))
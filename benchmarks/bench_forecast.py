@@ -0,0 +1,183 @@
+# Бенчмарк прогноза баланса (модуль forecast).
+#
+# В копии синтетической базы данных из генератора ledger.py прогноз строится на середину
+# последнего месяца с записями. Измеряются:
+# - первый прогноз (кривые читаются из таблицы daily_balance и строятся в NumPy);
+# - повторный прогноз без записи в базу данных (кривые из кэша);
+# - прогноз после добавления записи (кэш сбрасывается);
+# - тот же прогноз по записям, загруженным в Python, без numpy (для сравнения).
+# Проверяется, что прогнозы совпадают, а изменения по дням и категориям, которые поддерживают
+# триггеры, после добавления, изменения и удаления записей совпадают с полным пересчетом.
+#
+# Запуск: python benchmarks/bench_forecast.py --rows 1000000
+
+
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def timed(function, repeat=5):
+    """
+    Выполняет функцию несколько раз и возвращает наименьшее время.
+
+    Args:
+        function (callable): Функция без аргументов.
+        repeat (int, optional): Количество повторов.
+
+    Returns:
+        tuple: Наименьшее время в миллисекундах и результат последнего вызова.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def forecastFromRows(conn, balance, today, history_months):
+    """
+    Считает прогноз загрузкой всех записей в Python, без таблицы daily_balance и numpy.
+
+    Args:
+        conn (connection.Data): Подключение к базе данных.
+        balance (int): Текущий баланс в минимальных единицах.
+        today (datetime.date): Дата прогноза.
+        history_months (int): Количество полных месяцев истории.
+
+    Returns:
+        dict: Прогноз в формате BalanceForecast.forecast (все записи синтетической базы
+        данных - в базовой валюте).
+    """
+    from forecast import MONTH_DAYS, daysInMonth, shiftMonth
+
+    months = []
+    for shift in range(-history_months, 0):
+        year, month = shiftMonth(today.year, today.month, shift)
+        months.append(f"{year:04d}-{month:02d}")
+    month_index = {key: index for index, key in enumerate(months)}
+    daily = {}
+    query = conn.executeQuery("SELECT value, category, date FROM expenses")
+    while query.next():
+        value, category, date = query.value(0), query.value(1), query.value(2)
+        index = month_index.get(date[6:10] + "-" + date[3:5])
+        if index is None:
+            continue
+        days = daily.setdefault(category, [[0] * MONTH_DAYS for _ in months])
+        days[index][int(date[:2]) - 1] += value if category == "Поступления" else -value
+
+    rest, monthly = {}, {}
+    for category, days in daily.items():
+        totals = [sum(month_days) for month_days in days]
+        if today.day < daysInMonth(today.year, today.month):
+            rest[category] = statistics.median(total - sum(month_days[:today.day])
+                                               for total, month_days in zip(totals, days))
+        else:
+            rest[category] = 0
+        monthly[category] = statistics.median(totals)
+    month_end = balance + int(round(sum(rest.values())))
+    return {
+        "month_end": month_end,
+        "year_end": month_end + int(round(sum(monthly.values()) * (12 - today.month))),
+        "categories": sorted((category, int(round(change))) for category, change in rest.items() if change != 0),
+    }
+
+
+def dailyBalanceConsistent(conn):
+    """
+    Сравнивает таблицу daily_balance с изменениями по дням и категориям, посчитанными по всем записям.
+
+    Args:
+        conn (connection.Data): Подключение к базе данных.
+
+    Returns:
+        bool: True, если изменения совпадают.
+    """
+    from connection import ISO_DATE, SIGNED_VALUE
+
+    tables = []
+    for query_text in ("SELECT day, category, currency, net FROM daily_balance WHERE net <> 0 ORDER BY 1, 2, 3",
+                       f"SELECT {ISO_DATE.format('expenses')}, category, currency, "
+                       f"SUM({SIGNED_VALUE.format('expenses')}) AS net "
+                       "FROM expenses GROUP BY 1, 2, 3 HAVING net <> 0 ORDER BY 1, 2, 3"):
+        query = conn.executeQuery(query_text)
+        rows = []
+        while query.next():
+            rows.append((query.value(0), query.value(1), query.value(2), query.value(3)))
+        tables.append(rows)
+    return tables[0] == tables[1]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк прогноза баланса")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from connection import Data
+    from forecast import HISTORY_MONTHS, BalanceForecast
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = Data(copyLedger(args.rows, directory))
+        query = conn.executeQuery("SELECT MAX(day) FROM daily_balance")
+        last_day = datetime.date.fromisoformat(query.value(0)) if query.next() else None
+        today = last_day.replace(day=15)
+        balance = conn.getBalance()
+
+        miss_ms, result = timed(lambda: BalanceForecast(conn).forecast(balance, today))
+        forecast = BalanceForecast(conn)
+        forecast.forecast(balance, today)
+        cached_ms, _ = timed(lambda: forecast.forecast(balance, today), repeat=100)
+
+        def writeAndForecast():
+            conn.insertEntry("Проверка", 100, "Кафе", today.strftime("%d.%m.%Y"), "RUB")
+            return forecast.forecast(balance, today)
+
+        write_ms, _ = timed(writeAndForecast)
+        rows_ms, reference = timed(lambda: forecastFromRows(conn, balance, today, HISTORY_MONTHS), repeat=1)
+        result = BalanceForecast(conn).forecast(balance, today)
+        consistent = (result["month_end"] == reference["month_end"] and result["year_end"] == reference["year_end"]
+                      and sorted(result["categories"]) == reference["categories"])
+
+        # Изменения записей проходят через триггеры daily_balance
+        with conn.transaction():
+            for number in range(100):
+                conn.insertEntry(f"Проверка {number}", 100 + number, "Поступления" if number % 3 else "Кафе",
+                                 f"{number % 28 + 1:02d}.{today.month:02d}.{today.year}")
+            query = conn.executeQuery("SELECT id FROM expenses WHERE description LIKE 'Проверка %' ORDER BY id")
+            ids = []
+            while query.next():
+                ids.append(query.value(0))
+            for entry_id in ids[:30]:
+                conn.updateEntry("Проверка", 250, "Транспорт", f"03.{today.month:02d}.{today.year}", entry_id)
+            for entry_id in ids[30:50]:
+                conn.deleteEntry(entry_id)
+        daily_consistent = dailyBalanceConsistent(conn)
+
+    print(json.dumps({
+        "benchmark": "forecast",
+        "rows": args.rows,
+        "date": today.isoformat(),
+        "forecast_ms": miss_ms,
+        "forecast_cached_ms": cached_ms,
+        "write_and_forecast_ms": write_ms,
+        "forecast_by_loading_rows_ms": rows_ms,
+        "month_end_change": result["month_end"] - balance,
+        "year_end_change": result["year_end"] - balance,
+        "consistent": consistent,
+        "daily_balance_consistent": daily_consistent,
+    }, ensure_ascii=False, indent=2))
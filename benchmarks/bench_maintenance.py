@@ -0,0 +1,133 @@
+# Бенчмарк обслуживания базы данных (модуль maintenance).
+#
+# В копии синтетической базы данных из генератора ledger.py записи двух самых ранних лет
+# переносятся в архив (модуль archive), что оставляет в файле свободные страницы, и добавляются
+# записи с ошибками (в обход класса Data). Измеряются:
+# - проверка целостности (PRAGMA integrity_check и PRAGMA quick_check) и проверка записей;
+# - освобождение свободных страниц шагами PRAGMA incremental_vacuum, как в простое приложения
+#   (наибольшее время шага - время, на которое шаг может задержать окно), и полная перестройка
+#   файла VACUUM для сравнения;
+# - обновление статистики планировщика запросов (ANALYZE);
+# - время типичных запросов приложения (maintenance.PROBE_QUERIES) до и после обслуживания.
+# Проверяется, что проверка записей нашла ровно добавленные записи с ошибками.
+#
+# Запуск: python benchmarks/bench_maintenance.py --rows 1000000
+
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+# Записи с ошибками: описание, сумма, категория, дата и валюта
+BROKEN_ROWS = [
+    ("Дата из поля ввода", 10000, "Рестораны", "1/2/24", "RUB"),
+    ("Несуществующая дата", 10000, "Рестораны", "30.02.2024", "RUB"),
+    ("Неизвестная категория", 10000, "Кафешка", "01.02.2024", "RUB"),
+    ("Нулевая сумма", 0, "Рестораны", "01.02.2024", "RUB"),
+    ("", 10000, "Рестораны", "01.02.2024", "RUB"),
+    ("Валюта без курса", 10000, "Рестораны", "01.02.2024", "XYZ"),
+]
+
+
+def timed(function):
+    """
+    Выполняет функцию и измеряет время ее выполнения.
+
+    Args:
+        function (callable): Функция без аргументов.
+
+    Returns:
+        tuple: Время в миллисекундах и результат функции.
+    """
+    started = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def fileSize(maintenance):
+    """
+    Возвращает размер файла базы данных и количество свободных страниц.
+
+    Args:
+        maintenance (maintenance.Maintenance): Обслуживание базы данных.
+
+    Returns:
+        dict: Размер файла в мегабайтах и количество свободных страниц.
+    """
+    stats = maintenance.getPageStats()
+    return {"size_mb": stats["pages"] * stats["page_size"] / 2 ** 20, "free_pages": stats["free"]}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк обслуживания базы данных")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from archive import Archiver
+    from connection import Data
+    from maintenance import Maintenance
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = Data(copyLedger(args.rows, directory))
+        maintenance = Maintenance(conn)
+        years = Archiver(conn).getArchivableYears()
+        Archiver(conn).archiveUntil(years[1])
+        with conn.transaction():
+            for row in BROKEN_ROWS:
+                conn.executeQuery("INSERT INTO expenses (description, value, category, date, currency) "
+                                  "VALUES (?, ?, ?, ?, ?)", list(row))
+        before_size = fileSize(maintenance)
+
+        integrity_ms, integrity = timed(lambda: maintenance.checkIntegrity())
+        quick_ms, quick = timed(lambda: maintenance.checkIntegrity(quick=True))
+        validate_ms, broken = timed(maintenance.validateRows)
+        before = maintenance.timeQueries()
+
+        steps = []
+        while True:
+            step_ms, freed = timed(maintenance.vacuumStep)
+            if not freed:
+                break
+            steps.append(step_ms)
+        vacuum_size = fileSize(maintenance)
+        after_vacuum = maintenance.timeQueries()
+
+        analyze_ms, _ = timed(lambda: maintenance.optimize(full=True))
+        optimize_ms, _ = timed(maintenance.optimize)
+        after = maintenance.timeQueries()
+        rebuild_ms, _ = timed(maintenance.rebuild)
+
+    print(json.dumps({
+        "benchmark": "maintenance",
+        "rows": args.rows,
+        "archived_years": years[:2],
+        "integrity_check_ms": integrity_ms,
+        "integrity_ok": integrity == [],
+        "quick_check_ms": quick_ms,
+        "quick_check_ok": quick == [],
+        "validate_ms": validate_ms,
+        "validate_found": len(broken),
+        "validate_consistent": sorted(row[1] for row in broken) == sorted(row[0] for row in BROKEN_ROWS),
+        "file_before": before_size,
+        "file_after_vacuum": vacuum_size,
+        "vacuum_steps": len(steps),
+        "vacuum_step_max_ms": max(steps, default=0),
+        "vacuum_total_ms": sum(steps),
+        "vacuum_full_ms": rebuild_ms,
+        "analyze_ms": analyze_ms,
+        "optimize_ms": optimize_ms,
+        "queries_before_ms": before,
+        "queries_after_vacuum_ms": after_vacuum,
+        "queries_after_analyze_ms": after,
+    }, ensure_ascii=False, indent=2))
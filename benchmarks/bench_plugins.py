@@ -0,0 +1,134 @@
+# Бенчмарк плагинов (модуль plugins).
+#
+# В копии синтетической базы данных из генератора ledger.py измеряется время вставки, изменения
+# и удаления записи методами Data (в одной транзакции) без обработчиков записи и с простейшими
+# обработчиками before_write и after_write (функции этого скрипта), то есть накладные расходы
+# вызова плагинов; удаление с обработчиками дополнительно читает удаляемую запись.
+# Отдельным процессом измеряется время поиска плагинов при первом обращении к реестру
+# (импорт importlib.metadata и чтение точек входа) - то, что приложение выполняет в фоновом
+# потоке при создании окна. Проверяется, что обработчик, который спит при каждом вызове,
+# оказывается первым в статистике плагинов.
+#
+# Запуск: python benchmarks/bench_plugins.py --rows 100000
+
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+# Время сна медленного обработчика в секундах
+SLOW_HOOK_SECONDS = 0.005
+
+# Поиск плагинов в новом процессе
+DISCOVER_SCRIPT = ("import time; started = time.perf_counter(); from plugins import registry; "
+                   "plugins = registry.discover(); print((time.perf_counter() - started) * 1000, len(plugins))")
+
+
+def allow(operation, entries):
+    """
+    Обработчик before_write, разрешающий любую запись.
+    """
+    return True
+
+
+def record(operation, entries):
+    """
+    Обработчик after_write, ничего не делающий.
+    """
+
+
+def sleep(operation, entries):
+    """
+    Медленный обработчик after_write.
+    """
+    time.sleep(SLOW_HOOK_SECONDS)
+
+
+def timeWrites(conn, repeat):
+    """
+    Измеряет медианное время вставки, изменения и удаления одной записи.
+
+    Записи изменяются в одной транзакции, чтобы время синхронизации файла с диском
+    не скрывало время вызова обработчиков.
+
+    Args:
+        conn (connection.Data): Подключение к базе данных.
+        repeat (int): Количество записей.
+
+    Returns:
+        dict: Медианное время операций в микросекундах.
+    """
+    times = {"insert": [], "update": [], "delete": []}
+    with conn.transaction():
+        for number in range(repeat):
+            started = time.perf_counter()
+            entry_id = conn.insertEntry(f"Плагин {number}", 100 + number, "Рестораны", "15.06.2024")
+            inserted = time.perf_counter()
+            conn.updateEntry(f"Плагин {number}", 200 + number, "Рестораны", "16.06.2024", entry_id)
+            updated = time.perf_counter()
+            conn.deleteEntry(entry_id)
+            deleted = time.perf_counter()
+            times["insert"].append(inserted - started)
+            times["update"].append(updated - inserted)
+            times["delete"].append(deleted - updated)
+    return {operation: statistics.median(values) * 1e6 for operation, values in times.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк плагинов")
+    parser.add_argument("--rows", type=int, default=100000, help="количество записей в базе данных")
+    parser.add_argument("--repeat", type=int, default=500, help="количество записей на измерение")
+    args = parser.parse_args()
+
+    output = subprocess.run([sys.executable, "-c", DISCOVER_SCRIPT], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout.split()
+    discover_ms, discovered = float(output[0]), int(output[1])
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from connection import Data
+    from plugins import registry
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = Data(copyLedger(args.rows, directory))
+        registry.discover()
+        timeWrites(conn, 50)
+        without_hooks = timeWrites(conn, args.repeat)
+
+        hooks = [registry.register("before_write", "Разрешить", "__main__:allow"),
+                 registry.register("after_write", "Записать", "__main__:record")]
+        with_hooks = timeWrites(conn, args.repeat)
+
+        hooks.append(registry.register("after_write", "Медленный", "__main__:sleep"))
+        registry.resetStats()
+        timeWrites(conn, 20)
+        stats = registry.getStats()
+        for plugin in hooks:
+            registry.unregister(plugin)
+
+    print(json.dumps({
+        "benchmark": "plugins",
+        "rows": args.rows,
+        "discover_ms": discover_ms,
+        "discovered_plugins": discovered,
+        "writes_without_hooks_us": without_hooks,
+        "writes_with_hooks_us": with_hooks,
+        "hook_overhead_us": {operation: with_hooks[operation] - without_hooks[operation]
+                             for operation in without_hooks},
+        "slowest_plugin": stats[0]["name"],
+        "slow_plugin_found": stats[0]["name"] == "Медленный",
+        "plugin_stats_ms": {stats_row["name"]: {"calls": stats_row["calls"], "total": stats_row["total"] * 1000,
+                                                "max": stats_row["max"] * 1000}
+                            for stats_row in stats if stats_row["calls"]},
+    }, ensure_ascii=False, indent=2))
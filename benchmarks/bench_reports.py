@@ -0,0 +1,174 @@
+# Бенчмарк периодических отчетов (модуль reports).
+#
+# В копии синтетической базы данных из генератора ledger.py формируются выписки за месяц
+# и за год (HTML и PDF) и отчеты за все месяцы года последовательно (--jobs 1) и параллельно.
+# Для сравнения те же итоги месяца считаются загрузкой всех записей в Python (как без
+# агрегирующих запросов: остаток на начало требует записей всех предыдущих месяцев).
+# Проверяется, что итоги отчета совпадают с подсчетом по загруженным записям, а изменения
+# баланса по дням, которые поддерживают триггеры (таблица daily_balance), после добавления,
+# изменения и удаления записей совпадают с полным пересчетом.
+#
+# Запуск: python benchmarks/bench_reports.py --rows 1000000 [--jobs 4]
+
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def timed(function, repeat=3):
+    """
+    Выполняет функцию несколько раз и возвращает наименьшее время.
+
+    Args:
+        function (callable): Функция без аргументов.
+        repeat (int, optional): Количество повторов.
+
+    Returns:
+        tuple: Наименьшее время в миллисекундах и результат последнего вызова.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def loadMonthTotals(conn, month):
+    """
+    Считает итоги месяца загрузкой всех записей в Python.
+
+    Args:
+        conn (connection.Data): Подключение к базе данных.
+        month (str): Месяц 'YYYY-MM'.
+
+    Returns:
+        dict: Остаток на начало и конец месяца, поступления и расходы по категориям
+        в минимальных единицах (все записи синтетической базы данных - в базовой валюте).
+    """
+    query = conn.executeQuery("SELECT value, category, date FROM expenses")
+    opening = closing = income = 0
+    categories = {}
+    while query.next():
+        value, category, date = query.value(0), query.value(1), query.value(2)
+        row_month = date[6:10] + "-" + date[3:5]
+        if row_month > month:
+            continue
+        change = value if category == "Поступления" else -value
+        closing += change
+        if row_month < month:
+            opening += change
+        elif category == "Поступления":
+            income += value
+        else:
+            categories[category] = categories.get(category, 0) + value
+    return {"opening": opening, "closing": closing, "income": income, "categories": categories}
+
+
+def dailyBalanceConsistent(conn):
+    """
+    Сравнивает таблицу daily_balance с изменениями баланса, посчитанными по всем записям.
+
+    Args:
+        conn (connection.Data): Подключение к базе данных.
+
+    Returns:
+        bool: True, если изменения совпадают.
+    """
+    from connection import ISO_DATE, SIGNED_VALUE
+
+    tables = []
+    # В HAVING имя net означало бы колонку таблицы daily_balance, а не сумму
+    for query_text in ("SELECT day, currency, SUM(net) FROM daily_balance GROUP BY 1, 2 "
+                       "HAVING SUM(net) <> 0 ORDER BY 1, 2",
+                       f"SELECT {ISO_DATE.format('expenses')}, currency, SUM({SIGNED_VALUE.format('expenses')}) "
+                       f"FROM expenses GROUP BY 1, 2 HAVING SUM({SIGNED_VALUE.format('expenses')}) <> 0 ORDER BY 1, 2"):
+        query = conn.executeQuery(query_text)
+        rows = []
+        while query.next():
+            rows.append((query.value(0), query.value(1), query.value(2)))
+        tables.append(rows)
+    return tables[0] == tables[1]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк периодических отчетов")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="количество процессов для отчетов за месяцы")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtGui import QGuiApplication
+
+    app = QGuiApplication([])
+    from connection import Data
+    from reports import StatementReport, writeMonthlyReports
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = Data(copyLedger(args.rows, directory))
+        query = conn.executeQuery("SELECT MAX(substr(date, 7, 4)) FROM expenses")
+        year = int(query.value(0)) - 1 if query.next() else None
+        month = f"{year}-06"
+        output = os.path.join(directory, "report")
+
+        month_ms, _ = timed(lambda: StatementReport(conn, month).write(output + ".html"))
+        month_pdf_ms, _ = timed(lambda: StatementReport(conn, month).write(output + ".pdf", "pdf"))
+        year_ms, _ = timed(lambda: StatementReport(conn, str(year)).write(output + ".html"))
+        year_pdf_ms, _ = timed(lambda: StatementReport(conn, str(year)).write(output + ".pdf", "pdf"))
+        load_ms, loaded = timed(lambda: loadMonthTotals(conn, month), repeat=1)
+
+        report = StatementReport(conn, month)
+        summary = report.getSummary()
+        consistent = (summary["opening"] == loaded["opening"] and summary["closing"] == loaded["closing"]
+                      and summary["income"] == loaded["income"]
+                      and dict(report.getCategoryTotals()) == loaded["categories"])
+
+        # Изменения записей проходят через триггеры daily_balance
+        conn.insertRates([("USD", f"{year}-01-01", 90000000)])
+        with conn.transaction():
+            for number in range(100):
+                conn.insertEntry(f"Проверка {number}", 100 + number, "Поступления" if number % 3 else "Кафе",
+                                 f"{number % 28 + 1:02d}.06.{year}", "USD" if number % 5 == 0 else "RUB")
+            query = conn.executeQuery("SELECT id FROM expenses WHERE description LIKE 'Проверка %' ORDER BY id")
+            ids = []
+            while query.next():
+                ids.append(query.value(0))
+            for entry_id in ids[:30]:
+                conn.updateEntry("Проверка", 250, "Кафе", f"15.07.{year}", entry_id)
+            for entry_id in ids[30:50]:
+                conn.deleteEntry(entry_id)
+        daily_consistent = dailyBalanceConsistent(conn)
+
+        monthly = {}
+        for jobs in sorted({1, args.jobs}):
+            started = time.perf_counter()
+            results = writeMonthlyReports(conn, year, directory, "pdf", jobs)
+            monthly[jobs] = {
+                "seconds": time.perf_counter() - started,
+                "written": sum(path is not None for path, _ in results.values()),
+                "report_seconds_max": max(seconds for _, seconds in results.values()),
+            }
+
+    print(json.dumps({
+        "benchmark": "reports",
+        "rows": args.rows,
+        "cpus": os.cpu_count(),
+        "month_html_ms": month_ms,
+        "month_pdf_ms": month_pdf_ms,
+        "year_html_ms": year_ms,
+        "year_pdf_ms": year_pdf_ms,
+        "month_totals_by_loading_rows_ms": load_ms,
+        "consistent": consistent,
+        "daily_balance_consistent": daily_consistent,
+        "monthly_pdf": monthly,
+    }, ensure_ascii=False, indent=2))
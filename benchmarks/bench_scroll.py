@@ -0,0 +1,145 @@
+# Бенчмарк отрисовки таблицы записей при прокрутке (делегат delegates.LedgerDelegate).
+#
+# Таблица главного окна (интерфейс ui_main с таблицами стилей окна) показывает все записи
+# синтетической базы данных из генератора ledger.py; все строки модели загружаются заранее.
+# Для каждого способа отрисовки ячеек измеряется время кадра - синхронной перерисовки
+# области таблицы после сдвига полосы прокрутки:
+# - 'stylesheet': ячейки рисует стиль по правилам QTableView::item таблицы стилей,
+#   суммы форматирует MoneyDelegate (как до появления LedgerDelegate);
+# - 'delegate': ячейки рисует LedgerDelegate, строки одной высоты.
+# Прокрутка выполняется колесом (--wheel строк за шаг) и перетаскиванием полосы прокрутки
+# к случайным позициям по всей таблице.
+#
+# Запуск: python benchmarks/bench_scroll.py --rows 1000000 --frames 300
+
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import getLedger
+
+# Правила таблицы стилей, по которым рисовались ячейки таблицы записей до LedgerDelegate
+LEGACY_ITEM_STYLE = """
+QTableView::item {
+    border-style: none;
+    border-bottom: 1px solid rgb(70, 68, 81);
+    padding-left: 5px;
+    padding-right: 0px;
+    text-align: center;
+}
+
+QTableView::item:selected{
+    border: none;
+    color: rgb(70, 68, 81);
+    background-color: rgba(255, 255, 255, 50);
+}"""
+
+
+def measureFrames(app, view, positions):
+    """
+    Прокручивает таблицу к заданным позициям и измеряет время перерисовки каждого кадра.
+
+    Args:
+        app (QApplication): Приложение.
+        view (QTableView): Таблица.
+        positions (list): Позиции полосы прокрутки (номера первых видимых строк).
+
+    Returns:
+        dict: Медиана, 95-й процентиль и наибольшее время кадра в миллисекундах.
+    """
+    scroll_bar = view.verticalScrollBar()
+    frames = []
+    for position in positions:
+        started = time.perf_counter()
+        scroll_bar.setValue(position)
+        view.viewport().repaint()
+        frames.append((time.perf_counter() - started) * 1000)
+        app.processEvents()
+    frames.sort()
+    return {
+        "frame_p50_ms": statistics.median(frames),
+        "frame_p95_ms": frames[int(len(frames) * 0.95)],
+        "frame_max_ms": frames[-1],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк отрисовки таблицы записей при прокрутке")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    parser.add_argument("--frames", type=int, default=300, help="количество кадров каждого вида прокрутки")
+    parser.add_argument("--wheel", type=int, default=3, help="количество строк за шаг колеса")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtSql import QSqlQueryModel
+    from PyQt6.QtWidgets import QApplication, QHeaderView, QMainWindow, QStyledItemDelegate
+
+    app = QApplication([])
+    from connection import Data
+    from delegates import LedgerDelegate, MoneyDelegate
+    from ui_main import Ui_MainWindow
+
+    conn = Data(getLedger(args.rows))
+    window = QMainWindow()
+    ui = Ui_MainWindow()
+    ui.setupUi(window)
+    window.show()
+    view = ui.tableView
+    view.setSortingEnabled(False)
+    stylesheet = view.styleSheet()
+
+    model = QSqlQueryModel()
+    started = time.perf_counter()
+    model.setQuery(conn.getTableWithFilters(True, True, "", ""))
+    view.setModel(model)
+    while model.canFetchMore():
+        model.fetchMore()
+    fetch_seconds = time.perf_counter() - started
+    for column, width in enumerate((66, 320, 120, 80, 210, 110)):
+        view.setColumnWidth(column, width)
+    app.processEvents()
+
+    rng = random.Random(0)
+    visible = view.viewport().height() // view.rowHeight(0)
+    wheel = [visible + step * args.wheel for step in range(args.frames)]
+    jumps = [rng.randrange(model.rowCount() - visible) for _ in range(args.frames)]
+
+    modes = {}
+    legacy_delegate = QStyledItemDelegate()
+    money_delegate = MoneyDelegate()
+    ledger_delegate = LedgerDelegate()
+    for mode in ("stylesheet", "delegate"):
+        if mode == "stylesheet":
+            view.setStyleSheet(stylesheet + LEGACY_ITEM_STYLE)
+            view.setItemDelegate(legacy_delegate)
+            view.setItemDelegateForColumn(2, money_delegate)
+            view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        else:
+            view.setStyleSheet(stylesheet)
+            view.setItemDelegate(ledger_delegate)
+            view.setItemDelegateForColumn(2, None)
+            view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+            view.verticalHeader().setDefaultSectionSize(LedgerDelegate.ROW_HEIGHT)
+        view.selectRow(visible + 1)
+        # Первые кадры прогревают кэши шрифтов и стилей
+        measureFrames(app, view, wheel[:20])
+        modes[mode] = {
+            "wheel": measureFrames(app, view, wheel),
+            "jump": measureFrames(app, view, jumps),
+        }
+
+    print(json.dumps({
+        "benchmark": "scroll",
+        "rows": model.rowCount(),
+        "visible_rows": visible,
+        "fetch_seconds": fetch_seconds,
+        "modes": modes,
+    }, ensure_ascii=False, indent=2))
@@ -0,0 +1,202 @@
+# Бенчмарк разделенных записей и меток (модуль splits).
+#
+# В копии синтетической базы данных из генератора ledger.py:
+# - доля --tagged записей получает одну из --tags меток, а доля --vacation - метку 'отпуск';
+# - доля --splits записей разделяется методом Data.setSplit на 2-3 строки с той же общей суммой.
+# Измеряются:
+# - время Data.setSplit и Data.setTags на запись (в одной транзакции, без фиксации каждого вызова);
+# - список записей с меткой (Data.getTableWithFilters) и отчет по метке (Data.getTagSummary)
+#   с индексами и без них (отбор меток по tag_id запрещен унарным плюсом, как при хранении
+#   меток без индекса);
+# - список записей категории, включающий разделенные записи со строкой этой категории.
+# Проверяется, что баланс после разделения не изменился (разделенная запись учитывается один раз),
+# а суммы бюджетов, которые поддерживают триггеры, совпадают с полным пересчетом.
+#
+# Запуск: python benchmarks/bench_splits.py --rows 1000000
+
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def timed(function, repeat=5):
+    """
+    Выполняет функцию несколько раз и возвращает наименьшее время.
+
+    Args:
+        function (callable): Функция без аргументов.
+        repeat (int, optional): Количество повторов.
+
+    Returns:
+        tuple: Наименьшее время в миллисекундах и результат последнего вызова.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def countRows(query):
+    """
+    Читает все строки результата запроса.
+
+    Args:
+        query (QtSql.QSqlQuery): Выполненный запрос.
+
+    Returns:
+        int: Количество строк.
+    """
+    rows = 0
+    while query.next():
+        rows += 1
+    return rows
+
+
+def queryPlan(conn, query_text, query_values):
+    """
+    Возвращает план выполнения запроса.
+
+    Args:
+        conn (Data): Объект для работы с базой данных.
+        query_text (str): Текст запроса.
+        query_values (list): Параметры запроса.
+
+    Returns:
+        list: Строки плана.
+    """
+    query = conn.executeQuery("EXPLAIN QUERY PLAN " + query_text, query_values)
+    plan = []
+    while query.next():
+        plan.append(query.value(3))
+    return plan
+
+
+def budgetState(conn):
+    """
+    Возвращает суммы расходов по категориям за все месяцы.
+
+    Args:
+        conn (Data): Объект для работы с базой данных.
+
+    Returns:
+        list: Кортежи (месяц, категория, сумма) с ненулевой суммой.
+    """
+    query = conn.executeQuery("SELECT month, category, spent FROM budget_status WHERE spent <> 0 ORDER BY 1, 2")
+    state = []
+    while query.next():
+        state.append((query.value(0), query.value(1), query.value(2)))
+    return state
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк разделенных записей и меток")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    parser.add_argument("--tags", type=int, default=50, help="количество разных меток")
+    parser.add_argument("--tagged", type=float, default=0.3, help="доля записей с одной из меток")
+    parser.add_argument("--vacation", type=float, default=0.005, help="доля записей с меткой 'отпуск'")
+    parser.add_argument("--splits", type=float, default=0.05, help="доля разделенных записей")
+    args = parser.parse_args()
+
+    from PyQt6 import QtSql
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from connection import CATEGORIES, INCOME_CATEGORY, Data
+
+    rng = random.Random(0)
+    categories = [category for category in CATEGORIES if category != INCOME_CATEGORY]
+    with tempfile.TemporaryDirectory() as directory:
+        conn = Data(copyLedger(args.rows, directory))
+        query = conn.executeQuery("SELECT id, value, category FROM expenses")
+        entries = []
+        while query.next():
+            entries.append((query.value(0), query.value(1), query.value(2)))
+        balance = conn.getBalance()
+
+        # Метки вставляются пакетом, как при импорте; Data.setTags измеряется на части записей
+        names = [f"метка {number}" for number in range(args.tags)] + ["отпуск"]
+        with conn.transaction():
+            for name in names:
+                conn.executeQuery("INSERT INTO tags (name) VALUES (?)", [name])
+        ids = [entry_id for entry_id, value, category in entries]
+        tagged = rng.sample(ids, int(len(ids) * args.tagged))
+        vacation = rng.sample(ids, int(len(ids) * args.vacation))
+        links = sorted({(rng.randrange(args.tags) + 1, entry_id) for entry_id in tagged} |
+                       {(len(names), entry_id) for entry_id in vacation})
+        query = QtSql.QSqlQuery(conn.db)
+        query.prepare("INSERT INTO entry_tags (tag_id, entry_id) VALUES (?, ?)")
+        query.addBindValue([tag_id for tag_id, entry_id in links])
+        query.addBindValue([entry_id for tag_id, entry_id in links])
+        with conn.transaction():
+            query.execBatch()
+        sample = rng.sample(vacation, min(1000, len(vacation)))
+        started = time.perf_counter()
+        with conn.transaction():
+            for entry_id in sample:
+                conn.setTags(entry_id, ["отпуск", "метка 1"])
+        set_tags_ms = (time.perf_counter() - started) / len(sample) * 1000
+
+        # Разделение записей расходов на строки с той же общей суммой
+        expenses = [entry for entry in entries if entry[2] != INCOME_CATEGORY and entry[1] >= 3]
+        split = rng.sample(expenses, int(len(entries) * args.splits))
+        started = time.perf_counter()
+        with conn.transaction():
+            for entry_id, value, category in split:
+                first = rng.randrange(1, value - 1)
+                second = rng.randrange(1, value - first)
+                conn.setSplit(entry_id, [(category, first, "строка 1"),
+                                         (rng.choice(categories), second, "строка 2"),
+                                         (rng.choice(categories), value - first - second, "строка 3")])
+        set_split_ms = (time.perf_counter() - started) / len(split) * 1000
+        balance_kept = conn.getBalance() == balance
+        budgets = budgetState(conn)
+        conn.rebuildBudgetStatus()
+        budgets_consistent = budgets == budgetState(conn)
+
+        # Список записей с меткой и отчет по метке; для сравнения те же запросы без индекса меток
+        filter_ms, filter_rows = timed(lambda: countRows(conn.getTableWithFilters(True, True, "", "", tag="отпуск")))
+        summary_ms, summary_rows = timed(lambda: countRows(conn.getTagSummary("отпуск")))
+        common_ms, common_rows = timed(lambda: countRows(conn.getTableWithFilters(True, True, "", "", tag="метка 1")))
+        no_index = ("SELECT id, description, value, currency, category, date FROM expenses WHERE id IN "
+                    "(SELECT entry_id FROM entry_tags WHERE +tag_id = (SELECT id FROM tags WHERE name=?))")
+        scan_ms, scan_rows = timed(lambda: countRows(conn.executeQuery(no_index, ["отпуск"])), repeat=3)
+        category_ms, category_rows = timed(
+            lambda: countRows(conn.getTableWithFilters(True, False, "", "Аптеки")), repeat=3)
+        plan = queryPlan(conn, "SELECT id FROM expenses WHERE id IN (SELECT entry_id FROM entry_tags "
+                               "WHERE tag_id = (SELECT id FROM tags WHERE name=?))", ["отпуск"])
+        conn.close()
+
+    print(json.dumps({
+        "benchmark": "splits",
+        "rows": args.rows,
+        "tag_links": len(links),
+        "split_entries": len(split),
+        "set_split_ms_per_entry": set_split_ms,
+        "set_tags_ms_per_entry": set_tags_ms,
+        "balance_kept": balance_kept,
+        "budgets_consistent": budgets_consistent,
+        "tag_filter_ms": filter_ms,
+        "tag_filter_rows": filter_rows,
+        "tag_filter_no_index_ms": scan_ms,
+        "tag_filter_no_index_rows": scan_rows,
+        "common_tag_filter_ms": common_ms,
+        "common_tag_filter_rows": common_rows,
+        "tag_summary_ms": summary_ms,
+        "tag_summary_categories": summary_rows,
+        "category_filter_ms": category_ms,
+        "category_filter_rows": category_rows,
+        "tag_filter_plan": plan,
+    }, ensure_ascii=False, indent=2))
@@ -0,0 +1,104 @@
+# Бенчмарк холодного запуска главного окна.
+#
+# Копирует во временный каталог синтетическую базу данных из генератора ledger.py и несколько раз
+# запускает приложение в отдельном процессе (платформа offscreen), измеряя время
+# до первой отрисовки окна и до готовности к работе (сигнал ExpanseTracker.ready)
+# без снимка предыдущего сеанса и со снимком. Результаты выводятся в формате JSON.
+#
+# Запуск: python benchmarks/bench_startup.py --rows 100000 --runs 5
+
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def runChild(db_path):
+    """
+    Запускает главное окно и выводит время до первой отрисовки и до готовности в секундах.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+    """
+    started = time.perf_counter()
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QObject, QEvent
+    import main
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Type.Paint:
+                timings.setdefault("first_paint", time.perf_counter() - started)
+            return False
+
+    app = QApplication(sys.argv[:1])
+    timings = {"import": time.perf_counter() - started}
+    window = main.ExpanseTracker(db_path)
+    watcher = PaintWatcher()
+    window.installEventFilter(watcher)
+    window.show()
+
+    def finish():
+        timings["ready"] = time.perf_counter() - started
+        window.close()
+        app.quit()
+
+    window.ready.connect(finish)
+    app.exec()
+    print(json.dumps(timings))
+
+
+def measure(db_path, runs, with_snapshot):
+    """
+    Измеряет время запуска несколько раз и возвращает медианы.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        runs (int): Количество запусков.
+        with_snapshot (bool): Оставлять ли снимок предыдущего сеанса перед запуском.
+
+    Returns:
+        dict: Медианы времени этапов запуска в секундах.
+    """
+    results = []
+    for _ in range(runs):
+        if not with_snapshot and os.path.exists(db_path + ".snapshot.json"):
+            os.remove(db_path + ".snapshot.json")
+        output = subprocess.run([sys.executable, __file__, "--child", db_path],
+                                check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(result[key] for result in results) for key in results[0]}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк холодного запуска приложения")
+    parser.add_argument("--rows", type=int, default=100000, help="количество записей в базе данных")
+    parser.add_argument("--runs", type=int, default=5, help="количество запусков для каждого режима")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runChild(args.child)
+        sys.exit()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = copyLedger(args.rows, directory)
+        report = {
+            "benchmark": "startup",
+            "rows": args.rows,
+            "runs": args.runs,
+            "cold": measure(db_path, args.runs, with_snapshot=False),
+            "snapshot": measure(db_path, args.runs, with_snapshot=True),
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,159 @@
+# Бенчмарк синхронизации двух файлов базы данных (модуль sync).
+#
+# Две копии синтетической базы данных из генератора ledger.py синхронизируются:
+# - первый раз, когда хеши месяцев еще не вычислены (файлы совпадают);
+# - после --edits изменений в каждой копии (изменения сумм, новые записи, удаления
+#   и одновременные изменения одних и тех же записей) в последних --months месяцах,
+#   как при обычном ведении учета между синхронизациями;
+# - повторно, когда файлы уже совпадают.
+# Для сравнения измеряется чтение пар (uuid, время изменения) всех записей обоих файлов,
+# без которого не обойтись при сравнении без хешей диапазонов. Проверяется, что после
+# синхронизации файлы содержат одинаковые записи и баланс.
+#
+# Запуск: python benchmarks/bench_sync.py --rows 1000000 --edits 100 --months 3
+
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+def editLedger(conn, ids, edits, rng, label, date):
+    """
+    Вносит в базу данных изменения сумм, новые записи и удаления.
+
+    Args:
+        conn (Data): Объект для работы с базой данных.
+        ids (list): Идентификаторы записей, которые можно изменять.
+        edits (int): Количество изменений каждого вида.
+        rng (random.Random): Генератор случайных чисел.
+        label (str): Метка новых записей.
+        date (str): Дата новых записей.
+    """
+    with conn.transaction():
+        for entry_id in rng.sample(ids, edits):
+            conn.executeQuery("UPDATE expenses SET value = value + 1 WHERE id = ?", [entry_id])
+        for number in range(edits):
+            conn.insertEntry(f"{label} {number}", 12345, "Прочее", date)
+        for entry_id in rng.sample(ids, edits):
+            conn.executeQuery("DELETE FROM expenses WHERE id = ?", [entry_id])
+
+
+def readPairs(conn, path):
+    """
+    Читает пары (uuid, время изменения) всех записей файла.
+
+    Args:
+        conn (Data): Объект для работы с базой данных.
+        path (str): Путь к файлу базы данных.
+
+    Returns:
+        dict: Словарь {uuid: время изменения}.
+    """
+    conn.executeQuery("ATTACH DATABASE ? AS pairs", [path])
+    query = conn.executeQuery("SELECT uuid, modified_at FROM pairs.expenses")
+    pairs = {}
+    while query.next():
+        pairs[query.value(0)] = query.value(1)
+    conn.executeQuery("DETACH DATABASE pairs")
+    return pairs
+
+
+def ledgerState(conn):
+    """
+    Возвращает содержимое записей и баланс для проверки совпадения файлов.
+
+    Args:
+        conn (Data): Объект для работы с базой данных.
+
+    Returns:
+        tuple: Количество записей, контрольная сумма записей и баланс.
+    """
+    query = conn.executeQuery("SELECT COUNT(*), SUM(length(uuid || description || category || date) * value) "
+                              "FROM expenses")
+    query.next()
+    return query.value(0), query.value(1), conn.getBalance()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк синхронизации файлов базы данных")
+    parser.add_argument("--rows", type=int, default=1000000, help="количество записей в базе данных")
+    parser.add_argument("--edits", type=int, default=100, help="количество изменений каждого вида в каждом файле")
+    parser.add_argument("--months", type=int, default=3,
+                        help="количество последних месяцев, в которых вносятся изменения")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication([])
+    from connection import Data
+    from sync import LedgerSync, ROW_MONTH
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        local_path = copyLedger(args.rows, directory)
+        remote_path = copyLedger(args.rows, tempfile.mkdtemp(dir=directory))
+        conn = Data(local_path)
+        sync = LedgerSync(conn, remote_path)
+
+        started = time.perf_counter()
+        sync.reconcile()
+        cold_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        readPairs(conn, local_path)
+        readPairs(conn, remote_path)
+        full_compare_seconds = time.perf_counter() - started
+
+        query = conn.executeQuery(f"SELECT DISTINCT {ROW_MONTH} FROM expenses ORDER BY 1 DESC LIMIT ?", [args.months])
+        months = []
+        while query.next():
+            months.append(query.value(0))
+        placeholders = ", ".join("?" * len(months))
+        query = conn.executeQuery(f"SELECT id, date FROM expenses WHERE {ROW_MONTH} IN ({placeholders})", months)
+        ids = []
+        while query.next():
+            ids.append(query.value(0))
+            date = query.value(1)
+        # Половина изменяемых записей совпадает в обоих файлах - это одновременные изменения
+        shared = rng.sample(ids, args.edits)
+        editLedger(conn, shared + rng.sample(ids, args.edits), args.edits, rng, "Ноутбук", date)
+        remote = Data(remote_path, connection_name="remote")
+        editLedger(remote, shared + rng.sample(ids, args.edits), args.edits, rng, "Компьютер", date)
+        remote.close()
+
+        started = time.perf_counter()
+        result = sync.reconcile()
+        delta_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        noop = sync.reconcile()
+        noop_seconds = time.perf_counter() - started
+
+        remote = Data(remote_path, connection_name="remote")
+        converged = ledgerState(conn) == ledgerState(remote)
+        remote.close()
+        conn.close()
+
+    print(json.dumps({
+        "benchmark": "sync",
+        "rows": args.rows,
+        "edits": args.edits,
+        "months": args.months,
+        "cold_seconds": cold_seconds,
+        "full_compare_seconds": full_compare_seconds,
+        "delta_seconds": delta_seconds,
+        "delta_result": result,
+        "noop_seconds": noop_seconds,
+        "noop_rows": noop["rows"],
+        "converged": converged,
+    }, ensure_ascii=False, indent=2))
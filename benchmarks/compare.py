@@ -0,0 +1,38 @@
+# Сравнение результатов бенчмарка run.py для двух коммитов.
+#
+# Для каждого размера базы данных и операции выводится медиана времени в обоих файлах
+# и их отношение; отношение больше единицы означает замедление.
+#
+# Запуск: python benchmarks/compare.py before.json after.json
+
+
+import json
+import sys
+
+
+def loadResults(path):
+    """
+    Загружает результаты бенчмарка.
+
+    Args:
+        path (str): Путь к JSON-файлу, созданному run.py.
+
+    Returns:
+        tuple: Коммит и словарь {(количество записей, операция): медиана в миллисекундах}.
+    """
+    with open(path, encoding="utf-8") as file:
+        report = json.load(file)
+    medians = {}
+    for result in report["results"]:
+        for operation, stats in result["operations"].items():
+            medians[(result["rows"], operation)] = stats["median_ms"]
+    return report.get("commit"), medians
+
+
+if __name__ == '__main__':
+    before_commit, before = loadResults(sys.argv[1])
+    after_commit, after = loadResults(sys.argv[2])
+    print(f"{'записей':>10}  {'операция':<32}{str(before_commit)[:10]:>12}{str(after_commit)[:10]:>12}  отношение")
+    for rows, operation in sorted(before.keys() & after.keys()):
+        old, new = before[(rows, operation)], after[(rows, operation)]
+        print(f"{rows:>10}  {operation:<32}{old:>10.2f}мс{new:>10.2f}мс  {new / old:>8.2f}x")
@@ -0,0 +1,181 @@
+# Генератор синтетических баз данных для бенчмарков.
+#
+# Записи распределены по 32 встроенным категориям с реалистичными частотами и суммами:
+# ежемесячные поступления (зарплата и переводы), частые небольшие покупки в супермаркетах,
+# фастфуде и транспорте, редкие крупные траты на авиабилеты, отели и ремонт.
+# Даты равномерно покрывают несколько лет с повышенной активностью по выходным.
+#
+# Сгенерированные базы кэшируются в benchmarks/.cache по количеству записей, зерну
+# генератора и версии схемы, поэтому повторные запуски используют одинаковые данные.
+#
+# Запуск: python benchmarks/ledger.py 1000000 ledger.db
+
+
+import datetime
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from connection import CATEGORIES, MIGRATIONS
+from duplicates import fingerprint
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# Относительная частота категории и медиана суммы в рублях
+CATEGORY_PROFILE = {
+    "Поступления": (3, 40000), "Авиабилеты": (0.3, 15000), "Автоуслуги": (0.5, 4000),
+    "Аптеки": (3, 700), "Аренда авто": (0.1, 5000), "Благотворительность": (0.3, 500),
+    "Дом, ремонт": (1, 3000), "Ж/д билеты": (0.5, 3500), "Животные": (1.5, 900),
+    "Искусство": (0.2, 1500), "Кино": (1, 600), "Красота": (1, 2000),
+    "Медицинские услуги": (0.8, 3000), "Музыка": (0.5, 300), "Образование": (0.5, 5000),
+    "Одежда, обувь": (1.5, 4000), "Отели": (0.2, 8000), "Развлечения": (1.5, 1500),
+    "Рестораны": (3, 2500), "Связь": (1, 800), "Сервис-услуги": (1, 1200),
+    "Спорттовары": (0.4, 3000), "Сувениры": (0.3, 700), "Супермаркеты": (25, 1200),
+    "Топливо": (3, 3000), "Транспорт": (12, 60), "Фастфуд": (10, 450),
+    "Финансовые услуги": (0.5, 300), "Фото/видео": (0.2, 2000), "Цветы": (0.4, 2000),
+    "Частные услуги": (0.4, 2500), "Прочее": (2, 800),
+}
+
+# Типичные описания записей по категориям
+DESCRIPTIONS = {
+    "Поступления": ["Зарплата", "Аванс", "Перевод", "Кэшбэк", "Проценты по вкладу"],
+    "Супермаркеты": ["Пятерочка", "Перекресток", "Магнит", "Лента", "ВкусВилл", "Продукты"],
+    "Фастфуд": ["KFC", "Бургер Кинг", "Вкусно и точка", "Шаурма", "Кофе с собой"],
+    "Транспорт": ["Метро", "Автобус", "Подорожник", "Такси", "Электричка"],
+    "Рестораны": ["Ресторан", "Кафе", "Бар", "Доставка еды"],
+    "Аптеки": ["Аптека", "Нурофен", "Витамины"],
+    "Связь": ["Интернет", "Мобильная связь"],
+    "Топливо": ["АЗС", "Бензин"],
+}
+
+
+def ledgerPath(rows, seed):
+    """
+    Возвращает путь к кэшированной базе данных с заданным количеством записей.
+
+    Args:
+        rows (int): Количество записей.
+        seed (int): Зерно генератора случайных чисел.
+
+    Returns:
+        str: Путь к файлу базы данных в каталоге кэша.
+    """
+    return os.path.join(CACHE_DIR, f"ledger_{rows}_{seed}_v{len(MIGRATIONS)}.db")
+
+
+def generateRows(rows, seed, years=5):
+    """
+    Генерирует синтетические записи.
+
+    Args:
+        rows (int): Количество записей.
+        seed (int): Зерно генератора случайных чисел.
+        years (int, optional): Количество лет, которые покрывают записи.
+
+    Yields:
+        tuple: Описание, сумма в копейках, категория и дата в формате 'DD.MM.YYYY'.
+    """
+    rng = random.Random(seed)
+    weights = [CATEGORY_PROFILE[category][0] for category in CATEGORIES]
+    start = datetime.date(datetime.date.today().year - years, 1, 1)
+    days = years * 365
+    # Выходные дни выбираются в полтора раза чаще будних
+    day_weights = [1.5 if (start + datetime.timedelta(day)).weekday() >= 5 else 1 for day in range(days)]
+    batch = 10000
+    for offset in range(0, rows, batch):
+        size = min(batch, rows - offset)
+        categories = rng.choices(CATEGORIES, weights, k=size)
+        day_offsets = rng.choices(range(days), day_weights, k=size)
+        for number, (category, day) in enumerate(zip(categories, day_offsets), start=offset):
+            median = CATEGORY_PROFILE[category][1]
+            value = max(1, int(rng.lognormvariate(0, 0.6) * median * 100))
+            descriptions = DESCRIPTIONS.get(category)
+            description = rng.choice(descriptions) if descriptions else f"{category} #{number % 97}"
+            date = (start + datetime.timedelta(day)).strftime("%d.%m.%Y")
+            yield description, value, category, date
+
+
+def createSchema(db_path):
+    """
+    Создает в файле схему базы данных текущей версии приложения.
+
+    Схема создается классом Data в отдельном процессе, чтобы не занимать
+    соединение Qt по умолчанию в процессе бенчмарка.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+    """
+    code = ("import sys; from PyQt6 import QtCore; app = QtCore.QCoreApplication([]); "
+            "from connection import Data; Data(sys.argv[1])")
+    subprocess.run([sys.executable, "-c", code, db_path], check=True, cwd=ROOT)
+
+
+def generateLedger(db_path, rows, seed=0):
+    """
+    Создает базу данных с синтетическими записями.
+
+    Записи вставляются одной транзакцией; суммы бюджетов поддерживаются триггерами, как в приложении.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        rows (int): Количество записей.
+        seed (int, optional): Зерно генератора случайных чисел.
+    """
+    createSchema(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous = OFF")
+    with conn:
+        conn.executemany("INSERT INTO expenses (description, value, category, date, fingerprint) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         ((description, value, category, date, fingerprint(description, value, date))
+                          for description, value, category, date in generateRows(rows, seed)))
+        # Синтетическая история не считается изменениями для потребителей журнала
+        conn.execute("DELETE FROM changes")
+    conn.close()
+
+
+def getLedger(rows, seed=0):
+    """
+    Возвращает путь к кэшированной базе данных, создавая ее при необходимости.
+
+    Args:
+        rows (int): Количество записей.
+        seed (int, optional): Зерно генератора случайных чисел.
+
+    Returns:
+        str: Путь к файлу базы данных в каталоге кэша.
+    """
+    path = ledgerPath(rows, seed)
+    if not os.path.exists(path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        generateLedger(path + ".tmp", rows, seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def copyLedger(rows, directory, seed=0):
+    """
+    Копирует кэшированную базу данных в каталог, чтобы бенчмарки записи не меняли кэш.
+
+    Args:
+        rows (int): Количество записей.
+        directory (str): Каталог для копии.
+        seed (int, optional): Зерно генератора случайных чисел.
+
+    Returns:
+        str: Путь к копии базы данных.
+    """
+    path = os.path.join(directory, f"ledger_{rows}.db")
+    shutil.copyfile(getLedger(rows, seed), path)
+    return path
+
+
+if __name__ == '__main__':
+    generateLedger(sys.argv[2], int(float(sys.argv[1])))
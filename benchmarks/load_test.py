@@ -0,0 +1,160 @@
+# Нагрузочный тест локального HTTP-сервера (server.py).
+#
+# Запускает сервер в отдельном процессе на копии синтетической базы данных из генератора
+# ledger.py (или подключается к уже запущенному серверу) и открывает несколько постоянных
+# соединений, в каждом из которых запросы отправляются последовательно в течение заданного
+# времени. Смесь запросов: список записей с фильтром по категории, баланс и, с заданной
+# долей, добавление записи. Выводит количество запросов в секунду и задержки в формате JSON.
+#
+# Запуск: python benchmarks/load_test.py --rows 100000 --connections 16 --duration 10
+
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import CATEGORY_PROFILE, copyLedger
+
+
+def buildRequest(rng, write_ratio):
+    """
+    Формирует случайный запрос к серверу.
+
+    Args:
+        rng (random.Random): Генератор случайных чисел.
+        write_ratio (float): Доля запросов на добавление записи.
+
+    Returns:
+        tuple: Тип запроса и байты запроса HTTP.
+    """
+    if rng.random() < write_ratio:
+        body = json.dumps({"description": "Нагрузочный тест", "value": rng.randint(100, 500000),
+                           "category": "Супермаркеты", "date": f"{rng.randint(1, 28):02d}.06.2024"}).encode("utf-8")
+        return "insert", (b"POST /entries HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                          b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+    if rng.random() < 0.5:
+        return "balance", b"GET /balance HTTP/1.1\r\nHost: localhost\r\n\r\n"
+    from urllib.parse import quote
+
+    category = quote(rng.choice(list(CATEGORY_PROFILE)))
+    return "list", f"GET /entries?category={category}&limit=50 HTTP/1.1\r\nHost: localhost\r\n\r\n".encode()
+
+
+async def runConnection(host, port, deadline, write_ratio, seed, latencies, errors):
+    """
+    Отправляет запросы через одно постоянное соединение до истечения времени теста.
+
+    Args:
+        host (str): Адрес сервера.
+        port (int): Порт сервера.
+        deadline (float): Время окончания теста по time.perf_counter.
+        write_ratio (float): Доля запросов на добавление записи.
+        seed (int): Зерно генератора случайных чисел соединения.
+        latencies (dict): Словарь {тип запроса: список задержек в секундах} для результатов.
+        errors (list): Список для кодов статуса неуспешных ответов.
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    while time.perf_counter() < deadline:
+        kind, request = buildRequest(rng, write_ratio)
+        started = time.perf_counter()
+        writer.write(request)
+        head = await reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = int(head.lower().split(b"content-length:")[1].split(b"\r\n")[0])
+        await reader.readexactly(length)
+        latencies.setdefault(kind, []).append(time.perf_counter() - started)
+        if status >= 400:
+            errors.append(status)
+    writer.close()
+
+
+async def runLoad(host, port, connections, duration, write_ratio):
+    """
+    Выполняет нагрузочный тест.
+
+    Args:
+        host (str): Адрес сервера.
+        port (int): Порт сервера.
+        connections (int): Количество одновременных соединений.
+        duration (float): Длительность теста в секундах.
+        write_ratio (float): Доля запросов на добавление записи.
+
+    Returns:
+        dict: Количество запросов в секунду, задержки по типам запросов и количество ошибок.
+    """
+    latencies = {}
+    errors = []
+    started = time.perf_counter()
+    await asyncio.gather(*(runConnection(host, port, started + duration, write_ratio, seed, latencies, errors)
+                           for seed in range(connections)))
+    elapsed = time.perf_counter() - started
+    total = sum(len(samples) for samples in latencies.values())
+    return {
+        "requests": total,
+        "requests_per_second": total / elapsed,
+        "errors": len(errors),
+        "latency_ms": {
+            kind: {
+                "count": len(samples),
+                "median": statistics.median(samples) * 1000,
+                "p95": sorted(samples)[int(len(samples) * 0.95)] * 1000,
+            }
+            for kind, samples in sorted(latencies.items())
+        },
+    }
+
+
+def freePort():
+    """
+    Возвращает свободный порт на локальном адресе.
+
+    Returns:
+        int: Номер порта.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Нагрузочный тест HTTP-сервера")
+    parser.add_argument("--rows", type=int, default=100000, help="количество записей в базе данных")
+    parser.add_argument("--connections", type=int, default=16, help="количество одновременных соединений")
+    parser.add_argument("--duration", type=float, default=10, help="длительность теста в секундах")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="доля запросов на добавление записи")
+    parser.add_argument("--readers", type=int, default=4, help="количество потоков чтения сервера")
+    parser.add_argument("--port", type=int, help="порт уже запущенного сервера")
+    args = parser.parse_args()
+
+    report = {"benchmark": "load", "rows": args.rows, "connections": args.connections,
+              "readers": args.readers, "write_ratio": args.write_ratio}
+    if args.port:
+        report.update(asyncio.run(runLoad("127.0.0.1", args.port, args.connections, args.duration,
+                                          args.write_ratio)))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = copyLedger(args.rows, directory)
+            port = freePort()
+            server = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--db", db_path,
+                                       "--port", str(port), "--readers", str(args.readers)],
+                                      stdout=subprocess.PIPE, text=True)
+            try:
+                server.stdout.readline()
+                report.update(asyncio.run(runLoad("127.0.0.1", port, args.connections, args.duration,
+                                                  args.write_ratio)))
+            finally:
+                server.terminate()
+                server.wait()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,217 @@
+# Бенчмарк основных операций с базой данных и главного окна.
+#
+# Для каждого размера базы данных (от 10^3 до 10^7 записей) берется синтетическая база
+# из генератора ledger.py, и в отдельном процессе измеряется время операций:
+# Data.insertEntry, Data.getTableWithFilters без фильтров, с фильтром по дате и по категории
+# (с чтением всех строк результата), Data.getBalance и обновление таблицы главного окна
+# ExpanseTracker.viewData на платформе offscreen.
+#
+# Результаты выводятся в формате JSON вместе с коммитом и версиями Python, Qt и SQLite,
+# чтобы их можно было сравнивать между коммитами скриптом compare.py.
+#
+# Запуск: python benchmarks/run.py --sizes 1e3 1e4 1e5 1e6 --output results.json
+
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger, getLedger
+
+
+# Размеры баз данных по умолчанию; база на 10^7 записей генерируется несколько минут
+DEFAULT_SIZES = ["1e3", "1e4", "1e5", "1e6"]
+
+
+def summarize(samples):
+    """
+    Вычисляет статистики времени выполнения операции.
+
+    Args:
+        samples (list): Время отдельных запусков в секундах.
+
+    Returns:
+        dict: Количество запусков и минимум, медиана, среднее и 95-й процентиль в миллисекундах.
+    """
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0] * 1000,
+        "median_ms": statistics.median(ordered) * 1000,
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p95_ms": p95 * 1000,
+    }
+
+
+def timeRuns(function, repeat, warmup=1):
+    """
+    Измеряет время выполнения функции несколько раз.
+
+    Args:
+        function (callable): Измеряемая функция без аргументов.
+        repeat (int): Количество измеряемых запусков.
+        warmup (int, optional): Количество предварительных запусков, которые не учитываются.
+
+    Returns:
+        dict: Статистики времени выполнения (см. summarize).
+    """
+    for _ in range(warmup):
+        function()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def fetchAll(query):
+    """
+    Читает все строки результата запроса.
+
+    Args:
+        query (QtSql.QSqlQuery): Выполненный запрос.
+
+    Returns:
+        int: Количество строк.
+    """
+    rows = 0
+    while query.next():
+        rows += 1
+    return rows
+
+
+def runChild(db_path, repeat):
+    """
+    Измеряет время операций на базе данных и выводит результаты в формате JSON.
+
+    Args:
+        db_path (str): Путь к копии базы данных.
+        repeat (int): Количество измеряемых запусков каждой операции.
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtCore import QEvent, QLocale, QT_VERSION_STR
+    from PyQt6.QtWidgets import QApplication
+
+    # Фильтр по дате сравнивает текст поля даты в формате 'DD.MM.YYYY', как в русской локали
+    QLocale.setDefault(QLocale(QLocale.Language.Russian))
+    app = QApplication(sys.argv[:1])
+
+    import main
+    from connection import Data
+
+    # Отдельное соединение, чтобы не мешать соединению главного окна
+    conn = Data(db_path, connection_name="benchmark")
+    query = conn.executeQuery("SELECT sqlite_version(), count(*), min(substr(date, 7, 4)) FROM expenses")
+    query.next()
+    sqlite_version, rows, first_year = query.value(0), query.value(1), query.value(2)
+    query.finish()
+    filter_date = f"15.06.{first_year}"
+
+    counter = iter(range(10 ** 9))
+    results = {
+        "insertEntry": timeRuns(lambda: conn.insertEntry(f"Бенчмарк {next(counter)}", 12345,
+                                                         "Супермаркеты", filter_date), repeat),
+        "getTableWithFilters[none]": timeRuns(
+            lambda: fetchAll(conn.getTableWithFilters(True, True, filter_date, "Супермаркеты")), repeat),
+        "getTableWithFilters[date]": timeRuns(
+            lambda: fetchAll(conn.getTableWithFilters(False, True, filter_date, "Супермаркеты")), repeat),
+        "getTableWithFilters[category]": timeRuns(
+            lambda: fetchAll(conn.getTableWithFilters(True, False, filter_date, "Супермаркеты")), repeat),
+        "getBalance": timeRuns(conn.getBalance, repeat),
+    }
+
+    # Обновление таблицы главного окна после завершения запуска
+    window = main.ExpanseTracker(db_path)
+    window.show()
+    while window.conn is None or window.model is None or not window.model.rowCount():
+        app.processEvents()
+
+    def refresh():
+        window.viewData()
+        app.processEvents()
+
+    results["viewData"] = timeRuns(refresh, repeat)
+    window.close()
+    # Окно удаляется, а соединение бенчмарка закрывается до завершения интерпретатора: иначе
+    # порядок удаления объектов Qt при выходе случаен и процесс иногда падает с ошибкой сегментации
+    window.deleteLater()
+    app.sendPostedEvents(None, QEvent.Type.DeferredDelete)
+    conn.close()
+
+    print(json.dumps({
+        "rows": rows,
+        "sqlite": sqlite_version,
+        "qt": QT_VERSION_STR,
+        "operations": results,
+    }))
+
+
+def gitCommit():
+    """
+    Возвращает текущий коммит репозитория.
+
+    Returns:
+        str: Хэш коммита с пометкой '-dirty' при незафиксированных изменениях или None.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + "-dirty" if status else commit
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Бенчмарк операций с базой данных")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES,
+                        help="размеры баз данных, например 1e3 1e5 1e7")
+    parser.add_argument("--repeat", type=int, default=20, help="количество запусков каждой операции")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора баз данных")
+    parser.add_argument("--output", help="файл для результатов; по умолчанию вывод в консоль")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        runChild(args.child, args.repeat)
+        sys.exit()
+
+    report = {
+        "benchmark": "operations",
+        "commit": gitCommit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": [],
+    }
+    for size in (int(float(size)) for size in args.sizes):
+        getLedger(size, args.seed)
+        with tempfile.TemporaryDirectory() as directory:
+            db_path = copyLedger(size, directory, args.seed)
+            output = subprocess.run([sys.executable, __file__, "--child", db_path, "--repeat", str(args.repeat)],
+                                    check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        report["results"].append(result)
+        print(f"{size}: готово", file=sys.stderr)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
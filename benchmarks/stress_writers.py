@@ -0,0 +1,189 @@
+# Стресс-тест одновременной записи в базу данных из нескольких процессов.
+#
+# Несколько процессов-писателей одновременно добавляют записи в одну базу данных через
+# класс Data: половина записей добавляется по одной, половина - пакетами в транзакциях
+# Data.transaction. Параллельно процесс-читатель постоянно пересчитывает баланс, удерживая
+# разделяемые блокировки, а второй читатель, как таблица записей главного окна, держит
+# открытым запрос модели QSqlQueryModel, прочитанный частично, и раз в секунду выполняет
+# его заново. После завершения проверяется, что в базе данных есть каждая
+# запись, о сохранении которой сообщил писатель, что ни одна запись не продублирована
+# и что ни одна запись не потеряна (писатели не получили отказов).
+#
+# Запуск: python benchmarks/stress_writers.py --writers 8 --entries 200
+
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ledger import copyLedger
+
+
+# Размер пакета записей, добавляемых в одной транзакции
+BATCH_SIZE = 10
+
+
+def openData(db_path, busy_timeout):
+    """
+    Открывает соединение с базой данных в процессе теста.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        busy_timeout (int): Время ожидания блокировки в миллисекундах.
+
+    Returns:
+        tuple: Объект приложения Qt и объект Data.
+    """
+    from PyQt6.QtCore import QCoreApplication
+    from connection import Data
+
+    app = QCoreApplication([])
+    return app, Data(db_path, busy_timeout=busy_timeout)
+
+
+def runWriter(db_path, busy_timeout, writer, entries, start, results):
+    """
+    Добавляет записи и сообщает, какие из них сохранены.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        busy_timeout (int): Время ожидания блокировки в миллисекундах.
+        writer (int): Номер писателя.
+        entries (int): Количество записей.
+        start (multiprocessing.Event): Событие одновременного начала записи.
+        results (multiprocessing.Queue): Очередь для результатов.
+    """
+    from connection import TransactionError
+
+    app, conn = openData(db_path, busy_timeout)
+    saved, failed = [], []
+    start.wait()
+    started = time.perf_counter()
+    single = entries // 2
+    for number in range(single):
+        description = f"writer-{writer}-{number}"
+        if conn.insertEntry(description, 100 + number, "Прочее", "01.01.2024") is None:
+            failed.append(description)
+        else:
+            saved.append(description)
+    for offset in range(single, entries, BATCH_SIZE):
+        batch = [f"writer-{writer}-{number}" for number in range(offset, min(offset + BATCH_SIZE, entries))]
+        try:
+            with conn.transaction():
+                for description in batch:
+                    conn.insertEntry(description, 100, "Прочее", "01.01.2024")
+        except TransactionError:
+            failed += batch
+        else:
+            saved += batch
+    results.put({"writer": writer, "saved": saved, "failed": failed, "seconds": time.perf_counter() - started})
+
+
+def runReader(db_path, busy_timeout, start, stop):
+    """
+    Постоянно пересчитывает баланс, пока писатели добавляют записи.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        busy_timeout (int): Время ожидания блокировки в миллисекундах.
+        start (multiprocessing.Event): Событие одновременного начала записи.
+        stop (multiprocessing.Event): Событие завершения теста.
+    """
+    app, conn = openData(db_path, busy_timeout)
+    start.wait()
+    while not stop.is_set():
+        conn.getBalance()
+
+
+def runCursorReader(db_path, busy_timeout, start, stop):
+    """
+    Держит открытым частично прочитанный запрос таблицы записей, пока писатели добавляют записи.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        busy_timeout (int): Время ожидания блокировки в миллисекундах.
+        start (multiprocessing.Event): Событие одновременного начала записи.
+        stop (multiprocessing.Event): Событие завершения теста.
+    """
+    from PyQt6.QtSql import QSqlQueryModel
+
+    app, conn = openData(db_path, busy_timeout)
+    model = QSqlQueryModel()
+    start.wait()
+    while not stop.is_set():
+        # Модель читает первые строки результата, а остальные - при прокрутке,
+        # поэтому запрос остается открытым до следующего обновления
+        model.setQuery(conn.getTableWithFilters(True, True, "", "", None, None))
+        stop.wait(1)
+    model.clear()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Стресс-тест одновременной записи из нескольких процессов")
+    parser.add_argument("--writers", type=int, default=8, help="количество процессов-писателей")
+    parser.add_argument("--entries", type=int, default=200, help="количество записей каждого писателя")
+    parser.add_argument("--rows", type=int, default=10000, help="количество записей в исходной базе данных")
+    parser.add_argument("--busy-timeout", type=int, default=5000, help="время ожидания блокировки в мс")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = copyLedger(args.rows, directory)
+        start, stop, results = context.Event(), context.Event(), context.Queue()
+        readers = [context.Process(target=target, args=(db_path, args.busy_timeout, start, stop))
+                   for target in (runReader, runCursorReader)]
+        writers = [context.Process(target=runWriter,
+                                   args=(db_path, args.busy_timeout, writer, args.entries, start, results))
+                   for writer in range(args.writers)]
+        for process in readers + writers:
+            process.start()
+        # Писатели открывают соединения до начала записи, чтобы начать ее одновременно
+        time.sleep(1)
+        start.set()
+        reports = []
+        while len(reports) < len(writers):
+            try:
+                reports.append(results.get(timeout=1))
+            except queue.Empty:
+                if any(process.exitcode for process in writers):
+                    stop.set()
+                    sys.exit("Процесс-писатель завершился с ошибкой")
+        stop.set()
+        for process in readers + writers:
+            process.join()
+
+        with sqlite3.connect(db_path) as conn:
+            stored = {}
+            for description, count in conn.execute("SELECT description, COUNT(*) FROM expenses "
+                                                   "WHERE description LIKE 'writer-%' GROUP BY description"):
+                stored[description] = count
+
+    saved = [description for report in reports for description in report["saved"]]
+    failed = [description for report in reports for description in report["failed"]]
+    missing = [description for description in saved if description not in stored]
+    duplicated = [description for description, count in stored.items() if count > 1]
+    unexpected = set(failed) & stored.keys()
+    summary = {
+        "benchmark": "stress_writers",
+        "writers": args.writers,
+        "entries_per_writer": args.entries,
+        "busy_timeout_ms": args.busy_timeout,
+        "saved": len(saved),
+        "failed": len(failed),
+        "missing": len(missing),
+        "duplicated": len(duplicated),
+        "failed_but_stored": len(unexpected),
+        "max_writer_seconds": max(report["seconds"] for report in reports),
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if failed or missing or duplicated or unexpected:
+        sys.exit("Обнаружены потерянные или лишние записи")
@@ -0,0 +1,305 @@
+# Модуль для автоматического определения категории записи по ее описанию.
+#
+# Класс Categorizer обучается на парах (описание, категория) из таблицы расходов и сочетает:
+# - точные правила: описание, уже встречавшееся раньше, получает самую частую для него категорию;
+# - частотную модель (наивный байесовский классификатор) по словам описания для новых описаний.
+#
+# Модель хранится в памяти в виде индекса слов {слово: {категория: количество}} и кэшируется
+# в JSON-файле рядом с базой данных вместе с идентификатором последней учтенной записи.
+# При открытии модель дообучается только на записях, добавленных после сохранения,
+# а каждая новая запись учитывается сразу после добавления (метод refresh).
+# Изменения и удаления старых записей модель не отслеживает; метод rebuild обучает ее заново.
+#
+# Определение категории не обращается к базе данных и выполняет несколько обращений
+# к словарям на слово, поэтому пакетная разметка выписки обрабатывает десятки тысяч строк в секунду.
+
+
+import json
+import math
+import os
+import re
+
+
+# Версия формата файла модели
+MODEL_VERSION = 1
+
+# Минимальная уверенность, с которой предложенная категория выбирается автоматически
+MIN_CONFIDENCE = 0.5
+
+# Слова описания: последовательности букв и цифр, кроме чисел
+TOKEN_PATTERN = re.compile(r"\w*[^\W\d_]\w*")
+
+
+def modelPath(db_path):
+    """
+    Возвращает путь к файлу модели для базы данных.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+
+    Returns:
+        str: Путь к файлу модели.
+    """
+    return db_path + ".categorizer.json"
+
+
+def normalizeDescription(description):
+    """
+    Приводит описание к виду, по которому сравниваются описания.
+
+    Args:
+        description (str): Описание записи.
+
+    Returns:
+        str: Описание в нижнем регистре без лишних пробелов, 'ё' заменена на 'е'.
+    """
+    return " ".join(description.lower().replace("ё", "е").split())
+
+
+def tokenize(description):
+    """
+    Разбивает нормализованное описание на слова.
+
+    Args:
+        description (str): Нормализованное описание.
+
+    Returns:
+        set: Слова описания длиной не меньше двух символов.
+    """
+    return {token for token in TOKEN_PATTERN.findall(description) if len(token) > 1}
+
+
+class Categorizer:
+    def __init__(self, conn):
+        """
+        Инициализирует модель и загружает ее из файла, если он есть.
+
+        Args:
+            conn (Data): Объект для работы с базой данных.
+        """
+        super(Categorizer, self).__init__()
+        self.conn = conn
+        self.path = modelPath(conn.db_path)
+        self.clear()
+        self.load()
+
+    def clear(self):
+        """
+        Очищает модель.
+        """
+        self.last_id = 0
+        self.documents = {}
+        self.token_totals = {}
+        self.tokens = {}
+        self.exact = {}
+        self.base_scores = {}
+        self.dirty = True
+
+    def load(self):
+        """
+        Загружает модель из файла. Поврежденный или устаревший файл игнорируется.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                model = json.load(file)
+        except (OSError, ValueError):
+            return
+        if model.get("version") != MODEL_VERSION:
+            return
+        self.last_id = model["last_id"]
+        self.documents = model["documents"]
+        self.token_totals = model["token_totals"]
+        self.tokens = model["tokens"]
+        self.exact = model["exact"]
+        self.base_scores = {}
+        self.dirty = False
+
+    def save(self):
+        """
+        Сохраняет модель в файл, если она изменилась после загрузки.
+        """
+        if not self.dirty:
+            return
+        model = {
+            "version": MODEL_VERSION,
+            "last_id": self.last_id,
+            "documents": self.documents,
+            "token_totals": self.token_totals,
+            "tokens": self.tokens,
+            "exact": self.exact,
+        }
+        # Запись через временный файл, чтобы прерванное сохранение не повредило модель
+        with open(self.path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(model, file, ensure_ascii=False, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+        self.dirty = False
+
+    def refresh(self):
+        """
+        Дообучает модель на записях, добавленных после последнего обучения.
+
+        Если в базе данных нет записей новее учтенных (например, база данных заменена),
+        модель обучается заново.
+
+        Returns:
+            int: Количество учтенных записей.
+        """
+        max_id = self.maxEntryId()
+        if max_id < self.last_id:
+            self.clear()
+        if max_id == self.last_id:
+            return 0
+
+        query = self.conn.executeQuery("SELECT id, description, category FROM expenses WHERE id > ?",
+                                       [self.last_id])
+        count = 0
+        while query.next():
+            self.learn(query.value(1), query.value(2))
+            count += 1
+        self.last_id = max_id
+        return count
+
+    def maxEntryId(self):
+        """
+        Возвращает наибольший идентификатор записи в таблице расходов.
+
+        Returns:
+            int: Идентификатор или 0, если таблица пуста.
+        """
+        query = self.conn.executeQuery("SELECT MAX(id) FROM expenses")
+        return (query.value(0) if query.next() else None) or 0
+
+    def skipLearned(self):
+        """
+        Считает учтенными все записи, уже добавленные в базу данных.
+
+        Используется после пакетного импорта, чтобы модель не обучалась на категориях,
+        которые она сама предложила.
+        """
+        self.last_id = self.maxEntryId()
+        self.dirty = True
+
+    def rebuild(self):
+        """
+        Обучает модель заново на всей таблице расходов.
+
+        Returns:
+            int: Количество учтенных записей.
+        """
+        self.clear()
+        return self.refresh()
+
+    def learn(self, description, category):
+        """
+        Учитывает в модели пару (описание, категория).
+
+        Args:
+            description (str): Описание записи.
+            category (str): Категория записи.
+        """
+        key = normalizeDescription(description)
+        counts = self.exact.setdefault(key, {})
+        counts[category] = counts.get(category, 0) + 1
+        self.documents[category] = self.documents.get(category, 0) + 1
+        for token in tokenize(key):
+            counts = self.tokens.setdefault(token, {})
+            counts[category] = counts.get(category, 0) + 1
+            self.token_totals[category] = self.token_totals.get(category, 0) + 1
+        self.base_scores = {}
+        self.dirty = True
+
+    def baseScores(self, known_count, categories):
+        """
+        Возвращает оценки категорий для описания из заданного числа известных слов без учета самих слов.
+
+        Оценки зависят только от числа слов и набора допустимых категорий, поэтому
+        запоминаются до следующего обучения модели.
+
+        Args:
+            known_count (int): Количество известных модели слов описания.
+            categories (frozenset): Допустимые категории или None.
+
+        Returns:
+            tuple: Словарь {категория: оценка}, категория с наибольшей оценкой, эта оценка
+            и сумма экспонент оценок, сдвинутых на нее.
+        """
+        key = (known_count, categories)
+        if key not in self.base_scores:
+            vocabulary = len(self.tokens) + 1
+            total = sum(self.documents.values())
+            scores = {category: math.log(count / total) -
+                      known_count * math.log(self.token_totals.get(category, 0) + vocabulary)
+                      for category, count in self.documents.items() if categories is None or category in categories}
+            best = max(scores, key=scores.get) if scores else None
+            shift = scores[best] if scores else 0.0
+            self.base_scores[key] = (scores, best, shift, sum(math.exp(score - shift) for score in scores.values()))
+        return self.base_scores[key]
+
+    def suggest(self, description, categories=None):
+        """
+        Предлагает категорию для описания.
+
+        Args:
+            description (str): Описание записи.
+            categories (collection, optional): Допустимые категории; по умолчанию все известные модели.
+
+        Returns:
+            tuple: Категория и уверенность от 0 до 1 или (None, 0.0), если описание не похоже
+            ни на одно из известных.
+        """
+        key = normalizeDescription(description)
+
+        # Точное правило: описание уже встречалось
+        counts = self.exact.get(key)
+        if counts:
+            allowed = {category: count for category, count in counts.items()
+                       if categories is None or category in categories}
+            if allowed:
+                category = max(allowed, key=allowed.get)
+                return category, allowed[category] / sum(allowed.values())
+
+        # Наивный байесовский классификатор по известным словам описания
+        known = [self.tokens[token] for token in tokenize(key) if token in self.tokens]
+        if not known:
+            return None, 0.0
+        if categories is not None and not isinstance(categories, frozenset):
+            categories = frozenset(categories)
+        scores, best, shift, total = self.baseScores(len(known), categories)
+        if not scores:
+            return None, 0.0
+
+        # Слова описания меняют оценки только тех категорий, в которых они встречались,
+        # поэтому сумма экспонент пересчитывается только для этих категорий
+        hits = {}
+        for counts in known:
+            for category, count in counts.items():
+                if category in scores:
+                    hits[category] = hits.get(category, 0.0) + math.log(count + 1)
+        best_score = scores[best]
+        for category, hit in hits.items():
+            score = scores[category] + hit
+            total += math.exp(score - shift) - math.exp(scores[category] - shift)
+            if score > best_score:
+                best, best_score = category, score
+        return best, math.exp(best_score - shift) / total
+
+    def categorize(self, descriptions, categories=None):
+        """
+        Предлагает категории для списка описаний.
+
+        Args:
+            descriptions (iterable): Описания записей.
+            categories (collection, optional): Допустимые категории.
+
+        Returns:
+            list: Пары (категория, уверенность) в порядке описаний (см. suggest).
+        """
+        if categories is not None:
+            categories = frozenset(categories)
+        suggestions = {}
+        results = []
+        for description in descriptions:
+            if description not in suggestions:
+                suggestions[description] = self.suggest(description, categories)
+            results.append(suggestions[description])
+        return results
@@ -0,0 +1,192 @@
+# Модуль для чтения журнала изменений записей.
+#
+# Триггеры базы данных (см. connection.CHANGE_TRIGGERS) добавляют в таблицу changes строку
+# на каждую вставку, изменение и удаление записи, а модуль archive - на перенос записи в архив.
+# Номер изменения (seq) монотонно растет и не переиспользуется. Внешняя программа хранит
+# курсор - номер последнего прочитанного изменения - и читает только изменения после него,
+# поэтому синхронизация занимает время, пропорциональное количеству изменений, а не размеру
+# таблицы расходов.
+#
+# Курсор можно хранить в самой базе данных под именем потребителя (таблица change_consumers).
+# Метод compact удаляет изменения, прочитанные всеми именованными потребителями. Потребитель,
+# курсор которого отстал от очищенной части журнала, получает ChangeGapError и должен заново
+# прочитать таблицу расходов целиком, начиная затем с lastCursor().
+#
+# Запуск модуля выводит изменения в формате JSON Lines:
+#     python changes.py --since 0
+#     python changes.py --consumer reports [--follow]
+#     python changes.py --compact
+
+
+import argparse
+import json
+import sys
+import time
+
+from PyQt6 import QtCore
+
+from paths import DB_PATH
+
+
+# Количество изменений, читаемых одним запросом
+CHANGE_BATCH = 1000
+
+# Интервал опроса журнала в режиме --follow в секундах
+FOLLOW_INTERVAL = 1.0
+
+# Поля изменения и соответствующие им колонки таблицы changes
+CHANGE_FIELDS = ("seq", "id", "operation", "description", "value", "category", "date", "currency", "changed_at")
+CHANGE_COLUMNS = "seq, entry_id, operation, description, value, category, date, currency, changed_at"
+
+
+class ChangeGapError(Exception):
+    """
+    Изменения после курсора уже удалены из журнала.
+    """
+
+
+class ChangeFeed:
+    def __init__(self, conn):
+        """
+        Инициализирует чтение журнала изменений.
+
+        Args:
+            conn (Data): Объект для работы с базой данных.
+        """
+        super(ChangeFeed, self).__init__()
+        self.conn = conn
+
+    def lastCursor(self):
+        """
+        Возвращает номер последнего изменения, включая удаленные из журнала.
+
+        Returns:
+            int: Номер изменения или 0, если изменений не было.
+        """
+        query = self.conn.executeQuery("SELECT seq FROM sqlite_sequence WHERE name = 'changes'")
+        return (query.value(0) if query.next() else None) or 0
+
+    def getChanges(self, cursor=0, limit=CHANGE_BATCH):
+        """
+        Возвращает изменения после курсора.
+
+        Args:
+            cursor (int, optional): Номер последнего прочитанного изменения.
+            limit (int, optional): Наибольшее количество изменений.
+
+        Returns:
+            list: Изменения по возрастанию номера в виде словарей с ключами CHANGE_FIELDS;
+            у удаленных и архивированных записей заполнены только seq, id, operation и changed_at.
+
+        Raises:
+            ChangeGapError: Если часть изменений после курсора удалена из журнала.
+        """
+        query = self.conn.executeQuery(
+            f"SELECT {CHANGE_COLUMNS} FROM changes "
+            "WHERE seq > ? ORDER BY seq LIMIT ?", [cursor, limit])
+        changes = []
+        while query.next():
+            changes.append({field: None if query.isNull(column) else query.value(column)
+                            for column, field in enumerate(CHANGE_FIELDS)})
+
+        # Номера изменений идут без пропусков, поэтому пропуск после курсора означает очистку журнала
+        first = changes[0]["seq"] if changes else self.lastCursor() + 1
+        if first > cursor + 1 and cursor < self.lastCursor():
+            raise ChangeGapError(f"Изменения с {cursor + 1} по {first - 1} удалены из журнала")
+        return changes
+
+    def iterChanges(self, cursor=0, batch=CHANGE_BATCH):
+        """
+        Перебирает все изменения после курсора порциями.
+
+        Args:
+            cursor (int, optional): Номер последнего прочитанного изменения.
+            batch (int, optional): Количество изменений, читаемых одним запросом.
+
+        Yields:
+            dict: Изменение (см. getChanges).
+
+        Raises:
+            ChangeGapError: Если часть изменений после курсора удалена из журнала.
+        """
+        while True:
+            changes = self.getChanges(cursor, batch)
+            yield from changes
+            if len(changes) < batch:
+                return
+            cursor = changes[-1]["seq"]
+
+    def getCursor(self, consumer):
+        """
+        Возвращает сохраненный курсор потребителя.
+
+        Args:
+            consumer (str): Имя потребителя.
+
+        Returns:
+            int: Номер последнего прочитанного изменения или 0 для нового потребителя.
+        """
+        query = self.conn.executeQuery("SELECT seq FROM change_consumers WHERE name = ?", [consumer])
+        return query.value(0) if query.next() else 0
+
+    def acknowledge(self, consumer, cursor):
+        """
+        Сохраняет курсор потребителя.
+
+        Args:
+            consumer (str): Имя потребителя.
+            cursor (int): Номер последнего прочитанного изменения.
+
+        Returns:
+            bool: True, если курсор сохранен.
+        """
+        query = self.conn.executeQuery("INSERT INTO change_consumers (name, seq) VALUES (?, ?) "
+                                       "ON CONFLICT (name) DO UPDATE SET seq = excluded.seq", [consumer, cursor])
+        return query.isActive()
+
+    def compact(self):
+        """
+        Удаляет изменения, прочитанные всеми именованными потребителями.
+
+        Returns:
+            int: Количество удаленных изменений или None, если журнал не очищен.
+        """
+        query = self.conn.executeQuery("DELETE FROM changes WHERE seq <= (SELECT MIN(seq) FROM change_consumers)")
+        if not query.isActive():
+            return None
+        return max(query.numRowsAffected(), 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Журнал изменений записей")
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы данных")
+    parser.add_argument("--since", type=int, help="номер последнего прочитанного изменения")
+    parser.add_argument("--consumer", help="имя потребителя, курсор которого хранится в базе данных")
+    parser.add_argument("--follow", action="store_true", help="ожидать новые изменения")
+    parser.add_argument("--compact", action="store_true", help="удалить изменения, прочитанные всеми потребителями")
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication(sys.argv)
+    from connection import Data
+
+    feed = ChangeFeed(Data(args.db))
+    if args.compact:
+        print(f"Удалено изменений: {feed.compact()}", file=sys.stderr)
+        sys.exit(0)
+    cursor = args.since if args.since is not None else feed.getCursor(args.consumer) if args.consumer else 0
+    try:
+        while True:
+            acknowledged = cursor
+            for change in feed.iterChanges(cursor):
+                print(json.dumps(change, ensure_ascii=False))
+                cursor = change["seq"]
+            sys.stdout.flush()
+            if args.consumer and cursor != acknowledged:
+                feed.acknowledge(args.consumer, cursor)
+            if not args.follow:
+                break
+            time.sleep(FOLLOW_INTERVAL)
+    except ChangeGapError as error:
+        sys.exit(str(error))
+    except KeyboardInterrupt:
+        pass
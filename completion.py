@@ -0,0 +1,175 @@
+# Модуль для автодополнения описаний записей в окнах добавления и изменения записи.
+#
+# Класс DescriptionIndex хранит различные описания записей с частотой их использования,
+# последней суммой и количеством записей по категориям. Префиксный индекс - отсортированный
+# список пар (начало слова описания, описание): описания, начинающиеся с введенного текста
+# или содержащие слово с таким началом, занимают в нем непрерывный диапазон, который
+# находится двоичным поиском.
+#
+# Описания ранжируются по частоте с затуханием: каждая запись добавляет к оценке описания
+# 2 ** ((день записи - EPOCH) / HALF_LIFE_DAYS), поэтому запись, сделанная HALF_LIFE_DAYS дней
+# назад, весит вдвое меньше сегодняшней. Оценки отсчитываются от фиксированной даты
+# и только растут, поэтому их не нужно пересчитывать с течением времени.
+# Оценки и количества записей по категориям суммирует SQLite одним запросом с группировкой
+# по описанию и категории, поэтому в Python передаются тысячи строк, а не вся таблица.
+#
+# Индекс строится в фоновом потоке IndexBuilder с отдельным соединением с базой данных
+# и затем дообучается на новых записях по их идентификатору (метод refresh).
+# Изменения и удаления старых записей индекс не отслеживает до следующего запуска.
+
+
+import bisect
+import heapq
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from categorizer import normalizeDescription
+
+
+# Период, за который вес записи в оценке описания уменьшается вдвое, в днях
+HALF_LIFE_DAYS = 90
+
+# Дата, от которой отсчитываются оценки описаний
+EPOCH = "2000-01-01"
+
+# Количество предлагаемых вариантов
+COMPLETION_LIMIT = 10
+
+
+class DescriptionIndex:
+    def __init__(self):
+        """
+        Инициализирует пустой индекс описаний.
+        """
+        super(DescriptionIndex, self).__init__()
+        self.last_id = 0
+        self.descriptions = {}
+        self.prefixes = []
+
+    def add(self, description, category, count, score, date, value, currency):
+        """
+        Учитывает в индексе записи с одним описанием и категорией.
+
+        Args:
+            description (str): Описание записей.
+            category (str): Категория записей.
+            count (int): Количество записей.
+            score (float): Сумма весов записей (см. описание модуля).
+            date (str): Дата самой поздней из записей в формате 'YYYY-MM-DD'.
+            value (int): Сумма самой поздней записи в минимальных единицах валюты.
+            currency (str): Код валюты суммы.
+        """
+        key = normalizeDescription(description)
+        if not key:
+            return
+        stats = self.descriptions.get(key)
+        if stats is None:
+            stats = self.descriptions[key] = {"text": description, "score": 0.0, "categories": {},
+                                              "value": value, "currency": currency, "date": date}
+            words = key.split(" ")
+            for number in range(len(words)):
+                bisect.insort(self.prefixes, (" ".join(words[number:]), key))
+        stats["score"] += score
+        stats["categories"][category] = stats["categories"].get(category, 0) + count
+        # Написание и сумма берутся из самой поздней записи
+        if date >= stats["date"]:
+            stats.update(text=description, value=value, currency=currency, date=date)
+
+    def refresh(self, conn):
+        """
+        Учитывает в индексе записи, добавленные после последнего обновления.
+
+        Args:
+            conn (Data): Объект для работы с базой данных.
+
+        Returns:
+            int: Количество учтенных записей.
+        """
+        query = conn.executeQuery("SELECT MAX(id) FROM expenses")
+        max_id = (query.value(0) if query.next() else None) or 0
+        if max_id <= self.last_id:
+            return 0
+
+        # Сумма и валюта берутся из строки с наибольшей датой группы (см. min/max в документации SQLite)
+        day = "substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)"
+        query = conn.executeQuery(
+            f"SELECT description, category, COUNT(*), "
+            f"SUM(pow(2, (julianday({day}) - julianday('{EPOCH}')) / {HALF_LIFE_DAYS})), "
+            f"MAX({day}), value, currency FROM expenses WHERE id > ? AND id <= ? GROUP BY description, category",
+            [self.last_id, max_id])
+        count = 0
+        while query.next():
+            self.add(query.value(0), query.value(1), query.value(2), query.value(3) or 0.0, query.value(4),
+                     query.value(5), query.value(6))
+            count += query.value(2)
+        self.last_id = max_id
+        return count
+
+    def complete(self, prefix, limit=COMPLETION_LIMIT):
+        """
+        Возвращает описания, начинающиеся с заданного текста или содержащие слово с таким началом.
+
+        Args:
+            prefix (str): Введенный текст.
+            limit (int, optional): Наибольшее количество вариантов.
+
+        Returns:
+            list: Описания в порядке убывания оценки.
+        """
+        prefix = normalizeDescription(prefix)
+        if not prefix:
+            return []
+        start = bisect.bisect_left(self.prefixes, (prefix,))
+        keys = set()
+        for number in range(start, len(self.prefixes)):
+            word_start, key = self.prefixes[number]
+            if not word_start.startswith(prefix):
+                break
+            keys.add(key)
+        best = heapq.nlargest(limit, keys, key=lambda key: self.descriptions[key]["score"])
+        return [self.descriptions[key]["text"] for key in best]
+
+    def details(self, description):
+        """
+        Возвращает наиболее вероятные категорию и сумму для описания.
+
+        Args:
+            description (str): Описание записи.
+
+        Returns:
+            tuple: Самая частая категория описания, последняя сумма в минимальных единицах
+            и код ее валюты или None, если описание не встречалось.
+        """
+        stats = self.descriptions.get(normalizeDescription(description))
+        if stats is None:
+            return None
+        categories = stats["categories"]
+        return max(categories, key=categories.get), stats["value"], stats["currency"]
+
+
+class IndexBuilder(QThread):
+    # Сигнал с построенным индексом описаний
+    built = pyqtSignal(object)
+
+    def __init__(self, db_path, parent=None):
+        """
+        Инициализирует поток построения индекса описаний.
+
+        Args:
+            db_path (str): Путь к файлу базы данных.
+            parent (QObject, optional): Родительский объект.
+        """
+        super(IndexBuilder, self).__init__(parent)
+        self.db_path = db_path
+
+    def run(self):
+        """
+        Строит индекс по всей таблице расходов через отдельное соединение с базой данных.
+        """
+        from connection import Data
+
+        conn = Data(self.db_path, connection_name="completion", journal_mode=None)
+        index = DescriptionIndex()
+        index.refresh(conn)
+        conn.close()
+        self.built.emit(index)
@@ -2,27 +2,572 @@
 #
 # Класс Data предоставляет методы для создания соединения с базой данных,
 # выполнения SQL-запросов и управления записями в таблице расходов.
+# Время, количество строк и планы медленных запросов, выполняемых через executeQuery,
+# собираются в статистику запросов (см. модуль diagnostics).
+#
+# Базу данных могут одновременно изменять приложение и сторонние скрипты. Соединение ждет
+# освобождения блокировки до BUSY_TIMEOUT_MS, запрос вне транзакции, не дождавшийся ее,
+# повторяется несколько раз с увеличивающейся паузой, а группы запросов выполняются
+# в транзакциях Data.transaction, которые захватывают блокировку записи сразу при начале.
+# Методы записи возвращают признак успеха, чтобы неудавшаяся запись не терялась молча.
+# База данных работает в режиме журнала WAL: чтение не блокирует запись, поэтому запрос,
+# результат которого таблица записей окна читает по мере прокрутки, не мешает писать
+# сторонним скриптам. Соединения, которые только читают, режим журнала не меняют.
+#
+# Записи закрытых лет могут быть перенесены в архивы (см. модуль archive). Баланс учитывает
+# переносимые остатки архивов из таблицы archives, а список записей подключает архив года
+# только при фильтре по дате из этого года.
+#
+# Каждая вставка, изменение и удаление записи триггерами добавляется в журнал изменений
+# (таблица changes) с монотонно растущим номером, по которому внешние программы читают
+# изменения после своего курсора (см. модуль changes).
+#
+# Для синхронизации двух файлов базы данных (см. модуль sync) у каждой записи есть постоянный
+# идентификатор uuid и время последнего изменения modified_at, удаленные записи остаются
+# в таблице deleted_entries, а хеши записей по месяцам кэшируются в таблице sync_ranges.
+# Все это поддерживают триггеры, поэтому запись в обход класса Data тоже учитывается.
+#
+# Вложения записей хранятся в файлах рядом с базой данных, а таблица attachments содержит
+# только их хеши (см. модуль attachments).
+#
+# Покупку из нескольких категорий можно разделить на строки (таблица entry_items): запись
+# сохраняет общую сумму и получает категорию SPLIT_CATEGORY, поэтому баланс учитывает ее один раз,
+# а бюджеты и отчеты - строки по их категориям. Метки записей хранятся в таблицах tags и entry_tags.
+#
+# Изменения баланса по дням, категориям и валютам (таблица daily_balance) поддерживают триггеры;
+# по ним отчеты за период (см. модуль reports) получают остаток на начало периода, а прогноз
+# баланса (см. модуль forecast) - кривые расходов по категориям, не читая записи.
+#
+# Проверку целостности, статистику планировщика запросов и освобождение места в файле
+# выполняет модуль maintenance; время последнего выполнения задач хранится в таблице maintenance_log.
+#
+# Методы insertEntry, insertEntries, updateEntry, deleteEntry и setSplit вызывают обработчики записи
+# плагинов (см. модуль plugins): обработчик before_write может отменить запись, after_write получает
+# записи с их идентификаторами. Отмененная запись возвращает тот же признак неудачи, что и запись,
+# не дождавшаяся блокировки, а название отменившего плагина сохраняется в Data.cancelled_by, чтобы
+# окно сообщило о причине. Без обработчиков записи лишних запросов не выполняется. Плагины
+# находятся при создании объекта Data, а не при первой записи.
+
 
+import contextlib
+import hashlib
+import os
+import random
+import sys
+import time
 
 from PyQt6 import QtSql
 
+import recurring
+from diagnostics import QueryStats, TimedQuery
+from duplicates import fingerprint
+from currency import BASE_CURRENCY, RATE_SCALE, RateTable, requireMinorUnits
+from paths import DB_PATH
+from plugins import registry
+
+# Время ожидания освобождения блокировки базы данных другим соединением в миллисекундах
+BUSY_TIMEOUT_MS = 5000
+
+# Режим журнала, который устанавливает соединение (PRAGMA journal_mode)
+JOURNAL_MODE = "WAL"
+
+# Количество повторов запроса, не дождавшегося блокировки, и пауза перед первым повтором в секундах
+BUSY_RETRIES = 3
+BUSY_BACKOFF = 0.1
+
+# Категория поступлений; все остальные категории считаются расходами
+INCOME_CATEGORY = "Поступления"
+
+# Встроенные категории в порядке списков окон приложения
+CATEGORIES = (
+    "Поступления", "Авиабилеты", "Автоуслуги", "Аптеки", "Аренда авто", "Благотворительность",
+    "Дом, ремонт", "Ж/д билеты", "Животные", "Искусство", "Кино", "Красота", "Медицинские услуги",
+    "Музыка", "Образование", "Одежда, обувь", "Отели", "Развлечения", "Рестораны", "Связь",
+    "Сервис-услуги", "Спорттовары", "Сувениры", "Супермаркеты", "Топливо", "Транспорт", "Фастфуд",
+    "Финансовые услуги", "Фото/видео", "Цветы", "Частные услуги", "Прочее",
+)
+
+# Категория записи, разделенной на строки по категориям (см. Data.setSplit)
+SPLIT_CATEGORY = "Разделено"
+
+# Ключ месяца 'YYYY-MM' для даты записи в формате 'DD.MM.YYYY'
+MONTH_KEY = "substr({0}.date, 7, 4) || '-' || substr({0}.date, 4, 2)"
+
+# Дата записи в формате 'YYYY-MM-DD'
+ISO_DATE = "substr({0}.date, 7, 4) || '-' || substr({0}.date, 4, 2) || '-' || substr({0}.date, 1, 2)"
+
+# Сумма записи в минимальных единицах базовой валюты по курсу на дату записи: последнему
+# известному курсу не позже даты, иначе самому раннему, а без курсов - 1:1, как у
+# currency.RateTable.getRate (целочисленное деление с округлением)
+BASE_VALUE = ("(({0}.value * COALESCE((SELECT rate_micro FROM exchange_rates WHERE currency = {0}.currency "
+              "AND date <= " + ISO_DATE + " ORDER BY date DESC LIMIT 1), (SELECT rate_micro FROM exchange_rates "
+              f"WHERE currency = {{0}}.currency ORDER BY date LIMIT 1), {RATE_SCALE}) + {RATE_SCALE // 2}) "
+              f"/ {RATE_SCALE})")
+
+# Сумма строки {1} разделенной записи {0} в минимальных единицах базовой валюты
+# (строка в валюте записи, курс на дату записи)
+ITEM_BASE_VALUE = BASE_VALUE.replace("{0}.value", "{1}.value", 1)
+
+# Пересчет сумм расходов по категориям за месяцы неархивных лет по всей таблице расходов
+# (разделенные записи учитываются по строкам); суммы за месяцы архивных лет сохраняются
+BUDGET_STATUS_REBUILD = [
+    "DELETE FROM budget_status WHERE CAST(substr(month, 1, 4) AS INTEGER) NOT IN (SELECT year FROM archives)",
+    "INSERT INTO budget_status (month, category, spent) SELECT month, category, SUM(spent) FROM ("
+    f"SELECT {MONTH_KEY.format('expenses')} AS month, category, {BASE_VALUE.format('expenses')} AS spent "
+    "FROM expenses WHERE category NOT IN ('Поступления', 'Разделено') UNION ALL "
+    f"SELECT {MONTH_KEY.format('e')}, i.category, {ITEM_BASE_VALUE.format('e', 'i')} "
+    "FROM entry_items i JOIN expenses e ON e.id = i.entry_id) GROUP BY 1, 2",
+]
+
+# Суммы записей по валютам и дням для подсчета баланса: суммы в базовой валюте (первый параметр)
+# складываются в одну группу; {0} - дополнительное условие отбора записей
+BALANCE_GROUPS = ("SELECT currency, CASE WHEN currency=? THEN '' ELSE " + ISO_DATE.format("expenses") + " END, "
+                  "SUM(CASE WHEN category='Поступления' THEN value ELSE -value END) "
+                  "FROM expenses {0} GROUP BY 1, 2")
+
+# Изменение баланса записью {0}: поступления увеличивают баланс, остальные записи уменьшают
+SIGNED_VALUE = "CASE WHEN {0}.category = 'Поступления' THEN {0}.value ELSE -{0}.value END"
+
+# Текущее время в миллисекундах от начала эпохи Unix
+NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# Отметка месяцев, хеши которых нужно вычислить заново при следующей синхронизации
+DIRTY_MONTHS = "INSERT INTO sync_ranges (month) VALUES {0} ON CONFLICT (month) DO UPDATE SET hash = NULL; "
+
+# Наибольшее количество одновременно подключенных архивов (в SQLite по умолчанию - не больше 10 баз данных)
+MAX_ATTACHED_ARCHIVES = 8
+
+# Миграции схемы: элемент с индексом i переводит базу данных с версии i на версию i + 1
+# (текущая версия хранится в PRAGMA user_version)
+MIGRATIONS = [
+    # 1: валюта записей и правил повторения, бюджеты в базовой валюте
+    [
+        f"ALTER TABLE expenses ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}'",
+        f"ALTER TABLE recurring_rules ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}'",
+        "DROP TRIGGER IF EXISTS budget_status_insert",
+        "DROP TRIGGER IF EXISTS budget_status_delete",
+        "DROP TRIGGER IF EXISTS budget_status_update",
+    ],
+    # 2: суммы в минимальных единицах (копейках), курсы в миллионных долях
+    [
+        "DROP TRIGGER IF EXISTS budget_status_insert",
+        "DROP TRIGGER IF EXISTS budget_status_delete",
+        "DROP TRIGGER IF EXISTS budget_status_update",
+        # Таблица пересоздается, чтобы колонка суммы получила целочисленный тип
+        # (в ранних версиях базы она была объявлена как REAL)
+        "CREATE TABLE expenses_new ("
+        "id integer PRIMARY KEY AUTOINCREMENT NOT NULL,"
+        "description VARCHAR(32) NOT NULL,"
+        "value integer NOT NULL,"
+        "category VARCHAR(32) NOT NULL,"
+        "date DATE NOT NULL,"
+        f"currency VARCHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}')",
+        "INSERT INTO expenses_new (id, description, value, category, date, currency) "
+        "SELECT id, description, CAST(ROUND(value * 100) AS INTEGER), category, date, currency FROM expenses",
+        "UPDATE sqlite_sequence SET seq = (SELECT seq FROM sqlite_sequence WHERE name = 'expenses') "
+        "WHERE name = 'expenses_new'",
+        "DROP TABLE expenses",
+        "ALTER TABLE expenses_new RENAME TO expenses",
+        "UPDATE recurring_rules SET value = CAST(ROUND(value * 100) AS INTEGER)",
+        "UPDATE budgets SET monthly_limit = CAST(ROUND(monthly_limit * 100) AS INTEGER)",
+        "UPDATE budget_status SET spent = CAST(ROUND(spent * 100) AS INTEGER)",
+        "CREATE TABLE exchange_rates_new ("
+        "currency VARCHAR(3) NOT NULL,"
+        "date DATE NOT NULL,"
+        "rate_micro integer NOT NULL,"
+        "PRIMARY KEY (currency, date))",
+        "INSERT INTO exchange_rates_new (currency, date, rate_micro) "
+        f"SELECT currency, date, CAST(ROUND(rate * {RATE_SCALE}) AS INTEGER) FROM exchange_rates",
+        "DROP TABLE exchange_rates",
+        "ALTER TABLE exchange_rates_new RENAME TO exchange_rates",
+    ],
+    # 3: отпечатки записей для поиска повторов (заполняются методом fillMissingFingerprints)
+    # и пары записей, отмеченные пользователем как разные
+    [
+        "ALTER TABLE expenses ADD COLUMN fingerprint integer",
+        "CREATE INDEX IF NOT EXISTS expenses_fingerprint ON expenses (fingerprint)",
+        "CREATE TABLE IF NOT EXISTS duplicate_dismissed ("
+        "first_id integer NOT NULL,"
+        "second_id integer NOT NULL,"
+        "PRIMARY KEY (first_id, second_id))",
+    ],
+    # 4: архивы закрытых лет: файл архива относительно каталога базы данных, количество
+    # перенесенных записей и переносимый остаток в минимальных единицах базовой валюты
+    [
+        "CREATE TABLE IF NOT EXISTS archives ("
+        "year integer PRIMARY KEY NOT NULL,"
+        "path TEXT NOT NULL,"
+        "rows integer NOT NULL,"
+        "balance integer NOT NULL)",
+    ],
+    # 5: журнал изменений записей (номер изменения не переиспользуется после очистки журнала)
+    # и курсоры именованных потребителей журнала
+    [
+        "CREATE TABLE IF NOT EXISTS changes ("
+        "seq integer PRIMARY KEY AUTOINCREMENT NOT NULL,"
+        "entry_id integer NOT NULL,"
+        "operation VARCHAR(7) NOT NULL,"
+        "description VARCHAR(32),"
+        "value integer,"
+        "category VARCHAR(32),"
+        "date DATE,"
+        "currency VARCHAR(3),"
+        "changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP)",
+        "CREATE TABLE IF NOT EXISTS change_consumers ("
+        "name TEXT PRIMARY KEY NOT NULL,"
+        "seq integer NOT NULL)",
+    ],
+    # 6: синхронизация файлов: постоянный идентификатор и время изменения записи в миллисекундах
+    # (заполняются методом fillMissingUuids и триггерами SYNC_TRIGGERS), удаленные записи
+    # и кэш хешей записей по месяцам
+    [
+        "ALTER TABLE expenses ADD COLUMN uuid TEXT",
+        "ALTER TABLE expenses ADD COLUMN modified_at integer",
+        "CREATE UNIQUE INDEX IF NOT EXISTS expenses_uuid ON expenses (uuid)",
+        "CREATE INDEX IF NOT EXISTS expenses_month ON expenses (substr(date, 7, 4) || '-' || substr(date, 4, 2))",
+        "CREATE TABLE IF NOT EXISTS deleted_entries ("
+        "uuid TEXT PRIMARY KEY NOT NULL,"
+        "deleted_at integer NOT NULL,"
+        "month VARCHAR(7) NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS sync_ranges ("
+        "month VARCHAR(7) PRIMARY KEY NOT NULL,"
+        "hash BLOB)",
+    ],
+    # 7: вложения записей (фотографии чеков): сами файлы хранятся на диске под своим хешем
+    # SHA-256 (см. модуль attachments), в базе данных - только хеш и исходное имя файла
+    [
+        "CREATE TABLE IF NOT EXISTS attachments ("
+        "entry_id integer NOT NULL,"
+        "hash VARCHAR(64) NOT NULL,"
+        "name TEXT NOT NULL,"
+        "PRIMARY KEY (entry_id, hash))",
+        "CREATE INDEX IF NOT EXISTS attachments_hash ON attachments (hash)",
+    ],
+    # 8: разделенные записи и метки: строки разделенной записи по категориям в валюте записи
+    # и связь записей с метками (многие-ко-многим); индексы отбирают записи по метке и строки
+    # по записи и по категории. Триггеры бюджетов пересоздаются без учета разделенных записей:
+    # их суммы учитываются по строкам (SPLIT_TRIGGERS)
+    [
+        "DROP TRIGGER IF EXISTS budget_status_insert",
+        "DROP TRIGGER IF EXISTS budget_status_delete",
+        "DROP TRIGGER IF EXISTS budget_status_update",
+        "CREATE TABLE IF NOT EXISTS entry_items ("
+        "id integer PRIMARY KEY NOT NULL,"
+        "entry_id integer NOT NULL,"
+        "category VARCHAR(32) NOT NULL,"
+        "value integer NOT NULL,"
+        "description VARCHAR(32) NOT NULL DEFAULT '')",
+        "CREATE INDEX IF NOT EXISTS entry_items_entry ON entry_items (entry_id)",
+        "CREATE INDEX IF NOT EXISTS entry_items_category ON entry_items (category, entry_id)",
+        "CREATE TABLE IF NOT EXISTS tags ("
+        "id integer PRIMARY KEY NOT NULL,"
+        "name TEXT NOT NULL UNIQUE)",
+        "CREATE TABLE IF NOT EXISTS entry_tags ("
+        "tag_id integer NOT NULL,"
+        "entry_id integer NOT NULL,"
+        "PRIMARY KEY (tag_id, entry_id)) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS entry_tags_entry ON entry_tags (entry_id)",
+    ],
+    # 9: изменения баланса по дням 'YYYY-MM-DD' и валютам записей (в минимальных единицах
+    # валюты), дальше поддерживаются триггерами DAILY_BALANCE_TRIGGERS
+    [
+        "CREATE TABLE IF NOT EXISTS daily_balance ("
+        "day VARCHAR(10) NOT NULL,"
+        "currency VARCHAR(3) NOT NULL,"
+        "net integer NOT NULL DEFAULT 0,"
+        "PRIMARY KEY (day, currency)) WITHOUT ROWID",
+        f"INSERT INTO daily_balance (day, currency, net) SELECT {ISO_DATE.format('expenses')}, currency, "
+        f"SUM({SIGNED_VALUE.format('expenses')}) FROM expenses GROUP BY 1, 2",
+    ],
+    # 10: изменения баланса по дням дополнительно разделены по категориям записей
+    # (для кривых расходов прогноза баланса); триггеры пересоздаются с категорией
+    [
+        "DROP TRIGGER IF EXISTS daily_balance_insert",
+        "DROP TRIGGER IF EXISTS daily_balance_delete",
+        "DROP TRIGGER IF EXISTS daily_balance_update",
+        "DROP TABLE IF EXISTS daily_balance",
+        "CREATE TABLE daily_balance ("
+        "day VARCHAR(10) NOT NULL,"
+        "category VARCHAR(32) NOT NULL,"
+        "currency VARCHAR(3) NOT NULL,"
+        "net integer NOT NULL DEFAULT 0,"
+        "PRIMARY KEY (day, category, currency)) WITHOUT ROWID",
+        f"INSERT INTO daily_balance (day, category, currency, net) SELECT {ISO_DATE.format('expenses')}, category, "
+        f"currency, SUM({SIGNED_VALUE.format('expenses')}) FROM expenses GROUP BY 1, 2, 3",
+    ],
+    # 11: время и результат последнего выполнения задач обслуживания базы данных
+    # (см. модуль maintenance); время - в миллисекундах от начала эпохи Unix
+    [
+        "CREATE TABLE IF NOT EXISTS maintenance_log ("
+        "task VARCHAR(16) PRIMARY KEY NOT NULL,"
+        "finished_at integer NOT NULL,"
+        "seconds REAL NOT NULL,"
+        "result TEXT NOT NULL)",
+    ],
+    # 12: суммы в валюте без курса на дату записи пересчитываются по самому раннему курсу,
+    # как в currency.RateTable.getRate; триггеры бюджетов и строк разделенных записей
+    # пересоздаются с новым выражением BASE_VALUE, суммы расходов пересчитываются
+    [
+        "DROP TRIGGER IF EXISTS budget_status_insert",
+        "DROP TRIGGER IF EXISTS budget_status_delete",
+        "DROP TRIGGER IF EXISTS budget_status_update",
+        "DROP TRIGGER IF EXISTS split_items_insert",
+        "DROP TRIGGER IF EXISTS split_items_delete",
+        "DROP TRIGGER IF EXISTS split_items_update",
+        "DROP TRIGGER IF EXISTS split_entry_update",
+    ] + BUDGET_STATUS_REBUILD,
+]
+
+# Таблицы бюджетов: лимиты по категориям и суммы расходов по категориям за месяц
+BUDGET_TABLES = [
+    "CREATE TABLE IF NOT EXISTS budgets ("
+    "category VARCHAR(32) PRIMARY KEY NOT NULL,"
+    "monthly_limit integer NOT NULL)",
+
+    "CREATE TABLE IF NOT EXISTS budget_status ("
+    "month VARCHAR(7) NOT NULL,"
+    "category VARCHAR(32) NOT NULL,"
+    "spent integer NOT NULL DEFAULT 0,"
+    "PRIMARY KEY (month, category))",
+]
+
+# Триггеры, поддерживающие суммы расходов за месяц при каждой вставке, изменении и удалении записи
+BUDGET_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS budget_status_insert AFTER INSERT ON expenses "
+    "WHEN NEW.category NOT IN ('Поступления', 'Разделено') BEGIN "
+    f"INSERT INTO budget_status (month, category, spent) VALUES ({MONTH_KEY.format('NEW')}, NEW.category, "
+    f"{BASE_VALUE.format('NEW')}) "
+    "ON CONFLICT (month, category) DO UPDATE SET spent = spent + excluded.spent; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS budget_status_delete AFTER DELETE ON expenses "
+    "WHEN OLD.category NOT IN ('Поступления', 'Разделено') BEGIN "
+    f"UPDATE budget_status SET spent = spent - {BASE_VALUE.format('OLD')} "
+    f"WHERE month = {MONTH_KEY.format('OLD')} AND category = OLD.category; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS budget_status_update AFTER UPDATE OF value, currency, category, date "
+    "ON expenses BEGIN "
+    f"UPDATE budget_status SET spent = spent - {BASE_VALUE.format('OLD')} "
+    f"WHERE month = {MONTH_KEY.format('OLD')} AND category = OLD.category; "
+    "INSERT INTO budget_status (month, category, spent) "
+    f"SELECT {MONTH_KEY.format('NEW')}, NEW.category, {BASE_VALUE.format('NEW')} "
+    "WHERE NEW.category NOT IN ('Поступления', 'Разделено') "
+    "ON CONFLICT (month, category) DO UPDATE SET spent = spent + excluded.spent; "
+    "END",
+]
+
+# Триггеры, поддерживающие изменения баланса по дням, категориям и валютам. Перенос записей в архив
+# (см. модуль archive) их тоже вычитает: архивные годы учитываются переносимыми остатками
+DAILY_BALANCE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS daily_balance_insert AFTER INSERT ON expenses BEGIN "
+    f"INSERT INTO daily_balance (day, category, currency, net) VALUES ({ISO_DATE.format('NEW')}, NEW.category, "
+    f"NEW.currency, {SIGNED_VALUE.format('NEW')}) "
+    "ON CONFLICT (day, category, currency) DO UPDATE SET net = net + excluded.net; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS daily_balance_delete AFTER DELETE ON expenses BEGIN "
+    f"UPDATE daily_balance SET net = net - ({SIGNED_VALUE.format('OLD')}) "
+    f"WHERE day = {ISO_DATE.format('OLD')} AND category = OLD.category AND currency = OLD.currency; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS daily_balance_update AFTER UPDATE OF value, currency, category, date "
+    "ON expenses BEGIN "
+    f"UPDATE daily_balance SET net = net - ({SIGNED_VALUE.format('OLD')}) "
+    f"WHERE day = {ISO_DATE.format('OLD')} AND category = OLD.category AND currency = OLD.currency; "
+    f"INSERT INTO daily_balance (day, category, currency, net) VALUES ({ISO_DATE.format('NEW')}, NEW.category, "
+    f"NEW.currency, {SIGNED_VALUE.format('NEW')}) "
+    "ON CONFLICT (day, category, currency) DO UPDATE SET net = net + excluded.net; "
+    "END",
+]
+
+# Триггеры журнала изменений: вставка и изменение сохраняют новые значения записи,
+# удаление - только идентификатор; заполнение отпечатков (fingerprint) не считается изменением
+CHANGE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS changes_insert AFTER INSERT ON expenses BEGIN "
+    "INSERT INTO changes (entry_id, operation, description, value, category, date, currency) "
+    "VALUES (NEW.id, 'insert', NEW.description, NEW.value, NEW.category, NEW.date, NEW.currency); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS changes_update AFTER UPDATE OF description, value, category, date, currency "
+    "ON expenses BEGIN "
+    "INSERT INTO changes (entry_id, operation, description, value, category, date, currency) "
+    "VALUES (NEW.id, 'update', NEW.description, NEW.value, NEW.category, NEW.date, NEW.currency); "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS changes_delete AFTER DELETE ON expenses BEGIN "
+    "INSERT INTO changes (entry_id, operation) VALUES (OLD.id, 'delete'); "
+    "END",
+]
+
+# Триггеры синхронизации: новая запись получает случайный uuid и время изменения, если они
+# не заданы; изменение записи обновляет время изменения, если его не задала синхронизация;
+# удаление оставляет запись в deleted_entries. Хеши затронутых месяцев сбрасываются (hash = NULL).
+SYNC_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS sync_insert AFTER INSERT ON expenses BEGIN "
+    f"UPDATE expenses SET uuid = COALESCE(NEW.uuid, lower(hex(randomblob(16)))), "
+    f"modified_at = COALESCE(NEW.modified_at, {NOW_MS}) "
+    "WHERE id = NEW.id AND (NEW.uuid IS NULL OR NEW.modified_at IS NULL); "
+    + DIRTY_MONTHS.format(f"({MONTH_KEY.format('NEW')})") +
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS sync_update AFTER UPDATE OF description, value, category, date, currency, "
+    "modified_at ON expenses BEGIN "
+    f"UPDATE expenses SET modified_at = {NOW_MS} WHERE id = NEW.id AND NEW.modified_at IS OLD.modified_at; "
+    + DIRTY_MONTHS.format(f"({MONTH_KEY.format('OLD')}), ({MONTH_KEY.format('NEW')})") +
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS sync_delete AFTER DELETE ON expenses BEGIN "
+    f"INSERT INTO deleted_entries (uuid, deleted_at, month) SELECT OLD.uuid, {NOW_MS}, {MONTH_KEY.format('OLD')} "
+    "WHERE OLD.uuid IS NOT NULL ON CONFLICT (uuid) DO NOTHING; "
+    + DIRTY_MONTHS.format(f"({MONTH_KEY.format('OLD')})") +
+    "END",
+]
+
+
+# Триггер, удаляющий ссылки на вложения удаленной записи; файлы вложений без ссылок
+# удаляет AttachmentStore.collectGarbage
+ATTACHMENT_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS attachments_delete AFTER DELETE ON expenses BEGIN "
+    "DELETE FROM attachments WHERE entry_id = OLD.id; "
+    "END",
+]
+
+# Триггеры разделенных записей: строки учитываются в суммах расходов за месяц по своим категориям
+# и по месяцу записи. Строки удаляются до удаления записи и до смены ее категории (отмены разделения),
+# пока известны дата и валюта записи; перенос записи на другую дату или в другую валюту
+# пересчитывает суммы ее строк
+SPLIT_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS split_items_insert AFTER INSERT ON entry_items BEGIN "
+    "INSERT INTO budget_status (month, category, spent) "
+    f"SELECT {MONTH_KEY.format('e')}, NEW.category, {ITEM_BASE_VALUE.format('e', 'NEW')} "
+    "FROM expenses e WHERE e.id = NEW.entry_id "
+    "ON CONFLICT (month, category) DO UPDATE SET spent = spent + excluded.spent; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS split_items_delete AFTER DELETE ON entry_items BEGIN "
+    "UPDATE budget_status SET spent = spent - "
+    f"(SELECT {ITEM_BASE_VALUE.format('e', 'OLD')} FROM expenses e WHERE e.id = OLD.entry_id) "
+    f"WHERE month = (SELECT {MONTH_KEY.format('e')} FROM expenses e WHERE e.id = OLD.entry_id) "
+    "AND category = OLD.category; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS split_items_update AFTER UPDATE OF entry_id, category, value "
+    "ON entry_items BEGIN "
+    "UPDATE budget_status SET spent = spent - "
+    f"(SELECT {ITEM_BASE_VALUE.format('e', 'OLD')} FROM expenses e WHERE e.id = OLD.entry_id) "
+    f"WHERE month = (SELECT {MONTH_KEY.format('e')} FROM expenses e WHERE e.id = OLD.entry_id) "
+    "AND category = OLD.category; "
+    "INSERT INTO budget_status (month, category, spent) "
+    f"SELECT {MONTH_KEY.format('e')}, NEW.category, {ITEM_BASE_VALUE.format('e', 'NEW')} "
+    "FROM expenses e WHERE e.id = NEW.entry_id "
+    "ON CONFLICT (month, category) DO UPDATE SET spent = spent + excluded.spent; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS split_entry_update AFTER UPDATE OF currency, date ON expenses "
+    "WHEN NEW.category = 'Разделено' BEGIN "
+    "UPDATE budget_status SET spent = spent - "
+    f"(SELECT SUM({ITEM_BASE_VALUE.format('OLD', 'i')}) FROM entry_items i "
+    "WHERE i.entry_id = OLD.id AND i.category = budget_status.category) "
+    f"WHERE month = {MONTH_KEY.format('OLD')} "
+    "AND category IN (SELECT category FROM entry_items WHERE entry_id = OLD.id); "
+    "INSERT INTO budget_status (month, category, spent) "
+    f"SELECT {MONTH_KEY.format('NEW')}, i.category, {ITEM_BASE_VALUE.format('NEW', 'i')} "
+    "FROM entry_items i WHERE i.entry_id = NEW.id "
+    "ON CONFLICT (month, category) DO UPDATE SET spent = spent + excluded.spent; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS split_unsplit BEFORE UPDATE OF category ON expenses "
+    "WHEN OLD.category = 'Разделено' AND NEW.category <> 'Разделено' BEGIN "
+    "DELETE FROM entry_items WHERE entry_id = OLD.id; "
+    "END",
+
+    "CREATE TRIGGER IF NOT EXISTS split_delete BEFORE DELETE ON expenses "
+    "WHEN OLD.category = 'Разделено' BEGIN "
+    "DELETE FROM entry_items WHERE entry_id = OLD.id; "
+    "END",
+]
+
+# Триггер, удаляющий метки удаленной записи (сами названия меток остаются в таблице tags)
+TAG_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS entry_tags_delete AFTER DELETE ON expenses BEGIN "
+    "DELETE FROM entry_tags WHERE entry_id = OLD.id; "
+    "END",
+]
+
+
+def isBusyError(error):
+    """
+    Проверяет, вызвана ли ошибка блокировкой базы данных другим соединением.
+
+    Args:
+        error (QtSql.QSqlError): Ошибка выполнения запроса.
+
+    Returns:
+        bool: True для ошибок SQLITE_BUSY и SQLITE_LOCKED, включая расширенные коды.
+    """
+    code = error.nativeErrorCode()
+    return code.isdigit() and int(code) & 0xFF in (5, 6)
+
+
+class TransactionError(Exception):
+    """
+    Транзакция не выполнена и откачена.
+    """
+
 
 class Data:
-    def __init__(self):
+    def __init__(self, db_path=DB_PATH, connection_name=None, busy_timeout=BUSY_TIMEOUT_MS,
+                 journal_mode=JOURNAL_MODE):
         """
         Инициализирует объект Data и создает соединение с базой данных.
+
+        Args:
+            db_path (str, optional): Путь к файлу базы данных.
+            connection_name (str, optional): Имя соединения Qt; по умолчанию используется
+                соединение по умолчанию. Отдельные имена нужны, чтобы открыть несколько
+                соединений в одном процессе или в разных потоках.
+            busy_timeout (int, optional): Время ожидания освобождения блокировки базы данных
+                другим соединением в миллисекундах.
+            journal_mode (str, optional): Режим журнала базы данных; None - не менять режим
+                (для соединений, которые только читают: смена режима ждет, пока другие
+                соединения закончат чтение).
         """
         super(Data, self).__init__()
+        self.db_path = db_path
+        self.connection_name = connection_name
+        self.busy_timeout = busy_timeout
+        self.journal_mode = journal_mode
+        self.transaction_depth = 0
+        self.transaction_error = None
+        # Название плагина, отменившего последнее изменение записей (см. startWrite)
+        self.cancelled_by = None
+        self.attached = {}
+        self.rates = RateTable(self)
+        # Поиск плагинов выполняется один раз за процесс; главное окно начинает его заранее
+        registry.discover()
         self.createConnection()
 
     def createConnection(self):
         """
         Создает соединение с базой данных и создает таблицу расходов, если она не существует.
         """
-        db = QtSql.QSqlDatabase.addDatabase("QSQLITE")
-        db.setDatabaseName("expensetracker.db")
-        db.open()
-        query = QtSql.QSqlQuery()
+        if self.connection_name:
+            self.db = QtSql.QSqlDatabase.addDatabase("QSQLITE", self.connection_name)
+        else:
+            self.db = QtSql.QSqlDatabase.addDatabase("QSQLITE")
+        self.db.setDatabaseName(self.db_path)
+        self.db.setConnectOptions(f"QSQLITE_BUSY_TIMEOUT={self.busy_timeout}")
+        self.db.open()
+        self.stats = QueryStats(self.db)
+        query = QtSql.QSqlQuery(self.db)
+        # Новая база данных освобождает место постепенно (PRAGMA incremental_vacuum, см. модуль
+        # maintenance); для существующей базы режим меняется только полной перестройкой VACUUM
+        query.exec("PRAGMA auto_vacuum = INCREMENTAL")
+        if self.journal_mode is not None:
+            if not query.exec(f"PRAGMA journal_mode = {self.journal_mode}"):
+                print(query.lastError().text())
+            query.finish()
         if not query.exec("CREATE TABLE IF NOT EXISTS expenses ("
                           "id integer PRIMARY KEY AUTOINCREMENT NOT NULL,"
                           "description VARCHAR(32) NOT NULL,"
@@ -31,53 +576,420 @@ class Data:
                           "date DATE NOT NULL)"):
             print(query.lastError().text())
 
-    def executeQuery(self, query_text, query_values=None):
+        # Правила повторяющихся операций: даты хранятся в формате 'YYYY-MM-DD',
+        # next_index - количество уже материализованных вхождений
+        if not query.exec("CREATE TABLE IF NOT EXISTS recurring_rules ("
+                          "id integer PRIMARY KEY AUTOINCREMENT NOT NULL,"
+                          "description VARCHAR(32) NOT NULL,"
+                          "value integer NOT NULL,"
+                          "category VARCHAR(32) NOT NULL,"
+                          "start_date DATE NOT NULL,"
+                          "period VARCHAR(8) NOT NULL,"
+                          "step integer NOT NULL DEFAULT 1,"
+                          "end_date DATE,"
+                          "next_index integer NOT NULL DEFAULT 0)"):
+            print(query.lastError().text())
+
+        # Курсы валют: стоимость единицы валюты в базовой валюте на дату 'YYYY-MM-DD'
+        # (миграция 2 заменяет курс целыми миллионными долями - колонкой rate_micro)
+        if not query.exec("CREATE TABLE IF NOT EXISTS exchange_rates ("
+                          "currency VARCHAR(3) NOT NULL,"
+                          "date DATE NOT NULL,"
+                          "rate REAL NOT NULL,"
+                          "PRIMARY KEY (currency, date))"):
+            print(query.lastError().text())
+
+        # Состояние бюджетов заполняется по всей таблице только один раз, при создании,
+        # дальше оно обновляется триггерами
+        query.exec("SELECT 1 FROM sqlite_master WHERE type='table' AND name='budget_status'")
+        rebuild_status = not query.next()
+        for query_text in BUDGET_TABLES:
+            if not query.exec(query_text):
+                print(query.lastError().text())
+
+        self.migrateSchema()
+
+        for query_text in (BUDGET_TRIGGERS + DAILY_BALANCE_TRIGGERS + CHANGE_TRIGGERS + SYNC_TRIGGERS +
+                           ATTACHMENT_TRIGGERS + SPLIT_TRIGGERS + TAG_TRIGGERS):
+            if not query.exec(query_text):
+                print(query.lastError().text())
+        if rebuild_status:
+            try:
+                self.rebuildBudgetStatus()
+            except TransactionError:
+                # Ошибка уже выведена; состояние бюджетов останется пустым до следующего пересчета
+                pass
+        self.fillMissingFingerprints()
+        self.fillMissingUuids()
+
+    def migrateSchema(self):
+        """
+        Применяет к базе данных миграции схемы, которые еще не были применены.
+
+        Миграции выполняются в одной транзакции: если запрос миграции завершился ошибкой,
+        транзакция откатывается и версия схемы не меняется.
+
+        Raises:
+            TransactionError: Если миграции не удалось выполнить (блокировка базы данных
+                или ошибка запроса миграции).
+        """
+        query = QtSql.QSqlQuery(self.db)
+        self.execWithRetry(query, "PRAGMA user_version")
+        if (query.value(0) if query.next() else 0) == len(MIGRATIONS):
+            return
+
+        # Версия перечитывается под блокировкой записи: схему мог обновить другой процесс
+        with self.transaction():
+            query.exec("PRAGMA user_version")
+            version = query.value(0) if query.next() else 0
+            for version, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+                for query_text in statements:
+                    if not query.exec(query_text):
+                        self.transaction_error = query.lastError().text()
+                        print(self.transaction_error)
+                        return
+                query.exec(f"PRAGMA user_version = {version}")
+
+    def checkpoint(self):
+        """
+        Переносит изменения из журнала WAL в файл базы данных и очищает журнал.
+
+        Соединение не должно читать результат другого запроса: незавершенное чтение
+        не дает очистить журнал.
+
+        Returns:
+            bool: True, если журнал перенесен полностью (или база данных не в режиме WAL).
+        """
+        query = QtSql.QSqlQuery(self.db)
+        if not query.exec("PRAGMA wal_checkpoint(TRUNCATE)") or not query.next():
+            print(query.lastError().text())
+            return False
+        busy = query.value(0)
+        query.finish()
+        return busy == 0
+
+    def close(self):
+        """
+        Закрывает соединение с базой данных и удаляет его из списка соединений Qt.
+        """
+        name = self.db.connectionName()
+        self.db.close()
+        # Статистика запросов тоже хранит соединение (для планов медленных запросов)
+        self.db = self.stats.db = None
+        QtSql.QSqlDatabase.removeDatabase(name)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Выполняет блок запросов в одной транзакции.
+
+        Транзакция начинается командой BEGIN IMMEDIATE, которая сразу захватывает блокировку
+        записи (с ожиданием и повторами), поэтому запросы внутри блока не получают ошибку
+        блокировки при переходе от чтения к записи. Если запрос внутри блока завершился
+        ошибкой или в блоке возникло исключение, транзакция откатывается целиком.
+        Вложенные вызовы выполняются в рамках внешней транзакции.
+
+        Raises:
+            TransactionError: Если транзакцию не удалось начать или зафиксировать
+                либо запрос внутри нее завершился ошибкой.
+        """
+        if self.transaction_depth:
+            self.transaction_depth += 1
+            try:
+                yield
+            finally:
+                self.transaction_depth -= 1
+            return
+
+        query = QtSql.QSqlQuery(self.db)
+        if not self.execWithRetry(query, "BEGIN IMMEDIATE"):
+            print(query.lastError().text())
+            raise TransactionError(query.lastError().text())
+        self.transaction_depth = 1
+        self.transaction_error = None
+        try:
+            yield
+        except BaseException:
+            query.exec("ROLLBACK")
+            raise
+        finally:
+            self.transaction_depth = 0
+
+        if self.transaction_error is None:
+            if self.execWithRetry(query, "COMMIT"):
+                return
+            self.transaction_error = query.lastError().text()
+            print(self.transaction_error)
+        query.exec("ROLLBACK")
+        raise TransactionError(self.transaction_error)
+
+    def execWithRetry(self, query, query_text=None):
         """
-        Выполняет подготовленный SQL-запрос.
+        Выполняет запрос, повторяя его с увеличивающейся паузой, пока база данных заблокирована.
+
+        Args:
+            query (QtSql.QSqlQuery): Подготовленный запрос или запрос для выполнения текста.
+            query_text (str, optional): Текст запроса; по умолчанию выполняется подготовленный запрос.
+
+        Returns:
+            bool: True, если запрос выполнен.
+        """
+        for attempt in range(BUSY_RETRIES + 1):
+            executed = query.exec(query_text) if query_text else query.exec()
+            if executed or attempt == BUSY_RETRIES or not isBusyError(query.lastError()):
+                return executed
+            # Случайная составляющая паузы разводит повторы нескольких ожидающих процессов
+            time.sleep(BUSY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+    def database(self):
+        """
+        Возвращает соединение с базой данных.
+
+        Returns:
+            QtSql.QSqlDatabase: Открытое соединение с базой данных.
+        """
+        return self.db
+
+    def executeQuery(self, query_text, query_values=None, operation=None):
+        """
+        Выполняет подготовленный SQL-запрос и учитывает его в статистике запросов.
+
+        Вне транзакции запрос, не дождавшийся блокировки базы данных, повторяется (см. execWithRetry).
+        Внутри транзакции отдельный запрос не повторяется: ошибка откатывает всю транзакцию.
 
         Args:
             query_text (str): Текст SQL-запроса.
             query_values (list, optional): Список значений для подстановки в запрос.
+            operation (str, optional): Имя операции для статистики; по умолчанию
+                имя метода, вызвавшего executeQuery.
 
         Returns:
             QtSql.QSqlQuery: Объект QtSql.QSqlQuery с результатами выполнения запроса.
         """
-        query = QtSql.QSqlQuery()
+        if operation is None:
+            operation = sys._getframe(1).f_code.co_qualname
+        entry = self.stats.begin(operation, query_text, query_values)
+        query = TimedQuery(self.db, entry, self.stats)
         query.prepare(query_text)
         if query_values:
             for value in query_values:
                 query.addBindValue(value)
 
-        if not query.exec():
-            print(query.lastError().text())
+        started = time.perf_counter()
+        executed = query.exec() if self.transaction_depth else self.execWithRetry(query)
+        entry.seconds = time.perf_counter() - started
+        if not executed:
+            entry.error = query.lastError().text()
+            print(entry.error)
+            if self.transaction_depth:
+                self.transaction_error = entry.error
+        # Учет выборки продолжается при чтении строк (см. TimedQuery)
+        if not executed or not query.isSelect():
+            entry.rows = max(query.rememberRowsAffected(), 0)
+            self.stats.close(entry)
         return query
 
-    def insertEntry(self, description, value, category, date):
+    def startWrite(self):
+        """
+        Начинает изменение записей: сбрасывает название плагина, отменившего прошлое изменение.
+
+        Returns:
+            bool: True, если есть обработчики записи плагинов.
+        """
+        self.cancelled_by = None
+        return registry.hasWriteHooks()
+
+    def allowWrite(self, operation, entries):
+        """
+        Вызывает обработчики before_write и запоминает название плагина, отменившего запись.
+
+        Args:
+            operation (str): 'insert', 'update' или 'delete'.
+            entries (list): Записи (см. описание модуля plugins).
+
+        Returns:
+            bool: True, если запись разрешена.
+        """
+        plugin = registry.findVeto(operation, entries)
+        self.cancelled_by = plugin.name if plugin is not None else None
+        return plugin is None
+
+    def insertEntry(self, description, value, category, date, currency=BASE_CURRENCY):
         """
         Вставляет новую запись в таблицу расходов.
 
         Args:
             description (str): Описание расхода.
-            value (int): Сумма расхода.
+            value (int): Сумма расхода в минимальных единицах валюты.
             category (str): Категория расхода.
             date (str): Дата расхода.
+            currency (str, optional): Код валюты суммы.
+
+        Returns:
+            int: Идентификатор новой записи или None, если запись не добавлена.
+        """
+        requireMinorUnits(value)
+        hooks = self.startWrite()
+        if hooks and not self.allowWrite("insert", [(None, description, value, category, date, currency)]):
+            return None
+        query_text = ("INSERT INTO expenses (description, value, category, date, currency, fingerprint) "
+                      "VALUES (?, ?, ?, ?, ?, ?)")
+        entry_id = self.executeQuery(query_text, [description, value, category, date, currency,
+                                                  fingerprint(description, value, date, currency)]).lastInsertId()
+        if hooks and entry_id is not None:
+            registry.runWriteHooks("after_write", "insert", [(entry_id, description, value, category, date, currency)])
+        return entry_id
+
+    def insertEntries(self, entries):
+        """
+        Вставляет записи одним пакетом в одной транзакции.
+
+        Args:
+            entries (list): Список кортежей (описание, сумма в минимальных единицах, категория,
+                дата 'DD.MM.YYYY', код валюты).
+
+        Returns:
+            bool: True, если записи добавлены.
         """
-        query_text = "INSERT INTO expenses (description, value, category, date) VALUES (?, ?, ?, ?)"
-        self.executeQuery(query_text, [description, value, category, date])
+        for entry in entries:
+            requireMinorUnits(entry[1])
+        hooks = self.startWrite() and bool(entries)
+        if hooks and not self.allowWrite("insert", [(None,) + tuple(entry) for entry in entries]):
+            return False
+        query = QtSql.QSqlQuery(self.db)
+        query.prepare("INSERT INTO expenses (description, value, category, date, currency, fingerprint) "
+                      "VALUES (?, ?, ?, ?, ?, ?)")
+        for column in zip(*entries):
+            query.addBindValue(list(column))
+        query.addBindValue([fingerprint(description, value, date, currency)
+                            for description, value, category, date, currency in entries])
+        try:
+            with self.transaction():
+                if entries and not query.execBatch():
+                    self.transaction_error = query.lastError().text()
+                    print(self.transaction_error)
+                last_id = query.lastInsertId()
+        except TransactionError:
+            return False
+        if hooks and last_id is not None:
+            # Записи одной транзакции получают идущие подряд идентификаторы
+            first_id = last_id - len(entries) + 1
+            registry.runWriteHooks("after_write", "insert", [(first_id + number,) + tuple(entry)
+                                                             for number, entry in enumerate(entries)])
+        return True
 
-    def updateEntry(self, description, value, category, date, entry_id):
+    def updateEntry(self, description, value, category, date, entry_id, currency=BASE_CURRENCY):
         """
         Обновляет существующую запись в таблице расходов.
 
         Args:
             description (str): Описание расхода.
-            value (int): Сумма расхода.
+            value (int): Сумма расхода в минимальных единицах валюты.
             category (str): Категория расхода.
             date (str): Дата расхода.
             entry_id (int): Идентификатор записи для обновления.
+            currency (str, optional): Код валюты суммы.
+
+        Returns:
+            bool: True, если запрос выполнен.
+        """
+        requireMinorUnits(value)
+        hooks = self.startWrite()
+        entries = [(entry_id, description, value, category, date, currency)]
+        if hooks and not self.allowWrite("update", entries):
+            return False
+        query_text = ("UPDATE expenses SET description=?, value=?, category=?, date=?, currency=?, fingerprint=? "
+                      "WHERE id=?")
+        updated = self.executeQuery(query_text, [description, value, category, date, currency,
+                                                 fingerprint(description, value, date, currency), entry_id]).isActive()
+        if hooks and updated:
+            registry.runWriteHooks("after_write", "update", entries)
+        return updated
+
+    def fillMissingFingerprints(self):
+        """
+        Вычисляет отпечатки записей, у которых их нет: записей, созданных до появления
+        отпечатков или добавленных запросами SQL в обход методов этого класса.
+
+        Returns:
+            int: Количество записей, получивших отпечаток; 0, если отпечатки не сохранены.
+        """
+        query = self.executeQuery("SELECT id, description, value, date, currency FROM expenses "
+                                  "WHERE fingerprint IS NULL")
+        ids, fingerprints = [], []
+        while query.next():
+            ids.append(query.value(0))
+            fingerprints.append(fingerprint(query.value(1), query.value(2), query.value(3), query.value(4)))
+        if not ids:
+            return 0
+
+        query = QtSql.QSqlQuery(self.db)
+        query.prepare("UPDATE expenses SET fingerprint=? WHERE id=?")
+        query.addBindValue(fingerprints)
+        query.addBindValue(ids)
+        try:
+            with self.transaction():
+                if not query.execBatch():
+                    self.transaction_error = query.lastError().text()
+                    print(self.transaction_error)
+        except TransactionError:
+            return 0
+        return len(ids)
+
+    def fillMissingUuids(self):
+        """
+        Присваивает постоянные идентификаторы записям, созданным до появления синхронизации.
+
+        Идентификатор вычисляется по номеру и содержимому записи, поэтому одинаковые записи
+        в копиях одного файла получают одинаковые идентификаторы и при первой синхронизации
+        не удваиваются. Время изменения таких записей неизвестно и считается нулевым.
+
+        Returns:
+            int: Количество записей, получивших идентификатор; 0, если идентификаторы не сохранены.
+        """
+        query = self.executeQuery("SELECT id, description, value, category, date, currency FROM expenses "
+                                  "WHERE uuid IS NULL")
+        ids, uuids = [], []
+        while query.next():
+            ids.append(query.value(0))
+            key = "\x1f".join(str(query.value(column)) for column in range(6))
+            uuids.append(hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest())
+        if not ids:
+            return 0
+
+        query = QtSql.QSqlQuery(self.db)
+        query.prepare("UPDATE expenses SET uuid=?, modified_at=0 WHERE id=?")
+        query.addBindValue(uuids)
+        query.addBindValue(ids)
+        try:
+            with self.transaction():
+                if not query.execBatch():
+                    self.transaction_error = query.lastError().text()
+                    print(self.transaction_error)
+        except TransactionError:
+            return 0
+        return len(ids)
+
+    def countFingerprints(self, fingerprints):
+        """
+        Подсчитывает записи с заданными отпечатками.
+
+        Args:
+            fingerprints (iterable): Отпечатки записей (см. duplicates.fingerprint).
+
+        Returns:
+            dict: Словарь {отпечаток: количество записей} для отпечатков, найденных в базе данных.
         """
-        query_text = "UPDATE expenses SET description=?, value=?, category=?, date=? WHERE id=?"
-        self.executeQuery(query_text, [description, value, category, date, entry_id])
+        fingerprints = list(set(fingerprints))
+        counts = {}
+        # Отпечатки передаются частями, чтобы не превысить ограничение SQLite на число параметров
+        for offset in range(0, len(fingerprints), 500):
+            chunk = fingerprints[offset:offset + 500]
+            query = self.executeQuery("SELECT fingerprint, COUNT(*) FROM expenses WHERE fingerprint IN (" +
+                                      ", ".join("?" * len(chunk)) + ") GROUP BY fingerprint", chunk)
+            while query.next():
+                counts[query.value(0)] = query.value(1)
+        return counts
 
     def deleteEntry(self, entry_id):
         """
@@ -85,53 +997,384 @@ class Data:
 
         Args:
             entry_id (int): Идентификатор записи для удаления.
+
+        Returns:
+            bool: True, если запрос выполнен.
         """
+        entries = []
+        if self.startWrite():
+            # Обработчики получают удаляемую запись целиком
+            query = self.executeQuery("SELECT id, description, value, category, date, currency FROM expenses "
+                                      "WHERE id=?", [entry_id])
+            if query.next():
+                entries.append(tuple(query.value(column) for column in range(6)))
+            if entries and not self.allowWrite("delete", entries):
+                return False
         query_text = "DELETE FROM expenses WHERE id=?"
-        self.executeQuery(query_text, [entry_id])
+        deleted = self.executeQuery(query_text, [entry_id]).isActive()
+        if entries and deleted:
+            registry.runWriteHooks("after_write", "delete", entries)
+        return deleted
 
-    def getBalance(self):
+    def getBalance(self, project_until=None):
         """
-        Возвращает баланс доходов и расходов.
+        Возвращает баланс доходов и расходов в базовой валюте.
+
+        Суммы в базовой валюте складываются в одну группу, а суммы в остальных валютах
+        группируются по валюте и дню и пересчитываются по курсу на этот день.
+        К балансу добавляются переносимые остатки архивов.
+
+        Args:
+            project_until (str, optional): Дата в формате 'YYYY-MM-DD', до которой к балансу
+                добавляются будущие вхождения повторяющихся операций.
 
         Returns:
-            str: Баланс доходов и расходов.
+            int: Баланс доходов и расходов в минимальных единицах базовой валюты.
         """
-        income_value, outcome_value = 0, 0
-        query_text = "SELECT SUM(value) FROM expenses WHERE category='Поступления'"
-        query = self.executeQuery(query_text)
-        if query.next():
-            income_value = query.value(0) or 0
+        balance = self.rates.convertGroups(self.executeQuery(BALANCE_GROUPS.format(""), [BASE_CURRENCY]))
 
-        query_text = "SELECT SUM(value) FROM expenses WHERE category<>'Поступления'"
-        query = self.executeQuery(query_text)
+        # Архивные записи учитываются переносимыми остатками, без обращения к архивам
+        query = self.executeQuery("SELECT SUM(balance) FROM archives")
+        balance += (query.value(0) if query.next() else None) or 0
+
+        if project_until:
+            query_text = ("SELECT currency, " + ISO_DATE.format("p") + ", "
+                          "SUM(CASE WHEN category='Поступления' THEN value ELSE -value END) "
+                          "FROM (" + recurring.projectionQuery() + ") p GROUP BY 1, 2")
+            balance += self.rates.convertGroups(self.executeQuery(query_text, [project_until, project_until]))
+
+        return balance
+
+    def insertRates(self, rates):
+        """
+        Вставляет курсы валют одним пакетом, пересчитывает бюджеты в базовой валюте
+        и сбрасывает кэш курсов.
+
+        Args:
+            rates (list): Список кортежей (валюта, дата 'YYYY-MM-DD', курс в миллионных долях).
+
+        Returns:
+            bool: True, если курсы сохранены.
+        """
+        query = QtSql.QSqlQuery(self.db)
+        query.prepare("INSERT OR REPLACE INTO exchange_rates (currency, date, rate_micro) VALUES (?, ?, ?)")
+        for column in zip(*rates):
+            query.addBindValue(list(column))
+        try:
+            with self.transaction():
+                if rates and not query.execBatch():
+                    self.transaction_error = query.lastError().text()
+                    print(self.transaction_error)
+                self.rebuildBudgetStatus()
+        except TransactionError:
+            return False
+        self.rates.cache.clear()
+        return True
+
+    def rebuildBudgetStatus(self):
+        """
+        Пересчитывает суммы расходов по категориям за каждый месяц по всей таблице расходов;
+        разделенные записи учитываются по строкам. Суммы за месяцы архивных лет сохраняются.
+
+        Raises:
+            TransactionError: Если пересчет не выполнен.
+        """
+        with self.transaction():
+            for query_text in BUDGET_STATUS_REBUILD:
+                self.executeQuery(query_text)
+
+    def setBudget(self, category, monthly_limit):
+        """
+        Устанавливает месячный лимит расходов для категории.
+
+        Args:
+            category (str): Категория расходов.
+            monthly_limit (int): Лимит расходов за месяц в минимальных единицах базовой валюты.
+
+        Returns:
+            bool: True, если запрос выполнен.
+        """
+        requireMinorUnits(monthly_limit)
+        query_text = ("INSERT INTO budgets (category, monthly_limit) VALUES (?, ?) "
+                      "ON CONFLICT (category) DO UPDATE SET monthly_limit = excluded.monthly_limit")
+        return self.executeQuery(query_text, [category, monthly_limit]).isActive()
+
+    def deleteBudget(self, category):
+        """
+        Удаляет месячный лимит расходов для категории.
+
+        Args:
+            category (str): Категория расходов.
+
+        Returns:
+            bool: True, если запрос выполнен.
+        """
+        return self.executeQuery("DELETE FROM budgets WHERE category=?", [category]).isActive()
+
+    def getBudgetStatus(self, month):
+        """
+        Возвращает состояние бюджетов за месяц.
+
+        Args:
+            month (str): Месяц в формате 'YYYY-MM'.
+
+        Returns:
+            QtSql.QSqlQuery: Объект QtSql.QSqlQuery с колонками категория, потрачено, лимит, остаток
+            (суммы в минимальных единицах базовой валюты).
+        """
+        query_text = ("SELECT b.category, COALESCE(s.spent, 0), b.monthly_limit, "
+                      "b.monthly_limit - COALESCE(s.spent, 0) FROM budgets b "
+                      "LEFT JOIN budget_status s ON s.category = b.category AND s.month = ? "
+                      "ORDER BY b.category")
+        return self.executeQuery(query_text, [month])
+
+    def getBudgetOverrun(self, month, category):
+        """
+        Проверяет, превышен ли лимит расходов категории за месяц.
+
+        Args:
+            month (str): Месяц в формате 'YYYY-MM'.
+            category (str): Категория расходов.
+
+        Returns:
+            tuple: Пара (потрачено, лимит) в минимальных единицах, если лимит превышен, иначе None.
+        """
+        query_text = ("SELECT s.spent, b.monthly_limit FROM budgets b "
+                      "JOIN budget_status s ON s.category = b.category AND s.month = ? "
+                      "WHERE b.category = ? AND s.spent > b.monthly_limit")
+        query = self.executeQuery(query_text, [month, category])
         if query.next():
-            outcome_value = query.value(0) or 0
+            return query.value(0), query.value(1)
+        return None
+
+    def setSplit(self, entry_id, items):
+        """
+        Разделяет запись на строки по категориям, заменяя прежние строки записи.
+
+        Сумма записи становится суммой строк, а категория - SPLIT_CATEGORY, поэтому баланс
+        учитывает запись один раз, а суммы расходов по категориям - строки (триггеры SPLIT_TRIGGERS).
+        Разделение отменяется сменой категории записи (updateEntry): строки удаляет триггер.
+        Обработчики записи плагинов получают изменение записи ('update') с новой суммой и категорией.
+
+        Args:
+            entry_id (int): Идентификатор записи.
+            items (list): Непустой список кортежей (категория, сумма в минимальных единицах
+                валюты записи, описание строки).
+
+        Returns:
+            bool: True, если строки сохранены; False, если записи нет, обработчик записи отменил
+            изменение или изменения не сохранены.
+
+        Raises:
+            ValueError: Если строк нет или строка относится к поступлениям.
+        """
+        if not items:
+            raise ValueError("Разделенная запись должна содержать хотя бы одну строку")
+        for category, value, description in items:
+            requireMinorUnits(value)
+            if category in (INCOME_CATEGORY, SPLIT_CATEGORY):
+                raise ValueError(f"Строка разделенной записи не может относиться к категории «{category}»")
+
+        hooks = self.startWrite()
+        query = self.executeQuery("SELECT description, date, currency FROM expenses WHERE id=?", [entry_id])
+        if not query.next():
+            return False
+        description, date, currency = query.value(0), query.value(1), query.value(2)
+        value = sum(item[1] for item in items)
+        entries = [(entry_id, description, value, SPLIT_CATEGORY, date, currency)]
+        if hooks and not self.allowWrite("update", entries):
+            return False
+
+        insert = QtSql.QSqlQuery(self.db)
+        insert.prepare("INSERT INTO entry_items (entry_id, category, value, description) VALUES (?, ?, ?, ?)")
+        insert.addBindValue([entry_id] * len(items))
+        for column in zip(*items):
+            insert.addBindValue(list(column))
+        try:
+            with self.transaction():
+                self.executeQuery("DELETE FROM entry_items WHERE entry_id=?", [entry_id])
+                self.executeQuery("UPDATE expenses SET value=?, category=?, fingerprint=? WHERE id=?",
+                                  [value, SPLIT_CATEGORY, fingerprint(description, value, date, currency), entry_id])
+                if not insert.execBatch():
+                    self.transaction_error = insert.lastError().text()
+                    print(self.transaction_error)
+        except TransactionError:
+            return False
+        if hooks:
+            registry.runWriteHooks("after_write", "update", entries)
+        return True
+
+    def getSplit(self, entry_id):
+        """
+        Возвращает строки разделенной записи.
+
+        Args:
+            entry_id (int): Идентификатор записи.
+
+        Returns:
+            list: Список кортежей (категория, сумма в минимальных единицах валюты записи, описание)
+            в порядке добавления; пустой, если запись не разделена.
+        """
+        query = self.executeQuery("SELECT category, value, description FROM entry_items WHERE entry_id=? "
+                                  "ORDER BY id", [entry_id])
+        items = []
+        while query.next():
+            items.append((query.value(0), query.value(1), query.value(2)))
+        return items
+
+    def setTags(self, entry_id, tags):
+        """
+        Заменяет метки записи.
+
+        Args:
+            entry_id (int): Идентификатор записи.
+            tags (iterable): Названия меток (см. splits.parseTags); новые метки создаются.
+
+        Returns:
+            bool: True, если метки сохранены.
+        """
+        tags = list(dict.fromkeys(tags))
+        try:
+            with self.transaction():
+                self.executeQuery("DELETE FROM entry_tags WHERE entry_id=?", [entry_id])
+                for tag in tags:
+                    self.executeQuery("INSERT INTO tags (name) VALUES (?) ON CONFLICT (name) DO NOTHING", [tag])
+                    self.executeQuery("INSERT INTO entry_tags (tag_id, entry_id) "
+                                      "SELECT id, ? FROM tags WHERE name=?", [entry_id, tag])
+        except TransactionError:
+            return False
+        return True
+
+    def getTags(self, entry_id=None):
+        """
+        Возвращает метки записи или все метки, которые есть хотя бы у одной записи.
+
+        Args:
+            entry_id (int, optional): Идентификатор записи.
 
-        return str(int(income_value - outcome_value))
+        Returns:
+            list: Названия меток в алфавитном порядке.
+        """
+        if entry_id is None:
+            query = self.executeQuery("SELECT name FROM tags WHERE id IN (SELECT tag_id FROM entry_tags) "
+                                      "ORDER BY name")
+        else:
+            query = self.executeQuery("SELECT name FROM tags WHERE id IN "
+                                      "(SELECT tag_id FROM entry_tags WHERE entry_id=?) ORDER BY name", [entry_id])
+        tags = []
+        while query.next():
+            tags.append(query.value(0))
+        return tags
 
-    def getTableWithFilters(self, date_cb, category_cb, date, category):
+    def getTagSummary(self, tag):
         """
-        Возвращает записи из таблицы расходов с применением фильтров по дате и категории.
+        Возвращает суммы записей с меткой по категориям. Разделенные записи учитываются
+        по строкам. Записи отбираются по индексам меток, а строки - по индексу строк записи,
+        поэтому время отчета зависит от количества записей с меткой, а не от размера базы данных.
+        Записи архивных лет не учитываются.
+
+        Args:
+            tag (str): Название метки.
+
+        Returns:
+            QtSql.QSqlQuery: Объект QtSql.QSqlQuery с колонками категория, количество записей и строк,
+            сумма в минимальных единицах базовой валюты (по убыванию суммы).
+        """
+        tagged = "SELECT entry_id FROM entry_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?)"
+        query_text = (f"SELECT category, COUNT(*), SUM(value) FROM ("
+                      f"SELECT e.category, {BASE_VALUE.format('e')} AS value FROM expenses e "
+                      f"WHERE e.id IN ({tagged}) AND e.category <> 'Разделено' UNION ALL "
+                      f"SELECT i.category, {ITEM_BASE_VALUE.format('e', 'i')} FROM entry_items i "
+                      f"JOIN expenses e ON e.id = i.entry_id WHERE i.entry_id IN ({tagged})) "
+                      f"GROUP BY category ORDER BY 3 DESC")
+        return self.executeQuery(query_text, [tag, tag])
+
+    def getArchives(self):
+        """
+        Возвращает архивы закрытых лет.
+
+        Returns:
+            dict: Словарь {год: путь к файлу архива}.
+        """
+        query = self.executeQuery("SELECT year, path FROM archives")
+        archives = {}
+        while query.next():
+            archives[query.value(0)] = os.path.join(os.path.dirname(os.path.abspath(self.db_path)), query.value(1))
+        return archives
+
+    def attachArchive(self, year, path=None):
+        """
+        Подключает к соединению архив года, если он еще не подключен.
+
+        Args:
+            year (int): Год архива.
+            path (str, optional): Путь к файлу архива для создания нового архива;
+                по умолчанию путь берется из таблицы archives.
+
+        Returns:
+            str: Имя схемы архива для запросов или None, если год не архивирован
+            либо архив не удалось подключить.
+        """
+        if year in self.attached:
+            return self.attached[year]
+        if path is None:
+            path = self.getArchives().get(year)
+            if path is None:
+                return None
+        # Архивы отключаются вне транзакции; освобождается место для нового архива
+        if len(self.attached) >= MAX_ATTACHED_ARCHIVES:
+            for schema in self.attached.values():
+                self.executeQuery(f"DETACH DATABASE {schema}")
+            self.attached = {}
+        schema = f"archive_{year}"
+        if not self.executeQuery(f"ATTACH DATABASE ? AS {schema}", [path]).isActive():
+            return None
+        self.attached[year] = schema
+        return schema
+
+    def getTableWithFilters(self, date_cb, category_cb, date, category, project_until=None, tag=None):
+        """
+        Возвращает записи из таблицы расходов с применением фильтров по дате, категории и метке.
+        При фильтре по дате архивного года к записям добавляются записи из архива этого года.
+        Фильтр по категории отбирает и разделенные записи, у которых есть строка этой категории.
 
         Args:
             date_cb (bool): Флаг использования фильтра по дате.
             category_cb (bool): Флаг использования фильтра по категории.
-            date (str): Дата для фильтра в формате 'YYYY-MM-DD'.
+            date (str): Дата для фильтра в формате 'DD.MM.YYYY'.
             category (str): Категория для фильтра.
+            project_until (str, optional): Дата в формате 'YYYY-MM-DD', до которой к записям
+                добавляются виртуальные вхождения повторяющихся операций (с пустым ID).
+            tag (str, optional): Метка, по которой отбираются записи.
 
         Returns:
             QtSql.QSqlQuery: Объект QtSql.QSqlQuery с результатами выполнения запроса.
         """
-        query_text = "SELECT * FROM expenses"
+        query_text = "SELECT id, description, value, currency, category, date FROM expenses"
         query_values = []
         conditions = []
 
+        # Архив подключается, только если фильтр по дате относится к архивному году
+        schema = self.attachArchive(int(date[6:10])) if date_cb == False else None
+        if schema is not None:
+            query_text = ("SELECT * FROM (" + query_text + " UNION ALL SELECT id, description, value, currency, "
+                          f"category, date FROM {schema}.expenses)")
+
+        if project_until:
+            query_text = ("SELECT * FROM (" + query_text + " UNION ALL SELECT * FROM (" +
+                          recurring.projectionQuery() + "))")
+            query_values += [project_until, project_until]
+
         if date_cb == False:
             conditions.append("date=?")
             query_values.append(date)
         if category_cb == False:
-            conditions.append("category=?")
-            query_values.append(category)
+            conditions.append("(category=? OR id IN (SELECT entry_id FROM entry_items WHERE category=?))")
+            query_values += [category, category]
+        if tag:
+            conditions.append("id IN (SELECT entry_id FROM entry_tags "
+                              "WHERE tag_id = (SELECT id FROM tags WHERE name=?))")
+            query_values.append(tag)
 
         if conditions:
             query_text += " WHERE " + " AND ".join(conditions)
@@ -0,0 +1,249 @@
+# Модуль для работы с валютами, денежными суммами и курсами обмена.
+#
+# Денежные суммы хранятся и складываются как целые числа в минимальных единицах валюты
+# (копейках), а курсы - как целое число миллионных долей рубля за единицу валюты, поэтому
+# агрегаты и пересчет между валютами выполняются в целочисленной арифметике.
+#
+# Курсы хранятся локально в таблице exchange_rates (сколько рублей стоит единица валюты
+# на дату) и импортируются из CSV-файла без обращения к сети.
+#
+# Класс RateTable выполняет поиск курса на дату и запоминает результаты для каждой пары
+# (валюта, дата), поэтому пересчет агрегатов, сгруппированных по валюте и дню, требует
+# не более одного запроса на группу. Курс на дату - последний известный курс не позже даты,
+# а если его нет - самый ранний известный курс; сумма в валюте без курсов пересчитывается
+# как в базовой валюте (1:1). По тому же правилу суммы пересчитывают запросы SQL
+# (connection.BASE_VALUE), поэтому баланс, бюджеты и отчеты не расходятся.
+#
+# Запуск модуля импортирует курсы из файла: python currency.py rates.csv
+#
+# Модуль импортируется главным окном при запуске, поэтому модули csv и decimal,
+# нужные только при вводе сумм и импорте курсов, загружаются при первом использовании.
+
+
+import datetime
+import sys
+
+from PyQt6 import QtCore
+
+
+# Базовая валюта учета: в ней показывается баланс и ведутся бюджеты
+BASE_CURRENCY = "RUB"
+
+# Валюты, предлагаемые в окнах добавления и изменения записи
+CURRENCIES = ("RUB", "USD", "EUR", "CNY")
+
+# Количество минимальных единиц в единице валюты
+MINOR_UNITS = 100
+
+# Множитель, с которым хранятся курсы валют
+RATE_SCALE = 1000000
+
+
+def scaleAmount(amount, scale):
+    """
+    Умножает сумму на множитель с округлением до целого без потери точности.
+
+    Args:
+        amount (int | float | str | Decimal): Сумма; в строке допускается десятичная запятая.
+        scale (int): Множитель.
+
+    Returns:
+        int: Округленное произведение.
+    """
+    from decimal import Decimal, ROUND_HALF_UP
+
+    if isinstance(amount, str):
+        amount = amount.replace(" ", "").replace(",", ".")
+    return int((Decimal(str(amount)) * scale).to_integral_value(ROUND_HALF_UP))
+
+
+def toMinorUnits(amount):
+    """
+    Преобразует сумму в единицах валюты в целое число минимальных единиц (копеек).
+
+    Args:
+        amount (int | float | str | Decimal): Сумма в единицах валюты.
+
+    Returns:
+        int: Сумма в минимальных единицах.
+    """
+    return scaleAmount(amount, MINOR_UNITS)
+
+
+def formatMinorUnits(value):
+    """
+    Форматирует сумму в минимальных единицах для отображения, например 123456 -> '1234,56'.
+
+    Args:
+        value (int): Сумма в минимальных единицах.
+
+    Returns:
+        str: Сумма в единицах валюты с двумя знаками после запятой.
+    """
+    sign = "-" if value < 0 else ""
+    units, minor = divmod(abs(value), MINOR_UNITS)
+    return f"{sign}{units},{minor:02d}"
+
+
+def convertAmount(value, rate):
+    """
+    Пересчитывает сумму по курсу с округлением половины от нуля.
+
+    Args:
+        value (int): Сумма в минимальных единицах валюты.
+        rate (int): Курс в миллионных долях базовой валюты.
+
+    Returns:
+        int: Сумма в минимальных единицах базовой валюты.
+    """
+    converted = (abs(value) * rate + RATE_SCALE // 2) // RATE_SCALE
+    return converted if value >= 0 else -converted
+
+
+def requireMinorUnits(value):
+    """
+    Проверяет, что сумма передана целым числом минимальных единиц.
+
+    Args:
+        value (int): Сумма в минимальных единицах.
+
+    Returns:
+        int: Та же сумма.
+
+    Raises:
+        TypeError: Если сумма не является целым числом.
+    """
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(f"Сумма должна быть целым числом минимальных единиц, получено {value!r}")
+    return value
+
+
+def readRates(path):
+    """
+    Читает курсы валют из CSV-файла со строками вида 'валюта;дата;курс'.
+
+    Разделителем может быть точка с запятой или запятая, дата указывается
+    в формате 'YYYY-MM-DD' или 'DD.MM.YYYY'. Строка заголовка пропускается.
+
+    Args:
+        path (str): Путь к CSV-файлу.
+
+    Returns:
+        list: Список кортежей (валюта, дата 'YYYY-MM-DD', курс в миллионных долях).
+    """
+    import csv
+
+    rates = []
+    with open(path, newline="", encoding="utf-8") as file:
+        sample = file.read(1024)
+        file.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=";,")
+        for row in csv.reader(file, dialect):
+            if len(row) < 3:
+                continue
+            currency, date, rate = (cell.strip() for cell in row[:3])
+            try:
+                rate = scaleAmount(rate, RATE_SCALE)
+            except ArithmeticError:
+                # Заголовок или некорректная строка
+                continue
+            if "." in date:
+                date = datetime.datetime.strptime(date, "%d.%m.%Y").date().isoformat()
+            rates.append((currency.upper(), date, rate))
+    return rates
+
+
+class RateTable:
+    def __init__(self, conn):
+        """
+        Инициализирует таблицу курсов валют.
+
+        Args:
+            conn (Data): Объект для работы с базой данных.
+        """
+        super(RateTable, self).__init__()
+        self.conn = conn
+        self.cache = {}
+
+    def importFile(self, path):
+        """
+        Импортирует курсы валют из CSV-файла (Data.insertRates сбрасывает кэш курсов).
+
+        Args:
+            path (str): Путь к CSV-файлу.
+
+        Returns:
+            int: Количество импортированных курсов или None, если курсы не сохранены.
+        """
+        rates = readRates(path)
+        if not self.conn.insertRates(rates):
+            return None
+        return len(rates)
+
+    def getCurrencies(self):
+        """
+        Возвращает валюты, для которых известны курсы, вместе со встроенным списком.
+
+        Returns:
+            list: Список кодов валют.
+        """
+        currencies = list(CURRENCIES)
+        query = self.conn.executeQuery("SELECT DISTINCT currency FROM exchange_rates ORDER BY currency")
+        while query.next():
+            if query.value(0) not in currencies:
+                currencies.append(query.value(0))
+        return currencies
+
+    def getRate(self, currency, date):
+        """
+        Возвращает курс валюты на дату.
+
+        Используется последний курс не позже даты, а если его нет - самый ранний известный курс;
+        для валюты без курсов - курс 1:1, как в connection.BASE_VALUE.
+
+        Args:
+            currency (str): Код валюты.
+            date (str): Дата в формате 'YYYY-MM-DD'.
+
+        Returns:
+            int: Стоимость единицы валюты в миллионных долях базовой валюты.
+        """
+        if currency == BASE_CURRENCY:
+            return RATE_SCALE
+        key = (currency, date)
+        if key not in self.cache:
+            query = self.conn.executeQuery("SELECT rate_micro FROM exchange_rates WHERE currency=? AND date<=? "
+                                           "ORDER BY date DESC LIMIT 1", [currency, date])
+            if not query.next():
+                query = self.conn.executeQuery("SELECT rate_micro FROM exchange_rates WHERE currency=? "
+                                               "ORDER BY date LIMIT 1", [currency])
+                if not query.next():
+                    print(f"Неизвестен курс валюты {currency}, сумма пересчитана 1:1")
+                    self.cache[key] = RATE_SCALE
+                    return RATE_SCALE
+            self.cache[key] = query.value(0)
+        return self.cache[key]
+
+    def convertGroups(self, query):
+        """
+        Пересчитывает в базовую валюту суммы, сгруппированные по валюте и дню.
+
+        Args:
+            query (QtSql.QSqlQuery): Запрос с колонками валюта, дата 'YYYY-MM-DD', сумма в минимальных единицах.
+
+        Returns:
+            int: Общая сумма в минимальных единицах базовой валюты.
+        """
+        total = 0
+        while query.next():
+            total += convertAmount(query.value(2), self.getRate(query.value(0), query.value(1)))
+        return total
+
+
+if __name__ == '__main__':
+    from connection import Data
+
+    app = QtCore.QCoreApplication(sys.argv)
+    rates = RateTable(Data())
+    for path in sys.argv[1:]:
+        print(f"{path}: импортировано курсов - {rates.importFile(path)}")
@@ -0,0 +1,221 @@
+# Модуль с делегатами отображения ячеек таблиц главного окна.
+#
+# Класс MoneyDelegate показывает суммы, хранящиеся в минимальных единицах валюты,
+# в виде '1234,56'. Форматирование выполняется только для видимых ячеек,
+# поэтому запросы к базе данных возвращают суммы как есть, целыми числами.
+#
+# Класс LedgerDelegate рисует ячейки таблицы записей сам, без стиля и таблицы стилей окна:
+# отрисовка ячейки через таблицу стилей (правила QTableView::item) заново разбирает правила
+# и рисует рамки для каждой видимой ячейки в каждом кадре прокрутки. Делегат рисует
+# выделение, линию под строкой и текст: суммы - зеленым для поступлений и красным
+# для расходов, даты - приглушенным цветом. Текст ячеек готовится один раз (QStaticText)
+# и кэшируется. Строки таблицы имеют одну высоту ROW_HEIGHT, поэтому размеры строк
+# при прокрутке не вычисляются.
+#
+# Класс AttachmentDelegate показывает слева от описания записи миниатюру ее вложения
+# из кэша миниатюр (см. модуль attachments); пока миниатюра создается, ячейка рисуется без нее.
+
+
+from PyQt6.QtCore import QPointF, QRect, QSize, Qt
+from PyQt6.QtGui import QColor, QStaticText, QTransform
+from PyQt6.QtWidgets import QStyle, QStyledItemDelegate
+
+from currency import formatMinorUnits
+
+
+class MoneyDelegate(QStyledItemDelegate):
+    def displayText(self, value, locale):
+        """
+        Возвращает текст ячейки с суммой.
+
+        Args:
+            value (int): Сумма в минимальных единицах валюты.
+            locale (QLocale): Локаль представления.
+
+        Returns:
+            str: Сумма в единицах валюты с двумя знаками после запятой.
+        """
+        if isinstance(value, int):
+            return formatMinorUnits(value)
+        return super(MoneyDelegate, self).displayText(value, locale)
+
+
+class LedgerDelegate(QStyledItemDelegate):
+    # Колонки таблицы записей (см. connection.Data.getTableWithFilters)
+    AMOUNT_COLUMN = 2
+    CATEGORY_COLUMN = 4
+    DATE_COLUMN = 5
+
+    # Категория поступлений (connection.INCOME_CATEGORY; модуль connection импортируется
+    # только после первой отрисовки окна)
+    INCOME_CATEGORY = "Поступления"
+
+    # Высота строки, отступ текста от краев ячейки и наибольшая сторона изображения
+    # слева от текста (миниатюры вложения) в пикселях
+    ROW_HEIGHT = 30
+    PADDING = 5
+    PREVIEW_SIZE = 24
+
+    # Цвета текста, выделенной строки и линии под строкой
+    TEXT_COLOR = QColor(70, 68, 81)
+    MUTED_COLOR = QColor(112, 110, 128)
+    INCOME_COLOR = QColor(30, 132, 73)
+    EXPENSE_COLOR = QColor(186, 52, 52)
+    SELECTION_COLOR = QColor(255, 255, 255, 80)
+    LINE_COLOR = QColor(70, 68, 81)
+
+    # Наибольшее количество подготовленных строк текста (QStaticText) в кэше делегата
+    TEXT_CACHE_SIZE = 4096
+
+    def __init__(self, parent=None):
+        """
+        Инициализирует делегат таблицы записей.
+
+        Args:
+            parent (QObject, optional): Родительский объект.
+        """
+        super(LedgerDelegate, self).__init__(parent)
+        self.texts = {}
+
+    def cellText(self, index):
+        """
+        Возвращает текст ячейки, его цвет и выравнивание.
+
+        Args:
+            index (QModelIndex): Индекс ячейки.
+
+        Returns:
+            tuple: Текст, цвет (QColor) и признак выравнивания по правому краю.
+        """
+        value = index.data()
+        column = index.column()
+        if column == self.AMOUNT_COLUMN and isinstance(value, int):
+            income = index.sibling(index.row(), self.CATEGORY_COLUMN).data() == self.INCOME_CATEGORY
+            return formatMinorUnits(value), self.INCOME_COLOR if income else self.EXPENSE_COLOR, True
+        text = "" if value is None else str(value)
+        if column == self.DATE_COLUMN:
+            return text, self.MUTED_COLOR, False
+        return text, self.TEXT_COLOR, False
+
+    def staticText(self, text, width, option):
+        """
+        Возвращает подготовленный текст, сокращенный до ширины ячейки.
+
+        Разметка и сокращение текста - самая дорогая часть отрисовки ячейки, а описания,
+        категории, валюты и даты в таблице повторяются, поэтому подготовленный текст
+        кэшируется по строке и ширине. Кэш очищается целиком при переполнении.
+
+        Args:
+            text (str): Текст ячейки.
+            width (int): Ширина области текста в пикселях.
+            option (QStyleOptionViewItem): Параметры отрисовки.
+
+        Returns:
+            QStaticText: Подготовленный текст.
+        """
+        key = (text, width)
+        static_text = self.texts.get(key)
+        if static_text is None:
+            metrics = option.fontMetrics
+            if metrics.horizontalAdvance(text) > width:
+                text = metrics.elidedText(text, option.textElideMode, width)
+            static_text = QStaticText(text)
+            static_text.setTextFormat(Qt.TextFormat.PlainText)
+            static_text.prepare(QTransform(), option.font)
+            if len(self.texts) >= self.TEXT_CACHE_SIZE:
+                self.texts.clear()
+            self.texts[key] = static_text
+        return static_text
+
+    def decoration(self, index):
+        """
+        Возвращает изображение, которое рисуется слева от текста ячейки.
+
+        Args:
+            index (QModelIndex): Индекс ячейки.
+
+        Returns:
+            QPixmap: Изображение или None.
+        """
+        return None
+
+    def paint(self, painter, option, index):
+        """
+        Рисует ячейку таблицы записей.
+
+        Args:
+            painter (QPainter): Объект рисования.
+            option (QStyleOptionViewItem): Параметры отрисовки.
+            index (QModelIndex): Индекс ячейки.
+        """
+        # Поверх фона выделенной строки, который рисует представление, ячейка осветляется;
+        # линия под строкой рисуется прямоугольником, без смены пера
+        rect = option.rect
+        if QStyle.StateFlag.State_Selected in option.state:
+            painter.fillRect(rect, self.SELECTION_COLOR)
+        painter.fillRect(rect.left(), rect.bottom(), rect.width(), 1, self.LINE_COLOR)
+
+        left = rect.left() + self.PADDING
+        pixmap = self.decoration(index)
+        if pixmap is not None:
+            size = pixmap.size().scaled(self.PREVIEW_SIZE, self.PREVIEW_SIZE, Qt.AspectRatioMode.KeepAspectRatio)
+            target = QRect(left, rect.top() + (rect.height() - size.height()) // 2, size.width(), size.height())
+            painter.drawPixmap(target, pixmap)
+            left = target.right() + self.PADDING + 1
+
+        text, color, right = self.cellText(index)
+        width = rect.right() - self.PADDING - left + 1
+        if not text or width <= 0:
+            return
+        static_text = self.staticText(text, width, option)
+        size = static_text.size()
+        painter.setFont(option.font)
+        painter.setPen(color)
+        painter.drawStaticText(QPointF(left + width - size.width() if right else left,
+                                       rect.top() + (rect.height() - size.height()) / 2), static_text)
+
+    def sizeHint(self, option, index):
+        """
+        Возвращает размер ячейки: ширину текста с отступами и высоту строки ROW_HEIGHT.
+
+        Args:
+            option (QStyleOptionViewItem): Параметры отрисовки.
+            index (QModelIndex): Индекс ячейки.
+
+        Returns:
+            QSize: Размер ячейки.
+        """
+        text = self.cellText(index)[0]
+        return QSize(option.fontMetrics.horizontalAdvance(text) + 2 * self.PADDING, self.ROW_HEIGHT)
+
+
+class AttachmentDelegate(LedgerDelegate):
+    def __init__(self, thumbnails, parent=None):
+        """
+        Инициализирует делегат колонки описания с миниатюрами вложений.
+
+        Args:
+            thumbnails (ThumbnailCache): Кэш миниатюр вложений.
+            parent (QObject, optional): Родительский объект.
+        """
+        super(AttachmentDelegate, self).__init__(parent)
+        self.thumbnails = thumbnails
+        self.hashes = {}
+
+    def decoration(self, index):
+        """
+        Возвращает миниатюру вложения записи, если она уже готова.
+
+        Args:
+            index (QModelIndex): Индекс ячейки.
+
+        Returns:
+            QPixmap: Миниатюра или None.
+        """
+        attachment = self.hashes.get(index.sibling(index.row(), 0).data())
+        if attachment is None:
+            return None
+        pixmap = self.thumbnails.pixmap(attachment)
+        if pixmap is None or pixmap.isNull():
+            return None
+        return pixmap
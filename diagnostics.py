@@ -0,0 +1,340 @@
+# Модуль для сбора статистики запросов к базе данных.
+#
+# Каждый запрос, выполняемый через Data.executeQuery, помечается именем операции (метода,
+# вызвавшего executeQuery), количеством подставленных значений и количеством строк:
+# для изменяющих запросов - числом измененных строк, для выборок - числом строк,
+# прочитанных через next(). Время выборки складывается из выполнения запроса и чтения
+# строк, так как SQLite вычисляет результат постепенно, по мере чтения. Учет выборки
+# завершается, когда прочитана последняя строка или объект запроса удален. Модель
+# QSqlQueryModel читает строки в C++, минуя next(), поэтому запрос модели устанавливает
+# setModelQuery: она учитывает строки и время первой порции, прочитанной моделью при установке
+# запроса (следующие порции модель читает при прокрутке, и они в статистику не попадают).
+#
+# Статистика собирается по тексту запроса: количество выполнений и ошибок, суммарное
+# и максимальное время, количество строк и гистограмма времени выполнения.
+# Медленные и завершившиеся ошибкой запросы попадают в журнал вместе с планом выполнения
+# (EXPLAIN QUERY PLAN). План получается при чтении журнала, а не при завершении учета: учет
+# выборки может завершиться при удалении объекта запроса сборщиком мусора, когда выполнять
+# другие запросы нельзя. Статистику показывает окно диагностики главного окна.
+
+
+import collections
+import datetime
+from time import perf_counter
+
+from PyQt6 import QtSql
+
+
+# Порог времени выполнения медленного запроса в миллисекундах
+SLOW_QUERY_MS = 50
+
+# Количество записей в журнале медленных запросов
+SLOW_LOG_SIZE = 200
+
+# Верхние границы интервалов гистограммы времени выполнения в миллисекундах
+HISTOGRAM_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+
+def normalizeStatement(query_text):
+    """
+    Приводит текст запроса к виду, по которому собирается статистика.
+
+    Args:
+        query_text (str): Текст SQL-запроса.
+
+    Returns:
+        str: Текст запроса с пробельными символами, замененными одиночными пробелами.
+    """
+    return " ".join(query_text.split())
+
+
+def histogramLabels():
+    """
+    Возвращает подписи интервалов гистограммы времени выполнения.
+
+    Returns:
+        list: Подписи вида '≤1 мс' и '>1000 мс' в порядке интервалов.
+    """
+    return [f"≤{bound:g} мс" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]:g} мс"]
+
+
+class QueryEntry:
+    def __init__(self, operation, statement, values):
+        """
+        Инициализирует сведения об одном выполнении запроса.
+
+        Args:
+            operation (str): Имя операции, выполнившей запрос.
+            statement (str): Нормализованный текст запроса.
+            values (list): Значения, подставленные в запрос.
+        """
+        super(QueryEntry, self).__init__()
+        self.operation = operation
+        self.statement = statement
+        self.values = values
+        self.started = datetime.datetime.now()
+        self.seconds = 0.0
+        self.rows = 0
+        self.error = None
+        self.open = True
+        self.plan = None
+
+
+class StatementStats:
+    def __init__(self, statement):
+        """
+        Инициализирует статистику выполнений одного запроса.
+
+        Args:
+            statement (str): Нормализованный текст запроса.
+        """
+        super(StatementStats, self).__init__()
+        self.statement = statement
+        self.operations = set()
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, entry):
+        """
+        Добавляет в статистику завершенное выполнение запроса.
+
+        Args:
+            entry (QueryEntry): Сведения о выполнении запроса.
+        """
+        milliseconds = entry.seconds * 1000
+        self.operations.add(entry.operation)
+        self.count += 1
+        self.errors += entry.error is not None
+        self.total += entry.seconds
+        self.max = max(self.max, entry.seconds)
+        self.rows += entry.rows
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS_MS) and milliseconds > HISTOGRAM_BOUNDS_MS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+
+class QueryStats:
+    def __init__(self, db, slow_ms=SLOW_QUERY_MS):
+        """
+        Инициализирует статистику запросов к базе данных.
+
+        Args:
+            db (QtSql.QSqlDatabase): Соединение, через которое выполняются запросы.
+            slow_ms (float, optional): Порог времени выполнения медленного запроса в миллисекундах.
+        """
+        super(QueryStats, self).__init__()
+        self.db = db
+        self.slow_ms = slow_ms
+        self.statements = {}
+        self.slow_log = collections.deque(maxlen=SLOW_LOG_SIZE)
+
+    def begin(self, operation, query_text, values):
+        """
+        Начинает учет выполнения запроса.
+
+        Args:
+            operation (str): Имя операции, выполняющей запрос.
+            query_text (str): Текст SQL-запроса.
+            values (list): Значения, подставляемые в запрос.
+
+        Returns:
+            QueryEntry: Сведения о выполнении запроса.
+        """
+        return QueryEntry(operation, normalizeStatement(query_text), list(values or []))
+
+    def close(self, entry):
+        """
+        Завершает учет выполнения запроса и добавляет его в статистику.
+
+        Медленные и завершившиеся ошибкой запросы записываются в журнал; план выполнения
+        получает getSlowLog.
+
+        Args:
+            entry (QueryEntry): Сведения о выполнении запроса.
+        """
+        if not entry.open:
+            return
+        entry.open = False
+        if entry.statement not in self.statements:
+            self.statements[entry.statement] = StatementStats(entry.statement)
+        self.statements[entry.statement].add(entry)
+        if entry.error is not None or entry.seconds * 1000 >= self.slow_ms:
+            self.slow_log.append(entry)
+
+    def explain(self, entry):
+        """
+        Возвращает план выполнения запроса.
+
+        Args:
+            entry (QueryEntry): Сведения о выполнении запроса.
+
+        Returns:
+            list: Строки плана с отступами по уровню вложенности.
+        """
+        query = QtSql.QSqlQuery(self.db)
+        query.prepare("EXPLAIN QUERY PLAN " + entry.statement)
+        for value in entry.values:
+            query.addBindValue(value)
+        if not query.exec():
+            return [query.lastError().text()]
+        depths = {0: -1}
+        plan = []
+        while query.next():
+            depths[query.value(0)] = depths.get(query.value(1), -1) + 1
+            plan.append("  " * depths[query.value(0)] + query.value(3))
+        return plan
+
+    def getStatements(self):
+        """
+        Возвращает статистику запросов в порядке убывания суммарного времени выполнения.
+
+        Returns:
+            list: Список объектов StatementStats.
+        """
+        return sorted(self.statements.values(), key=lambda stats: stats.total, reverse=True)
+
+    def getSlowLog(self):
+        """
+        Возвращает журнал медленных запросов и запросов с ошибками, начиная с последнего.
+
+        План выполнения запроса получается при первом чтении журнала после его выполнения.
+
+        Returns:
+            list: Список словарей с ключами 'time', 'operation', 'statement', 'ms', 'binds',
+            'rows', 'error' и 'plan'.
+        """
+        slow_log = []
+        for entry in reversed(self.slow_log):
+            if entry.plan is None:
+                entry.plan = self.explain(entry)
+            slow_log.append({
+                "time": entry.started.isoformat(sep=" ", timespec="seconds"),
+                "operation": entry.operation,
+                "statement": entry.statement,
+                "ms": entry.seconds * 1000,
+                "binds": len(entry.values),
+                "rows": entry.rows,
+                "error": entry.error,
+                "plan": entry.plan,
+            })
+        return slow_log
+
+    def reset(self):
+        """
+        Очищает статистику и журнал медленных запросов.
+        """
+        self.statements.clear()
+        self.slow_log.clear()
+
+
+class TimedQuery(QtSql.QSqlQuery):
+    def __init__(self, db, entry, stats):
+        """
+        Инициализирует запрос, учитывающий время чтения и количество прочитанных строк.
+
+        Args:
+            db (QtSql.QSqlDatabase): Соединение с базой данных.
+            entry (QueryEntry): Сведения о выполнении запроса.
+            stats (QueryStats): Статистика запросов.
+        """
+        super(TimedQuery, self).__init__(db)
+        self.entry = entry
+        self.stats = stats
+        self.fetch_seconds = 0.0
+        self.fetched = 0
+        self.rows_affected = None
+
+    def next(self):
+        """
+        Переходит к следующей строке результата.
+
+        Returns:
+            bool: True, если строка прочитана.
+        """
+        # Метод вызывается для каждой строки, поэтому учет сведен к сложению двух чисел
+        started = perf_counter()
+        has_row = QtSql.QSqlQuery.next(self)
+        self.fetch_seconds += perf_counter() - started
+        if has_row:
+            self.fetched += 1
+        else:
+            self.closeStats()
+        return has_row
+
+    def numRowsAffected(self):
+        """
+        Возвращает количество строк, измененных запросом.
+
+        Количество запоминается сразу после выполнения (см. rememberRowsAffected): SQLite
+        сообщает его для последнего запроса соединения, а до чтения количества соединение
+        может выполнить другие запросы.
+
+        Returns:
+            int: Количество строк или -1, если оно неизвестно.
+        """
+        if self.rows_affected is None:
+            return QtSql.QSqlQuery.numRowsAffected(self)
+        return self.rows_affected
+
+    def rememberRowsAffected(self):
+        """
+        Запоминает количество строк, измененных только что выполненным запросом.
+
+        Returns:
+            int: Количество строк или -1, если оно неизвестно.
+        """
+        self.rows_affected = QtSql.QSqlQuery.numRowsAffected(self)
+        return self.rows_affected
+
+    def closeStats(self):
+        """
+        Завершает учет выборки и добавляет ее в статистику.
+        """
+        if self.entry.open:
+            self.entry.seconds += self.fetch_seconds
+            self.entry.rows += self.fetched
+            self.stats.close(self.entry)
+
+    def closeModelStats(self, rows, seconds):
+        """
+        Завершает учет выборки, строки которой прочитала модель, а не next().
+
+        Args:
+            rows (int): Количество строк, прочитанных моделью.
+            seconds (float): Время чтения строк моделью в секундах.
+        """
+        self.fetched = rows
+        self.fetch_seconds = seconds
+        self.closeStats()
+
+    def finish(self):
+        """
+        Завершает учет выборки и освобождает результат запроса.
+        """
+        self.closeStats()
+        QtSql.QSqlQuery.finish(self)
+
+    def __del__(self):
+        """
+        Завершает учет выборки, не прочитанной до конца, при удалении запроса.
+        """
+        self.closeStats()
+
+
+def setModelQuery(model, query):
+    """
+    Устанавливает запрос модели и учитывает строки и время первой порции, прочитанной моделью.
+
+    Args:
+        model (QtSql.QSqlQueryModel): Модель.
+        query (QtSql.QSqlQuery): Выполненный запрос (TimedQuery из Data.executeQuery).
+    """
+    started = perf_counter()
+    model.setQuery(query)
+    if isinstance(query, TimedQuery):
+        query.closeModelStats(model.rowCount(), perf_counter() - started)
@@ -0,0 +1,200 @@
+# Модуль для поиска повторяющихся записей.
+#
+# Каждая запись получает отпечаток - 64-битный хеш нормализованного описания, суммы, валюты
+# и даты (колонка fingerprint с индексом). Совпадение отпечатков означает точный повтор записи
+# и проверяется одним запросом по индексу при добавлении записи и при импорте выписки.
+# Отпечатки вычисляет класс Data при вставке и изменении записей; записи, добавленные
+# запросами SQL в обход этих методов, получают отпечаток при следующем открытии базы данных.
+#
+# Похожие записи (например, запись, внесенная вручную и затем импортированная из выписки
+# с другим описанием и датой списания) ищутся с разбиением на блоки: записи группируются
+# по сумме и валюте, внутри блока упорядочиваются по дате, и сравниваются только записи,
+# отстоящие друг от друга не больше чем на DATE_WINDOW_DAYS дней. Количество сравнений
+# поэтому растет почти линейно с размером таблицы, а не квадратично.
+# Записи с буквально одинаковым описанием считаются кандидатами только в один и тот же день,
+# иначе регулярные покупки (проезд, кофе) попадали бы в кандидаты каждый день; описания,
+# отличающиеся только регистром или пробелами, говорят о разных источниках записи.
+# Пары, отмеченные пользователем как разные записи, хранятся в таблице duplicate_dismissed.
+
+
+import collections
+import difflib
+import hashlib
+
+from categorizer import normalizeDescription, tokenize
+from currency import BASE_CURRENCY
+
+
+# Наибольшая разница в днях между датами похожих записей
+DATE_WINDOW_DAYS = 3
+
+# Наименьшее сходство описаний похожих записей (от 0 до 1)
+MIN_SIMILARITY = 0.6
+
+
+def fingerprint(description, value, date, currency=BASE_CURRENCY):
+    """
+    Вычисляет отпечаток записи.
+
+    Args:
+        description (str): Описание записи.
+        value (int): Сумма в минимальных единицах валюты.
+        date (str): Дата в формате 'DD.MM.YYYY'.
+        currency (str, optional): Код валюты суммы.
+
+    Returns:
+        int: 64-битное целое со знаком, которое помещается в колонку INTEGER SQLite.
+    """
+    key = "\x1f".join((normalizeDescription(description), str(value), currency, date))
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def similarity(first, second):
+    """
+    Оценивает сходство двух нормализованных описаний.
+
+    Сходство - наибольшее из доли совпадающих символов и доли слов более короткого
+    описания, входящих в другое (так 'кофе' похоже на 'кофе хауз 1234').
+
+    Args:
+        first (str): Первое описание.
+        second (str): Второе описание.
+
+    Returns:
+        float: Сходство от 0 до 1.
+    """
+    if first == second:
+        return 1.0
+    first_tokens, second_tokens = tokenize(first), tokenize(second)
+    overlap = 0.0
+    if first_tokens and second_tokens:
+        overlap = len(first_tokens & second_tokens) / min(len(first_tokens), len(second_tokens))
+    matcher = difflib.SequenceMatcher(None, first, second, autojunk=False)
+    # Быстрые верхние оценки позволяют не вычислять точное значение для непохожих описаний
+    if overlap >= matcher.real_quick_ratio() or overlap >= matcher.quick_ratio():
+        return overlap
+    return max(overlap, matcher.ratio())
+
+
+class DuplicateFinder:
+    def __init__(self, conn):
+        """
+        Инициализирует поиск повторяющихся записей.
+
+        Args:
+            conn (Data): Объект для работы с базой данных.
+        """
+        super(DuplicateFinder, self).__init__()
+        self.conn = conn
+
+    def findCandidates(self, window_days=DATE_WINDOW_DAYS, min_similarity=MIN_SIMILARITY):
+        """
+        Находит пары похожих записей.
+
+        Args:
+            window_days (int, optional): Наибольшая разница в днях между датами записей пары.
+            min_similarity (float, optional): Наименьшее сходство описаний.
+
+        Returns:
+            list: Пары в виде словарей с ключами 'first' и 'second' (словари записей с ключами
+            'id', 'description', 'category', 'date'), 'value', 'currency', 'days' и 'similarity',
+            упорядоченные по убыванию сходства.
+        """
+        dismissed = set()
+        query = self.conn.executeQuery("SELECT first_id, second_id FROM duplicate_dismissed")
+        while query.next():
+            dismissed.add((query.value(0), query.value(1)))
+
+        # В выборку попадают только блоки из нескольких записей; SQLite упорядочивает
+        # записи по блокам и по дате внутри блока
+        query = self.conn.executeQuery(
+            "SELECT id, description, category, date, value, currency, "
+            "julianday(substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)) AS day "
+            "FROM expenses WHERE (value, currency) IN ("
+            "SELECT value, currency FROM expenses GROUP BY value, currency HAVING COUNT(*) > 1) "
+            "ORDER BY value, currency, day")
+        candidates = []
+        block_key = None
+        block = collections.deque()
+        while query.next():
+            key = (query.value(4), query.value(5))
+            if key != block_key:
+                block_key = key
+                block = collections.deque()
+            entry = {"id": query.value(0), "description": query.value(1), "category": query.value(2),
+                     "date": query.value(3), "day": query.value(6),
+                     "key": normalizeDescription(query.value(1))}
+            # Из начала блока убираются записи, вышедшие за окно дат
+            while block and entry["day"] - block[0]["day"] > window_days:
+                block.popleft()
+            for other in block:
+                same_text = other["key"] == entry["key"]
+                if other["description"] == entry["description"] and other["day"] != entry["day"]:
+                    continue
+                pair = (min(other["id"], entry["id"]), max(other["id"], entry["id"]))
+                if pair in dismissed:
+                    continue
+                score = 1.0 if same_text else similarity(other["key"], entry["key"])
+                if score >= min_similarity:
+                    first, second = sorted((other, entry), key=lambda item: item["id"])
+                    candidates.append({
+                        "first": {name: first[name] for name in ("id", "description", "category", "date")},
+                        "second": {name: second[name] for name in ("id", "description", "category", "date")},
+                        "value": key[0], "currency": key[1],
+                        "days": int(entry["day"] - other["day"]), "similarity": score,
+                    })
+            block.append(entry)
+        candidates.sort(key=lambda candidate: (-candidate["similarity"], candidate["first"]["id"]))
+        return candidates
+
+    def dismiss(self, candidate):
+        """
+        Отмечает пару записей как разные, чтобы она больше не предлагалась.
+
+        Args:
+            candidate (dict): Пара записей из findCandidates.
+
+        Returns:
+            bool: True, если отметка сохранена.
+        """
+        return self.conn.executeQuery(
+            "INSERT OR IGNORE INTO duplicate_dismissed (first_id, second_id) VALUES (?, ?)",
+            [candidate["first"]["id"], candidate["second"]["id"]]).isActive()
+
+    def drop(self, candidate):
+        """
+        Удаляет вторую (более позднюю) запись пары.
+
+        Args:
+            candidate (dict): Пара записей из findCandidates.
+
+        Returns:
+            bool: True, если запись удалена.
+        """
+        return self.conn.deleteEntry(candidate["second"]["id"])
+
+    def merge(self, candidate):
+        """
+        Объединяет пару записей: первая запись получает более подробное из двух описаний,
+        вторая удаляется. Сумма, категория и дата первой записи сохраняются.
+
+        Args:
+            candidate (dict): Пара записей из findCandidates.
+
+        Returns:
+            bool: True, если записи объединены.
+        """
+        from connection import TransactionError
+
+        first, second = candidate["first"], candidate["second"]
+        description = max(first["description"], second["description"], key=len)
+        try:
+            with self.conn.transaction():
+                # Изменение, отмененное обработчиком записи, откатывает все объединение
+                if not (self.conn.updateEntry(description, candidate["value"], first["category"], first["date"],
+                                              first["id"], candidate["currency"]) and
+                        self.conn.deleteEntry(second["id"])):
+                    self.conn.transaction_error = self.conn.cancelled_by or "Записи не объединены"
+        except TransactionError:
+            return False
+        return True
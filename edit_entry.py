@@ -50,14 +50,30 @@ class Ui_Dialog(object):
         self.descriptionLineEdit.setClearButtonEnabled(False)
         self.descriptionLineEdit.setObjectName("descriptionLineEdit")
         self.verticalLayout.addWidget(self.descriptionLineEdit)
-        self.priceSpinBox = QtWidgets.QSpinBox(parent=self.mainFrame)
+        self.priceSpinBox = QtWidgets.QDoubleSpinBox(parent=self.mainFrame)
         self.priceSpinBox.setStyleSheet("")
         self.priceSpinBox.setButtonSymbols(QtWidgets.QAbstractSpinBox.ButtonSymbols.NoButtons)
-        self.priceSpinBox.setMinimum(0)
-        self.priceSpinBox.setMaximum(100000000)
-        self.priceSpinBox.setProperty("value", 0)
+        self.priceSpinBox.setDecimals(2)
+        self.priceSpinBox.setMinimum(0.0)
+        self.priceSpinBox.setMaximum(100000000.0)
+        self.priceSpinBox.setProperty("value", 0.0)
         self.priceSpinBox.setObjectName("priceSpinBox")
         self.verticalLayout.addWidget(self.priceSpinBox)
+        self.currencyComboBox = QtWidgets.QComboBox(parent=self.mainFrame)
+        self.currencyComboBox.setStyleSheet("QComboBox {\n"
+"    border-radius: 3px;\n"
+"    padding-left: 5px;\n"
+"}\n"
+"\n"
+"QComboBox QAbstractItemView {\n"
+"    background-color: white;\n"
+"}")
+        self.currencyComboBox.setObjectName("currencyComboBox")
+        self.currencyComboBox.addItem("")
+        self.currencyComboBox.addItem("")
+        self.currencyComboBox.addItem("")
+        self.currencyComboBox.addItem("")
+        self.verticalLayout.addWidget(self.currencyComboBox)
         self.categoryComboBox = QtWidgets.QComboBox(parent=self.mainFrame)
         self.categoryComboBox.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.DefaultContextMenu)
         self.categoryComboBox.setStyleSheet("QComboBox {\n"
@@ -138,6 +154,10 @@ class Ui_Dialog(object):
         self.newEntryLabel.setText(_translate("Dialog", "Изменение записи"))
         self.descriptionLineEdit.setPlaceholderText(_translate("Dialog", "Описание"))
         self.categoryComboBox.setCurrentText(_translate("Dialog", "Поступления"))
+        self.currencyComboBox.setItemText(0, _translate("Dialog", "RUB"))
+        self.currencyComboBox.setItemText(1, _translate("Dialog", "USD"))
+        self.currencyComboBox.setItemText(2, _translate("Dialog", "EUR"))
+        self.currencyComboBox.setItemText(3, _translate("Dialog", "CNY"))
         self.categoryComboBox.setPlaceholderText(_translate("Dialog", "Категория"))
         self.categoryComboBox.setItemText(0, _translate("Dialog", "Поступления"))
         self.categoryComboBox.setItemText(1, _translate("Dialog", "Авиабилеты"))
@@ -0,0 +1,383 @@
+# Модуль для хранения базы данных в зашифрованном виде.
+#
+# Зашифрованная база данных хранится в файле 'expensetracker.db.enc'. При запуске приложение
+# запрашивает пароль и расшифровывает файл в рабочую копию во временном каталоге, доступном
+# только владельцу (0700); приложение работает с рабочей копией как с обычной базой данных,
+# поэтому скорость запросов не отличается от незашифрованной базы. Изменения сохраняются
+# в зашифрованный файл раз в SAVE_INTERVAL_MS (если рабочая копия изменилась) и при закрытии,
+# после чего временный каталог удаляется вместе с производными файлами (снимком окна,
+# моделью категорий). Пока каталог используется, в нем заблокирован файл LOCK_NAME
+# (QLockFile); каталог, блокировку которого не держит ни один работающий процесс, остался
+# после аварийного завершения и удаляется при следующем открытии зашифрованной базы данных
+# (removeStaleCopies), так что расшифрованная копия не остается на диске дольше одного запуска.
+#
+# Формат файла: заголовок (сигнатура, параметры scrypt, соль, размер страницы, количество
+# страниц и проверочный блок пароля), затем страницы по PAGE_SIZE байт (16 страниц SQLite),
+# каждая зашифрована AES-256-GCM со случайным 96-битным nonce. Номер страницы и признак
+# последней страницы входят в дополнительные данные шифрования, поэтому перестановка,
+# подмена и усечение страниц обнаруживаются при расшифровке.
+#
+# Шифрование потоковое и постраничное: файлы обрабатываются страницами без загрузки
+# в память целиком, а при сохранении заново шифруются только страницы, изменившиеся
+# с прошлого сохранения (их хеши хранятся в памяти); неизменные страницы копируются
+# из прошлого файла. Цели (см. benchmarks/bench_encryption.py): расшифровка при запуске
+# и сохранение - не меньше 100 МБ/с на процессоре с инструкциями AES (скорость ограничивает
+# вычисление хешей страниц, а не шифрование); запросы к рабочей копии шифрование не замедляет.
+#
+# Шифрование требует пакета cryptography (pip install cryptography); без него
+# работа с незашифрованной базой данных не меняется.
+#
+# Запуск модуля: python encryption.py encrypt|decrypt expensetracker.db
+
+
+import getpass
+import hashlib
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = None
+
+
+# Сигнатура и версия формата зашифрованного файла
+MAGIC = b"ETENC\x00\x01\x00"
+
+# Размер страницы шифрования в байтах
+PAGE_SIZE = 65536
+
+# Параметры формирования ключа из пароля (scrypt)
+SCRYPT_N = 2 ** 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Заголовок: сигнатура, N, r, p, соль, размер страницы, количество страниц
+HEADER = struct.Struct("<8sIII16sIQ")
+
+# Длина nonce и тега AES-GCM
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# Период сохранения изменений рабочей копии в зашифрованный файл в миллисекундах
+SAVE_INTERVAL_MS = 60000
+
+# Префикс временного каталога рабочей копии и имя файла блокировки в нем
+WORKING_PREFIX = "expensetracker-"
+LOCK_NAME = "working.lock"
+
+
+class EncryptionError(Exception):
+    """
+    Неверный пароль, поврежденный файл или недоступное шифрование.
+    """
+
+
+def encryptedPath(db_path):
+    """
+    Возвращает путь к зашифрованному файлу базы данных.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+
+    Returns:
+        str: Путь к зашифрованному файлу.
+    """
+    return db_path + ".enc"
+
+
+def requireCryptography():
+    """
+    Проверяет, что пакет cryptography установлен.
+
+    Raises:
+        EncryptionError: Если пакет не установлен.
+    """
+    if AESGCM is None:
+        raise EncryptionError("Для шифрования базы данных установите пакет cryptography")
+
+
+def lockWorkingDirectory(directory):
+    """
+    Блокирует каталог рабочей копии на время работы процесса.
+
+    Args:
+        directory (str): Путь к каталогу.
+
+    Returns:
+        QtCore.QLockFile: Захваченная блокировка или None, если каталог используется другим процессом.
+    """
+    from PyQt6 import QtCore
+
+    lock = QtCore.QLockFile(os.path.join(directory, LOCK_NAME))
+    # Блокировка считается оставленной, только если ее процесс завершился, а не по давности
+    lock.setStaleLockTime(0)
+    return lock if lock.tryLock(0) else None
+
+
+def removeStaleCopies():
+    """
+    Удаляет рабочие копии, оставшиеся после аварийного завершения приложения.
+
+    Returns:
+        int: Количество удаленных каталогов.
+    """
+    temp = tempfile.gettempdir()
+    removed = 0
+    for name in os.listdir(temp):
+        directory = os.path.join(temp, name)
+        if not name.startswith(WORKING_PREFIX) or not os.path.isdir(directory):
+            continue
+        lock = lockWorkingDirectory(directory)
+        if lock is None:
+            continue
+        lock.unlock()
+        shutil.rmtree(directory, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+def deriveKey(password, salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """
+    Формирует 256-битный ключ из пароля.
+
+    Args:
+        password (str): Пароль.
+        salt (bytes): Соль файла.
+        n (int, optional): Параметр сложности scrypt.
+        r (int, optional): Размер блока scrypt.
+        p (int, optional): Параметр параллельности scrypt.
+
+    Returns:
+        bytes: Ключ.
+    """
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * r * n, dklen=32)
+
+
+def pageData(header, index, last):
+    """
+    Возвращает дополнительные данные шифрования страницы.
+
+    Args:
+        header (bytes): Заголовок файла без количества страниц.
+        index (int): Номер страницы.
+        last (bool): Признак последней страницы.
+
+    Returns:
+        bytes: Дополнительные данные.
+    """
+    return header + struct.pack("<Q?", index, last)
+
+
+class EncryptedLedger:
+    def __init__(self, path, password, create=False, source_path=None):
+        """
+        Открывает зашифрованную базу данных и расшифровывает ее в рабочую копию
+        или создает новый зашифрованный файл.
+
+        Args:
+            path (str): Путь к зашифрованному файлу.
+            password (str): Пароль.
+            create (bool, optional): Создать новый файл вместо открытия существующего.
+            source_path (str, optional): Незашифрованная база данных, которая шифруется
+                при создании файла; по умолчанию создается пустая база данных.
+
+        Raises:
+            EncryptionError: Если пароль неверен, файл поврежден или шифрование недоступно.
+        """
+        super(EncryptedLedger, self).__init__()
+        requireCryptography()
+        self.path = path
+        removeStaleCopies()
+        # Временный каталог создается с правами 0700, рабочая копия - с правами 0600
+        self.directory = tempfile.mkdtemp(prefix=WORKING_PREFIX)
+        self.lock = lockWorkingDirectory(self.directory)
+        self.working_path = os.path.join(self.directory, os.path.basename(path)[:-len(".enc")] or "ledger.db")
+        self.page_hashes = []
+        self.saved_state = None
+        try:
+            if create:
+                self.salt, self.params, self.page_size = os.urandom(16), (SCRYPT_N, SCRYPT_R, SCRYPT_P), PAGE_SIZE
+                self.aead = AESGCM(deriveKey(password, self.salt))
+                os.close(os.open(self.working_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600))
+                if source_path is not None:
+                    with open(source_path, "rb") as source, open(self.working_path, "wb") as target:
+                        shutil.copyfileobj(source, target, PAGE_SIZE)
+                self.save()
+            else:
+                self.decrypt(password)
+        except BaseException:
+            self.removeWorkingCopy()
+            raise
+
+    def decrypt(self, password):
+        """
+        Расшифровывает файл в рабочую копию постранично и запоминает хеши страниц.
+
+        Args:
+            password (str): Пароль.
+
+        Raises:
+            EncryptionError: Если пароль неверен или файл поврежден.
+        """
+        with open(self.path, "rb") as source:
+            header = source.read(HEADER.size)
+            if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+                raise EncryptionError("Файл не является зашифрованной базой данных")
+            magic, n, r, p, salt, page_size, pages = HEADER.unpack(header)
+            self.salt, self.params, self.page_size = salt, (n, r, p), page_size
+            self.aead = AESGCM(deriveKey(password, salt, n, r, p))
+            self.checkPassword(source.read(NONCE_SIZE + TAG_SIZE))
+            fd = os.open(self.working_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, "wb") as target:
+                for index in range(pages):
+                    page = self.decryptPage(source.read(NONCE_SIZE + page_size + TAG_SIZE), index, pages)
+                    self.page_hashes.append(hashlib.blake2b(page, digest_size=16).digest())
+                    target.write(page)
+        self.saved_state = self.workingState()
+
+    def workingState(self):
+        """
+        Возвращает размер и время изменения рабочей копии.
+
+        Returns:
+            tuple: Размер в байтах и время изменения в наносекундах.
+        """
+        stat = os.stat(self.working_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def header(self, pages):
+        """
+        Возвращает заголовок файла.
+
+        Args:
+            pages (int): Количество страниц.
+
+        Returns:
+            bytes: Заголовок.
+        """
+        return HEADER.pack(MAGIC, *self.params, self.salt, self.page_size, pages)
+
+    def checkPassword(self, block):
+        """
+        Проверяет пароль по проверочному блоку файла.
+
+        Args:
+            block (bytes): Проверочный блок (nonce и тег шифрования пустой строки).
+
+        Raises:
+            EncryptionError: Если пароль неверен.
+        """
+        try:
+            self.aead.decrypt(block[:NONCE_SIZE], block[NONCE_SIZE:], MAGIC + self.salt)
+        except InvalidTag:
+            raise EncryptionError("Неверный пароль") from None
+
+    def decryptPage(self, block, index, pages):
+        """
+        Расшифровывает страницу.
+
+        Args:
+            block (bytes): Nonce, зашифрованная страница и тег.
+            index (int): Номер страницы.
+            pages (int): Количество страниц в файле.
+
+        Returns:
+            bytes: Страница.
+
+        Raises:
+            EncryptionError: Если страница повреждена, подменена или файл усечен.
+        """
+        try:
+            return self.aead.decrypt(block[:NONCE_SIZE], block[NONCE_SIZE:],
+                                     pageData(self.header(0), index, index == pages - 1))
+        except InvalidTag:
+            raise EncryptionError(f"Страница {index} зашифрованного файла повреждена") from None
+
+    def save(self):
+        """
+        Сохраняет рабочую копию в зашифрованный файл, если она изменилась после прошлого сохранения.
+
+        Заново шифруются только изменившиеся страницы и страницы, у которых изменился
+        признак последней страницы; остальные страницы копируются из прошлого файла.
+        Файл заменяется атомарно.
+
+        Returns:
+            int: Количество заново зашифрованных страниц.
+        """
+        state = self.workingState()
+        if state == self.saved_state:
+            return 0
+        size = os.path.getsize(self.working_path)
+        pages = max((size + self.page_size - 1) // self.page_size, 1)
+        header = self.header(0)
+        old_pages = len(self.page_hashes)
+        page_hashes = []
+        encrypted = 0
+        old = open(self.path, "rb") if old_pages else None
+        try:
+            with open(self.working_path, "rb") as source, open(self.path + ".tmp", "wb") as target:
+                target.write(self.header(pages))
+                nonce = os.urandom(NONCE_SIZE)
+                target.write(nonce + self.aead.encrypt(nonce, b"", MAGIC + self.salt))
+                for index in range(pages):
+                    page = source.read(self.page_size)
+                    page_hash = hashlib.blake2b(page, digest_size=16).digest()
+                    page_hashes.append(page_hash)
+                    last = index == pages - 1
+                    # Страница переиспользуется, если не изменились ни она, ни ее признак последней страницы
+                    if index < old_pages and (index == old_pages - 1) == last and page_hash == self.page_hashes[index]:
+                        old.seek(HEADER.size + NONCE_SIZE + TAG_SIZE + index * (NONCE_SIZE + self.page_size + TAG_SIZE))
+                        target.write(old.read(NONCE_SIZE + len(page) + TAG_SIZE))
+                        continue
+                    nonce = os.urandom(NONCE_SIZE)
+                    target.write(nonce + self.aead.encrypt(nonce, page, pageData(header, index, last)))
+                    encrypted += 1
+                target.flush()
+                os.fsync(target.fileno())
+        finally:
+            if old is not None:
+                old.close()
+        os.replace(self.path + ".tmp", self.path)
+        self.page_hashes = page_hashes
+        self.saved_state = state
+        return encrypted
+
+    def close(self):
+        """
+        Сохраняет изменения и удаляет рабочую копию вместе с временным каталогом.
+        """
+        self.save()
+        self.removeWorkingCopy()
+
+    def removeWorkingCopy(self):
+        """
+        Снимает блокировку и удаляет временный каталог рабочей копии.
+        """
+        if self.lock is not None:
+            self.lock.unlock()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    command, db_path = sys.argv[1], sys.argv[2]
+    try:
+        if command == "encrypt":
+            password = getpass.getpass("Новый пароль: ")
+            if password != getpass.getpass("Повторите пароль: "):
+                sys.exit("Пароли не совпадают")
+            EncryptedLedger(encryptedPath(db_path), password, create=True, source_path=db_path).close()
+            print(f"Создан файл {encryptedPath(db_path)}; незашифрованный файл {db_path} можно удалить")
+        elif command == "decrypt":
+            ledger = EncryptedLedger(encryptedPath(db_path), getpass.getpass("Пароль: "))
+            shutil.copyfile(ledger.working_path, db_path)
+            ledger.removeWorkingCopy()
+            print(f"Расшифрованная база данных сохранена в {db_path}")
+        else:
+            sys.exit("Команда: encrypt или decrypt")
+    except EncryptionError as error:
+        sys.exit(str(error))
@@ -0,0 +1,251 @@
+# Модуль прогноза баланса на конец месяца и года.
+#
+# Прогноз строится по кривым расходов и поступлений по категориям за HISTORY_MONTHS полных
+# месяцев перед текущим. Кривая категории - накопленная сумма изменений баланса по дням месяца;
+# ее читают не из записей, а из таблицы daily_balance (изменения по дням, категориям и валютам,
+# которые поддерживают триггеры, см. connection.DAILY_BALANCE_TRIGGERS), поэтому время
+# прогноза не зависит от количества записей. Кривые всех категорий и месяцев складываются
+# в массив NumPy, и прогноз вычисляется векторными операциями:
+# - на конец месяца - текущий баланс плюс медиана по месяцам истории суммы категории после
+#   сегодняшнего дня месяца (медиана не дает разовой крупной покупке исказить прогноз);
+# - на конец года - прогноз на конец месяца плюс медиана полной суммы категории за месяц
+#   на каждый оставшийся месяц года.
+# Разделенные записи учитываются по своей общей сумме (категория SPLIT_CATEGORY), а курсы
+# других валют берутся на день изменения.
+#
+# Массив кривых кэшируется до следующей записи в базу данных: ключ кэша - номер последнего
+# изменения в журнале изменений и последний импортированный курс.
+#
+# Прогноз требует пакета numpy (pip install numpy); без него прогноз не показывается.
+#
+# Запуск модуля выводит прогноз: python forecast.py [--db expensetracker.db]
+
+
+import argparse
+import datetime
+import sys
+
+from PyQt6 import QtCore
+
+from currency import BASE_CURRENCY, convertAmount, formatMinorUnits
+from paths import DB_PATH
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Количество полных месяцев истории, по которым строятся кривые
+HISTORY_MONTHS = 6
+
+# Наибольшее количество дней в месяце (длина кривой)
+MONTH_DAYS = 31
+
+
+def shiftMonth(year, month, months):
+    """
+    Сдвигает месяц на заданное количество месяцев.
+
+    Args:
+        year (int): Год.
+        month (int): Месяц (1-12).
+        months (int): Сдвиг в месяцах (отрицательный - назад).
+
+    Returns:
+        tuple: Год и месяц после сдвига.
+    """
+    index = year * 12 + month - 1 + months
+    return index // 12, index % 12 + 1
+
+
+def daysInMonth(year, month):
+    """
+    Возвращает количество дней в месяце.
+
+    Args:
+        year (int): Год.
+        month (int): Месяц (1-12).
+
+    Returns:
+        int: Количество дней.
+    """
+    next_year, next_month = shiftMonth(year, month, 1)
+    return (datetime.date(next_year, next_month, 1) - datetime.date(year, month, 1)).days
+
+
+class BalanceForecast:
+    """
+    Прогноз баланса по кривым расходов и поступлений по категориям.
+    """
+
+    def __init__(self, conn, history_months=HISTORY_MONTHS):
+        """
+        Инициализирует прогноз.
+
+        Args:
+            conn (connection.Data): Подключение к базе данных.
+            history_months (int, optional): Количество полных месяцев истории.
+        """
+        self.conn = conn
+        self.history_months = history_months
+        self.cache_key = None
+        self.categories = []
+        self.curves = None
+
+    def getCacheKey(self, year, month):
+        """
+        Возвращает ключ кэша кривых: месяц прогноза, номер последнего изменения записей
+        и последний импортированный курс.
+
+        Args:
+            year (int): Год прогноза.
+            month (int): Месяц прогноза.
+
+        Returns:
+            tuple: Ключ кэша.
+        """
+        query = self.conn.executeQuery("SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'changes'), "
+                                       "(SELECT MAX(rowid) FROM exchange_rates)")
+        if not query.next():
+            return None
+        return year, month, query.value(0), query.value(1)
+
+    def loadCurves(self, year, month):
+        """
+        Читает изменения баланса по дням и категориям за месяцы истории и строит кривые.
+
+        Месяцы до первого месяца с записями в историю не входят, чтобы пустые месяцы
+        не занижали медианы.
+
+        Args:
+            year (int): Год прогноза.
+            month (int): Месяц прогноза.
+
+        Returns:
+            tuple: Список категорий и массив numpy формы (категории, месяцы, MONTH_DAYS)
+            накопленных изменений баланса в минимальных единицах базовой валюты
+            (None, если истории нет).
+        """
+        first_year, first_month = shiftMonth(year, month, -self.history_months)
+        query = self.conn.executeQuery("SELECT MIN(day) FROM daily_balance")
+        first_day = (query.value(0) if query.next() else None) or f"{year:04d}-{month:02d}-01"
+        start = max(f"{first_year:04d}-{first_month:02d}", first_day[:7])
+        months = []
+        current_year, current_month = first_year, first_month
+        while (current_year, current_month) < (year, month):
+            if f"{current_year:04d}-{current_month:02d}" >= start:
+                months.append(f"{current_year:04d}-{current_month:02d}")
+            current_year, current_month = shiftMonth(current_year, current_month, 1)
+        if not months:
+            return [], None
+
+        # Изменения в базовой валюте читаются строкой пар 'день сумма' на категорию и месяц,
+        # изменения в других валютах - по одному и пересчитываются по курсу на день
+        bounds = [f"{months[0]}-01", f"{months[-1]}-31", BASE_CURRENCY]
+        query = self.conn.executeQuery("SELECT category, substr(day, 1, 7), "
+                                       "group_concat(CAST(substr(day, 9, 2) AS INTEGER) || ' ' || net, ' ') "
+                                       "FROM daily_balance WHERE day BETWEEN ? AND ? AND currency = ? AND net <> 0 "
+                                       "GROUP BY 1, 2", bounds)
+        month_index = {key: index for index, key in enumerate(months)}
+        category_index = {}
+        groups = []
+        while query.next():
+            groups.append((category_index.setdefault(query.value(0), len(category_index)),
+                           month_index[query.value(1)], query.value(2)))
+        query = self.conn.executeQuery("SELECT category, day, currency, net FROM daily_balance "
+                                       "WHERE day BETWEEN ? AND ? AND currency <> ? AND net <> 0", bounds)
+        converted = []
+        while query.next():
+            rate = self.conn.rates.getRate(query.value(2), query.value(1))
+            converted.append((category_index.setdefault(query.value(0), len(category_index)),
+                              month_index[query.value(1)[:7]], int(query.value(1)[8:10]),
+                              convertAmount(query.value(3), rate)))
+        if not groups and not converted:
+            return [], None
+
+        daily = numpy.zeros((len(category_index), len(months), MONTH_DAYS), dtype=numpy.int64)
+        for category, month, pairs in groups:
+            pairs = numpy.array(pairs.split(), dtype=numpy.int64).reshape(-1, 2)
+            daily[category, month, pairs[:, 0] - 1] = pairs[:, 1]
+        for category, month, day, value in converted:
+            daily[category, month, day - 1] += value
+        return list(category_index), numpy.cumsum(daily, axis=2)
+
+    def getCurves(self, year, month):
+        """
+        Возвращает кривые категорий, перечитывая их только после записи в базу данных.
+
+        Args:
+            year (int): Год прогноза.
+            month (int): Месяц прогноза.
+
+        Returns:
+            tuple: Список категорий и массив накопленных изменений (см. loadCurves).
+        """
+        key = self.getCacheKey(year, month)
+        if key is None or key != self.cache_key:
+            self.categories, self.curves = self.loadCurves(year, month)
+            self.cache_key = key
+        return self.categories, self.curves
+
+    def forecast(self, balance, today=None):
+        """
+        Прогнозирует баланс на конец текущего месяца и года.
+
+        Args:
+            balance (int): Текущий баланс в минимальных единицах базовой валюты.
+            today (datetime.date, optional): Текущая дата.
+
+        Returns:
+            dict: Прогноз на конец месяца ('month_end') и года ('year_end') и ожидаемые
+            до конца месяца изменения по категориям ('categories', список пар по возрастанию
+            изменения, то есть от наибольших расходов), суммы в минимальных единицах базовой
+            валюты; None, если numpy не установлен или истории еще нет.
+        """
+        if numpy is None:
+            return None
+        today = today or datetime.date.today()
+        categories, curves = self.getCurves(today.year, today.month)
+        if curves is None:
+            return None
+
+        # Изменения после сегодняшнего дня; дни истории после конца текущего месяца
+        # (31-е число для месяца из 30 дней) относятся к его последнему дню
+        totals = curves[:, :, -1]
+        if today.day < daysInMonth(today.year, today.month):
+            rest = numpy.median(totals - curves[:, :, today.day - 1], axis=1)
+        else:
+            rest = numpy.zeros(len(categories))
+        monthly = numpy.median(totals, axis=1)
+
+        month_end = balance + int(round(rest.sum()))
+        year_end = month_end + int(round(monthly.sum() * (12 - today.month)))
+        order = numpy.argsort(rest)
+        return {
+            "month_end": month_end,
+            "year_end": year_end,
+            "categories": [(categories[index], int(round(rest[index]))) for index in order if rest[index] != 0],
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Прогноз баланса на конец месяца и года")
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы данных")
+    args = parser.parse_args()
+
+    if numpy is None:
+        sys.exit("Для прогноза баланса установите пакет numpy")
+    app = QtCore.QCoreApplication(sys.argv)
+    from connection import Data
+
+    conn = Data(args.db)
+    balance = conn.getBalance()
+    result = BalanceForecast(conn).forecast(balance)
+    if result is None:
+        sys.exit("Для прогноза нужна история хотя бы за один полный месяц")
+    print(f"Баланс:\t{formatMinorUnits(balance)}")
+    print(f"На конец месяца:\t{formatMinorUnits(result['month_end'])}")
+    print(f"На конец года:\t{formatMinorUnits(result['year_end'])}")
+    for category, change in result["categories"]:
+        print(f"{category}\t{formatMinorUnits(change)}")
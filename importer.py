@@ -0,0 +1,199 @@
+# Модуль для импорта банковских выписок из CSV-файла с автоматическим определением категорий.
+#
+# Строки выписки имеют вид 'дата;описание;сумма[;валюта[;категория]]', разделителем может быть
+# точка с запятой или запятая, дата указывается в формате 'DD.MM.YYYY' или 'YYYY-MM-DD'.
+# Отрицательная сумма - расход, положительная - поступление. Строки без суммы (например,
+# заголовок) пропускаются.
+#
+# Строки, уже импортированные раньше (с тем же отпечатком, см. модуль duplicates), пропускаются:
+# если в выписке несколько одинаковых строк, пропускается столько, сколько таких записей уже есть.
+# Категории расходов, не указанные в выписке, определяет модель categorizer.Categorizer
+# одним пакетом; если модель не уверена в категории, запись попадает в категорию 'Прочее'.
+# Все записи вставляются одной транзакцией, после чего модель дообучается на категориях,
+# указанных в выписке, и сохраняется.
+#
+# Выписки других форматов читают плагины импорта (см. модуль plugins), а функция writeStatement
+# записывает записи в формате, который читает readStatement (встроенный плагин экспорта).
+#
+# Запуск модуля импортирует выписку в базу данных:
+# python importer.py [--format 'CSV (*.csv)'] statement.csv
+
+
+import datetime
+import sys
+
+from PyQt6 import QtCore
+
+from categorizer import MIN_CONFIDENCE
+from connection import CATEGORIES, INCOME_CATEGORY
+from currency import BASE_CURRENCY, formatMinorUnits, toMinorUnits
+from duplicates import fingerprint
+
+
+# Категория расходов, в которую попадают записи с неуверенно определенной категорией
+FALLBACK_CATEGORY = "Прочее"
+
+
+def parseStatementDate(date):
+    """
+    Преобразует дату из выписки в формат 'DD.MM.YYYY'.
+
+    Args:
+        date (str): Дата в формате 'DD.MM.YYYY' или 'YYYY-MM-DD'.
+
+    Returns:
+        str: Дата в формате 'DD.MM.YYYY'.
+
+    Raises:
+        ValueError: Если дата не соответствует ни одному из форматов.
+    """
+    if "-" in date:
+        return datetime.datetime.strptime(date, "%Y-%m-%d").strftime("%d.%m.%Y")
+    return datetime.datetime.strptime(date, "%d.%m.%Y").strftime("%d.%m.%Y")
+
+
+def readStatement(path):
+    """
+    Читает выписку из CSV-файла.
+
+    Args:
+        path (str): Путь к CSV-файлу.
+
+    Returns:
+        tuple: Список кортежей (описание, сумма в минимальных единицах со знаком, валюта,
+        категория или None, дата 'DD.MM.YYYY') и количество пропущенных строк.
+    """
+    import csv
+
+    rows = []
+    skipped = 0
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        # Разделитель определяется по первой строке: в описаниях и категориях бывают запятые
+        delimiter = ";" if ";" in file.readline() else ","
+        file.seek(0)
+        for row in csv.reader(file, delimiter=delimiter):
+            if not any(cell.strip() for cell in row):
+                continue
+            if len(row) < 3:
+                skipped += 1
+                continue
+            cells = [cell.strip() for cell in row] + ["", ""]
+            try:
+                value = toMinorUnits(cells[2])
+                date = parseStatementDate(cells[0])
+            except (ArithmeticError, ValueError):
+                # Заголовок или некорректная строка
+                skipped += 1
+                continue
+            currency = cells[3].upper() or BASE_CURRENCY
+            category = cells[4] if cells[4] in CATEGORIES else None
+            rows.append((cells[1], value, currency, category, date))
+    return rows, skipped
+
+
+def writeStatement(rows, path):
+    """
+    Записывает записи в CSV-файл в формате выписки, которую читает readStatement.
+
+    Args:
+        rows (list): Список кортежей (ID, описание, сумма в минимальных единицах, валюта,
+            категория, дата 'DD.MM.YYYY').
+        path (str): Путь к CSV-файлу.
+    """
+    import csv
+
+    with open(path, "w", newline="", encoding="utf-8-sig") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(["Дата", "Описание", "Сумма", "Валюта", "Категория"])
+        for entry_id, description, value, currency, category, date in rows:
+            signed = value if category == INCOME_CATEGORY else -value
+            writer.writerow([date, description, formatMinorUnits(signed), currency, category])
+
+
+def importStatement(conn, categorizer, path, parser=readStatement):
+    """
+    Импортирует выписку в базу данных, определяя недостающие категории расходов.
+
+    Args:
+        conn (Data): Объект для работы с базой данных.
+        categorizer (Categorizer): Модель определения категорий.
+        path (str): Путь к файлу выписки.
+        parser (callable, optional): Функция чтения выписки с результатом как у readStatement
+            (например, Plugin.call плагина импорта); None вместо результата - ошибка чтения.
+
+    Returns:
+        dict: Количество импортированных записей ('imported'), записей с категорией,
+        определенной моделью ('categorized'), записей в категории по умолчанию ('fallback'),
+        пропущенных строк ('skipped') и уже импортированных записей ('duplicates')
+        или None, если выписку не удалось прочитать или записи не удалось сохранить.
+    """
+    statement = parser(path)
+    if statement is None:
+        return None
+    rows, skipped = statement
+    categorizer.refresh()
+
+    # Строки, уже имеющиеся в базе данных, определяются по отпечаткам одним набором запросов
+    fingerprints = [fingerprint(description, abs(value), date, currency)
+                    for description, value, currency, category, date in rows]
+    existing = conn.countFingerprints(fingerprints)
+    new_rows = []
+    for row, row_fingerprint in zip(rows, fingerprints):
+        if existing.get(row_fingerprint):
+            existing[row_fingerprint] -= 1
+        else:
+            new_rows.append(row)
+    duplicates = len(rows) - len(new_rows)
+    rows = new_rows
+
+    # Категории расходов определяются одним пакетом
+    expense_categories = [category for category in CATEGORIES if category != INCOME_CATEGORY]
+    unknown = [row[0] for row in rows if row[3] is None and row[1] < 0]
+    suggestions = iter(categorizer.categorize(unknown, expense_categories))
+
+    entries = []
+    categorized = fallback = 0
+    for description, value, currency, category, date in rows:
+        if category is None and value >= 0:
+            category = INCOME_CATEGORY
+        elif category is None:
+            category, confidence = next(suggestions)
+            if category is not None and confidence >= MIN_CONFIDENCE:
+                categorized += 1
+            else:
+                category = FALLBACK_CATEGORY
+                fallback += 1
+        entries.append((description, abs(value), category, date, currency))
+
+    if not conn.insertEntries(entries):
+        return None
+
+    # Модель учится только на категориях из выписки, а не на своих предположениях
+    for description, value, currency, category, date in rows:
+        if category is not None:
+            categorizer.learn(description, category)
+    categorizer.skipLearned()
+    categorizer.save()
+    return {"imported": len(entries), "categorized": categorized, "fallback": fallback, "skipped": skipped,
+            "duplicates": duplicates}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from categorizer import Categorizer
+    from connection import Data
+    from plugins import registry
+
+    formats = [plugin.name for plugin in registry.getPlugins("importer")]
+    parser = argparse.ArgumentParser(description="Импорт банковских выписок")
+    parser.add_argument("--format", default=formats[0], choices=formats, help="плагин импорта")
+    parser.add_argument("paths", nargs="+", help="файлы выписок")
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication(sys.argv)
+    conn = Data()
+    categorizer = Categorizer(conn)
+    plugin = registry.getPlugin("importer", args.format)
+    for path in args.paths:
+        print(f"{path}: {importStatement(conn, categorizer, path, plugin.call)}")
@@ -7,38 +7,259 @@
 # - Обработку пользовательских взаимодействий, таких как добавление, редактирование и удаление записей.
 # - Открытие окон добавления и редактирования записей.
 # - Фильтрацию данных по дате и категории.
+# - Материализацию повторяющихся операций при запуске и их прогноз на будущие даты.
+# - Отображение состояния месячных бюджетов по категориям и предупреждения о превышении лимита.
+# - Ввод сумм в разных валютах и импорт курсов валют из файла.
+# - Быстрый запуск: показ снимка предыдущего сеанса до открытия базы данных.
+# - Окно диагностики со статистикой запросов к базе данных и журналом медленных запросов.
+# - Подсказку категории по описанию записи и импорт банковских выписок с автоматическим
+#   определением категорий (см. модули categorizer и importer).
+# - Предупреждение о повторном добавлении записи и окно проверки похожих записей,
+#   в котором их можно объединить или удалить (см. модуль duplicates).
+# - Автодополнение описаний в окнах записи с подстановкой вероятной категории и суммы
+#   (индекс описаний строится в фоновом потоке, см. модуль completion).
+# - Перенос записей закрытых лет в архивы (см. модуль archive).
+# - Работу с зашифрованной базой данных: если есть файл 'expensetracker.db.enc', при запуске
+#   запрашивается пароль, а изменения периодически сохраняются в зашифрованный файл
+#   (см. модуль encryption).
+# - Резервное копирование без остановки приложения: полная копия и копия изменений создаются
+#   отдельным процессом, ход копирования показывается в строке состояния (см. модуль backup).
+# - Синхронизацию с другим файлом базы данных (см. модуль sync).
+# - Вложения записей (фотографии чеков) в окнах записи и их миниатюры в таблице записей;
+#   миниатюры создаются в фоновых потоках (см. модуль attachments).
+# - Разделение записи на строки по категориям, метки записей, список записей с меткой
+#   и отчет по метке (см. модуль splits).
+# - Плагины (см. модуль plugins): форматы импорта выписок и экспорта записей, панели над таблицей
+#   записей и их время вызовов в окне диагностики. Плагины ищутся в фоновом потоке при создании
+#   окна, а их панели добавляются после первого показа данных.
+#
+# Окна добавления и изменения записи, а также слой работы с SQL (QtSql, connection, recurring)
+# импортируются при первом использовании, чтобы не задерживать первую отрисовку окна. Миграции
+# схемы, запись наступивших повторяющихся операций и подсчет баланса при запуске выполняются
+# в фоновом потоке (StartupWorker), пока окно показывает снимок предыдущего сеанса.
+# Аргумент --profile-startup выводит время этапов запуска (см. модуль profiler).
+
 
+import profiler
 
+import os
 import sys
 from PyQt6 import QtWidgets
-from PyQt6.QtWidgets import QApplication, QMainWindow, QMessageBox
-from PyQt6.QtSql import QSqlQueryModel
-from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication, QMainWindow, QMessageBox, QInputDialog, QFileDialog, QCompleter
+from PyQt6.QtGui import QDesktopServices, QStandardItemModel, QStandardItem
+from PyQt6.QtCore import Qt, QDate, QTimer, QThread, QProcess, QStringListModel, QUrl, pyqtSignal
 
 from ui_main import Ui_MainWindow
-from new_entry import Ui_Dialog as NewEntryUI
-from edit_entry import Ui_Dialog as EditEntryUI
-from connection import Data
+from paths import DB_PATH
+from currency import MINOR_UNITS, toMinorUnits, formatMinorUnits
+from delegates import MoneyDelegate, LedgerDelegate, AttachmentDelegate
+from snapshot import loadSnapshot, saveSnapshot, SNAPSHOT_ROWS
+
+profiler.mark("Импорт модулей")
+
+
+# Периоды повторения для пунктов repeatComboBox окна добавления записи: (единица, шаг)
+REPEAT_PERIODS = {
+    1: ("days", 7),
+    2: ("months", 1),
+    3: ("years", 1),
+}
+
+# Оформление ячеек панели бюджетов; ячейки таблицы записей так же рисует LedgerDelegate
+BUDGET_ITEM_STYLE = """
+QTableView::item {
+    border-style: none;
+    border-bottom: 1px solid rgb(70, 68, 81);
+    padding-left: 5px;
+}
+
+QTableView::item:selected {
+    border: none;
+    color: rgb(70, 68, 81);
+    background-color: rgba(255, 255, 255, 50);
+}"""
+
+
+class StartupWorker(QThread):
+    # Сигнал о подготовленной базе данных: количество записанных вхождений повторяющихся
+    # операций и баланс (None, если баланс не считался)
+    prepared = pyqtSignal(int, object)
+
+    def __init__(self, db_path, journal_mode, count_balance, parent=None):
+        """
+        Инициализирует поток подготовки базы данных при запуске.
+
+        Args:
+            db_path (str): Путь к файлу базы данных.
+            journal_mode (str): Режим журнала соединения (см. connection.Data).
+            count_balance (bool): Посчитать баланс, даже если повторяющихся операций не записано.
+            parent (QObject, optional): Родительский объект.
+        """
+        super(StartupWorker, self).__init__(parent)
+        self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.count_balance = count_balance
+
+    def run(self):
+        """
+        Выполняет миграции схемы и заполнение столбцов (при создании соединения), записывает
+        наступившие повторяющиеся операции и считает баланс через отдельное соединение.
+        """
+        from connection import Data
+        from recurring import Scheduler
+
+        with profiler.timed("Подготовка базы данных (фоновый поток)"):
+            conn = Data(self.db_path, connection_name="startup", journal_mode=self.journal_mode)
+            materialized = Scheduler(conn).materializeDue()
+            balance = conn.getBalance() if materialized or self.count_balance else None
+            conn.close()
+        self.prepared.emit(materialized, balance)
 
 
 class ExpanseTracker(QMainWindow):
-    def __init__(self):
+    # Сигнал о завершении запуска: соединение с базой данных открыто, данные актуальны
+    ready = pyqtSignal()
+
+    def __init__(self, db_path=DB_PATH, vault=None):
         """
-        Инициализирует главное окно приложения, устанавливает соединение с базой данных,
-        отображает актуальные данные и подключает сигналы к слотам.
+        Инициализирует главное окно приложения и показывает снимок предыдущего сеанса.
+        Соединение с базой данных устанавливается после первой отрисовки окна и подготовки базы
+        данных в фоновом потоке (см. paintEvent и StartupWorker).
+
+        Args:
+            db_path (str, optional): Путь к файлу базы данных.
+            vault (EncryptedLedger, optional): Зашифрованная база данных, рабочая копия
+                которой открывается по пути db_path.
         """
         super(ExpanseTracker, self).__init__()
 
+        # Точки входа плагинов читаются, пока создается окно: соединение с базой данных
+        # и первая запись получают уже найденные обработчики записи
+        from plugins import registry
+
+        registry.discoverInBackground()
+
         # Инициализация главного окна
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
+        self.db_path = db_path
+        self.conn = None
+        self.balance = None
+        self.categorizer = None
+        self.descriptionIndex = None
+        self.startupWorker = None
+        self.indexBuilder = None
+        self.backupProcess = None
+        self.reportProcess = None
+        self.reportPath = None
+        self.idleMaintenance = None
+        self.vault = vault
+        self.attachments = None
+        self.thumbnails = None
+        self.attachmentDelegate = None
+        self.attachmentList = None
+        self.attachmentWidgets = []
+        self.splitEditor = None
+        self.tagsLineEdit = None
+        self.splitWidgets = []
+        self.tagFilter = None
+        self.pluginWidgets = []
+
+        # Изменения рабочей копии зашифрованной базы данных периодически сохраняются
+        if self.vault is not None:
+            from encryption import SAVE_INTERVAL_MS
+
+            self.saveTimer = QTimer(self)
+            self.saveTimer.timeout.connect(self.saveEncrypted)
+            self.saveTimer.start(SAVE_INTERVAL_MS)
+
+        # Суммы хранятся в минимальных единицах и форматируются только при отображении
+        self.moneyDelegate = MoneyDelegate(self)
+
+        # Ячейки таблицы записей рисует делегат, а не таблица стилей; строки одной высоты,
+        # поэтому при прокрутке высоты строк не вычисляются
+        self.model = None
+        self.ledgerDelegate = LedgerDelegate(self)
+        self.ui.tableView.setItemDelegate(self.ledgerDelegate)
+        self.ui.tableView.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.ResizeMode.Fixed)
+        self.ui.tableView.verticalHeader().setDefaultSectionSize(LedgerDelegate.ROW_HEIGHT)
+
+        # Панель бюджетов, прогноз баланса и меню
+        self.setupBudgetPanel()
+        self.setupForecastLabel()
+        self.setupMenu()
+
+        # Снимок предыдущего сеанса показывается сразу, без запросов к базе данных
+        self.snapshot = loadSnapshot(self.db_path)
+        if self.snapshot:
+            self.showSnapshot(self.snapshot)
+        self.startupScheduled = False
+        profiler.mark("Создание окна")
+
+    def paintEvent(self, event):
+        """
+        Отрисовывает окно и после первой отрисовки планирует завершение запуска.
+
+        Args:
+            event (QPaintEvent): Событие отрисовки.
+        """
+        super(ExpanseTracker, self).paintEvent(event)
+        if not self.startupScheduled:
+            self.startupScheduled = True
+            profiler.mark("Первая отрисовка")
+            QTimer.singleShot(0, self.finishStartup)
+
+    def finishStartup(self):
+        """
+        Начинает подготовку базы данных в фоновом потоке (см. StartupWorker).
+        """
+        with profiler.timed("Импорт слоя SQL"):
+            from connection import JOURNAL_MODE
+
+        # Рабочая копия зашифрованной базы данных доступна только приложению и остается в режиме
+        # журнала отката, чтобы файл, который шифрует EncryptedLedger.save, всегда содержал все записи
+        self.journalMode = "DELETE" if self.vault is not None else JOURNAL_MODE
+
+        # Миграции схемы, запись наступивших повторяющихся операций (включая пропущенные периоды)
+        # и подсчет баланса выполняются в фоновом потоке, пока окно показывает снимок; баланс
+        # из снимка пересчитывается, только если база данных изменилась после его сохранения
+        count_balance = not (self.snapshot and self.snapshot["valid"])
+        self.startupWorker = StartupWorker(self.db_path, self.journalMode, count_balance, self)
+        self.startupWorker.prepared.connect(self.connectDatabase)
+        self.startupWorker.start()
+
+    def connectDatabase(self, materialized, balance):
+        """
+        Устанавливает соединение с подготовленной базой данных, обновляет данные окна
+        и подключает сигналы к слотам.
+
+        Args:
+            materialized (int): Количество записанных вхождений повторяющихся операций.
+            balance (int): Баланс, посчитанный потоком подготовки, или None, если действует баланс снимка.
+        """
+        # Окно закрыли до окончания подготовки базы данных
+        if self.startupWorker is None:
+            return
+
+        from connection import Data
+        from recurring import Scheduler
 
-        # Установка соединения с базой данных
-        self.conn = Data()
+        self.startupWorker.wait()
+        self.startupWorker = None
+        with profiler.timed("Открытие базы данных"):
+            self.conn = Data(self.db_path, journal_mode=self.journalMode)
+        self.setupAttachmentStore()
+        self.scheduler = Scheduler(self.conn)
 
-        # Отображение и обновление данных
+        # Отображение данных; модели таблиц читают результаты запросов в этом потоке
         self.viewData()
-        self.reloadData()
+        self.balance = self.snapshot["balance"] if balance is None else balance
+        self.ui.balanceDynamicLabel.setText(formatMinorUnits(self.balance))
+        self.reloadBudgets()
+        # Прогноз считается после первого показа данных: импорт numpy не задерживает запуск
+        QTimer.singleShot(0, self.updateForecast)
+        # Панели плагинов создаются тоже после первого показа данных
+        QTimer.singleShot(0, self.loadPlugins)
 
         # Подключение сигналов к слотам
         self.ui.addButton.clicked.connect(self.openAddEntryWindow)
@@ -49,39 +270,602 @@ class ExpanseTracker(QMainWindow):
         self.ui.categoryComboBox.currentIndexChanged.connect(self.viewData)
         self.ui.dateEdit.dateChanged.connect(self.viewData)
 
+        # Индекс описаний для автодополнения строится в фоне и не задерживает запуск
+        from completion import IndexBuilder
+
+        self.indexBuilder = IndexBuilder(self.db_path, self)
+        self.indexBuilder.built.connect(self.setDescriptionIndex)
+        self.indexBuilder.start()
+
+        # Обслуживание базы данных выполняется, пока пользователь не работает с окном
+        from maintenance import IdleMaintenance
+
+        self.idleMaintenance = IdleMaintenance(self.conn, self)
+        self.idleMaintenance.checked.connect(self.showMaintenanceResult)
+        profiler.mark("Готовность к работе")
+        profiler.report()
+        self.ready.emit()
+
+    def showSnapshot(self, snapshot):
+        """
+        Восстанавливает фильтры из снимка и, если снимок актуален, показывает баланс и первые записи.
+
+        Args:
+            snapshot (dict): Снимок, загруженный функцией loadSnapshot.
+        """
+        filters = snapshot["filters"]
+        self.ui.dateCheckBox.setChecked(filters["date_cb"])
+        self.ui.dateEdit.setEnabled(not filters["date_cb"])
+        self.ui.dateEdit.setDate(QDate.fromString(filters["date"], "dd.MM.yyyy"))
+        self.ui.categoryCheckBox.setChecked(filters["category_cb"])
+        self.ui.categoryComboBox.setEnabled(not filters["category_cb"])
+        self.ui.categoryComboBox.setCurrentIndex(filters["category_index"])
+        self.setTagFilter(filters.get("tag"))
+        if not snapshot["valid"]:
+            return
+
+        self.ui.balanceDynamicLabel.setText(formatMinorUnits(snapshot["balance"]))
+        self.ui.tableView.setModel(self.createItemModel(snapshot["headers"], snapshot["rows"]))
+        self.setColumnWidths()
+
+    def createItemModel(self, headers, rows):
+        """
+        Создает модель таблицы с неизменяемыми данными.
+
+        Args:
+            headers (list): Заголовки колонок.
+            rows (list): Строки таблицы в виде списков значений.
+
+        Returns:
+            QStandardItemModel: Модель с данными.
+        """
+        model = QStandardItemModel(len(rows), len(headers), self)
+        model.setHorizontalHeaderLabels(headers)
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QStandardItem()
+                item.setData(value, Qt.ItemDataRole.DisplayRole)
+                model.setItem(row, column, item)
+        return model
+
+    def saveEncrypted(self):
+        """
+        Сохраняет изменения рабочей копии в зашифрованный файл базы данных.
+        """
+        try:
+            self.vault.save()
+        except OSError as error:
+            print(error)
+
+    def setDescriptionIndex(self, index):
+        """
+        Подключает индекс описаний, построенный в фоновом потоке, и учитывает в нем записи,
+        добавленные во время построения.
+
+        Args:
+            index (DescriptionIndex): Индекс описаний.
+        """
+        index.refresh(self.conn)
+        self.descriptionIndex = index
+
+    def setupCompleter(self, dialog, lineEdit, fill_details):
+        """
+        Подключает автодополнение описаний к полю описания окна записи.
+
+        Args:
+            dialog (QtWidgets.QDialog): Окно записи.
+            lineEdit (QtWidgets.QLineEdit): Поле описания.
+            fill_details (bool): Подставлять ли категорию и сумму выбранного описания.
+        """
+        model = QStringListModel(dialog)
+        completer = QCompleter(model, dialog)
+        completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        completer.setWidget(lineEdit)
+
+        def showCompletions(text):
+            if self.descriptionIndex is None:
+                return
+            completions = self.descriptionIndex.complete(text)
+            model.setStringList(completions)
+            if completions:
+                completer.complete()
+            else:
+                completer.popup().hide()
+
+        def selectCompletion(text):
+            lineEdit.setText(text)
+            if fill_details:
+                self.fillEntryDetails(text)
+
+        lineEdit.textEdited.connect(showCompletions)
+        completer.activated.connect(selectCompletion)
+
+    def fillEntryDetails(self, description):
+        """
+        Подставляет в окно добавления записи самые вероятные категорию и сумму для описания.
+
+        Args:
+            description (str): Выбранное описание.
+        """
+        details = self.descriptionIndex.details(description)
+        if details is None:
+            return
+        category, value, currency = details
+        self.addEntryWindow.categoryComboBox.setCurrentText(category)
+        self.addEntryWindow.priceSpinBox.setValue(value / MINOR_UNITS)
+        if self.addEntryWindow.currencyComboBox.findText(currency) >= 0:
+            self.addEntryWindow.currencyComboBox.setCurrentText(currency)
+
+    def setupAttachmentStore(self):
+        """
+        Подключает хранилище вложений и показ их миниатюр в колонке описания таблицы записей.
+        """
+        # Файлы вложений не шифруются, поэтому для зашифрованной базы данных вложения отключены
+        if self.vault is not None:
+            return
+        from attachments import AttachmentStore, ThumbnailCache, attachmentDirectory
+
+        self.attachments = AttachmentStore(self.conn, attachmentDirectory(self.db_path))
+        self.thumbnails = ThumbnailCache(self.attachments, parent=self)
+        self.attachmentDelegate = AttachmentDelegate(self.thumbnails, self)
+        self.ui.tableView.setItemDelegateForColumn(1, self.attachmentDelegate)
+        self.thumbnails.ready.connect(lambda attachment: self.ui.tableView.viewport().update())
+
+    def setupAttachments(self, dialog, ui, entry_id=None):
+        """
+        Добавляет в окно записи список вложений с кнопками прикрепления и открепления файлов.
+
+        Args:
+            dialog (QtWidgets.QDialog): Окно записи.
+            ui (Ui_Dialog): Интерфейс окна записи.
+            entry_id (int, optional): ID изменяемой записи.
+        """
+        self.attachmentList = None
+        self.attachmentWidgets = []
+        if self.attachments is None:
+            return
+        from attachments import AttachmentList, IMAGE_FILTER
+
+        attachment_list = AttachmentList(self.thumbnails, dialog)
+        if entry_id is not None:
+            for attachment, name in self.attachments.getAttachments(entry_id):
+                attachment_list.addAttachment(name, attachment=attachment)
+        attach_button = QtWidgets.QPushButton("Прикрепить чек...", dialog)
+        detach_button = QtWidgets.QPushButton("Открепить", dialog)
+
+        def chooseFiles():
+            paths, _ = QFileDialog.getOpenFileNames(dialog, "Вложения", "", IMAGE_FILTER)
+            for path in paths:
+                attachment_list.addAttachment(os.path.basename(path), path=path)
+
+        attach_button.clicked.connect(chooseFiles)
+        detach_button.clicked.connect(attachment_list.removeSelected)
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(attach_button)
+        buttons.addWidget(detach_button)
+        position = ui.verticalLayout.indexOf(ui.saveButton)
+        ui.verticalLayout.insertWidget(position, attachment_list)
+        ui.verticalLayout.insertLayout(position + 1, buttons)
+        self.attachmentList = attachment_list
+        self.attachmentWidgets = [attachment_list, attach_button, detach_button]
+
+    def updateEntryWidgets(self, repeat):
+        """
+        Отключает вложения, метки и строки в окне добавления записи для повторяющейся операции:
+        они относятся к записям, а не к правилам повторения.
+
+        Args:
+            repeat (int): Индекс выбранного пункта repeatComboBox.
+        """
+        for widget in self.attachmentWidgets + self.splitWidgets:
+            widget.setEnabled(repeat not in REPEAT_PERIODS)
+
+    def setupSplits(self, dialog, ui, entry_id=None):
+        """
+        Добавляет в окно записи поле меток и таблицу строк для разделения записи по категориям.
+        Пока в таблице есть строки, сумма записи равна их сумме, а категория записи не выбирается.
+
+        Args:
+            dialog (QtWidgets.QDialog): Окно записи.
+            ui (Ui_Dialog): Интерфейс окна записи.
+            entry_id (int, optional): ID изменяемой записи.
+        """
+        from connection import CATEGORIES, INCOME_CATEGORY
+        from splits import SplitEditor
+
+        tags_line_edit = QtWidgets.QLineEdit(dialog)
+        tags_line_edit.setPlaceholderText("Метки через запятую")
+        tags_line_edit.setCompleter(QCompleter(self.conn.getTags(), dialog))
+        split_editor = SplitEditor([category for category in CATEGORIES if category != INCOME_CATEGORY], dialog)
+        split_editor.hide()
+
+        def updateTotal(total, count):
+            if count:
+                ui.priceSpinBox.setValue(total / MINOR_UNITS)
+            ui.priceSpinBox.setEnabled(not count)
+            ui.categoryComboBox.setEnabled(not count)
+
+        def addItem():
+            split_editor.show()
+            split_editor.addItem()
+
+        split_editor.totalChanged.connect(updateTotal)
+        add_button = QtWidgets.QPushButton("Разделить по категориям", dialog)
+        add_button.clicked.connect(addItem)
+        remove_button = QtWidgets.QPushButton("Удалить строку", dialog)
+        remove_button.clicked.connect(split_editor.removeSelected)
+        if entry_id is not None:
+            tags_line_edit.setText(", ".join(self.conn.getTags(entry_id)))
+            for category, value, description in self.conn.getSplit(entry_id):
+                split_editor.addItem(category, value, description)
+            split_editor.setVisible(split_editor.rowCount() > 0)
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addWidget(add_button)
+        buttons.addWidget(remove_button)
+        position = ui.verticalLayout.indexOf(ui.saveButton)
+        ui.verticalLayout.insertWidget(position, tags_line_edit)
+        ui.verticalLayout.insertWidget(position + 1, split_editor)
+        ui.verticalLayout.insertLayout(position + 2, buttons)
+        self.tagsLineEdit = tags_line_edit
+        self.splitEditor = split_editor
+        self.splitWidgets = [tags_line_edit, split_editor, add_button, remove_button]
+
+    def saveSplits(self, entry_id):
+        """
+        Сохраняет метки и строки записи из окна записи.
+
+        Args:
+            entry_id (int): ID записи.
+
+        Returns:
+            bool: True, если метки и строки сохранены.
+        """
+        from splits import parseTags
+
+        saved = self.conn.setTags(entry_id, parseTags(self.tagsLineEdit.text()))
+        items = self.splitEditor.items()
+        if items:
+            saved = self.conn.setSplit(entry_id, items) and saved
+        return saved
+
+    def entryCategories(self, category):
+        """
+        Возвращает категории записи из окна записи: категории строк разделенной записи
+        или выбранную категорию.
+
+        Args:
+            category (str): Категория, выбранная в окне записи.
+
+        Returns:
+            list: Категории без повторов.
+        """
+        items = self.splitEditor.items() if self.splitEditor is not None else []
+        if not items:
+            return [category]
+        return list(dict.fromkeys(item[0] for item in items))
+
+    def saveAttachments(self, entry_id):
+        """
+        Прикрепляет к записи новые файлы из окна записи и открепляет убранные из него вложения.
+
+        Args:
+            entry_id (int): ID записи.
+
+        Returns:
+            bool: True, если все вложения сохранены.
+        """
+        if self.attachmentList is None:
+            return True
+        saved = True
+        for attachment in self.attachmentList.initial - self.attachmentList.attachments():
+            saved = self.attachments.detach(entry_id, attachment) and saved
+        for path in self.attachmentList.paths():
+            saved = self.attachments.attach(entry_id, path) is not None and saved
+        return saved
+
+    def closeEvent(self, event):
+        """
+        Сохраняет снимок состояния окна и модель определения категорий при закрытии приложения.
+
+        Args:
+            event (QCloseEvent): Событие закрытия окна.
+        """
+        # Потоки подготовки базы данных, построения индекса описаний и миниатюр должны
+        # завершиться до удаления окна
+        if self.startupWorker is not None:
+            self.startupWorker.wait()
+            self.startupWorker = None
+        if self.indexBuilder is not None:
+            self.indexBuilder.wait()
+        if self.thumbnails is not None:
+            self.thumbnails.wait()
+        if self.idleMaintenance is not None:
+            self.idleMaintenance.stop()
+        # Начатая резервная копия дописывается до конца
+        if self.backupProcess is not None:
+            self.backupProcess.waitForFinished(-1)
+        if self.conn is not None and self.balance is not None:
+            filters = {
+                "date_cb": self.ui.dateCheckBox.isChecked(),
+                "date": self.ui.dateEdit.date().toString("dd.MM.yyyy"),
+                "category_cb": self.ui.categoryCheckBox.isChecked(),
+                "category_index": self.ui.categoryComboBox.currentIndex(),
+                "tag": self.tagFilter,
+            }
+            headers = [self.model.headerData(column, Qt.Orientation.Horizontal)
+                       for column in range(self.model.columnCount())]
+            rows = [[self.model.data(self.model.index(row, column)) for column in range(self.model.columnCount())]
+                    for row in range(min(self.model.rowCount(), SNAPSHOT_ROWS))]
+            # Журнал WAL переносится в файл до вычисления ключа снимка, иначе это сделало бы
+            # закрытие соединения; запросы моделей таблиц при этом должны быть завершены
+            self.model.clear()
+            if self.budgetModel is not None:
+                self.budgetModel.clear()
+            self.conn.checkpoint()
+            try:
+                saveSnapshot(self.db_path, self.balance, filters, headers, rows)
+                if self.categorizer is not None:
+                    self.categorizer.save()
+            except OSError as error:
+                print(error)
+        super(ExpanseTracker, self).closeEvent(event)
+
     def reloadData(self):
         """
-        Перезагружает данные баланса.
+        Перезагружает данные баланса и бюджетов.
         """
-        self.ui.balanceDynamicLabel.setText(self.conn.getBalance())
+        self.balance = self.conn.getBalance()
+        self.ui.balanceDynamicLabel.setText(formatMinorUnits(self.balance))
+        self.reloadBudgets()
+        if self.forecast is not None:
+            self.updateForecast()
+        for plugin, widget in self.pluginWidgets:
+            if callable(getattr(widget, "refresh", None)):
+                plugin.invoke(widget.refresh)
+
+    def loadPlugins(self):
+        """
+        Находит плагины и добавляет их панели над таблицей записей.
+        """
+        from plugins import registry
+
+        for plugin in registry.getPlugins("widget"):
+            widget = plugin.call(self.conn, self.ui.centralwidget)
+            if not isinstance(widget, QtWidgets.QWidget):
+                continue
+            self.ui.verticalLayout_3.insertWidget(self.ui.verticalLayout_3.indexOf(self.ui.tableView), widget)
+            self.pluginWidgets.append((plugin, widget))
+
+    def updateForecast(self):
+        """
+        Обновляет прогноз баланса на конец месяца и года под текущим балансом.
+        """
+        from forecast import BalanceForecast
+
+        if self.forecast is None:
+            self.forecast = BalanceForecast(self.conn)
+        result = self.forecast.forecast(self.balance)
+        if result is None:
+            self.forecastLabel.hide()
+            return
+        self.forecastLabel.setText(f"К концу месяца: {formatMinorUnits(result['month_end'])}\n"
+                                   f"К концу года: {formatMinorUnits(result['year_end'])}")
+        lines = [f"{category}: {formatMinorUnits(change)}" for category, change in result["categories"][:5]]
+        self.forecastLabel.setToolTip("Ожидается до конца месяца:\n" + "\n".join(lines) if lines else "")
+        self.forecastLabel.show()
+
+    def reloadBudgets(self):
+        """
+        Перезагружает состояние бюджетов за текущий месяц.
+        """
+        # Состояние бюджетов читается из небольшой таблицы, которую поддерживают триггеры
+        from PyQt6.QtSql import QSqlQueryModel
+        from diagnostics import setModelQuery
+
+        if self.budgetModel is None:
+            self.budgetModel = QSqlQueryModel(self)
+            self.budgetView.setModel(self.budgetModel)
+        month = QDate.currentDate().toString("yyyy-MM")
+        setModelQuery(self.budgetModel, self.conn.getBudgetStatus(month))
+        self.budgetModel.setHeaderData(0, Qt.Orientation.Horizontal, "Бюджет")
+        self.budgetModel.setHeaderData(1, Qt.Orientation.Horizontal, "Потрачено")
+        self.budgetModel.setHeaderData(2, Qt.Orientation.Horizontal, "Лимит")
+        self.budgetModel.setHeaderData(3, Qt.Orientation.Horizontal, "Остаток")
+        self.budgetView.setVisible(self.budgetModel.rowCount() > 0)
+
+    def setupBudgetPanel(self):
+        """
+        Создает панель состояния бюджетов над таблицей записей.
+        """
+        # Модель панели создается после открытия базы данных (см. reloadBudgets)
+        self.budgetModel = None
+        self.budgetView = QtWidgets.QTableView(parent=self.ui.centralwidget)
+        for column in range(1, 4):
+            self.budgetView.setItemDelegateForColumn(column, self.moneyDelegate)
+        self.budgetView.setStyleSheet(self.ui.tableView.styleSheet() + BUDGET_ITEM_STYLE)
+        self.budgetView.setMaximumHeight(120)
+        self.budgetView.setShowGrid(False)
+        self.budgetView.verticalHeader().hide()
+        self.budgetView.horizontalHeader().setStretchLastSection(True)
+        self.budgetView.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.budgetView.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.NoSelection)
+        self.ui.verticalLayout_3.insertWidget(2, self.budgetView)
+        self.budgetView.hide()
+
+    def setupForecastLabel(self):
+        """
+        Создает строку прогноза баланса под текущим балансом.
+        """
+        # Прогноз создается при первом обновлении (см. updateForecast)
+        self.forecast = None
+        self.forecastLabel = QtWidgets.QLabel(parent=self.ui.balanceFrame)
+        self.forecastLabel.setStyleSheet("font-size: 10pt;\n"
+                                         "background-color: none;\n"
+                                         "border: none")
+        self.ui.verticalLayout_6.addWidget(self.forecastLabel)
+        self.forecastLabel.hide()
+
+    def setupMenu(self):
+        """
+        Создает меню главного окна.
+        """
+        budget_menu = self.menuBar().addMenu("Бюджеты")
+        budget_menu.addAction("Установить лимит...", self.openBudgetDialog)
+        entries_menu = self.menuBar().addMenu("Записи")
+        entries_menu.addAction("Импорт выписки...", self.importStatement)
+        entries_menu.addAction("Экспорт записей...", self.exportEntries)
+        entries_menu.addAction("Поиск повторов...", self.openDuplicatesWindow)
+        entries_menu.addAction("Архивировать закрытые годы...", self.archiveYears)
+        entries_menu.addAction("Синхронизировать с файлом...", self.syncLedger)
+        entries_menu.addAction("Отчет за период...", self.startReport)
+        tags_menu = self.menuBar().addMenu("Метки")
+        tags_menu.addAction("Показать записи с меткой...", self.chooseTagFilter)
+        tags_menu.addAction("Отчет по метке...", self.openTagReport)
+        backup_menu = self.menuBar().addMenu("Резервные копии")
+        backup_menu.addAction("Создать полную копию", lambda: self.startBackup("full"))
+        backup_menu.addAction("Сохранить изменения после последней копии", lambda: self.startBackup("incremental"))
+        currency_menu = self.menuBar().addMenu("Валюты")
+        currency_menu.addAction("Импорт курсов...", self.importRates)
+        diagnostics_menu = self.menuBar().addMenu("Диагностика")
+        diagnostics_menu.addAction("Запросы к базе данных...", self.openDiagnosticsWindow)
+
+    def openDiagnosticsWindow(self):
+        """
+        Открывает окно со статистикой запросов к базе данных, журналом медленных запросов
+        и временем вызовов плагинов.
+        """
+        if self.conn is None:
+            return
+        self.diagnosticsWindow = QtWidgets.QDialog(self)
+        self.diagnosticsWindow.setWindowTitle("Диагностика запросов")
+        self.diagnosticsWindow.resize(1000, 500)
+        tabs = QtWidgets.QTabWidget()
+        self.statementsView = QtWidgets.QTableView()
+        self.slowLogView = QtWidgets.QTableView()
+        self.pluginsView = QtWidgets.QTableView()
+        for view in (self.statementsView, self.slowLogView, self.pluginsView):
+            view.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+            view.verticalHeader().hide()
+        tabs.addTab(self.statementsView, "Запросы")
+        tabs.addTab(self.slowLogView, "Медленные запросы и ошибки")
+        tabs.addTab(self.pluginsView, "Плагины")
+
+        refresh_button = QtWidgets.QPushButton("Обновить")
+        refresh_button.clicked.connect(self.reloadDiagnostics)
+        reset_button = QtWidgets.QPushButton("Сбросить")
+        reset_button.clicked.connect(self.resetDiagnostics)
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(refresh_button)
+        buttons.addWidget(reset_button)
+        layout = QtWidgets.QVBoxLayout(self.diagnosticsWindow)
+        layout.addWidget(tabs)
+        layout.addLayout(buttons)
+
+        self.reloadDiagnostics()
+        self.diagnosticsWindow.show()
+
+    def reloadDiagnostics(self):
+        """
+        Обновляет таблицы окна диагностики.
+        """
+        from diagnostics import histogramLabels
+
+        headers = ["Операции", "Запрос", "Выполнений", "Ошибок", "Всего, мс", "Среднее, мс", "Макс., мс",
+                   "Строк"] + histogramLabels()
+        rows = [[", ".join(sorted(stats.operations)), stats.statement, stats.count, stats.errors,
+                 round(stats.total * 1000, 2), round(stats.total * 1000 / stats.count, 2),
+                 round(stats.max * 1000, 2), stats.rows] + stats.histogram
+                for stats in self.conn.stats.getStatements()]
+        self.statementsView.setModel(self.createItemModel(headers, rows))
+        self.statementsView.setColumnWidth(1, 320)
+
+        headers = ["Время", "Операция", "Время, мс", "Параметров", "Строк", "Запрос", "Ошибка", "План"]
+        rows = [[entry["time"], entry["operation"], round(entry["ms"], 2), entry["binds"], entry["rows"],
+                 entry["statement"], entry["error"] or "", "\n".join(entry["plan"])]
+                for entry in self.conn.stats.getSlowLog()]
+        self.slowLogView.setModel(self.createItemModel(headers, rows))
+        self.slowLogView.setColumnWidth(5, 320)
+        self.slowLogView.resizeRowsToContents()
+
+        from plugins import registry
+
+        headers = ["Вид", "Плагин", "Пакет", "Импорт, мс", "Вызовов", "Ошибок", "Всего, мс", "Среднее, мс",
+                   "Макс., мс", "Ошибка загрузки"]
+        rows = [[stats["kind"], stats["name"], stats["package"], round(stats["import_seconds"] * 1000, 2),
+                 stats["calls"], stats["errors"], round(stats["total"] * 1000, 2),
+                 round(stats["total"] * 1000 / stats["calls"], 2) if stats["calls"] else 0,
+                 round(stats["max"] * 1000, 2), stats["error"] or ""]
+                for stats in registry.getStats()]
+        self.pluginsView.setModel(self.createItemModel(headers, rows))
+        self.pluginsView.setColumnWidth(1, 200)
+
+    def resetDiagnostics(self):
+        """
+        Очищает статистику запросов и плагинов и обновляет окно диагностики.
+        """
+        from plugins import registry
+
+        self.conn.stats.reset()
+        registry.resetStats()
+        self.reloadDiagnostics()
 
     def viewData(self):
         """
         Отображает данные из базы данных с учетом фильтров.
         """
-        # Получение и выполнение запроса с фильтрами
-        date_cb = self.ui.dateCheckBox.isChecked()
-        category_cb = self.ui.categoryCheckBox.isChecked()
-        date = self.ui.dateEdit.text()
-        category = self.ui.categoryComboBox.currentText()
-        query = self.conn.getTableWithFilters(date_cb, category_cb, date, category)
-        self.model = QSqlQueryModel(self)
-        self.model.setQuery(query)
+        query = self.getFilteredQuery()
+
+        from PyQt6.QtSql import QSqlQueryModel
+        from diagnostics import setModelQuery
+
+        # Модель создается один раз: при замене запроса колонки и их ширина сохраняются
+        if self.model is None:
+            self.model = QSqlQueryModel(self)
+        # Модель читает строки в C++; строки и время чтения учитывает setModelQuery
+        setModelQuery(self.model, query)
 
         # Замена заголовков колонок на русский язык
         self.model.setHeaderData(0, Qt.Orientation.Horizontal, "ID")
         self.model.setHeaderData(1, Qt.Orientation.Horizontal, "Описание")
         self.model.setHeaderData(2, Qt.Orientation.Horizontal, "Сумма")
-        self.model.setHeaderData(3, Qt.Orientation.Horizontal, "Категория")
-        self.model.setHeaderData(4, Qt.Orientation.Horizontal, "Дата")
-        self.ui.tableView.setModel(self.model)
+        self.model.setHeaderData(3, Qt.Orientation.Horizontal, "Валюта")
+        self.model.setHeaderData(4, Qt.Orientation.Horizontal, "Категория")
+        self.model.setHeaderData(5, Qt.Orientation.Horizontal, "Дата")
+        if self.ui.tableView.model() is not self.model:
+            self.ui.tableView.setModel(self.model)
+            self.setColumnWidths()
+        if self.attachmentDelegate is not None:
+            self.attachmentDelegate.hashes = self.attachments.getEntryHashes()
+
+    def getFilteredQuery(self):
+        """
+        Выполняет запрос записей с фильтрами окна.
+
+        Returns:
+            QSqlQuery: Запрос с колонками ID, описание, сумма, валюта, категория и дата.
+        """
+        date_cb = self.ui.dateCheckBox.isChecked()
+        category_cb = self.ui.categoryCheckBox.isChecked()
+        date = self.ui.dateEdit.date().toString("dd.MM.yyyy")
+        category = self.ui.categoryComboBox.currentText()
+
+        # Для будущей даты показываются и виртуальные вхождения повторяющихся операций
+        project_until = None
+        if not date_cb and self.ui.dateEdit.date() > QDate.currentDate():
+            project_until = self.ui.dateEdit.date().toString("yyyy-MM-dd")
+        return self.conn.getTableWithFilters(date_cb, category_cb, date, category, project_until, self.tagFilter)
 
-        # Настройка ширины колонок
-        self.ui.tableView.setColumnWidth(1, 400)
+    def setColumnWidths(self):
+        """
+        Настраивает ширину колонок таблицы записей.
+        """
+        self.ui.tableView.setColumnWidth(1, 320)
         self.ui.tableView.setColumnWidth(0, 66)
         self.ui.tableView.setColumnWidth(2, 120)
-        self.ui.tableView.setColumnWidth(3, 210)
-        self.ui.tableView.setColumnWidth(4, 110)
+        self.ui.tableView.setColumnWidth(3, 80)
+        self.ui.tableView.setColumnWidth(4, 210)
+        self.ui.tableView.setColumnWidth(5, 110)
 
     def updateCategoryCheckBox(self):
         """
@@ -103,6 +887,63 @@ class ExpanseTracker(QMainWindow):
             self.ui.dateEdit.setEnabled(True)
         self.viewData()
 
+    def setTagFilter(self, tag):
+        """
+        Устанавливает метку, по которой отбираются записи таблицы, и показывает ее над фильтрами.
+
+        Args:
+            tag (str): Метка или None, чтобы показывать все записи.
+        """
+        self.tagFilter = tag or None
+        if self.tagFilter:
+            self.ui.filtersLabel.setText(f"Показать записи с меткой «{self.tagFilter}»")
+        else:
+            self.ui.filtersLabel.setText("Показать записи")
+
+    def chooseTagFilter(self):
+        """
+        Предлагает выбрать метку, по которой отбираются записи таблицы.
+        """
+        if self.conn is None:
+            return
+        choices = ["Все записи"] + self.conn.getTags()
+        current = choices.index(self.tagFilter) if self.tagFilter in choices else 0
+        tag, ok = QInputDialog.getItem(self, "Метки", "Показать записи с меткой:", choices, current, False)
+        if ok:
+            self.setTagFilter(tag if tag != choices[0] else None)
+            self.viewData()
+
+    def openTagReport(self):
+        """
+        Открывает отчет по метке: суммы записей с меткой по категориям.
+        """
+        if self.conn is None:
+            return
+        tags = self.conn.getTags()
+        if not tags:
+            QMessageBox.information(self, "Метки", "Ни у одной записи нет меток")
+            return
+        current = tags.index(self.tagFilter) if self.tagFilter in tags else 0
+        tag, ok = QInputDialog.getItem(self, "Метки", "Отчет по метке:", tags, current, False)
+        if not ok:
+            return
+
+        query = self.conn.getTagSummary(tag)
+        rows = []
+        while query.next():
+            rows.append([query.value(0), query.value(1), formatMinorUnits(query.value(2))])
+        self.tagReportWindow = QtWidgets.QDialog(self)
+        self.tagReportWindow.setWindowTitle(f"Метка «{tag}»")
+        self.tagReportWindow.resize(500, 400)
+        view = QtWidgets.QTableView()
+        view.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        view.verticalHeader().hide()
+        view.setModel(self.createItemModel(["Категория", "Записей", "Сумма"], rows))
+        view.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.ResizeMode.Stretch)
+        layout = QtWidgets.QVBoxLayout(self.tagReportWindow)
+        layout.addWidget(view)
+        self.tagReportWindow.show()
+
     def showNoSelectionMessage(self):
         """
         Показывает предупреждение при попытке редактирования записи,
@@ -115,25 +956,477 @@ class ExpanseTracker(QMainWindow):
         msg.setStandardButtons(QMessageBox.StandardButton.Ok)
         msg.exec()
 
+    def showWriteError(self, cancelled_by=None):
+        """
+        Показывает предупреждение, если изменение не удалось сохранить в базе данных.
+
+        Args:
+            cancelled_by (str, optional): Название плагина, отменившего запись (см. Data.cancelled_by);
+                None - база данных занята другой программой.
+        """
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Icon.Warning)
+        msg.setWindowTitle("Изменения не сохранены")
+        if cancelled_by:
+            msg.setText(f"Запись отменена плагином '{cancelled_by}'")
+        else:
+            msg.setText("Не удалось сохранить изменения: база данных занята другой программой. "
+                        "Повторите попытку позже")
+        msg.setStandardButtons(QMessageBox.StandardButton.Ok)
+        msg.exec()
+
+    def selectedEntryId(self):
+        """
+        Возвращает ID выбранной записи.
+
+        Returns:
+            str: ID выбранной записи или None, если запись не выбрана
+            либо выбрано виртуальное вхождение повторяющейся операции.
+        """
+        selected_indexes = self.ui.tableView.selectedIndexes()
+        if selected_indexes and selected_indexes[0].column() == 0:
+            entry_id = self.ui.tableView.model().data(selected_indexes[0])
+            if entry_id not in (None, ""):
+                return str(entry_id)
+        return None
+
+    def openBudgetDialog(self):
+        """
+        Запрашивает категорию и месячный лимит расходов для нее.
+        Нулевой лимит удаляет бюджет категории.
+        """
+        if self.conn is None:
+            return
+        # Поступления (первый пункт списка) не ограничиваются бюджетом
+        categories = [self.ui.categoryComboBox.itemText(i) for i in range(1, self.ui.categoryComboBox.count())]
+        category, ok = QInputDialog.getItem(self, "Бюджет", "Категория", categories, 0, False)
+        if not ok:
+            return
+        monthly_limit, ok = QInputDialog.getDouble(self, "Бюджет", "Лимит на месяц (0 - без лимита)",
+                                                   0, 0, 100000000, 2)
+        if not ok:
+            return
+
+        if monthly_limit:
+            saved = self.conn.setBudget(category, toMinorUnits(monthly_limit))
+        else:
+            saved = self.conn.deleteBudget(category)
+        if not saved:
+            self.showWriteError()
+        self.reloadData()
+
+    def importRates(self):
+        """
+        Импортирует курсы валют из выбранного CSV-файла.
+        """
+        if self.conn is None:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Импорт курсов валют", "", "CSV (*.csv);;Все файлы (*)")
+        if not path:
+            return
+        count = self.conn.rates.importFile(path)
+        if count is None:
+            self.showWriteError()
+            return
+        self.reloadData()
+        QMessageBox.information(self, "Импорт курсов валют", f"Импортировано курсов: {count}")
+
+    def getCategorizer(self):
+        """
+        Возвращает модель определения категорий, загружая и дообучая ее при первом обращении.
+
+        Returns:
+            Categorizer: Модель определения категорий.
+        """
+        if self.categorizer is None:
+            from categorizer import Categorizer
+
+            self.categorizer = Categorizer(self.conn)
+            self.categorizer.refresh()
+        return self.categorizer
+
+    def suggestCategory(self):
+        """
+        Выбирает в окне добавления записи категорию, предложенную моделью по описанию.
+        """
+        from categorizer import MIN_CONFIDENCE
+
+        description = self.addEntryWindow.descriptionLineEdit.text()
+        category, confidence = self.getCategorizer().suggest(description)
+        if category is not None and confidence >= MIN_CONFIDENCE:
+            self.addEntryWindow.categoryComboBox.setCurrentText(category)
+
+    def importStatement(self):
+        """
+        Импортирует банковскую выписку из выбранного файла форматом, выбранным в фильтре файлов.
+        """
+        if self.conn is None:
+            return
+        from plugins import registry
+
+        importers = registry.getPlugins("importer")
+        path, selected = QFileDialog.getOpenFileName(self, "Импорт выписки", "",
+                                                     ";;".join([plugin.name for plugin in importers] +
+                                                               ["Все файлы (*)"]))
+        if not path:
+            return
+        from importer import importStatement
+
+        plugin = registry.getPlugin("importer", selected) or importers[0]
+        errors = plugin.errors
+        result = importStatement(self.conn, self.getCategorizer(), path, plugin.call)
+        if result is None and (plugin.target is None or plugin.errors > errors):
+            QMessageBox.warning(self, "Импорт выписки", f"Не удалось прочитать выписку форматом «{plugin.name}»")
+            return
+        if result is None:
+            self.showWriteError(self.conn.cancelled_by)
+            return
+        if self.descriptionIndex is not None:
+            self.descriptionIndex.refresh(self.conn)
+        self.viewData()
+        self.reloadData()
+        QMessageBox.information(self, "Импорт выписки",
+                                f"Импортировано записей: {result['imported']}\n"
+                                f"Категория определена автоматически: {result['categorized']}\n"
+                                f"Отнесено к категории «Прочее»: {result['fallback']}\n"
+                                f"Пропущено строк: {result['skipped']}\n"
+                                f"Пропущено уже импортированных записей: {result['duplicates']}")
+
+    def exportEntries(self):
+        """
+        Сохраняет записи, показанные с текущими фильтрами, в файл форматом, выбранным в фильтре файлов.
+        """
+        if self.conn is None:
+            return
+        from plugins import registry
+
+        exporters = registry.getPlugins("exporter")
+        path, selected = QFileDialog.getSaveFileName(self, "Экспорт записей", "",
+                                                     ";;".join(plugin.name for plugin in exporters))
+        if not path:
+            return
+        plugin = registry.getPlugin("exporter", selected) or exporters[0]
+
+        # Модель таблицы читает записи по мере прокрутки, поэтому экспорт выполняет запрос заново
+        query = self.getFilteredQuery()
+        rows = []
+        while query.next():
+            rows.append(tuple(query.value(column) for column in range(6)))
+        errors = plugin.errors
+        plugin.call(rows, path)
+        if plugin.target is None or plugin.errors > errors:
+            QMessageBox.warning(self, "Экспорт записей", f"Не удалось сохранить записи форматом «{plugin.name}»")
+            return
+        self.statusBar().showMessage(f"Экспортировано записей: {len(rows)}")
+
+    def archiveYears(self):
+        """
+        Запрашивает последний архивируемый год и переносит записи закрытых лет до него в архивы.
+        """
+        if self.conn is None:
+            return
+        if self.vault is not None:
+            # Архивы хранились бы рядом с рабочей копией во временном каталоге
+            QMessageBox.information(self, "Архивация", "Архивация зашифрованной базы данных не поддерживается")
+            return
+        from archive import Archiver
+
+        archiver = Archiver(self.conn)
+        years = [str(year) for year in archiver.getArchivableYears()]
+        if not years:
+            QMessageBox.information(self, "Архивация", "В базе данных нет записей закрытых лет")
+            return
+        year, ok = QInputDialog.getItem(self, "Архивация", "Перенести в архив записи до года включительно",
+                                        years, len(years) - 1, False)
+        if not ok:
+            return
+        results = archiver.archiveUntil(int(year))
+        if None in results.values():
+            self.showWriteError()
+        self.viewData()
+        self.reloadData()
+        QMessageBox.information(self, "Архивация", "\n".join(
+            f"{archived}: перенесено записей - {rows}" for archived, rows in results.items() if rows is not None))
+
+    def syncLedger(self):
+        """
+        Синхронизирует базу данных с выбранным файлом базы данных.
+        """
+        if self.conn is None:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Синхронизация", "", "База данных (*.db);;Все файлы (*)")
+        if not path:
+            return
+        from sync import LedgerSync
+
+        # Модель таблицы читает записи частями; незавершенная выборка не дает отключить второй файл
+        self.model.clear()
+        result = LedgerSync(self.conn, path).reconcile()
+        self.viewData()
+        if result is None:
+            self.showWriteError()
+            return
+        if self.descriptionIndex is not None:
+            self.descriptionIndex.refresh(self.conn)
+        self.reloadData()
+        QMessageBox.information(self, "Синхронизация",
+                                f"Сравнено месяцев: {result['months']}, различающихся записей: {result['rows']}\n"
+                                f"Получено изменений: {result['pulled']}\n"
+                                f"Передано изменений: {result['pushed']}\n"
+                                f"Записей, различавшихся в обоих файлах: {result['conflicts']}")
+
+    def startBackup(self, command):
+        """
+        Запускает резервное копирование базы данных отдельным процессом.
+
+        Args:
+            command (str): 'full' для полной копии или 'incremental' для копии изменений.
+        """
+        if self.vault is not None:
+            # Копия рабочей копии хранилась бы незашифрованной
+            QMessageBox.information(self, "Резервная копия",
+                                    "Резервное копирование зашифрованной базы данных не поддерживается")
+            return
+        if self.backupProcess is not None:
+            QMessageBox.information(self, "Резервная копия", "Резервное копирование уже выполняется")
+            return
+        self.backupOutput = ""
+        self.backupProcess = QProcess(self)
+        self.backupProcess.readyReadStandardOutput.connect(self.readBackupOutput)
+        self.backupProcess.finished.connect(self.finishBackup)
+        self.backupProcess.start(sys.executable, [os.path.join(os.path.dirname(os.path.abspath(__file__)), "backup.py"),
+                                                  command, "--db", self.db_path, "--progress"])
+        self.statusBar().showMessage("Резервное копирование...")
+
+    def readBackupOutput(self):
+        """
+        Показывает ход резервного копирования в строке состояния.
+        """
+        self.backupOutput += bytes(self.backupProcess.readAllStandardOutput()).decode("utf-8")
+        lines = self.backupOutput.splitlines()
+        progress = [line.split() for line in lines if line.startswith("progress ")]
+        if progress:
+            done, total = int(progress[-1][1]), int(progress[-1][2])
+            self.statusBar().showMessage(f"Резервное копирование: {100 * done // max(total, 1)}%")
+
+    def finishBackup(self, exit_code, exit_status):
+        """
+        Сообщает о результате резервного копирования.
+
+        Args:
+            exit_code (int): Код завершения процесса копирования.
+            exit_status (QProcess.ExitStatus): Состояние завершения процесса.
+        """
+        self.readBackupOutput()
+        errors = bytes(self.backupProcess.readAllStandardError()).decode("utf-8").strip()
+        self.backupProcess = None
+        self.statusBar().clearMessage()
+        lines = [line for line in self.backupOutput.splitlines() if not line.startswith("progress ")]
+        if exit_status != QProcess.ExitStatus.NormalExit or exit_code != 0:
+            print(errors)
+            QMessageBox.warning(self, "Резервная копия", "Не удалось создать резервную копию")
+            return
+        QMessageBox.information(self, "Резервная копия", lines[-1] if lines else "Резервная копия создана")
+
+    def showMaintenanceResult(self, task, problems):
+        """
+        Сообщает об ошибках, найденных проверками обслуживания базы данных.
+
+        Args:
+            task (str): Имя проверки ('integrity' или 'validate').
+            problems (int): Количество найденных ошибок.
+        """
+        if not problems:
+            return
+        if task == "integrity":
+            QMessageBox.warning(self, "Проверка базы данных",
+                                "Проверка целостности нашла ошибки в файле базы данных. Подробности: "
+                                "python maintenance.py check. Восстановите базу данных из резервной копии.")
+        else:
+            self.statusBar().showMessage(f"Записей с ошибками: {problems} (отчет: python maintenance.py validate)")
+
+    def startReport(self):
+        """
+        Запускает формирование отчета за месяц или год (модуль reports) отдельным процессом.
+        """
+        if self.conn is None:
+            return
+        if self.reportProcess is not None:
+            QMessageBox.information(self, "Отчет", "Отчет уже формируется")
+            return
+        from reports import periodMonths
+
+        period, ok = QInputDialog.getText(self, "Отчет", "Месяц (ГГГГ-ММ) или год (ГГГГ):",
+                                          text=QDate.currentDate().toString("yyyy-MM"))
+        if not ok:
+            return
+        try:
+            periodMonths(period.strip())
+        except ValueError as error:
+            QMessageBox.warning(self, "Отчет", str(error))
+            return
+        path, _ = QFileDialog.getSaveFileName(self, "Отчет", f"expensetracker.{period.strip()}.html",
+                                              "HTML (*.html);;PDF (*.pdf)")
+        if not path:
+            return
+        report_format = "pdf" if path.lower().endswith(".pdf") else "html"
+
+        # Для зашифрованной базы данных отчет читает рабочую копию во временном каталоге
+        self.reportPath = path
+        self.reportProcess = QProcess(self)
+        self.reportProcess.finished.connect(self.finishReport)
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports.py")
+        self.reportProcess.start(sys.executable, [script, period.strip(), "--format", report_format, "--output", path,
+                                                  "--db", self.conn.db_path])
+        self.statusBar().showMessage("Формирование отчета...")
+
+    def finishReport(self, exit_code, exit_status):
+        """
+        Открывает сформированный отчет или сообщает об ошибке.
+
+        Args:
+            exit_code (int): Код завершения процесса формирования отчета.
+            exit_status (QProcess.ExitStatus): Состояние завершения процесса.
+        """
+        errors = bytes(self.reportProcess.readAllStandardError()).decode("utf-8").strip()
+        self.reportProcess = None
+        self.statusBar().clearMessage()
+        if exit_status != QProcess.ExitStatus.NormalExit or exit_code != 0:
+            print(errors)
+            QMessageBox.warning(self, "Отчет", "Не удалось сформировать отчет")
+            return
+        QDesktopServices.openUrl(QUrl.fromLocalFile(self.reportPath))
+
+    def openDuplicatesWindow(self):
+        """
+        Открывает окно проверки похожих записей.
+        """
+        if self.conn is None:
+            return
+        from duplicates import DuplicateFinder
+
+        self.duplicateFinder = DuplicateFinder(self.conn)
+        self.duplicatesWindow = QtWidgets.QDialog(self)
+        self.duplicatesWindow.setWindowTitle("Похожие записи")
+        self.duplicatesWindow.resize(1000, 500)
+        self.duplicatesView = QtWidgets.QTableView()
+        self.duplicatesView.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.duplicatesView.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        self.duplicatesView.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.SingleSelection)
+        self.duplicatesView.verticalHeader().hide()
+
+        buttons = QtWidgets.QHBoxLayout()
+        buttons.addStretch()
+        for text, action in (("Объединить", self.duplicateFinder.merge),
+                             ("Удалить вторую запись", self.duplicateFinder.drop),
+                             ("Это разные записи", self.duplicateFinder.dismiss)):
+            button = QtWidgets.QPushButton(text)
+            button.clicked.connect(lambda checked, action=action: self.resolveDuplicate(action))
+            buttons.addWidget(button)
+        layout = QtWidgets.QVBoxLayout(self.duplicatesWindow)
+        layout.addWidget(self.duplicatesView)
+        layout.addLayout(buttons)
+
+        self.reloadDuplicates()
+        self.duplicatesWindow.show()
+
+    def reloadDuplicates(self):
+        """
+        Ищет похожие записи и обновляет таблицу окна проверки.
+        """
+        self.duplicateCandidates = self.duplicateFinder.findCandidates()
+        headers = ["ID 1", "Описание 1", "Дата 1", "ID 2", "Описание 2", "Дата 2", "Сумма", "Валюта",
+                   "Категория", "Сходство"]
+        rows = [[candidate["first"]["id"], candidate["first"]["description"], candidate["first"]["date"],
+                 candidate["second"]["id"], candidate["second"]["description"], candidate["second"]["date"],
+                 formatMinorUnits(candidate["value"]), candidate["currency"], candidate["first"]["category"],
+                 f"{candidate['similarity']:.0%}"]
+                for candidate in self.duplicateCandidates]
+        self.duplicatesView.setModel(self.createItemModel(headers, rows))
+        self.duplicatesView.resizeColumnsToContents()
+
+    def resolveDuplicate(self, action):
+        """
+        Применяет действие окна проверки к выбранной паре похожих записей.
+
+        Args:
+            action (callable): Метод DuplicateFinder, принимающий пару записей и возвращающий
+                признак успеха.
+        """
+        rows = self.duplicatesView.selectionModel().selectedRows()
+        if not rows:
+            self.showNoSelectionMessage()
+            return
+        # Отклонение пары не меняет записей, поэтому прошлая отмена плагином к нему не относится
+        self.conn.cancelled_by = None
+        if not action(self.duplicateCandidates[rows[0].row()]):
+            self.showWriteError(self.conn.cancelled_by)
+        self.reloadDuplicates()
+        self.viewData()
+        self.reloadData()
+
+    def setupCurrencies(self, comboBox):
+        """
+        Добавляет в список валют окна записи валюты из таблицы курсов.
+
+        Args:
+            comboBox (QtWidgets.QComboBox): Список валют окна записи.
+        """
+        for currency in self.conn.rates.getCurrencies():
+            if comboBox.findText(currency) < 0:
+                comboBox.addItem(currency)
+
+    def checkBudget(self, category, date):
+        """
+        Показывает предупреждение, если после изменения записи превышен лимит категории.
+
+        Args:
+            category (str): Категория записи.
+            date (str): Дата записи в формате 'DD.MM.YYYY'.
+        """
+        overrun = self.conn.getBudgetOverrun(date[6:10] + "-" + date[3:5], category)
+        if overrun:
+            spent, monthly_limit = overrun
+            msg = QMessageBox()
+            msg.setIcon(QMessageBox.Icon.Warning)
+            msg.setWindowTitle("Превышен бюджет")
+            msg.setText(f"Расходы в категории «{category}» за месяц: {formatMinorUnits(spent)} "
+                        f"при лимите {formatMinorUnits(monthly_limit)}")
+            msg.setStandardButtons(QMessageBox.StandardButton.Ok)
+            msg.exec()
+
     def openAddEntryWindow(self):
         """
         Открывает окно для добавления новой записи.
         """
+        from new_entry import Ui_Dialog as NewEntryUI
+
         self.window = QtWidgets.QDialog()
         self.addEntryWindow = NewEntryUI()
         self.addEntryWindow.setupUi(self.window)
+        self.setupCurrencies(self.addEntryWindow.currencyComboBox)
+        self.setupCompleter(self.window, self.addEntryWindow.descriptionLineEdit, True)
+        self.setupSplits(self.window, self.addEntryWindow)
+        self.setupAttachments(self.window, self.addEntryWindow)
+        self.addEntryWindow.repeatComboBox.currentIndexChanged.connect(self.updateEntryWidgets)
         self.window.show()
         self.addEntryWindow.saveButton.clicked.connect(self.addEntry)
+        self.addEntryWindow.descriptionLineEdit.editingFinished.connect(self.suggestCategory)
 
     def openEditEntryWindow(self):
         """
         Открывает окно для редактирования выбранной записи.
         """
-        selected_indexes = self.ui.tableView.selectedIndexes()
-        if selected_indexes and selected_indexes[0].column() == 0:
+        if self.selectedEntryId() is not None:
+            from edit_entry import Ui_Dialog as EditEntryUI
+
             self.window = QtWidgets.QDialog()
             self.editEntryWindow = EditEntryUI()
             self.editEntryWindow.setupUi(self.window)
+            self.setupCurrencies(self.editEntryWindow.currencyComboBox)
+            self.setupCompleter(self.window, self.editEntryWindow.descriptionLineEdit, False)
+            self.setupSplits(self.window, self.editEntryWindow, int(self.selectedEntryId()))
+            self.setupAttachments(self.window, self.editEntryWindow, int(self.selectedEntryId()))
             self.window.show()
             self.editEntryWindow.saveButton.clicked.connect(self.editEntry)
         else:
@@ -144,49 +1437,149 @@ class ExpanseTracker(QMainWindow):
         Добавляет новую запись в базу данных.
         """
         description = self.addEntryWindow.descriptionLineEdit.text()
-        value = self.addEntryWindow.priceSpinBox.text()
+        value = toMinorUnits(self.addEntryWindow.priceSpinBox.value())
+        currency = self.addEntryWindow.currencyComboBox.currentText()
         category = self.addEntryWindow.categoryComboBox.currentText()
-        date = self.addEntryWindow.dateEdit.text()
+        # Текст поля зависит от формата даты системы, а записи хранят дату в формате 'DD.MM.YYYY'
+        date = self.addEntryWindow.dateEdit.date().toString("dd.MM.yyyy")
+        repeat = self.addEntryWindow.repeatComboBox.currentIndex()
 
-        self.conn.insertEntry(description, value, category, date)
+        if repeat in REPEAT_PERIODS:
+            # Повторяющаяся операция записывается планировщиком, начиная с первого вхождения
+            period, step = REPEAT_PERIODS[repeat]
+            saved = self.scheduler.addRule(description, value, category, date, period, step, currency=currency)
+            # Правило сохраняется, даже если обработчик записи отменил запись его вхождений
+            if saved and not self.scheduler.materializeDue() and self.conn.cancelled_by:
+                self.showWriteError(self.conn.cancelled_by)
+        else:
+            if not self.confirmDuplicate(description, value, date, currency):
+                return
+            entry_id = self.conn.insertEntry(description, value, category, date, currency)
+            saved = entry_id is not None
+            if saved and not (self.saveSplits(entry_id) and self.saveAttachments(entry_id)):
+                # Запись уже сохранена, поэтому окно закрывается; не сохранились только метки,
+                # строки или вложения
+                self.showWriteError(self.conn.cancelled_by)
+        # При ошибке окно остается открытым, чтобы запись можно было сохранить повторно
+        if not saved:
+            self.showWriteError(None if repeat in REPEAT_PERIODS else self.conn.cancelled_by)
+            return
+        if self.categorizer is not None:
+            self.categorizer.refresh()
+        if self.descriptionIndex is not None:
+            self.descriptionIndex.refresh(self.conn)
         self.viewData()
         self.reloadData()
         self.window.close()
+        for category in self.entryCategories(category) if repeat not in REPEAT_PERIODS else [category]:
+            self.checkBudget(category, date)
+
+    def confirmDuplicate(self, description, value, date, currency):
+        """
+        Спрашивает, добавлять ли запись, если такая же запись уже есть в базе данных.
+
+        Args:
+            description (str): Описание записи.
+            value (int): Сумма в минимальных единицах валюты.
+            date (str): Дата записи в формате 'DD.MM.YYYY'.
+            currency (str): Код валюты суммы.
+
+        Returns:
+            bool: True, если запись нужно добавить.
+        """
+        from duplicates import fingerprint
+
+        if not self.conn.countFingerprints([fingerprint(description, value, date, currency)]):
+            return True
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Icon.Question)
+        msg.setWindowTitle("Повтор записи")
+        msg.setText(f"Запись «{description}» на {formatMinorUnits(value)} {currency} за {date} уже есть. "
+                    "Добавить еще одну?")
+        msg.setStandardButtons(QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
+        return msg.exec() == QMessageBox.StandardButton.Yes
 
     def editEntry(self):
         """
         Редактирует выбранную запись в базе данных.
         """
-        index = self.ui.tableView.selectedIndexes()[0]
-        id = str(self.ui.tableView.model().data(index))
+        id = self.selectedEntryId()
 
         description = self.editEntryWindow.descriptionLineEdit.text()
-        value = self.editEntryWindow.priceSpinBox.text()
+        value = toMinorUnits(self.editEntryWindow.priceSpinBox.value())
+        currency = self.editEntryWindow.currencyComboBox.currentText()
         category = self.editEntryWindow.categoryComboBox.currentText()
-        date = self.editEntryWindow.dateEdit.text()
+        date = self.editEntryWindow.dateEdit.date().toString("dd.MM.yyyy")
+        categories = self.entryCategories(category)
+        if self.splitEditor.items():
+            # Смена категории отменила бы разделение записи, а строки заменяет saveSplits (см. Data.setSplit)
+            from connection import SPLIT_CATEGORY
+
+            category = SPLIT_CATEGORY
 
-        self.conn.updateEntry(description, value, category, date, id)
+        if not self.conn.updateEntry(description, value, category, date, id, currency) or \
+                not self.saveSplits(int(id)) or not self.saveAttachments(int(id)):
+            self.showWriteError(self.conn.cancelled_by)
+            return
         self.viewData()
         self.reloadData()
         self.window.close()
+        for category in categories:
+            self.checkBudget(category, date)
 
     def deleteEntry(self):
         """
         Удаляет выбранную запись из базы данных.
         """
-        selected_indexes = self.ui.tableView.selectedIndexes()
-        if selected_indexes and selected_indexes[0].column() == 0:
-            id = str(self.ui.tableView.model().data(selected_indexes[0]))
-            self.conn.deleteEntry(id)
+        id = self.selectedEntryId()
+        if id is not None:
+            attachments = [attachment for attachment, name in self.attachments.getAttachments(int(id))] \
+                if self.attachments is not None else []
+            if not self.conn.deleteEntry(id):
+                self.showWriteError(self.conn.cancelled_by)
+            elif attachments:
+                # Ссылки на вложения удалил триггер; файлы удаляются, если на них не ссылаются другие записи
+                self.attachments.removeUnreferenced(attachments)
             self.viewData()
             self.reloadData()
         else:
             self.showNoSelectionMessage()
 
 
+def unlockLedger(path):
+    """
+    Запрашивает пароль и расшифровывает базу данных, пока пароль не будет введен верно.
+
+    Args:
+        path (str): Путь к зашифрованному файлу базы данных.
+
+    Returns:
+        EncryptedLedger: Расшифрованная база данных или None, если пользователь отказался от ввода пароля.
+    """
+    from encryption import EncryptedLedger, EncryptionError
+
+    message = "Пароль базы данных"
+    while True:
+        password, ok = QInputDialog.getText(None, "Учет расходов", message, QtWidgets.QLineEdit.EchoMode.Password)
+        if not ok:
+            return None
+        try:
+            return EncryptedLedger(path, password)
+        except EncryptionError as error:
+            message = f"{error}. Пароль базы данных"
+
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
-    window = ExpanseTracker()
+    vault = None
+    if os.path.exists(DB_PATH + ".enc"):
+        vault = unlockLedger(DB_PATH + ".enc")
+        if vault is None:
+            sys.exit(0)
+    window = ExpanseTracker(vault.working_path if vault else DB_PATH, vault)
     window.show()
 
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    if vault is not None:
+        vault.close()
+    sys.exit(exit_code)
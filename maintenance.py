@@ -0,0 +1,686 @@
+# Модуль обслуживания базы данных.
+#
+# Задачи обслуживания:
+# - 'integrity' - проверка целостности файла (PRAGMA integrity_check; PRAGMA quick_check
+#   пропускает проверку соответствия индексов таблицам и выполняется в десятки раз быстрее);
+# - 'validate' - проверка записей: даты не в формате 'DD.MM.YYYY' или несуществующие,
+#   неизвестные категории, неположительные или нецелые суммы, пустые описания, валюты
+#   без курсов и разделенные записи, сумма строк которых не равна сумме записи;
+# - 'optimize' - статистика для планировщика запросов: ANALYZE, если статистики еще нет,
+#   иначе PRAGMA optimize (пересчитывает статистику только там, где она устарела);
+# - 'vacuum' - освобождение страниц, оставшихся свободными после удаления записей, архивации
+#   и миграций (PRAGMA incremental_vacuum порциями по VACUUM_STEP_PAGES страниц).
+# Время и результат последнего выполнения задачи хранятся в таблице maintenance_log;
+# задача выполняется снова через TASK_INTERVALS_DAYS дней, а 'vacuum' - когда свободных
+# страниц больше VACUUM_MIN_PAGES.
+#
+# Постепенное освобождение страниц требует режима auto_vacuum = INCREMENTAL. Новая база
+# данных создается в этом режиме (см. connection.Data.createConnection), а существующую
+# один раз перестраивает команда 'vacuum' (полный VACUUM, пока приложение закрыто).
+#
+# В приложении задачи выполняются, когда пользователь не работает с окном IDLE_MS миллисекунд
+# (класс IdleMaintenance): 'vacuum' - короткими шагами через соединение окна, затем 'optimize',
+# 'integrity' и 'validate', которые могут занять секунды (первый ANALYZE большой базы данных,
+# полный проход по файлу), - отдельным процессом, чтобы окно не останавливалось. Процесс открывает
+# простое соединение (IdleConnection) без миграций схемы, заполнения столбцов и поиска плагинов;
+# в режиме журнала WAL его ANALYZE не мешает окну ни читать, ни записывать. Любое действие
+# пользователя прерывает обслуживание; прерванные задачи остаются в очереди.
+#
+# Запуск модуля:
+#     python maintenance.py check [--quick]     проверка целостности
+#     python maintenance.py validate            отчет о записях с ошибками
+#     python maintenance.py optimize|vacuum     задача и время типичных запросов до и после
+#     python maintenance.py run                 все задачи
+# Общие параметры: [--db expensetracker.db]
+
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+from PyQt6 import QtCore, QtSql
+
+from paths import DB_PATH
+
+
+# Время без действий пользователя, после которого приложение выполняет обслуживание, в миллисекундах
+IDLE_MS = 60000
+
+# Период проверки, наступило ли время обслуживания, в миллисекундах
+IDLE_CHECK_MS = 5000
+
+# Количество дней между выполнениями задач
+TASK_INTERVALS_DAYS = {"optimize": 1, "integrity": 7, "validate": 7}
+
+# Количество свободных страниц, начиная с которого выполняется задача 'vacuum'
+VACUUM_MIN_PAGES = 256
+
+# Количество страниц, освобождаемых за один шаг PRAGMA incremental_vacuum
+VACUUM_STEP_PAGES = 128
+
+# Наибольшее количество сообщений проверки целостности
+INTEGRITY_LIMIT = 100
+
+# Проверки записей: имя колонки результата, условие на запись expenses и описание ошибки;
+# {categories} - список известных категорий, {split} - категория разделенной записи
+ROW_CHECKS = (
+    ("bad_date", "length(date) <> 10 OR date({iso}) IS NOT {iso}", "дата не в формате ДД.ММ.ГГГГ"),
+    ("bad_category", "category NOT IN ({categories})", "неизвестная категория"),
+    ("bad_value", "typeof(value) <> 'integer' OR value <= 0", "сумма не целое положительное число"),
+    ("empty_description", "trim(description) = ''", "пустое описание"),
+    ("bad_currency", "currency <> ? AND currency NOT IN (SELECT currency FROM exchange_rates)",
+     "нет курса валюты"),
+    ("bad_split", "category = {split} AND value IS NOT "
+     "(SELECT SUM(value) FROM entry_items WHERE entry_id = expenses.id)", "сумма строк не равна сумме записи"),
+)
+
+# Типичные запросы приложения, время которых сравнивается до и после обслуживания:
+# название и функция от подключения к базе данных и последнего месяца с записями 'YYYY-MM'
+PROBE_QUERIES = (
+    ("Баланс", lambda conn, month: conn.getBalance()),
+    ("Записи категории", lambda conn, month: readAll(conn.getTableWithFilters(True, False, "", "Супермаркеты"))),
+    ("Записи за день", lambda conn, month: readAll(
+        conn.getTableWithFilters(False, True, f"15.{month[5:7]}.{month[:4]}", ""))),
+    ("Бюджеты месяца", lambda conn, month: readAll(conn.getBudgetStatus(month))),
+    ("Записи месяца", lambda conn, month: readAll(conn.executeQuery(
+        "SELECT COUNT(*), SUM(value) FROM expenses WHERE substr(date, 7, 4) || '-' || substr(date, 4, 2) = ?",
+        [month]))),
+)
+
+
+def readAll(query):
+    """
+    Читает все строки результата запроса.
+
+    Args:
+        query (QtSql.QSqlQuery): Выполненный запрос.
+
+    Returns:
+        int: Количество прочитанных строк.
+    """
+    rows = 0
+    while query.next():
+        rows += 1
+    return rows
+
+
+class IdleConnection:
+    """
+    Простое соединение процесса обслуживания в простое: только открывает файл базы данных.
+    """
+
+    def __init__(self, db_path, busy_timeout):
+        """
+        Открывает соединение с базой данных.
+
+        Args:
+            db_path (str): Путь к файлу базы данных.
+            busy_timeout (int): Время ожидания блокировки базы данных в миллисекундах.
+        """
+        self.db_path = db_path
+        self.db = QtSql.QSqlDatabase.addDatabase("QSQLITE")
+        self.db.setDatabaseName(db_path)
+        self.db.setConnectOptions(f"QSQLITE_BUSY_TIMEOUT={busy_timeout}")
+        if not self.db.open():
+            print(self.db.lastError().text())
+
+    def executeQuery(self, query_text, query_values=None):
+        """
+        Выполняет подготовленный SQL-запрос.
+
+        Args:
+            query_text (str): Текст SQL-запроса.
+            query_values (list, optional): Список значений для подстановки в запрос.
+
+        Returns:
+            QtSql.QSqlQuery: Объект QtSql.QSqlQuery с результатами выполнения запроса.
+        """
+        query = QtSql.QSqlQuery(self.db)
+        query.prepare(query_text)
+        for value in query_values or []:
+            query.addBindValue(value)
+        if not query.exec():
+            print(query.lastError().text())
+        return query
+
+
+class Maintenance:
+    """
+    Задачи обслуживания базы данных.
+    """
+
+    def __init__(self, conn):
+        """
+        Инициализирует обслуживание базы данных.
+
+        Args:
+            conn (connection.Data): Подключение к базе данных; для проверок и обновления
+                статистики достаточно IdleConnection.
+        """
+        self.conn = conn
+
+    def pragma(self, name):
+        """
+        Возвращает значение параметра PRAGMA.
+
+        Args:
+            name (str): Имя параметра.
+
+        Returns:
+            int: Значение параметра.
+        """
+        query = self.conn.executeQuery(f"PRAGMA {name}")
+        return query.value(0) if query.next() else None
+
+    def getPageStats(self):
+        """
+        Возвращает размер файла базы данных в страницах.
+
+        Returns:
+            dict: Размер страницы в байтах ('page_size'), количество страниц ('pages')
+            и свободных страниц ('free') и режим auto_vacuum (0 - нет, 1 - полный, 2 - постепенный).
+        """
+        return {
+            "page_size": self.pragma("page_size"),
+            "pages": self.pragma("page_count"),
+            "free": self.pragma("freelist_count"),
+            "auto_vacuum": self.pragma("auto_vacuum"),
+        }
+
+    def checkIntegrity(self, quick=False):
+        """
+        Проверяет целостность файла базы данных.
+
+        Args:
+            quick (bool, optional): Выполнить быструю проверку без сверки индексов с таблицами.
+
+        Returns:
+            list: Сообщения о найденных ошибках (пустой список, если ошибок нет);
+            None, если проверку не удалось выполнить.
+        """
+        query = self.conn.executeQuery(f"PRAGMA {'quick_check' if quick else 'integrity_check'}({INTEGRITY_LIMIT})")
+        if not query.isActive():
+            return None
+        messages = []
+        while query.next():
+            messages.append(query.value(0))
+        return [] if messages == ["ok"] else messages
+
+    def validateRows(self):
+        """
+        Проверяет записи таблицы расходов одним проходом по таблице.
+
+        Returns:
+            list: Записи с ошибками - кортежи из ID, описания, суммы, категории, даты, валюты
+            и списка описаний ошибок; None, если проверку не удалось выполнить.
+        """
+        from connection import CATEGORIES, ISO_DATE, SPLIT_CATEGORY
+        from currency import BASE_CURRENCY
+
+        categories = ", ".join("'" + category.replace("'", "''") + "'" for category in CATEGORIES + (SPLIT_CATEGORY,))
+        columns = ", ".join(f"({condition}) AS {name}" for name, condition, _ in ROW_CHECKS)
+        columns = columns.format(iso=ISO_DATE.format("expenses"), categories=categories, split=f"'{SPLIT_CATEGORY}'")
+        query = self.conn.executeQuery(
+            f"SELECT * FROM (SELECT id, description, value, category, date, currency, {columns} FROM expenses) "
+            f"WHERE {' OR '.join(name for name, _, _ in ROW_CHECKS)} ORDER BY id", [BASE_CURRENCY])
+        if not query.isActive():
+            return None
+        rows = []
+        while query.next():
+            problems = [problem for index, (_, _, problem) in enumerate(ROW_CHECKS) if query.value(6 + index)]
+            rows.append(tuple(query.value(column) for column in range(6)) + (problems,))
+        return rows
+
+    def optimize(self, full=False):
+        """
+        Обновляет статистику планировщика запросов.
+
+        Args:
+            full (bool, optional): Пересчитать статистику всех таблиц и индексов (ANALYZE).
+
+        Returns:
+            bool: True, если статистика обновлена.
+        """
+        query = self.conn.executeQuery("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+        if full or not query.next():
+            query = self.conn.executeQuery("ANALYZE")
+        else:
+            query = self.conn.executeQuery("PRAGMA optimize")
+        return query.isActive()
+
+    def vacuumStep(self, pages=VACUUM_STEP_PAGES):
+        """
+        Освобождает часть свободных страниц файла базы данных.
+
+        Args:
+            pages (int, optional): Наибольшее количество освобождаемых страниц.
+
+        Returns:
+            int: Количество освобожденных страниц (0, если база данных не в режиме
+            auto_vacuum = INCREMENTAL или свободных страниц нет); None при ошибке.
+        """
+        from connection import TransactionError
+
+        free = self.pragma("freelist_count")
+        if not free or self.pragma("auto_vacuum") != 2:
+            return 0
+        try:
+            with self.conn.transaction():
+                # Каждый шаг запроса освобождает одну страницу, а QSqlQuery выполняет только
+                # первый шаг запроса без результата, поэтому запрос повторяется в одной транзакции
+                query = QtSql.QSqlQuery(self.conn.database())
+                query.prepare("PRAGMA incremental_vacuum(1)")
+                for _ in range(min(free, pages)):
+                    if not query.exec():
+                        print(query.lastError().text())
+                        raise TransactionError(query.lastError().text())
+                query.finish()
+        except TransactionError:
+            return None
+        return free - self.pragma("freelist_count")
+
+    def rebuild(self):
+        """
+        Перестраивает файл базы данных полным VACUUM и включает постепенное освобождение страниц.
+
+        Требует монопольного доступа к базе данных: приложение должно быть закрыто.
+
+        Returns:
+            bool: True, если файл перестроен.
+        """
+        self.conn.executeQuery("PRAGMA auto_vacuum = INCREMENTAL")
+        return self.conn.executeQuery("VACUUM").isActive()
+
+    def timeQueries(self, repeat=3):
+        """
+        Измеряет время типичных запросов приложения (PROBE_QUERIES).
+
+        Args:
+            repeat (int, optional): Количество повторов после первого выполнения; учитывается
+                наименьшее время.
+
+        Returns:
+            dict: Время запросов в миллисекундах по их названиям.
+        """
+        query = self.conn.executeQuery("SELECT MAX(day) FROM daily_balance "
+                                       "WHERE day GLOB '[0-9][0-9][0-9][0-9]-[0-1][0-9]-[0-3][0-9]'")
+        day = query.value(0) if query.next() else None
+        month = day[:7] if day else datetime.date.today().strftime("%Y-%m")
+        timings = {}
+        for name, function in PROBE_QUERIES:
+            # Первое выполнение прогревает кэш страниц и не учитывается
+            function(self.conn, month)
+            best = None
+            for _ in range(repeat):
+                started = time.perf_counter()
+                function(self.conn, month)
+                elapsed = (time.perf_counter() - started) * 1000
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = best
+        return timings
+
+    def getLog(self):
+        """
+        Возвращает время и результат последнего выполнения задач.
+
+        Returns:
+            dict: Время завершения (datetime.datetime), длительность в секундах и результат
+            по именам задач.
+        """
+        query = self.conn.executeQuery("SELECT task, finished_at, seconds, result FROM maintenance_log")
+        log = {}
+        while query.next():
+            log[query.value(0)] = (datetime.datetime.fromtimestamp(query.value(1) / 1000), query.value(2),
+                                   query.value(3))
+        return log
+
+    def logTask(self, task, seconds, result):
+        """
+        Сохраняет время и результат выполнения задачи.
+
+        Args:
+            task (str): Имя задачи.
+            seconds (float): Длительность выполнения в секундах.
+            result (str): Результат выполнения.
+
+        Returns:
+            bool: True, если запись сохранена.
+        """
+        from connection import NOW_MS
+
+        query_text = (f"INSERT INTO maintenance_log (task, finished_at, seconds, result) VALUES (?, {NOW_MS}, ?, ?) "
+                      "ON CONFLICT (task) DO UPDATE SET finished_at = excluded.finished_at, "
+                      "seconds = excluded.seconds, result = excluded.result")
+        return self.conn.executeQuery(query_text, [task, seconds, result]).isActive()
+
+    def getDueTasks(self):
+        """
+        Возвращает задачи, время выполнения которых наступило.
+
+        Returns:
+            list: Имена задач в порядке выполнения ('vacuum' - первой: статистика
+            собирается по уже уплотненному файлу).
+        """
+        log = self.getLog()
+        now = datetime.datetime.now()
+        due = [task for task, days in TASK_INTERVALS_DAYS.items()
+               if task not in log or now - log[task][0] >= datetime.timedelta(days=days)]
+        stats = self.getPageStats()
+        if stats["auto_vacuum"] == 2 and stats["free"] >= VACUUM_MIN_PAGES:
+            due.insert(0, "vacuum")
+        return due
+
+
+class IdleMaintenance(QtCore.QObject):
+    """
+    Выполняет задачи обслуживания, пока пользователь не работает с приложением.
+    """
+
+    # Результат проверки: имя проверки ('integrity' или 'validate') и количество найденных ошибок
+    checked = QtCore.pyqtSignal(str, int)
+
+    # События, которые считаются действиями пользователя
+    INPUT_EVENTS = (QtCore.QEvent.Type.KeyPress, QtCore.QEvent.Type.MouseButtonPress, QtCore.QEvent.Type.Wheel,
+                    QtCore.QEvent.Type.MouseMove)
+
+    def __init__(self, conn, parent=None, idle_ms=IDLE_MS):
+        """
+        Инициализирует обслуживание в простое и начинает следить за действиями пользователя.
+
+        Args:
+            conn (connection.Data): Подключение к базе данных главного окна.
+            parent (QObject, optional): Родительский объект.
+            idle_ms (int, optional): Время без действий пользователя до начала обслуживания в миллисекундах.
+        """
+        super(IdleMaintenance, self).__init__(parent)
+        self.maintenance = Maintenance(conn)
+        self.idle_ms = idle_ms
+        self.lastInput = time.monotonic()
+        self.running = False
+        self.tasks = []
+        self.process = None
+        self.processOutput = ""
+        self.vacuumed = 0
+        self.vacuumSeconds = 0.0
+        QtCore.QCoreApplication.instance().installEventFilter(self)
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.checkIdle)
+        self.timer.start(IDLE_CHECK_MS)
+
+    def eventFilter(self, watched, event):
+        """
+        Запоминает время действия пользователя и прерывает обслуживание.
+
+        Args:
+            watched (QObject): Объект, которому адресовано событие.
+            event (QEvent): Событие.
+
+        Returns:
+            bool: False - событие обрабатывается как обычно.
+        """
+        if event.type() in self.INPUT_EVENTS:
+            self.lastInput = time.monotonic()
+            if self.running:
+                self.stop()
+        return False
+
+    def checkIdle(self):
+        """
+        Начинает обслуживание, если пользователь не работает с приложением и есть задачи.
+        """
+        if self.running or (time.monotonic() - self.lastInput) * 1000 < self.idle_ms:
+            return
+        self.tasks = self.maintenance.getDueTasks()
+        if self.tasks:
+            self.running = True
+            self.vacuumed = 0
+            self.vacuumSeconds = 0.0
+            QtCore.QTimer.singleShot(0, self.runStep)
+        else:
+            self.finish()
+
+    def runStep(self):
+        """
+        Выполняет следующий шаг обслуживания.
+        """
+        if not self.running:
+            return
+        if not self.tasks:
+            self.finish()
+            return
+        if self.tasks[0] != "vacuum":
+            self.startChecks()
+            return
+        started = time.perf_counter()
+        freed = self.maintenance.vacuumStep()
+        self.vacuumSeconds += time.perf_counter() - started
+        if freed:
+            self.vacuumed += freed
+        else:
+            if freed is not None:
+                self.maintenance.logTask("vacuum", self.vacuumSeconds, str(self.vacuumed))
+            self.tasks.pop(0)
+        QtCore.QTimer.singleShot(0, self.runStep)
+
+    def startChecks(self):
+        """
+        Запускает остальные задачи (обновление статистики и проверки) отдельным процессом.
+        """
+        self.processOutput = ""
+        self.process = QtCore.QProcess(self)
+        self.process.readyReadStandardOutput.connect(self.readOutput)
+        self.process.finished.connect(self.finishChecks)
+        self.process.start(sys.executable, [os.path.abspath(__file__), "idle", "--db", self.maintenance.conn.db_path,
+                                            "--tasks", ",".join(self.tasks)])
+
+    def readOutput(self):
+        """
+        Учитывает результаты задач процесса по мере их завершения.
+
+        Строки результата имеют вид 'result <задача> <секунды> <количество ошибок>'.
+        """
+        if self.process is None:
+            return
+        self.processOutput += bytes(self.process.readAllStandardOutput()).decode("utf-8")
+        *lines, self.processOutput = self.processOutput.split("\n")
+        for line in lines:
+            parts = line.split()
+            if len(parts) == 4 and parts[0] == "result" and parts[1] in self.tasks:
+                task, seconds, problems = parts[1], float(parts[2]), int(parts[3])
+                self.maintenance.logTask(task, seconds, "ok" if not problems else str(problems))
+                self.tasks.remove(task)
+                if task != "optimize":
+                    self.checked.emit(task, problems)
+
+    def finishChecks(self, exit_code, exit_status):
+        """
+        Завершает обслуживание после окончания процесса задач.
+
+        Args:
+            exit_code (int): Код завершения процесса.
+            exit_status (QProcess.ExitStatus): Состояние завершения процесса.
+        """
+        self.readOutput()
+        if exit_status == QtCore.QProcess.ExitStatus.NormalExit and exit_code != 0:
+            print(bytes(self.process.readAllStandardError()).decode("utf-8").strip())
+        self.process = None
+        self.finish()
+
+    def finish(self):
+        """
+        Завершает обслуживание; задачи, которые не удалось выполнить, повторяются в следующий простой.
+        """
+        self.running = False
+        self.lastInput = time.monotonic()
+
+    def stop(self):
+        """
+        Прерывает обслуживание; невыполненные задачи будут выполнены в следующий простой.
+        """
+        self.running = False
+        if self.process is not None:
+            self.process.finished.disconnect(self.finishChecks)
+            self.process.kill()
+            self.process.waitForFinished(1000)
+            self.process = None
+
+
+def printTimings(before, after):
+    """
+    Выводит время типичных запросов до и после обслуживания.
+
+    Args:
+        before (dict): Время запросов до обслуживания в миллисекундах.
+        after (dict): Время запросов после обслуживания в миллисекундах.
+    """
+    print("Запрос\tдо, мс\tпосле, мс")
+    for name in before:
+        print(f"{name}\t{before[name]:.1f}\t{after[name]:.1f}")
+
+
+def runCheck(maintenance, quick=False):
+    """
+    Выполняет проверку целостности и выводит ее результат.
+
+    Args:
+        maintenance (Maintenance): Обслуживание базы данных.
+        quick (bool, optional): Выполнить быструю проверку.
+
+    Returns:
+        int: Количество найденных ошибок (-1, если проверку не удалось выполнить).
+    """
+    started = time.perf_counter()
+    messages = maintenance.checkIntegrity(quick)
+    seconds = time.perf_counter() - started
+    if messages is None:
+        print("Не удалось проверить целостность базы данных")
+        return -1
+    for message in messages:
+        print(message)
+    print(f"Проверка целостности: {'ошибок нет' if not messages else f'ошибок - {len(messages)}'} ({seconds:.2f} с)")
+    maintenance.logTask("integrity", seconds, "ok" if not messages else str(len(messages)))
+    return len(messages)
+
+
+def runValidate(maintenance):
+    """
+    Проверяет записи и выводит отчет о записях с ошибками.
+
+    Args:
+        maintenance (Maintenance): Обслуживание базы данных.
+
+    Returns:
+        int: Количество записей с ошибками (-1, если проверку не удалось выполнить).
+    """
+    from currency import formatMinorUnits
+
+    started = time.perf_counter()
+    rows = maintenance.validateRows()
+    seconds = time.perf_counter() - started
+    if rows is None:
+        print("Не удалось проверить записи")
+        return -1
+    for entry_id, description, value, category, date, currency, problems in rows:
+        amount = formatMinorUnits(value) if isinstance(value, int) else value
+        print(f"{entry_id}\t{date}\t{description}\t{amount} {currency}\t{category}\t{'; '.join(problems)}")
+    print(f"Проверка записей: {'ошибок нет' if not rows else f'записей с ошибками - {len(rows)}'} ({seconds:.2f} с)")
+    maintenance.logTask("validate", seconds, "ok" if not rows else str(len(rows)))
+    return len(rows)
+
+
+def runOptimize(maintenance):
+    """
+    Обновляет статистику планировщика запросов и выводит результат.
+
+    Args:
+        maintenance (Maintenance): Обслуживание базы данных.
+
+    Returns:
+        bool: True, если статистика обновлена.
+    """
+    started = time.perf_counter()
+    if not maintenance.optimize(full=True):
+        print("Не удалось обновить статистику")
+        return False
+    seconds = time.perf_counter() - started
+    print(f"Статистика обновлена ({seconds:.2f} с)")
+    maintenance.logTask("optimize", seconds, "ok")
+    return True
+
+
+def runVacuum(maintenance):
+    """
+    Освобождает свободные страницы (при первом запуске перестраивает файл) и выводит результат.
+
+    Args:
+        maintenance (Maintenance): Обслуживание базы данных.
+
+    Returns:
+        bool: True, если задача выполнена.
+    """
+    before = maintenance.getPageStats()
+    started = time.perf_counter()
+    if before["auto_vacuum"] != 2:
+        if not maintenance.rebuild():
+            print("Не удалось перестроить базу данных: закройте приложение и повторите")
+            return False
+    else:
+        freed = maintenance.vacuumStep()
+        while freed:
+            freed = maintenance.vacuumStep()
+        if freed is None:
+            return False
+    seconds = time.perf_counter() - started
+    after = maintenance.getPageStats()
+    print(f"Размер файла: {before['pages'] * before['page_size'] / 2 ** 20:.1f} МБ -> "
+          f"{after['pages'] * after['page_size'] / 2 ** 20:.1f} МБ, свободных страниц: {before['free']} -> "
+          f"{after['free']} ({seconds:.2f} с)")
+    maintenance.logTask("vacuum", seconds, str(before["pages"] - after["pages"]))
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Обслуживание базы данных")
+    parser.add_argument("command", choices=["check", "validate", "optimize", "vacuum", "run", "idle"])
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы данных")
+    parser.add_argument("--quick", action="store_true", help="быстрая проверка целостности (без сверки индексов)")
+    parser.add_argument("--tasks", default="integrity,validate", help="задачи для команды idle через запятую")
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication(sys.argv)
+    from connection import BUSY_TIMEOUT_MS, Data
+
+    if args.command == "idle":
+        # Задачи в простое приложения: схему и журнал задач ведет соединение окна
+        maintenance = Maintenance(IdleConnection(args.db, BUSY_TIMEOUT_MS))
+        for task in args.tasks.split(","):
+            started = time.perf_counter()
+            if task == "optimize":
+                problems = [] if maintenance.optimize() else None
+            elif task == "integrity":
+                problems = maintenance.checkIntegrity()
+            elif task == "validate":
+                problems = maintenance.validateRows()
+            else:
+                continue
+            if problems is None:
+                sys.exit(1)
+            print(f"result {task} {time.perf_counter() - started:.3f} {len(problems)}", flush=True)
+        sys.exit(0)
+
+    maintenance = Maintenance(Data(args.db))
+    failed = False
+    if args.command in ("check", "run"):
+        failed |= runCheck(maintenance, args.quick) != 0
+    if args.command in ("validate", "run"):
+        failed |= runValidate(maintenance) < 0
+    if args.command in ("optimize", "vacuum", "run"):
+        before = maintenance.timeQueries()
+        if args.command in ("vacuum", "run"):
+            failed |= not runVacuum(maintenance)
+        if args.command in ("optimize", "run"):
+            failed |= not runOptimize(maintenance)
+        printTimings(before, maintenance.timeQueries())
+    sys.exit(1 if failed else 0)
@@ -50,14 +50,30 @@ class Ui_Dialog(object):
         self.descriptionLineEdit.setClearButtonEnabled(False)
         self.descriptionLineEdit.setObjectName("descriptionLineEdit")
         self.verticalLayout.addWidget(self.descriptionLineEdit)
-        self.priceSpinBox = QtWidgets.QSpinBox(parent=self.mainFrame)
+        self.priceSpinBox = QtWidgets.QDoubleSpinBox(parent=self.mainFrame)
         self.priceSpinBox.setStyleSheet("")
         self.priceSpinBox.setButtonSymbols(QtWidgets.QAbstractSpinBox.ButtonSymbols.NoButtons)
-        self.priceSpinBox.setMinimum(0)
-        self.priceSpinBox.setMaximum(100000000)
-        self.priceSpinBox.setProperty("value", 0)
+        self.priceSpinBox.setDecimals(2)
+        self.priceSpinBox.setMinimum(0.0)
+        self.priceSpinBox.setMaximum(100000000.0)
+        self.priceSpinBox.setProperty("value", 0.0)
         self.priceSpinBox.setObjectName("priceSpinBox")
         self.verticalLayout.addWidget(self.priceSpinBox)
+        self.currencyComboBox = QtWidgets.QComboBox(parent=self.mainFrame)
+        self.currencyComboBox.setStyleSheet("QComboBox {\n"
+"    border-radius: 3px;\n"
+"    padding-left: 5px;\n"
+"}\n"
+"\n"
+"QComboBox QAbstractItemView {\n"
+"    background-color: white;\n"
+"}")
+        self.currencyComboBox.setObjectName("currencyComboBox")
+        self.currencyComboBox.addItem("")
+        self.currencyComboBox.addItem("")
+        self.currencyComboBox.addItem("")
+        self.currencyComboBox.addItem("")
+        self.verticalLayout.addWidget(self.currencyComboBox)
         self.categoryComboBox = QtWidgets.QComboBox(parent=self.mainFrame)
         self.categoryComboBox.setContextMenuPolicy(QtCore.Qt.ContextMenuPolicy.DefaultContextMenu)
         self.categoryComboBox.setStyleSheet("QComboBox {\n"
@@ -113,6 +129,21 @@ class Ui_Dialog(object):
         self.dateEdit.setDate(QtCore.QDate(2024, 1, 1))
         self.dateEdit.setObjectName("dateEdit")
         self.verticalLayout.addWidget(self.dateEdit)
+        self.repeatComboBox = QtWidgets.QComboBox(parent=self.mainFrame)
+        self.repeatComboBox.setStyleSheet("QComboBox {\n"
+"    border-radius: 3px;\n"
+"    padding-left: 5px;\n"
+"}\n"
+"\n"
+"QComboBox QAbstractItemView {\n"
+"    background-color: white;\n"
+"}")
+        self.repeatComboBox.setObjectName("repeatComboBox")
+        self.repeatComboBox.addItem("")
+        self.repeatComboBox.addItem("")
+        self.repeatComboBox.addItem("")
+        self.repeatComboBox.addItem("")
+        self.verticalLayout.addWidget(self.repeatComboBox)
         self.saveButton = QtWidgets.QPushButton(parent=self.mainFrame)
         self.saveButton.setMaximumSize(QtCore.QSize(16777215, 50))
         self.saveButton.setStyleSheet("QPushButton { \n"
@@ -138,6 +169,10 @@ class Ui_Dialog(object):
         Dialog.setWindowTitle(_translate("Dialog", "Dialog"))
         self.newEntryLabel.setText(_translate("Dialog", "Добавление записи"))
         self.descriptionLineEdit.setPlaceholderText(_translate("Dialog", "Описание"))
+        self.currencyComboBox.setItemText(0, _translate("Dialog", "RUB"))
+        self.currencyComboBox.setItemText(1, _translate("Dialog", "USD"))
+        self.currencyComboBox.setItemText(2, _translate("Dialog", "EUR"))
+        self.currencyComboBox.setItemText(3, _translate("Dialog", "CNY"))
         self.categoryComboBox.setPlaceholderText(_translate("Dialog", "Категория"))
         self.categoryComboBox.setItemText(0, _translate("Dialog", "Поступления"))
         self.categoryComboBox.setItemText(1, _translate("Dialog", "Авиабилеты"))
@@ -171,4 +206,8 @@ class Ui_Dialog(object):
         self.categoryComboBox.setItemText(29, _translate("Dialog", "Цветы"))
         self.categoryComboBox.setItemText(30, _translate("Dialog", "Частные услуги"))
         self.categoryComboBox.setItemText(31, _translate("Dialog", "Прочее"))
+        self.repeatComboBox.setItemText(0, _translate("Dialog", "Не повторять"))
+        self.repeatComboBox.setItemText(1, _translate("Dialog", "Каждую неделю"))
+        self.repeatComboBox.setItemText(2, _translate("Dialog", "Каждый месяц"))
+        self.repeatComboBox.setItemText(3, _translate("Dialog", "Каждый год"))
         self.saveButton.setText(_translate("Dialog", "Сохранить"))
@@ -0,0 +1,8 @@
+# Модуль с путями к файлам приложения.
+#
+# Вынесен отдельно от модуля connection, чтобы главное окно могло узнать путь
+# к базе данных, не загружая слой работы с SQL при запуске.
+
+
+# Путь к файлу базы данных по умолчанию
+DB_PATH = "expensetracker.db"
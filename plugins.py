@@ -0,0 +1,428 @@
+# Модуль плагинов: импорт выписок, экспорт записей, панели главного окна и обработчики записи.
+#
+# Плагин - функция стороннего пакета, объявленная точкой входа (entry point) в одной из групп:
+#     expensetracker.importers     чтение выписки: parse(path) -> (строки, количество пропущенных
+#                                  строк), строки - как у importer.readStatement
+#     expensetracker.exporters     запись файла: write(rows, path), строки - кортежи (ID, описание,
+#                                  сумма в минимальных единицах, валюта, категория, дата 'DD.MM.YYYY')
+#     expensetracker.widgets       панель главного окна: create(conn, parent) -> QWidget; метод
+#                                  refresh() панели, если он есть, вызывается при обновлении данных окна
+#     expensetracker.before_write  перед записью: hook(operation, entries); False отменяет запись
+#     expensetracker.after_write   после записи: hook(operation, entries)
+# operation - 'insert', 'update' или 'delete', entries - список кортежей (ID, описание, сумма
+# в минимальных единицах, категория, дата 'DD.MM.YYYY', валюта); ID записи до вставки - None.
+#
+# Имя точки входа - название плагина в интерфейсе; у импорта и экспорта в нем указывается
+# фильтр файлов. Пакет объявляет плагин в pyproject.toml:
+#     [project.entry-points."expensetracker.importers"]
+#     "Тинькофф (*.csv)" = "tinkoff_statement:parse"
+#
+# Обработчики записи вызывают методы connection.Data, меняющие записи (insertEntry, insertEntries,
+# updateEntry, deleteEntry, setSplit - как изменение записи), и материализация повторяющихся
+# операций (recurring.Scheduler.materializeDue - как вставка; при запуске приложения она выполняется
+# в фоновом потоке, поэтому обработчик не должен обращаться к окнам). Намеренно без обработчиков:
+#     синхронизация (sync)          переносит изменения, которые уже прошли обработчики в другой копии
+#     архивирование (archive)       переносит записи в файл архива года, не меняя их
+#     восстановление копии (backup) заменяет файл базы данных целиком
+#     служебные запросы Data        заполняют отпечатки и идентификаторы, выполняют миграции схемы
+#
+# Точки входа читаются из метаданных установленных пакетов один раз за процесс при запуске:
+# при создании соединения connection.Data, а главное окно начинает чтение в фоновом потоке
+# при создании (discoverInBackground), поэтому поиск не задерживает ни первую отрисовку, ни первую
+# запись. Модуль плагина импортируется при первом вызове. При импорте проверяется, что функцию
+# можно вызвать с аргументами своей группы; упавший при импорте плагин или плагин с другой
+# сигнатурой отключается. Исключение при вызове плагина выводится и учитывается, но не прерывает
+# работу приложения; так же учитывается результат импорта другого вида, чем описано выше
+# (см. checkStatement), - вызов возвращает None, как при ошибке чтения.
+#
+# Для каждого плагина собирается время импорта, количество вызовов и ошибок, суммарное
+# и наибольшее время вызова; их показывают окно диагностики и запуск модуля.
+#
+# Запуск модуля выводит найденные плагины: python plugins.py
+
+
+import importlib
+import threading
+import time
+
+
+# Группы точек входа по видам плагинов
+GROUPS = {
+    "importer": "expensetracker.importers",
+    "exporter": "expensetracker.exporters",
+    "widget": "expensetracker.widgets",
+    "before_write": "expensetracker.before_write",
+    "after_write": "expensetracker.after_write",
+}
+
+# Аргументы, с которыми вызываются плагины каждого вида (для проверки сигнатуры)
+HOOK_ARGUMENTS = {
+    "importer": ("statement.csv",),
+    "exporter": ([], "statement.csv"),
+    "widget": (None, None),
+    "before_write": ("insert", []),
+    "after_write": ("insert", []),
+}
+
+# Встроенные плагины: вид, название и ссылка 'модуль:функция'
+BUILTIN_PLUGINS = (
+    ("importer", "CSV (*.csv)", "importer:readStatement"),
+    ("exporter", "CSV (*.csv)", "importer:writeStatement"),
+)
+
+# Название пакета встроенных плагинов
+BUILTIN_PACKAGE = "expensetracker"
+
+
+def checkStatement(statement):
+    """
+    Проверяет вид результата плагина импорта.
+
+    Args:
+        statement: Результат плагина импорта.
+
+    Returns:
+        tuple: Строки и количество пропущенных строк.
+
+    Raises:
+        TypeError: Если результат не пара (строки, количество пропущенных строк) или строка
+            не кортеж (описание, сумма в минимальных единицах, валюта, категория или None, дата).
+    """
+    if not isinstance(statement, (tuple, list)) or len(statement) != 2:
+        raise TypeError(f"результат импорта - не пара (строки, пропущено): {type(statement).__name__}")
+    rows, skipped = statement
+    if not isinstance(rows, (tuple, list)) or not isinstance(skipped, int) or isinstance(skipped, bool):
+        raise TypeError("результат импорта - не список строк и количество пропущенных строк")
+    for row in rows:
+        if not isinstance(row, (tuple, list)) or len(row) != 5:
+            raise TypeError(f"строка выписки - не кортеж из 5 значений: {row!r}")
+        description, value, currency, category, date = row
+        if not (isinstance(description, str) and isinstance(currency, str) and isinstance(date, str) and
+                (category is None or isinstance(category, str))) or \
+                not isinstance(value, int) or isinstance(value, bool):
+            raise TypeError(f"неверные типы значений строки выписки: {row!r}")
+    return rows, skipped
+
+
+# Проверки результата вызова по видам плагинов
+RESULT_CHECKS = {
+    "importer": checkStatement,
+}
+
+
+class Plugin:
+    """
+    Плагин: ссылка на функцию, загружаемую при первом вызове, и статистика вызовов.
+    """
+
+    def __init__(self, kind, name, value, package):
+        """
+        Инициализирует плагин.
+
+        Args:
+            kind (str): Вид плагина (ключ GROUPS).
+            name (str): Название плагина.
+            value (str): Ссылка на функцию 'модуль:атрибут'.
+            package (str): Название пакета, объявившего плагин.
+        """
+        self.kind = kind
+        self.name = name
+        self.value = value
+        self.package = package
+        self.target = None
+        self.loaded = False
+        self.error = None
+        self.import_seconds = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        Импортирует модуль плагина и проверяет сигнатуру функции (один раз).
+
+        Returns:
+            callable: Функция плагина или None, если плагин не удалось загрузить.
+        """
+        with self.lock:
+            if self.loaded:
+                return self.target
+            import inspect
+
+            started = time.perf_counter()
+            try:
+                module_name, _, attribute = self.value.partition(":")
+                target = importlib.import_module(module_name.strip())
+                for part in attribute.strip().split(".") if attribute.strip() else []:
+                    target = getattr(target, part)
+                inspect.signature(target).bind(*HOOK_ARGUMENTS[self.kind])
+            except Exception as error:
+                self.error = f"{type(error).__name__}: {error}"
+                print(f"Плагин '{self.name}' ({self.value}) отключен: {self.error}")
+            else:
+                self.target = target
+            self.import_seconds = time.perf_counter() - started
+            self.loaded = True
+            return self.target
+
+    def call(self, *args):
+        """
+        Вызывает функцию плагина, загружая ее при первом вызове.
+
+        Args:
+            *args: Аргументы вызова (см. HOOK_ARGUMENTS).
+
+        Returns:
+            Результат функции или None, если плагин отключен, вызов завершился ошибкой
+            или результат не прошел проверку своего вида (RESULT_CHECKS).
+        """
+        target = self.load()
+        if target is None:
+            return None
+        check = RESULT_CHECKS.get(self.kind)
+        if check is None:
+            return self.invoke(target, *args)
+        # Неверный результат учитывается как ошибка вызова плагина
+        return self.invoke(lambda *call_args: check(target(*call_args)), *args)
+
+    def invoke(self, function, *args):
+        """
+        Вызывает функцию от имени плагина, учитывая время вызова и ошибки.
+
+        Используется и для методов объектов, созданных плагином (например, refresh панели).
+
+        Args:
+            function (callable): Функция.
+            *args: Аргументы вызова.
+
+        Returns:
+            Результат функции или None, если вызов завершился ошибкой.
+        """
+        started = time.perf_counter()
+        failed = False
+        try:
+            return function(*args)
+        except Exception as error:
+            failed = True
+            print(f"Ошибка плагина '{self.name}': {type(error).__name__}: {error}")
+            return None
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.calls += 1
+                self.errors += failed
+                self.total += elapsed
+                self.max = max(self.max, elapsed)
+
+    def getStats(self):
+        """
+        Возвращает статистику плагина.
+
+        Returns:
+            dict: Вид, название, пакет, ссылка, ошибка загрузки, время импорта, количество
+            вызовов и ошибок, суммарное и наибольшее время вызова (время - в секундах).
+        """
+        with self.lock:
+            return {"kind": self.kind, "name": self.name, "package": self.package, "value": self.value,
+                    "error": self.error, "import_seconds": self.import_seconds, "calls": self.calls,
+                    "errors": self.errors, "total": self.total, "max": self.max}
+
+    def resetStats(self):
+        """
+        Сбрасывает статистику вызовов (время импорта сохраняется).
+        """
+        with self.lock:
+            self.calls = self.errors = 0
+            self.total = self.max = 0.0
+
+
+class PluginRegistry:
+    """
+    Реестр плагинов, читающий точки входа при первом обращении.
+    """
+
+    def __init__(self):
+        """
+        Инициализирует пустой реестр.
+        """
+        self.plugins = None
+        self.lock = threading.Lock()
+
+    def discover(self):
+        """
+        Читает точки входа установленных пакетов (один раз) и добавляет встроенные плагины.
+
+        Returns:
+            list: Список объектов Plugin.
+        """
+        with self.lock:
+            if self.plugins is None:
+                from importlib import metadata
+
+                plugins = [Plugin(kind, name, value, BUILTIN_PACKAGE) for kind, name, value in BUILTIN_PLUGINS]
+                for kind, group in GROUPS.items():
+                    for entry_point in metadata.entry_points(group=group):
+                        package = entry_point.dist.name if entry_point.dist is not None else ""
+                        plugins.append(Plugin(kind, entry_point.name, entry_point.value, package))
+                self.plugins = plugins
+            return self.plugins
+
+    def discoverInBackground(self):
+        """
+        Начинает чтение точек входа в фоновом потоке; discover в других потоках дождется его.
+
+        Returns:
+            threading.Thread: Поток чтения точек входа.
+        """
+        thread = threading.Thread(target=self.discover, name="plugins", daemon=True)
+        thread.start()
+        return thread
+
+    def register(self, kind, name, value, package=""):
+        """
+        Добавляет плагин без точки входа (например, из скрипта или бенчмарка).
+
+        Args:
+            kind (str): Вид плагина (ключ GROUPS).
+            name (str): Название плагина.
+            value (str): Ссылка на функцию 'модуль:атрибут'.
+            package (str, optional): Название пакета.
+
+        Returns:
+            Plugin: Добавленный плагин.
+
+        Raises:
+            ValueError: Если вид плагина неизвестен.
+        """
+        if kind not in GROUPS:
+            raise ValueError(f"Неизвестный вид плагина: {kind}")
+        plugin = Plugin(kind, name, value, package)
+        plugins = self.discover()
+        with self.lock:
+            plugins.append(plugin)
+        return plugin
+
+    def unregister(self, plugin):
+        """
+        Удаляет плагин из реестра.
+
+        Args:
+            plugin (Plugin): Плагин.
+        """
+        plugins = self.discover()
+        with self.lock:
+            if plugin in plugins:
+                plugins.remove(plugin)
+
+    def getPlugins(self, kind):
+        """
+        Возвращает плагины заданного вида в порядке объявления (встроенные - первыми).
+
+        Args:
+            kind (str): Вид плагина (ключ GROUPS).
+
+        Returns:
+            list: Список объектов Plugin.
+        """
+        return [plugin for plugin in self.discover() if plugin.kind == kind]
+
+    def getPlugin(self, kind, name):
+        """
+        Возвращает плагин по виду и названию.
+
+        Args:
+            kind (str): Вид плагина.
+            name (str): Название плагина.
+
+        Returns:
+            Plugin: Плагин или None, если такого нет.
+        """
+        for plugin in self.getPlugins(kind):
+            if plugin.name == name:
+                return plugin
+        return None
+
+    def hasWriteHooks(self):
+        """
+        Проверяет, есть ли обработчики записи.
+
+        Returns:
+            bool: True, если объявлен хотя бы один обработчик before_write или after_write.
+        """
+        return any(plugin.kind in ("before_write", "after_write") for plugin in self.discover())
+
+    def findVeto(self, operation, entries):
+        """
+        Вызывает обработчики before_write до первого, отменившего запись.
+
+        Args:
+            operation (str): 'insert', 'update' или 'delete'.
+            entries (list): Записи (см. описание модуля).
+
+        Returns:
+            Plugin: Обработчик, отменивший запись, или None, если запись разрешена.
+        """
+        for plugin in self.getPlugins("before_write"):
+            if plugin.call(operation, entries) is False:
+                print(f"Запись отменена плагином '{plugin.name}'")
+                return plugin
+        return None
+
+    def runWriteHooks(self, phase, operation, entries):
+        """
+        Вызывает обработчики записи.
+
+        Args:
+            phase (str): 'before_write' или 'after_write'.
+            operation (str): 'insert', 'update' или 'delete'.
+            entries (list): Записи (см. описание модуля).
+
+        Returns:
+            bool: False, если обработчик before_write отменил запись, иначе True.
+        """
+        if phase == "before_write":
+            return self.findVeto(operation, entries) is None
+        for plugin in self.getPlugins(phase):
+            plugin.call(operation, entries)
+        return True
+
+    def getStats(self):
+        """
+        Возвращает статистику всех плагинов, начиная с самых медленных.
+
+        Returns:
+            list: Словари статистики (см. Plugin.getStats), по убыванию суммарного времени
+            вызовов и импорта.
+        """
+        stats = [plugin.getStats() for plugin in self.discover()]
+        return sorted(stats, key=lambda row: row["total"] + row["import_seconds"], reverse=True)
+
+    def resetStats(self):
+        """
+        Сбрасывает статистику вызовов всех плагинов.
+        """
+        for plugin in self.discover():
+            plugin.resetStats()
+
+
+# Общий реестр приложения
+registry = PluginRegistry()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Список плагинов")
+    parser.add_argument("--load", action="store_true", help="импортировать плагины и вывести время импорта")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    plugins = registry.discover()
+    print(f"Чтение точек входа: {(time.perf_counter() - started) * 1000:.1f} мс")
+    for plugin in plugins:
+        if args.load:
+            plugin.load()
+        status = plugin.error or (f"{plugin.import_seconds * 1000:.1f} мс" if plugin.loaded else "не загружен")
+        print(f"{plugin.kind}\t{plugin.name}\t{plugin.package}\t{plugin.value}\t{status}")
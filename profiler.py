@@ -0,0 +1,59 @@
+# Модуль для профилирования запуска приложения.
+#
+# Режим включается аргументом командной строки --profile-startup или переменной окружения
+# EXPENSETRACKER_PROFILE_STARTUP=1. В этом режиме отмечается время этапов запуска
+# (импорт модулей, создание окна, первая отрисовка, готовность к работе) и время
+# отложенного импорта модулей, а после готовности окна в stderr выводится отчет.
+#
+# Подробное время импорта каждого модуля дает запуск python -X importtime main.py.
+#
+# Модуль должен импортироваться первым, чтобы отсчет времени начинался как можно раньше.
+
+
+import contextlib
+import os
+import sys
+import time
+
+
+STARTED = time.perf_counter()
+
+enabled = "--profile-startup" in sys.argv or os.environ.get("EXPENSETRACKER_PROFILE_STARTUP") == "1"
+marks = []
+
+
+def mark(name):
+    """
+    Отмечает завершение этапа запуска.
+
+    Args:
+        name (str): Название этапа.
+    """
+    if enabled:
+        marks.append((name, time.perf_counter() - STARTED, None))
+
+
+@contextlib.contextmanager
+def timed(name):
+    """
+    Измеряет длительность блока кода, например отложенного импорта модуля.
+
+    Args:
+        name (str): Название блока.
+    """
+    started = time.perf_counter()
+    yield
+    if enabled:
+        marks.append((name, time.perf_counter() - STARTED, time.perf_counter() - started))
+
+
+def report():
+    """
+    Выводит в stderr отчет о времени этапов запуска.
+    """
+    if not enabled:
+        return
+    print("Этап запуска                             с начала, мс   длительность, мс", file=sys.stderr)
+    for name, since_start, duration in marks:
+        duration = f"{duration * 1000:16.1f}" if duration is not None else ""
+        print(f"{name:40} {since_start * 1000:13.1f} {duration}", file=sys.stderr)
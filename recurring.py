@@ -0,0 +1,207 @@
+# Модуль для работы с повторяющимися операциями (зарплата, аренда, подписки).
+#
+# Класс Scheduler хранит правила повторения в таблице recurring_rules и:
+# - Материализует наступившие вхождения в таблицу расходов одним пакетным запросом,
+#   догоняя все пропущенные периоды.
+# - Позволяет получать будущие вхождения виртуально, не записывая их в базу данных.
+#
+# Вхождения правил вычисляются рекурсивным CTE на стороне SQLite, поэтому материализация
+# и прогноз используют одну и ту же арифметику дат.
+
+
+import datetime
+
+from currency import BASE_CURRENCY, requireMinorUnits
+
+
+# Допустимые единицы периода (совпадают с модификаторами функции date() в SQLite)
+PERIODS = ("days", "months", "years")
+
+
+def occurrenceDate(rule, k):
+    """
+    Возвращает SQL-выражение даты k-го вхождения правила в формате 'YYYY-MM-DD'.
+
+    Для месячных и годовых периодов дата ограничивается последним днем месяца,
+    чтобы правило на 31-е число не перескакивало на следующий месяц.
+
+    Args:
+        rule (str): Псевдоним таблицы recurring_rules в запросе.
+        k (str): SQL-выражение номера вхождения.
+
+    Returns:
+        str: SQL-выражение даты вхождения.
+    """
+    shift = f"'+' || (({k}) * {rule}.step) || ' ' || {rule}.period"
+    return (f"CASE {rule}.period WHEN 'days' THEN date({rule}.start_date, {shift}) "
+            f"ELSE min(date({rule}.start_date, {shift}), "
+            f"date({rule}.start_date, 'start of month', {shift}, '+1 months', '-1 day')) END")
+
+
+# Рекурсивный CTE с еще не материализованными вхождениями правил до даты (первый параметр)
+OCCURRENCES_CTE = (
+    "WITH RECURSIVE occurrences(rule_id, k, day) AS ("
+    f"SELECT r.id, r.next_index, {occurrenceDate('r', 'r.next_index')} FROM recurring_rules r "
+    "UNION ALL "
+    f"SELECT r.id, o.k + 1, {occurrenceDate('r', 'o.k + 1')} "
+    "FROM occurrences o JOIN recurring_rules r ON r.id = o.rule_id "
+    "WHERE o.day <= ? AND (r.end_date IS NULL OR o.day <= r.end_date)) "
+)
+
+# Условие отбора вхождений, попадающих в интервал до даты (второй параметр)
+OCCURRENCES_FILTER = "o.day <= ? AND (r.end_date IS NULL OR o.day <= r.end_date)"
+
+# Наступившие вхождения с колонками записи: описание, сумма, категория, дата 'DD.MM.YYYY', валюта
+DUE_OCCURRENCES = (OCCURRENCES_CTE +
+                   "SELECT r.description, r.value, r.category, strftime('%d.%m.%Y', o.day), r.currency "
+                   "FROM occurrences o JOIN recurring_rules r ON r.id = o.rule_id "
+                   f"WHERE {OCCURRENCES_FILTER} ORDER BY o.day")
+
+
+def projectionQuery():
+    """
+    Возвращает текст запроса виртуальных записей, построенных по правилам повторения.
+
+    Колонки совпадают с таблицей расходов, а идентификатор записи равен NULL.
+    Запрос принимает два параметра - дату 'YYYY-MM-DD', до которой строится прогноз.
+
+    Returns:
+        str: Текст SQL-запроса.
+    """
+    return (OCCURRENCES_CTE +
+            "SELECT NULL AS id, r.description AS description, r.value AS value, r.currency AS currency, "
+            "r.category AS category, strftime('%d.%m.%Y', o.day) AS date "
+            "FROM occurrences o JOIN recurring_rules r ON r.id = o.rule_id "
+            f"WHERE {OCCURRENCES_FILTER}")
+
+
+def toIsoDate(date):
+    """
+    Преобразует дату из формата интерфейса 'DD.MM.YYYY' в формат 'YYYY-MM-DD'.
+
+    Args:
+        date (str): Дата в формате 'DD.MM.YYYY'.
+
+    Returns:
+        str: Дата в формате 'YYYY-MM-DD'.
+    """
+    return datetime.datetime.strptime(date, "%d.%m.%Y").date().isoformat()
+
+
+class Scheduler:
+    def __init__(self, conn):
+        """
+        Инициализирует планировщик повторяющихся операций.
+
+        Args:
+            conn (Data): Объект для работы с базой данных.
+        """
+        super(Scheduler, self).__init__()
+        self.conn = conn
+
+    def addRule(self, description, value, category, start_date, period, step=1, end_date=None,
+                currency=BASE_CURRENCY):
+        """
+        Добавляет правило повторения.
+
+        Args:
+            description (str): Описание операции.
+            value (int): Сумма операции в минимальных единицах валюты.
+            category (str): Категория операции.
+            start_date (str): Дата первого вхождения в формате 'DD.MM.YYYY'.
+            period (str): Единица периода: 'days', 'months' или 'years'.
+            step (int, optional): Количество единиц периода между вхождениями.
+            end_date (str, optional): Дата последнего вхождения в формате 'DD.MM.YYYY'.
+            currency (str, optional): Код валюты суммы.
+
+        Returns:
+            bool: True, если правило добавлено.
+
+        Raises:
+            TypeError: Если сумма не является целым числом минимальных единиц.
+            ValueError: Если период неизвестен или шаг не является целым числом не меньше 1.
+        """
+        requireMinorUnits(value)
+        if period not in PERIODS:
+            raise ValueError(f"Неизвестный период повторения: {period}")
+        # Шаг 0 или меньше зациклил бы вычисление вхождений (рекурсивный CTE не продвигается по датам)
+        if isinstance(step, bool) or not isinstance(step, int) or step < 1:
+            raise ValueError(f"Шаг повторения должен быть целым числом не меньше 1, получено {step!r}")
+        query_text = ("INSERT INTO recurring_rules (description, value, category, start_date, period, step, end_date, "
+                      "currency) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+        return self.conn.executeQuery(query_text, [description, value, category, toIsoDate(start_date), period,
+                                                   step, toIsoDate(end_date) if end_date else None,
+                                                   currency]).isActive()
+
+    def deleteRule(self, rule_id):
+        """
+        Удаляет правило повторения. Уже материализованные записи сохраняются.
+
+        Args:
+            rule_id (int): Идентификатор правила.
+        """
+        self.conn.executeQuery("DELETE FROM recurring_rules WHERE id=?", [rule_id])
+
+    def getRules(self):
+        """
+        Возвращает список правил повторения.
+
+        Returns:
+            QtSql.QSqlQuery: Объект QtSql.QSqlQuery с результатами выполнения запроса.
+        """
+        return self.conn.executeQuery("SELECT id, description, value, currency, category, start_date, period, step, "
+                                      "end_date FROM recurring_rules")
+
+    def materializeDue(self, today=None):
+        """
+        Записывает в таблицу расходов все наступившие вхождения правил, включая пропущенные периоды.
+
+        Все вхождения вставляются одним запросом INSERT ... SELECT в рамках одной транзакции,
+        после чего счетчики материализованных вхождений правил сдвигаются. Если есть обработчики
+        записи плагинов (см. модуль plugins), вхождения сначала читаются и передаются им как
+        вставка записей; обработчик before_write может отменить материализацию.
+
+        Args:
+            today (datetime.date, optional): Дата, до которой материализуются вхождения.
+
+        Returns:
+            int: Количество добавленных записей; 0, если транзакция не выполнена или обработчик
+            записи отменил материализацию (его название - в conn.cancelled_by).
+        """
+        # Модуль connection сам импортирует этот модуль, поэтому импорт выполняется при вызове
+        from connection import TransactionError
+        from plugins import registry
+
+        until = (today or datetime.date.today()).isoformat()
+        entries = []
+        try:
+            with self.conn.transaction():
+                if self.conn.startWrite():
+                    # Вхождения читаются в той же транзакции, поэтому обработчики получают ровно
+                    # те записи, которые будут вставлены
+                    query = self.conn.executeQuery(DUE_OCCURRENCES, [until, until])
+                    while query.next():
+                        entries.append((None,) + tuple(query.value(column) for column in range(5)))
+                    if entries and not self.conn.allowWrite("insert", entries):
+                        return 0
+                query = self.conn.executeQuery(
+                    "INSERT INTO expenses (description, value, category, date, currency) " + DUE_OCCURRENCES,
+                    [until, until])
+                inserted = max(query.numRowsAffected(), 0)
+                last_id = query.lastInsertId()
+                if inserted:
+                    self.conn.fillMissingFingerprints()
+                    self.conn.executeQuery(
+                        OCCURRENCES_CTE +
+                        "UPDATE recurring_rules SET next_index = next_index + ("
+                        "SELECT COUNT(*) FROM occurrences o JOIN recurring_rules r ON r.id = o.rule_id "
+                        f"WHERE o.rule_id = recurring_rules.id AND {OCCURRENCES_FILTER})", [until, until])
+        except TransactionError:
+            # Вхождения будут записаны при следующем вызове
+            return 0
+        if entries and inserted == len(entries) and last_id is not None:
+            # Строки одного запроса INSERT получают идущие подряд идентификаторы
+            first_id = last_id - inserted + 1
+            registry.runWriteHooks("after_write", "insert", [(first_id + number,) + entry[1:]
+                                                             for number, entry in enumerate(entries)])
+        return inserted
@@ -0,0 +1,566 @@
+# Модуль для периодических отчетов - выписок за месяц или год в формате HTML или PDF.
+#
+# Отчет содержит итоги периода (остаток на начало, поступления, расходы, остаток на конец),
+# расходы по категориям, самые крупные расходы и изменение баланса по дням (отчет за месяц)
+# или по месяцам (отчет за год). Все данные отчета читаются агрегирующими запросами,
+# а не загрузкой записей периода:
+# - расходы по категориям - из таблицы budget_status, которую триггеры поддерживают
+#   для бюджетов (разделенные записи учитываются по строкам, архивные месяцы сохраняются);
+# - остаток на начало периода, поступления, расходы и изменение баланса - из таблицы
+#   daily_balance (изменения баланса по дням, категориям и валютам, их тоже поддерживают
+#   триггеры) и переносимых остатков архивов; суммы в других валютах пересчитываются
+#   по курсу на день, поэтому итоги сходятся: остаток на начало плюс поступления минус
+#   расходы равен остатку на конец (см. StatementReport.getSummary);
+# - крупные расходы - первые TOP_EXPENSES записей периода, отобранных по индексу месяца
+#   expenses_month (SQLite держит при сортировке только их).
+# Строки отчета записываются в файл по мере формирования (шаблоны разделов HTML_*).
+# PDF создается из того же HTML средствами Qt (QTextDocument и QPdfWriter), без графика.
+#
+# Отчеты за все месяцы года (--monthly) формируются параллельно в отдельных процессах;
+# остаток на начало года и изменения баланса по дням года читаются один раз в основном
+# процессе, и каждый процесс получает остаток на начало своего месяца.
+#
+# Запуск модуля:
+#     python reports.py 2024-03 [--format html|pdf] [--output отчет.html] [--db expensetracker.db]
+#     python reports.py 2024 --monthly [--format pdf] [--output каталог] [--jobs 4]
+
+
+import argparse
+import html
+import io
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PyQt6 import QtCore
+
+from currency import BASE_CURRENCY, convertAmount, formatMinorUnits
+from paths import DB_PATH
+
+# Количество самых крупных расходов в отчете
+TOP_EXPENSES = 10
+
+# Форматы отчетов
+REPORT_FORMATS = ("html", "pdf")
+
+# Названия месяцев в заголовках отчетов
+MONTH_NAMES = ("январь", "февраль", "март", "апрель", "май", "июнь", "июль", "август",
+               "сентябрь", "октябрь", "ноябрь", "декабрь")
+
+# Размеры графика изменения баланса в отчете HTML
+CHART_WIDTH = 640
+CHART_HEIGHT = 160
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="ru">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; color: #464451; margin: 24px; }}
+table {{ border-collapse: collapse; margin-bottom: 24px; }}
+th, td {{ padding: 4px 12px; border-bottom: 1px solid #c8c6d0; text-align: left; }}
+td.amount {{ text-align: right; }}
+.income {{ color: #1e8449; }}
+.expense {{ color: #ba3434; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+"""
+
+HTML_SUMMARY = """<h2>Итоги</h2>
+<table>
+<tr><td>Остаток на начало</td><td class="amount">{opening}</td></tr>
+<tr><td>Поступления</td><td class="amount income">{income}</td></tr>
+<tr><td>Расходы</td><td class="amount expense">{expenses}</td></tr>
+<tr><td>Остаток на конец</td><td class="amount">{closing}</td></tr>
+</table>
+"""
+
+HTML_TABLE_START = """<h2>{caption}</h2>
+<table>
+<tr>{header}</tr>
+"""
+
+HTML_TABLE_END = "</table>\n"
+
+HTML_END = """<p>Суммы в {currency}. Сформировано {created}.</p>
+</body>
+</html>
+"""
+
+
+def periodMonths(period):
+    """
+    Возвращает первый и последний месяц периода отчета.
+
+    Args:
+        period (str): Месяц 'YYYY-MM' или год 'YYYY'.
+
+    Returns:
+        tuple: Первый и последний месяц периода в формате 'YYYY-MM'.
+
+    Raises:
+        ValueError: Если период записан в другом формате.
+    """
+    if len(period) == 4 and period.isdigit():
+        return f"{period}-01", f"{period}-12"
+    if len(period) == 7 and period[4] == "-" and period[:4].isdigit() and period[5:].isdigit() \
+            and 1 <= int(period[5:]) <= 12:
+        return period, period
+    raise ValueError(f"Период отчета должен быть месяцем 'YYYY-MM' или годом 'YYYY': {period}")
+
+
+def periodTitle(period):
+    """
+    Возвращает заголовок отчета за период.
+
+    Args:
+        period (str): Месяц 'YYYY-MM' или год 'YYYY'.
+
+    Returns:
+        str: Заголовок отчета.
+    """
+    if len(period) == 4:
+        return f"Выписка за {period} год"
+    return f"Выписка за {MONTH_NAMES[int(period[5:]) - 1]} {period[:4]}"
+
+
+class StatementReport:
+    """
+    Отчет за месяц или год, данные которого читаются агрегирующими запросами.
+    """
+
+    def __init__(self, conn, period, opening=None):
+        """
+        Инициализирует отчет.
+
+        Args:
+            conn (connection.Data): Подключение к базе данных.
+            period (str): Месяц 'YYYY-MM' или год 'YYYY'.
+            opening (int, optional): Остаток на начало периода в минимальных единицах
+                базовой валюты, если он уже известен; иначе он считается запросом.
+
+        Raises:
+            ValueError: Если период записан в другом формате.
+        """
+        self.conn = conn
+        self.period = period
+        self.first_month, self.last_month = periodMonths(period)
+        self.opening = opening
+        self.daily = None
+
+        # Записи архивного года хранятся в файле архива
+        self.sources = ["expenses"]
+        schema = conn.attachArchive(int(period[:4]))
+        if schema is not None:
+            self.sources.append(f"{schema}.expenses")
+
+    def sourceQuery(self, columns, condition):
+        """
+        Возвращает запрос, объединяющий записи периода из основной таблицы и архива года.
+
+        Args:
+            columns (str): Выбираемые колонки; таблица записей доступна под именем t.
+            condition (str): Условие отбора записей.
+
+        Returns:
+            str: Текст запроса.
+        """
+        return " UNION ALL ".join(f"SELECT {columns} FROM {source} t WHERE {condition}" for source in self.sources)
+
+    def getDailyTotals(self):
+        """
+        Возвращает поступления и расходы по дням периода.
+
+        Изменения по дням, валютам и категориям читаются из таблицы daily_balance (записи
+        архива года - запросом по записям), складываются отдельно для поступлений и расходов
+        и пересчитываются в базовую валюту по курсу на день, как в connection.Data.getBalance.
+
+        Returns:
+            dict: Словарь {дата 'YYYY-MM-DD': [поступления, расходы]} в минимальных единицах
+            базовой валюты; расходы - положительное число.
+        """
+        if self.daily is not None:
+            return self.daily
+        from connection import ISO_DATE, MONTH_KEY, SIGNED_VALUE
+
+        rows = " UNION ALL ".join(["SELECT currency, day, category, net FROM daily_balance "
+                                   "WHERE day BETWEEN ? AND ?"] + [
+            f"SELECT currency, {ISO_DATE.format('t')}, category, {SIGNED_VALUE.format('t')} FROM {source} t "
+            f"WHERE {MONTH_KEY.format('t')} BETWEEN ? AND ?" for source in self.sources[1:]])
+        query = self.conn.executeQuery(f"SELECT currency, day, category = 'Поступления', SUM(net) FROM ({rows}) "
+                                       "GROUP BY 1, 2, 3 HAVING SUM(net) <> 0",
+                                       [f"{self.first_month}-01", f"{self.last_month}-31"] +
+                                       [self.first_month, self.last_month] * (len(self.sources) - 1))
+        daily = {}
+        while query.next():
+            amount = convertAmount(query.value(3), self.conn.rates.getRate(query.value(0), query.value(1)))
+            totals = daily.setdefault(query.value(1), [0, 0])
+            if query.value(2):
+                totals[0] += amount
+            else:
+                totals[1] -= amount
+        self.daily = daily
+        return daily
+
+    def getNetChanges(self):
+        """
+        Возвращает изменения баланса по дням периода (см. getDailyTotals).
+
+        Returns:
+            dict: Словарь {дата 'YYYY-MM-DD': изменение баланса в минимальных единицах базовой валюты}.
+        """
+        return {day: income - expenses for day, (income, expenses) in self.getDailyTotals().items()
+                if income != expenses}
+
+    def getOpeningBalance(self):
+        """
+        Возвращает остаток на начало периода: переносимые остатки архивов предыдущих лет
+        и изменения баланса по дням до первого месяца периода (таблица daily_balance,
+        для архива года - записи архива).
+
+        Returns:
+            int: Остаток в минимальных единицах базовой валюты.
+        """
+        if self.opening is not None:
+            return self.opening
+        from connection import ISO_DATE, MONTH_KEY, SIGNED_VALUE
+
+        query = self.conn.executeQuery("SELECT SUM(balance) FROM archives WHERE year < ?", [int(self.period[:4])])
+        opening = (query.value(0) if query.next() else None) or 0
+        # Суммы в базовой валюте складываются в одну группу, как в connection.BALANCE_GROUPS
+        rows = " UNION ALL ".join(["SELECT currency, day, net FROM daily_balance WHERE day < ?"] + [
+            f"SELECT currency, {ISO_DATE.format('t')}, {SIGNED_VALUE.format('t')} FROM {source} t "
+            f"WHERE {MONTH_KEY.format('t')} < ?" for source in self.sources[1:]])
+        opening += self.conn.rates.convertGroups(self.conn.executeQuery(
+            f"SELECT currency, CASE WHEN currency=? THEN '' ELSE day END, SUM(net) FROM ({rows}) GROUP BY 1, 2",
+            [BASE_CURRENCY, f"{self.first_month}-01"] + [self.first_month] * (len(self.sources) - 1)))
+        self.opening = opening
+        return opening
+
+    def getCategoryTotals(self):
+        """
+        Возвращает расходы периода по категориям.
+
+        Returns:
+            list: Список пар (категория, сумма в минимальных единицах базовой валюты)
+            по убыванию суммы.
+        """
+        query = self.conn.executeQuery("SELECT category, SUM(spent) FROM budget_status "
+                                       "WHERE month BETWEEN ? AND ? GROUP BY category "
+                                       "HAVING SUM(spent) <> 0 ORDER BY 2 DESC",
+                                       [self.first_month, self.last_month])
+        totals = []
+        while query.next():
+            totals.append((query.value(0), query.value(1)))
+        return totals
+
+    def iterTopExpenses(self, limit=TOP_EXPENSES):
+        """
+        Перебирает самые крупные расходы периода по сумме в базовой валюте.
+
+        Args:
+            limit (int, optional): Количество расходов.
+
+        Yields:
+            tuple: Дата 'DD.MM.YYYY', описание, категория, сумма в минимальных единицах
+            валюты записи, валюта, сумма в минимальных единицах базовой валюты.
+        """
+        from connection import BASE_VALUE, MONTH_KEY
+
+        # Курс ищется только для записей не в базовой валюте
+        rows = self.sourceQuery(f"date, description, category, value, currency, "
+                                f"CASE WHEN currency = ? THEN value ELSE {BASE_VALUE.format('t')} END AS base",
+                                f"{MONTH_KEY.format('t')} BETWEEN ? AND ? AND category <> 'Поступления'")
+        query = self.conn.executeQuery(f"SELECT * FROM ({rows}) ORDER BY base DESC LIMIT ?",
+                                       [BASE_CURRENCY, self.first_month, self.last_month] * len(self.sources)
+                                       + [limit])
+        while query.next():
+            yield tuple(query.value(column) for column in range(6))
+
+    def getTrend(self):
+        """
+        Возвращает изменение баланса за период: остаток на конец каждого дня для отчета
+        за месяц или на конец каждого месяца для отчета за год.
+
+        Returns:
+            list: Список пар (день 'YYYY-MM-DD' или месяц 'YYYY-MM', остаток
+            в минимальных единицах базовой валюты); дни и месяцы без записей пропускаются.
+        """
+        key_length = 7 if len(self.period) == 4 else 10
+        buckets = {}
+        for day, change in self.getNetChanges().items():
+            buckets[day[:key_length]] = buckets.get(day[:key_length], 0) + change
+        balance = self.getOpeningBalance()
+        trend = []
+        for key in sorted(buckets):
+            balance += buckets[key]
+            trend.append((key, balance))
+        return trend
+
+    def getSummary(self):
+        """
+        Возвращает итоги периода.
+
+        Поступления и расходы складываются из тех же пересчитанных сумм по дням, что и изменение
+        баланса (getDailyTotals), поэтому итоги сходятся: остаток на начало плюс поступления
+        минус расходы равен остатку на конец. Записи периода для этого не читаются.
+
+        Returns:
+            dict: Остаток на начало ('opening'), поступления ('income'), расходы ('expenses')
+            и остаток на конец ('closing') в минимальных единицах базовой валюты.
+        """
+        opening = self.getOpeningBalance()
+        daily = self.getDailyTotals().values()
+        income = sum(totals[0] for totals in daily)
+        expenses = sum(totals[1] for totals in daily)
+        return {"opening": opening, "income": income, "expenses": expenses, "closing": opening + income - expenses}
+
+    def iterHtml(self, chart=True):
+        """
+        Формирует отчет в формате HTML по частям.
+
+        Args:
+            chart (bool, optional): Добавить график изменения баланса (SVG).
+
+        Yields:
+            str: Очередная часть документа.
+        """
+        title = periodTitle(self.period)
+        yield HTML_HEAD.format(title=html.escape(title))
+
+        trend = self.getTrend()
+        summary = self.getSummary()
+        yield HTML_SUMMARY.format(**{key: formatMinorUnits(value) for key, value in summary.items()})
+
+        yield HTML_TABLE_START.format(caption="Расходы по категориям",
+                                      header="<th>Категория</th><th>Сумма</th><th>Доля</th>")
+        # Доли считаются от суммы строк таблицы (разделенные записи учитываются по строкам)
+        category_totals = self.getCategoryTotals()
+        expenses = sum(spent for _, spent in category_totals)
+        for category, spent in category_totals:
+            share = f"{100 * spent / expenses if expenses else 0:.1f}".replace(".", ",")
+            yield (f"<tr><td>{html.escape(category)}</td><td class=\"amount\">{formatMinorUnits(spent)}</td>"
+                   f"<td class=\"amount\">{share}%</td></tr>\n")
+        yield HTML_TABLE_END
+
+        yield HTML_TABLE_START.format(caption="Крупные расходы",
+                                      header="<th>Дата</th><th>Описание</th><th>Категория</th><th>Сумма</th>")
+        for date, description, category, value, currency, base in self.iterTopExpenses():
+            amount = formatMinorUnits(value) if currency == BASE_CURRENCY \
+                else f"{formatMinorUnits(base)} ({formatMinorUnits(value)} {html.escape(currency)})"
+            yield (f"<tr><td>{date}</td><td>{html.escape(description)}</td><td>{html.escape(category)}</td>"
+                   f"<td class=\"amount\">{amount}</td></tr>\n")
+        yield HTML_TABLE_END
+
+        if chart and len(trend) > 1:
+            yield self.chartSvg(trend)
+        yield HTML_TABLE_START.format(caption="Изменение баланса",
+                                      header="<th>Месяц</th><th>Остаток</th>" if len(self.period) == 4
+                                      else "<th>День</th><th>Остаток</th>")
+        for key, balance in trend:
+            label = key if len(key) == 7 else f"{key[8:10]}.{key[5:7]}.{key[:4]}"
+            yield f"<tr><td>{label}</td><td class=\"amount\">{formatMinorUnits(balance)}</td></tr>\n"
+        yield HTML_TABLE_END
+
+        yield HTML_END.format(currency=BASE_CURRENCY,
+                              created=QtCore.QDateTime.currentDateTime().toString("dd.MM.yyyy HH:mm"))
+
+    def chartSvg(self, trend):
+        """
+        Возвращает график изменения баланса в формате SVG.
+
+        Args:
+            trend (list): Пары (день или месяц, остаток) из getTrend.
+
+        Returns:
+            str: Элемент svg для вставки в HTML.
+        """
+        low = min(balance for _, balance in trend)
+        high = max(balance for _, balance in trend)
+        span = (high - low) or 1
+        step = CHART_WIDTH / (len(trend) - 1)
+        points = " ".join(f"{index * step:.1f},{CHART_HEIGHT - (balance - low) * CHART_HEIGHT / span:.1f}"
+                          for index, (_, balance) in enumerate(trend))
+        return (f"<svg width=\"{CHART_WIDTH}\" height=\"{CHART_HEIGHT}\" viewBox=\"0 -4 {CHART_WIDTH} "
+                f"{CHART_HEIGHT + 8}\"><polyline points=\"{points}\" fill=\"none\" stroke=\"#464451\" "
+                f"stroke-width=\"2\"/></svg>\n")
+
+    def write(self, path, report_format="html"):
+        """
+        Записывает отчет в файл.
+
+        Отчет HTML записывается по частям по мере формирования. Для PDF тот же документ
+        (без графика) верстается QTextDocument; для этого нужен QGuiApplication.
+
+        Args:
+            path (str): Путь к файлу отчета.
+            report_format (str, optional): 'html' или 'pdf'.
+
+        Returns:
+            bool: True, если отчет записан.
+        """
+        try:
+            if report_format == "html":
+                with open(path, "w", encoding="utf-8") as report_file:
+                    for chunk in self.iterHtml():
+                        report_file.write(chunk)
+                return True
+            from PyQt6.QtGui import QPageSize, QPdfWriter, QTextDocument
+
+            buffer = io.StringIO()
+            for chunk in self.iterHtml(chart=False):
+                buffer.write(chunk)
+            document = QTextDocument()
+            document.setHtml(buffer.getvalue())
+            writer = QPdfWriter(path)
+            writer.setPageSize(QPageSize(QPageSize.PageSizeId.A4))
+            writer.setTitle(periodTitle(self.period))
+            document.print(writer)
+            return os.path.exists(path)
+        except OSError as error:
+            print(error)
+            return False
+
+
+def reportPath(db_path, period, report_format, directory=None):
+    """
+    Возвращает путь к файлу отчета по умолчанию: рядом с базой данных или в заданном каталоге.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        period (str): Месяц 'YYYY-MM' или год 'YYYY'.
+        report_format (str): 'html' или 'pdf'.
+        directory (str, optional): Каталог отчетов.
+
+    Returns:
+        str: Путь к файлу отчета, например 'expensetracker.2024-03.html'.
+    """
+    name = f"{os.path.splitext(os.path.basename(db_path))[0]}.{period}.{report_format}"
+    return os.path.join(directory or os.path.dirname(os.path.abspath(db_path)), name)
+
+
+# Приложение Qt и подключение к базе данных процесса, формирующего отчеты (см. initWorker)
+worker_app = None
+worker_conn = None
+
+
+def initWorker(db_path, report_format):
+    """
+    Подготавливает процесс, формирующий отчеты: создает приложение Qt (QGuiApplication
+    для PDF) и подключение к базе данных, общее для всех отчетов процесса.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        report_format (str): 'html' или 'pdf'.
+    """
+    global worker_app, worker_conn
+    if report_format == "pdf":
+        from PyQt6.QtGui import QGuiApplication
+
+        worker_app = QGuiApplication(sys.argv[:1])
+    else:
+        worker_app = QtCore.QCoreApplication(sys.argv[:1])
+    from connection import Data
+
+    worker_conn = Data(db_path, "report", journal_mode=None)
+
+
+def writeWorkerReport(period, path, report_format, opening):
+    """
+    Формирует отчет в процессе, подготовленном initWorker.
+
+    Args:
+        period (str): Месяц 'YYYY-MM' или год 'YYYY'.
+        path (str): Путь к файлу отчета.
+        report_format (str): 'html' или 'pdf'.
+        opening (int): Остаток на начало периода в минимальных единицах базовой валюты.
+
+    Returns:
+        tuple: Путь к файлу отчета (None, если отчет не записан) и время формирования в секундах.
+    """
+    started = time.perf_counter()
+    written = StatementReport(worker_conn, period, opening).write(path, report_format)
+    return (path if written else None), time.perf_counter() - started
+
+
+def writeMonthlyReports(conn, year, directory=None, report_format="html", jobs=None):
+    """
+    Формирует отчеты за все месяцы года параллельно в отдельных процессах.
+
+    Остаток на начало года и изменения баланса по дням года читаются здесь один раз,
+    и каждый процесс получает остаток на начало своего месяца. Процессы запускаются методом
+    spawn: копия процесса с открытым соединением и приложением Qt (fork) небезопасна.
+
+    Args:
+        conn (connection.Data): Подключение к базе данных.
+        year (int): Год.
+        directory (str, optional): Каталог отчетов; по умолчанию каталог базы данных.
+        report_format (str, optional): 'html' или 'pdf'.
+        jobs (int, optional): Количество процессов; по умолчанию количество процессоров.
+
+    Returns:
+        dict: Словарь {месяц 'YYYY-MM': (путь к файлу отчета или None, время формирования в секундах)}.
+    """
+    year_report = StatementReport(conn, str(year))
+    opening = year_report.getOpeningBalance()
+    changes = year_report.getNetChanges()
+    openings = {}
+    for month in range(1, 13):
+        period = f"{year}-{month:02d}"
+        openings[period] = opening
+        opening += sum(change for day, change in changes.items() if day[:7] == period)
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(jobs, context, initWorker, (conn.db_path, report_format)) as executor:
+        futures = {period: executor.submit(writeWorkerReport, period,
+                                           reportPath(conn.db_path, period, report_format, directory),
+                                           report_format, month_opening)
+                   for period, month_opening in openings.items()}
+        return {period: future.result() for period, future in futures.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Выписка за месяц или год в формате HTML или PDF")
+    parser.add_argument("period", help="месяц 'YYYY-MM' или год 'YYYY'")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="html", help="формат отчета")
+    parser.add_argument("--output", help="файл отчета (для --monthly - каталог отчетов)")
+    parser.add_argument("--monthly", action="store_true", help="отчеты за каждый месяц года")
+    parser.add_argument("--jobs", type=int, help="количество процессов для --monthly")
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы данных")
+    args = parser.parse_args()
+
+    try:
+        periodMonths(args.period)
+    except ValueError as error:
+        sys.exit(str(error))
+    if args.monthly and len(args.period) != 4:
+        sys.exit("Для --monthly укажите год 'YYYY'")
+
+    if args.format == "pdf":
+        from PyQt6.QtGui import QGuiApplication
+
+        app = QGuiApplication(sys.argv)
+    else:
+        app = QtCore.QCoreApplication(sys.argv)
+    from connection import Data
+
+    conn = Data(args.db, journal_mode=None)
+    started = time.perf_counter()
+    if args.monthly:
+        if args.output:
+            os.makedirs(args.output, exist_ok=True)
+        results = writeMonthlyReports(conn, int(args.period), args.output, args.format, args.jobs)
+    else:
+        path = args.output or reportPath(args.db, args.period, args.format)
+        results = {args.period: (path if StatementReport(conn, args.period).write(path, args.format) else None,
+                                 time.perf_counter() - started)}
+    for period, (path, seconds) in results.items():
+        print(f"{period}\t{path or 'не записан'}\t{seconds:.2f} с")
+    print(f"Всего: {time.perf_counter() - started:.2f} с", file=sys.stderr)
+    if None in (path for path, _ in results.values()):
+        sys.exit(1)
@@ -0,0 +1,357 @@
+# Локальный HTTP-сервер с JSON API для доступа к базе данных расходов из других программ.
+#
+# Сервер построен на asyncio и поддерживает постоянные соединения (keep-alive) HTTP/1.1.
+# Запросы к базе данных выполняются через класс Data вне цикла событий:
+# - чтение - в пуле потоков, у каждого потока собственное именованное соединение;
+# - запись - в единственном потоке-писателе, поэтому записи выполняются последовательно
+#   и не конкурируют друг с другом за блокировку базы данных.
+#
+# Методы API:
+# - GET /entries?date=DD.MM.YYYY&category=...&limit=100&offset=0 - записи с фильтрами;
+#   параметр until=YYYY-MM-DD добавляет вхождения повторяющихся операций до даты.
+# - POST /entries - добавление записи, тело: {"description", "value" (в копейках),
+#   "category", "date" ('DD.MM.YYYY'), "currency" (необязательно)}.
+# - GET /balance?until=YYYY-MM-DD - баланс в минимальных единицах базовой валюты.
+# - GET /changes?since=0&limit=1000 - изменения записей после курсора since (см. модуль changes);
+#   ответ 410, если изменения после курсора уже удалены из журнала.
+#
+# Сервер слушает только локальный адрес и не выполняет аутентификацию.
+#
+# Запуск: python server.py --port 8765 --readers 4
+
+
+import argparse
+import asyncio
+import datetime
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from PyQt6 import QtCore
+
+from changes import CHANGE_BATCH, ChangeFeed, ChangeGapError
+from connection import CATEGORIES, Data
+from currency import BASE_CURRENCY
+from paths import DB_PATH
+
+
+# Время ожидания следующего запроса в постоянном соединении в секундах
+KEEP_ALIVE_TIMEOUT = 15
+
+# Количество записей в ответе по умолчанию и максимальное
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+
+# Максимальный размер тела запроса в байтах
+MAX_BODY_SIZE = 65536
+
+# Тексты статусов ответов
+STATUS_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+                  405: "Method Not Allowed", 410: "Gone", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+# Колонки записи в ответах, в порядке колонок Data.getTableWithFilters
+ENTRY_FIELDS = ("id", "description", "value", "currency", "category", "date")
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        """
+        Инициализирует ошибку запроса, возвращаемую клиенту.
+
+        Args:
+            status (int): Код статуса HTTP.
+            message (str): Описание ошибки.
+        """
+        super(RequestError, self).__init__(message)
+        self.status = status
+
+
+def parseInt(params, name, default, maximum):
+    """
+    Читает неотрицательный целочисленный параметр запроса.
+
+    Args:
+        params (dict): Параметры строки запроса.
+        name (str): Имя параметра.
+        default (int): Значение по умолчанию.
+        maximum (int): Максимальное значение.
+
+    Returns:
+        int: Значение параметра.
+
+    Raises:
+        RequestError: Если значение не является неотрицательным целым числом.
+    """
+    value = params.get(name, default)
+    try:
+        value = int(value)
+    except ValueError:
+        raise RequestError(400, f"Параметр {name} должен быть целым числом")
+    if value < 0:
+        raise RequestError(400, f"Параметр {name} не может быть отрицательным")
+    return min(value, maximum)
+
+
+def parseDate(value, date_format, name):
+    """
+    Проверяет формат даты.
+
+    Args:
+        value (str): Дата.
+        date_format (str): Формат даты для datetime.strptime.
+        name (str): Имя параметра для сообщения об ошибке.
+
+    Returns:
+        str: Та же дата.
+
+    Raises:
+        RequestError: Если дата не соответствует формату.
+    """
+    try:
+        datetime.datetime.strptime(value, date_format)
+    except (TypeError, ValueError):
+        raise RequestError(400, f"Некорректная дата в параметре {name}: {value!r}")
+    return value
+
+
+class LedgerServer:
+    def __init__(self, db_path=DB_PATH, readers=4):
+        """
+        Инициализирует сервер и пулы потоков для чтения и записи.
+
+        Соединения с базой данных открываются при запуске каждого потока.
+
+        Args:
+            db_path (str, optional): Путь к файлу базы данных.
+            readers (int, optional): Количество потоков чтения.
+        """
+        super(LedgerServer, self).__init__()
+        self.db_path = db_path
+        self.local = threading.local()
+        self.read_pool = ThreadPoolExecutor(readers, "reader", self.openConnection, ("reader",))
+        self.writer = ThreadPoolExecutor(1, "writer", self.openConnection, ("writer",))
+
+    def openConnection(self, role):
+        """
+        Открывает соединение с базой данных для текущего потока.
+
+        Args:
+            role (str): Назначение потока, используется в имени соединения.
+        """
+        self.local.conn = Data(self.db_path, connection_name=f"{role}-{threading.get_ident()}")
+
+    def listEntries(self, params):
+        """
+        Возвращает записи с фильтрами по дате и категории. Выполняется в потоке чтения.
+
+        Args:
+            params (dict): Параметры строки запроса.
+
+        Returns:
+            dict: Список записей и параметры страницы.
+        """
+        date = params.get("date")
+        category = params.get("category")
+        until = params.get("until")
+        if date is not None:
+            parseDate(date, "%d.%m.%Y", "date")
+        if until is not None:
+            parseDate(until, "%Y-%m-%d", "until")
+        limit = parseInt(params, "limit", DEFAULT_LIMIT, MAX_LIMIT)
+        offset = parseInt(params, "offset", 0, 2 ** 62)
+
+        query = self.local.conn.getTableWithFilters(date is None, category is None, date, category, until)
+        entries = []
+        has_row = query.seek(offset)
+        while has_row and len(entries) < limit:
+            entries.append({field: query.value(column) for column, field in enumerate(ENTRY_FIELDS)})
+            has_row = query.next()
+        return {"entries": entries, "limit": limit, "offset": offset}
+
+    def getBalance(self, params):
+        """
+        Возвращает баланс. Выполняется в потоке чтения.
+
+        Args:
+            params (dict): Параметры строки запроса.
+
+        Returns:
+            dict: Баланс в минимальных единицах базовой валюты.
+        """
+        until = params.get("until")
+        if until is not None:
+            parseDate(until, "%Y-%m-%d", "until")
+        return {"balance": self.local.conn.getBalance(until), "currency": BASE_CURRENCY}
+
+    def listChanges(self, params):
+        """
+        Возвращает изменения записей после курсора. Выполняется в потоке чтения.
+
+        Args:
+            params (dict): Параметры строки запроса.
+
+        Returns:
+            dict: Список изменений и курсор для следующего запроса.
+
+        Raises:
+            RequestError: Если изменения после курсора удалены из журнала.
+        """
+        since = parseInt(params, "since", 0, 2 ** 62)
+        limit = parseInt(params, "limit", CHANGE_BATCH, MAX_LIMIT)
+        try:
+            changes = ChangeFeed(self.local.conn).getChanges(since, limit)
+        except ChangeGapError as error:
+            raise RequestError(410, str(error))
+        return {"changes": changes, "cursor": changes[-1]["seq"] if changes else since}
+
+    def insertEntry(self, entry):
+        """
+        Добавляет запись. Выполняется в потоке записи.
+
+        Args:
+            entry (dict): Запись из тела запроса.
+
+        Returns:
+            dict: Идентификатор новой записи.
+
+        Raises:
+            RequestError: Если запись некорректна.
+        """
+        if not isinstance(entry, dict):
+            raise RequestError(400, "Тело запроса должно быть объектом JSON")
+        description = entry.get("description")
+        value = entry.get("value")
+        category = entry.get("category")
+        currency = entry.get("currency", BASE_CURRENCY)
+        if not isinstance(description, str) or not description.strip():
+            raise RequestError(400, "Не указано описание записи")
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise RequestError(400, "Сумма должна быть целым числом минимальных единиц")
+        if category not in CATEGORIES:
+            raise RequestError(400, f"Неизвестная категория: {category!r}")
+        if not isinstance(currency, str) or len(currency) != 3 or not currency.isalpha():
+            raise RequestError(400, f"Некорректный код валюты: {currency!r}")
+        date = parseDate(entry.get("date"), "%d.%m.%Y", "date")
+        entry_id = self.local.conn.insertEntry(description.strip(), value, category, date, currency.upper())
+        if entry_id is None:
+            raise RequestError(500, "Не удалось добавить запись")
+        return {"id": entry_id}
+
+    async def dispatch(self, method, target, body):
+        """
+        Выполняет метод API.
+
+        Args:
+            method (str): Метод HTTP.
+            target (str): Путь и строка запроса.
+            body (bytes): Тело запроса.
+
+        Returns:
+            tuple: Код статуса и объект ответа.
+
+        Raises:
+            RequestError: Если запрос некорректен.
+        """
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        loop = asyncio.get_running_loop()
+        if url.path == "/entries" and method == "GET":
+            return 200, await loop.run_in_executor(self.read_pool, self.listEntries, params)
+        if url.path == "/entries" and method == "POST":
+            try:
+                entry = json.loads(body)
+            except ValueError:
+                raise RequestError(400, "Тело запроса не является JSON")
+            return 201, await loop.run_in_executor(self.writer, self.insertEntry, entry)
+        if url.path == "/balance" and method == "GET":
+            return 200, await loop.run_in_executor(self.read_pool, self.getBalance, params)
+        if url.path == "/changes" and method == "GET":
+            return 200, await loop.run_in_executor(self.read_pool, self.listChanges, params)
+        if url.path in ("/entries", "/balance", "/changes"):
+            raise RequestError(405, f"Метод {method} не поддерживается")
+        raise RequestError(404, f"Неизвестный путь: {url.path}")
+
+    async def handleConnection(self, reader, writer):
+        """
+        Обслуживает соединение с клиентом, пока клиент не закроет его или не истечет время ожидания.
+
+        Args:
+            reader (asyncio.StreamReader): Поток чтения соединения.
+            writer (asyncio.StreamWriter): Поток записи соединения.
+        """
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+                try:
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY_SIZE:
+                        keep_alive = False
+                        raise RequestError(413, "Слишком большое тело запроса")
+                    body = await reader.readexactly(length)
+                    status, response = await self.dispatch(method, target, body)
+                except RequestError as error:
+                    status, response = error.status, {"error": str(error)}
+                except asyncio.IncompleteReadError:
+                    break
+                except Exception as error:
+                    print(error)
+                    status, response = 500, {"error": "Внутренняя ошибка сервера"}
+
+                payload = json.dumps(response, ensure_ascii=False).encode("utf-8")
+                writer.write((f"HTTP/1.1 {status} {STATUS_REASONS[status]}\r\n"
+                              f"Content-Type: application/json; charset=utf-8\r\n"
+                              f"Content-Length: {len(payload)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1")
+                             + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        """
+        Запускает сервер и обслуживает соединения до остановки.
+
+        Args:
+            host (str): Адрес для прослушивания.
+            port (int): Порт.
+        """
+        server = await asyncio.start_server(self.handleConnection, host, port)
+        print(f"Сервер запущен: http://{host}:{port}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Локальный HTTP-сервер для доступа к базе данных расходов")
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы данных")
+    parser.add_argument("--host", default="127.0.0.1", help="адрес для прослушивания")
+    parser.add_argument("--port", type=int, default=8765, help="порт")
+    parser.add_argument("--readers", type=int, default=4, help="количество потоков чтения")
+    args = parser.parse_args()
+
+    # Драйверу QtSql нужен объект приложения Qt
+    app = QtCore.QCoreApplication([])
+    try:
+        asyncio.run(LedgerServer(args.db, args.readers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
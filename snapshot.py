@@ -0,0 +1,104 @@
+# Модуль для работы со снимком состояния главного окна, ускоряющим запуск приложения.
+#
+# При закрытии окна в файл рядом с базой данных сохраняются баланс, состояние фильтров
+# и первая страница таблицы записей. Снимок привязан к ключу файла базы данных:
+# счетчику изменений из заголовка SQLite (увеличивается при каждой записывающей транзакции),
+# времени изменения и размеру файла, а также к размеру журнала WAL: записи, еще не перенесенные
+# из журнала в файл базы данных, файл не меняют. Перед сохранением снимка окно переносит журнал
+# в файл (см. connection.Data.checkpoint), поэтому закрытие соединения ключ не меняет.
+# При следующем запуске снимок показывается сразу, до открытия соединения с базой данных,
+# если ключ не изменился.
+#
+# PRAGMA data_version для этого не подходит: он действует только в пределах одного
+# соединения и не сохраняется между запусками.
+
+
+import json
+import os
+
+
+# Количество строк таблицы записей, сохраняемых в снимке
+SNAPSHOT_ROWS = 50
+
+
+def snapshotPath(db_path):
+    """
+    Возвращает путь к файлу снимка для базы данных.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+
+    Returns:
+        str: Путь к файлу снимка.
+    """
+    return db_path + ".snapshot.json"
+
+
+def databaseKey(db_path):
+    """
+    Возвращает ключ текущего состояния файла базы данных.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+
+    Returns:
+        list: Счетчик изменений из заголовка SQLite, время изменения и размер файла и размер
+        журнала WAL (0, если журнала нет) или None, если файл не существует.
+    """
+    try:
+        stat = os.stat(db_path)
+        with open(db_path, "rb") as file:
+            header = file.read(28)
+    except OSError:
+        return None
+    try:
+        wal_size = os.path.getsize(db_path + "-wal")
+    except OSError:
+        wal_size = 0
+    change_counter = int.from_bytes(header[24:28], "big") if len(header) == 28 else 0
+    return [change_counter, stat.st_mtime_ns, stat.st_size, wal_size]
+
+
+def loadSnapshot(db_path):
+    """
+    Загружает снимок состояния главного окна.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+
+    Returns:
+        dict: Снимок с ключами 'balance', 'filters', 'headers', 'rows' и 'valid' или None.
+        Ключ 'valid' показывает, соответствуют ли данные снимка текущему состоянию базы данных.
+    """
+    try:
+        with open(snapshotPath(db_path), encoding="utf-8") as file:
+            snapshot = json.load(file)
+    except (OSError, ValueError):
+        return None
+    snapshot["valid"] = snapshot.get("key") == databaseKey(db_path)
+    return snapshot
+
+
+def saveSnapshot(db_path, balance, filters, headers, rows):
+    """
+    Сохраняет снимок состояния главного окна.
+
+    Args:
+        db_path (str): Путь к файлу базы данных.
+        balance (int): Баланс в минимальных единицах базовой валюты.
+        filters (dict): Состояние фильтров по дате, категории и метке.
+        headers (list): Заголовки колонок таблицы записей.
+        rows (list): Первые строки таблицы записей.
+    """
+    snapshot = {
+        "key": databaseKey(db_path),
+        "balance": balance,
+        "filters": filters,
+        "headers": headers,
+        "rows": rows[:SNAPSHOT_ROWS],
+    }
+    # Запись через временный файл, чтобы прерванное сохранение не оставило поврежденный снимок
+    path = snapshotPath(db_path)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(snapshot, file, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
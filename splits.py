@@ -0,0 +1,152 @@
+# Модуль для разделения записей на строки по категориям и для меток записей.
+#
+# Одна покупка может относиться к нескольким категориям (например, в чеке супермаркета -
+# продукты и лекарства). Разделенная запись остается одной записью таблицы расходов с общей
+# суммой и категорией SPLIT_CATEGORY, а ее строки хранятся в таблице entry_items (см.
+# connection.Data.setSplit). Баланс складывает записи и поэтому учитывает разделенную запись
+# один раз, а суммы расходов по категориям, бюджеты и отчеты по меткам - ее строки.
+#
+# Метки - произвольные слова, которые пользователь присваивает записям ('отпуск', 'ремонт
+# кухни'); запись может иметь несколько меток. Связи записей с метками хранятся в таблице
+# entry_tags с индексами по метке и по записи, поэтому список записей с меткой и отчет
+# по метке читают только записи с этой меткой.
+#
+# SplitEditor - таблица строк в окнах добавления и изменения записи.
+#
+# Строки разделенных записей и метки не синхронизируются (см. модуль sync).
+#
+# Запуск модуля выводит суммы записей с меткой по категориям:
+#     python splits.py отпуск [--db expensetracker.db]
+
+
+import argparse
+import sys
+
+from PyQt6.QtCore import pyqtSignal
+from PyQt6.QtWidgets import QAbstractItemView, QComboBox, QDoubleSpinBox, QHeaderView, QTableWidget, QTableWidgetItem
+
+from currency import MINOR_UNITS, formatMinorUnits, toMinorUnits
+from paths import DB_PATH
+
+
+# Разделители меток в строке ввода
+TAG_SEPARATORS = ",;"
+
+
+def parseTags(text):
+    """
+    Разбирает строку меток, введенную пользователем.
+
+    Метки разделяются запятыми или точками с запятой; начальный символ '#' и лишние пробелы
+    отбрасываются, а регистр приводится к нижнему, чтобы 'Отпуск' и '#отпуск' были одной меткой.
+
+    Args:
+        text (str): Строка меток.
+
+    Returns:
+        list: Метки без повторов в порядке ввода.
+    """
+    for separator in TAG_SEPARATORS[1:]:
+        text = text.replace(separator, TAG_SEPARATORS[0])
+    tags = (" ".join(tag.strip().lstrip("#").split()).lower() for tag in text.split(TAG_SEPARATORS[0]))
+    return list(dict.fromkeys(tag for tag in tags if tag))
+
+
+class SplitEditor(QTableWidget):
+    # Сигнал об изменении суммы строк (в минимальных единицах) и их количества
+    totalChanged = pyqtSignal(int, int)
+
+    def __init__(self, categories, parent=None):
+        """
+        Инициализирует таблицу строк разделенной записи.
+
+        Args:
+            categories (iterable): Категории, доступные для строк.
+            parent (QWidget, optional): Родительский виджет.
+        """
+        super(SplitEditor, self).__init__(0, 3, parent)
+        self.categories = list(categories)
+        self.setHorizontalHeaderLabels(["Категория", "Сумма", "Описание"])
+        self.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        self.setColumnWidth(0, 180)
+        self.setColumnWidth(1, 110)
+        self.verticalHeader().hide()
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.setMinimumHeight(120)
+
+    def addItem(self, category=None, value=0, description=""):
+        """
+        Добавляет строку.
+
+        Args:
+            category (str, optional): Категория строки; по умолчанию первая из доступных.
+            value (int, optional): Сумма строки в минимальных единицах.
+            description (str, optional): Описание строки.
+        """
+        row = self.rowCount()
+        self.insertRow(row)
+        combo_box = QComboBox(self)
+        combo_box.addItems(self.categories)
+        if category is not None:
+            if combo_box.findText(category) < 0:
+                combo_box.addItem(category)
+            combo_box.setCurrentText(category)
+        spin_box = QDoubleSpinBox(self)
+        spin_box.setDecimals(2)
+        spin_box.setMaximum(100000000.0)
+        spin_box.setButtonSymbols(QDoubleSpinBox.ButtonSymbols.NoButtons)
+        spin_box.setValue(value / MINOR_UNITS)
+        spin_box.valueChanged.connect(self.emitTotal)
+        self.setCellWidget(row, 0, combo_box)
+        self.setCellWidget(row, 1, spin_box)
+        self.setItem(row, 2, QTableWidgetItem(description))
+        self.emitTotal()
+
+    def removeSelected(self):
+        """
+        Удаляет выбранные строки.
+        """
+        for row in sorted({index.row() for index in self.selectedIndexes()}, reverse=True):
+            self.removeRow(row)
+        self.emitTotal()
+
+    def items(self):
+        """
+        Возвращает строки с ненулевой суммой.
+
+        Returns:
+            list: Список кортежей (категория, сумма в минимальных единицах, описание).
+        """
+        items = []
+        for row in range(self.rowCount()):
+            value = toMinorUnits(self.cellWidget(row, 1).value())
+            if value:
+                description = self.item(row, 2).text().strip() if self.item(row, 2) is not None else ""
+                items.append((self.cellWidget(row, 0).currentText(), value, description))
+        return items
+
+    def emitTotal(self):
+        """
+        Сообщает сумму и количество строк сигналом totalChanged.
+        """
+        items = self.items()
+        self.totalChanged.emit(sum(item[1] for item in items), len(items))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Суммы записей с меткой по категориям")
+    parser.add_argument("tag", help="метка")
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы данных")
+    args = parser.parse_args()
+
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication(sys.argv)
+    from connection import Data
+
+    tags = parseTags(args.tag)
+    if not tags:
+        sys.exit("Метка не указана")
+    query = Data(args.db).getTagSummary(tags[0])
+    while query.next():
+        print(f"{query.value(0)}\t{query.value(1)}\t{formatMinorUnits(query.value(2))}")
@@ -0,0 +1,356 @@
+# Модуль для синхронизации двух файлов базы данных (например, копий на ноутбуке и настольном компьютере).
+#
+# Записи сопоставляются по постоянному идентификатору uuid, а не по номеру id, который в разных
+# файлах свой. Удаленные записи остаются в таблице deleted_entries с временем удаления,
+# чтобы удаление тоже переносилось в другой файл (см. connection.SYNC_TRIGGERS).
+#
+# Сравнение идет по диапазонам: хеш месяца вычисляется по упорядоченным парам (uuid, время
+# изменения) записей и удалений месяца, которые собирает сама SQLite (group_concat), поэтому
+# в Python читается одна строка на месяц. Хеши кэшируются в таблице sync_ranges до следующего
+# изменения месяца, а корневой хеш вычисляется по хешам всех месяцев. Совпадение корневых
+# хешей означает, что файлы не различаются; иначе в месяцах с разными хешами SQLite находит
+# пары, которые есть только в одном файле, и в Python читаются лишь эти записи (по uuid,
+# поэтому находятся и записи, перенесенные изменением даты в другой месяц).
+#
+# Правила разрешения конфликтов (для каждого uuid, который различается в файлах):
+# - запись есть только в одном файле и нет сведений об удалении в другом - она копируется;
+# - запись изменена в обоих файлах - остается версия с более поздним временем изменения;
+# - запись удалена в одном файле и изменена в другом - побеждает более позднее действие,
+#   при равном времени - удаление;
+# - записи, перенесенные в архивы (годы из таблицы archives любого из файлов), не синхронизируются.
+# Время изменения берется из часов компьютера, поэтому расхождение часов влияет на результат
+# только для записей, измененных в обоих файлах между синхронизациями.
+#
+# Второй файл подключается к соединению (ATTACH), и изменения обоих файлов применяются
+# одной транзакцией; триггеры бюджетов и журнала изменений срабатывают в каждом файле.
+# В режиме WAL транзакция атомарна для каждого файла в отдельности: если сбой прервет
+# фиксацию между файлами, следующая синхронизация найдет различие и перенесет его снова.
+#
+# Запуск модуля: python sync.py /media/usb/expensetracker.db [--db expensetracker.db]
+
+
+import argparse
+import hashlib
+import sys
+import time
+
+from PyQt6 import QtCore
+
+from paths import DB_PATH
+
+
+# Имя схемы подключенного второго файла
+REMOTE_SCHEMA = "sync_remote"
+
+# Месяц записи в формате 'YYYY-MM' (совпадает с выражением индекса expenses_month)
+ROW_MONTH = "substr(date, 7, 4) || '-' || substr(date, 4, 2)"
+
+# Колонки записи, переносимые между файлами
+ROW_COLUMNS = ("description", "value", "category", "date", "currency", "fingerprint")
+
+# Доля измененных месяцев, начиная с которой хеши считаются одним проходом по всей таблице,
+# а не запросами по индексу месяца
+FULL_SCAN_SHARE = 0.25
+
+# Количество идентификаторов в одном запросе (ограничение SQLite на число параметров)
+UUID_BATCH = 500
+
+
+def rootHash(hashes):
+    """
+    Вычисляет корневой хеш по хешам месяцев.
+
+    Args:
+        hashes (dict): Словарь {месяц 'YYYY-MM': хеш месяца}.
+
+    Returns:
+        bytes: Корневой хеш.
+    """
+    root = hashlib.blake2b(digest_size=16)
+    for month in sorted(hashes):
+        root.update(month.encode("ascii") + hashes[month])
+    return root.digest()
+
+
+class LedgerSync:
+    def __init__(self, conn, remote_path):
+        """
+        Инициализирует синхронизацию базы данных с другим файлом.
+
+        Args:
+            conn (Data): Объект для работы с базой данных.
+            remote_path (str): Путь к другому файлу базы данных.
+        """
+        super(LedgerSync, self).__init__()
+        self.conn = conn
+        self.remote_path = remote_path
+
+    def attach(self):
+        """
+        Обновляет схему второго файла до текущей версии и подключает его к соединению.
+
+        Returns:
+            bool: True, если файл подключен.
+        """
+        from connection import Data
+
+        Data(self.remote_path, connection_name="sync-remote").close()
+        # Файл мог остаться подключенным, если прошлое отключение не удалось
+        query = self.conn.executeQuery("PRAGMA database_list")
+        schemas = []
+        while query.next():
+            schemas.append(query.value(1))
+        if REMOTE_SCHEMA in schemas:
+            self.detach()
+        return self.conn.executeQuery(f"ATTACH DATABASE ? AS {REMOTE_SCHEMA}", [self.remote_path]).isActive()
+
+    def detach(self):
+        """
+        Отключает второй файл от соединения.
+
+        Отключение не удается, пока у соединения есть незавершенные выборки
+        (например, модель таблицы, прочитанная не до конца).
+        """
+        self.conn.executeQuery(f"DETACH DATABASE {REMOTE_SCHEMA}")
+
+    def getArchivedYears(self, schema):
+        """
+        Возвращает архивированные годы файла.
+
+        Args:
+            schema (str): Схема файла ('main' или REMOTE_SCHEMA).
+
+        Returns:
+            set: Годы.
+        """
+        query = self.conn.executeQuery(f"SELECT year FROM {schema}.archives")
+        years = set()
+        while query.next():
+            years.add(query.value(0))
+        return years
+
+    def getRangeHashes(self, schema):
+        """
+        Возвращает хеши месяцев файла, вычисляя заново хеши измененных месяцев.
+
+        Месяцы, измененные после прошлой синхронизации, отмечены в sync_ranges пустым хешем
+        (см. connection.SYNC_TRIGGERS), поэтому без изменений таблица расходов не читается.
+
+        Args:
+            schema (str): Схема файла ('main' или REMOTE_SCHEMA).
+
+        Returns:
+            dict: Словарь {месяц 'YYYY-MM': хеш месяца}.
+        """
+        query = self.conn.executeQuery(f"SELECT month, hash FROM {schema}.sync_ranges")
+        hashes = {}
+        dirty = []
+        while query.next():
+            if query.isNull(1):
+                dirty.append(query.value(0))
+            else:
+                hashes[query.value(0)] = bytes(query.value(1))
+        if not dirty and hashes:
+            return hashes
+
+        # Удаления отличаются от записей знаком времени; пары упорядочиваются, чтобы хеш
+        # не зависел от порядка строк в файле
+        pairs = (f"SELECT {ROW_MONTH} AS month, uuid || ':' || modified_at AS pair FROM {schema}.expenses{{0}} "
+                 f"UNION ALL SELECT month, uuid || ':' || -deleted_at FROM {schema}.deleted_entries{{1}}")
+        # Пустой кэш (первая синхронизация файла) и много измененных месяцев считаются одним проходом
+        full_scan = not hashes or len(dirty) > (len(hashes) + len(dirty)) * FULL_SCAN_SHARE
+        if full_scan:
+            hashes = {}
+            queries = [self.conn.executeQuery(f"SELECT month, group_concat(pair, ',') FROM "
+                                              f"(SELECT * FROM ({pairs.format('', '')}) ORDER BY month, pair) "
+                                              "GROUP BY month")]
+        else:
+            monthly = pairs.format(f" WHERE {ROW_MONTH} = ?", " WHERE month = ?")
+            queries = (self.conn.executeQuery(f"SELECT month, group_concat(pair, ',') FROM "
+                                              f"(SELECT * FROM ({monthly}) ORDER BY pair) GROUP BY month",
+                                              [month, month]) for month in dirty)
+        computed = {}
+        for query in queries:
+            while query.next():
+                computed[query.value(0)] = hashlib.blake2b(query.value(1).encode("ascii"), digest_size=16).digest()
+
+        if full_scan:
+            self.conn.executeQuery(f"DELETE FROM {schema}.sync_ranges")
+        for month, month_hash in computed.items():
+            self.conn.executeQuery(f"INSERT OR REPLACE INTO {schema}.sync_ranges (month, hash) VALUES (?, ?)",
+                                   [month, QtCore.QByteArray(month_hash)])
+        # Все записи месяца могли перенести в другой месяц изменением даты
+        for month in set(dirty) - set(computed):
+            self.conn.executeQuery(f"DELETE FROM {schema}.sync_ranges WHERE month = ?", [month])
+        hashes.update(computed)
+        return hashes
+
+    def getDifferences(self, months):
+        """
+        Возвращает идентификаторы записей, пары (uuid, время изменения) которых за месяцы
+        есть только в одном из файлов.
+
+        Args:
+            months (list): Месяцы 'YYYY-MM'.
+
+        Returns:
+            set: Идентификаторы записей.
+        """
+        placeholders = ", ".join("?" * len(months))
+        pairs = " UNION ALL ".join(
+            f"SELECT uuid, modified_at AS stamp FROM {schema}.expenses WHERE {ROW_MONTH} IN ({placeholders}) "
+            f"UNION ALL SELECT uuid, -deleted_at FROM {schema}.deleted_entries WHERE month IN ({placeholders})"
+            for schema in ("main", REMOTE_SCHEMA))
+        # Сравнение выполняет SQLite, поэтому совпадающие записи месяцев не читаются в Python
+        query = self.conn.executeQuery(f"SELECT uuid FROM ({pairs}) GROUP BY uuid, stamp HAVING COUNT(*) = 1",
+                                       months * 4)
+        uuids = set()
+        while query.next():
+            uuids.add(query.value(0))
+        return uuids
+
+    def getStates(self, schema, uuids):
+        """
+        Возвращает состояние записей файла по идентификаторам.
+
+        Args:
+            schema (str): Схема файла ('main' или REMOTE_SCHEMA).
+            uuids (iterable): Идентификаторы записей.
+
+        Returns:
+            dict: Словарь {uuid: состояние}; состояние - кортеж (время изменения или удаления,
+            признак удаления, месяц, значения ROW_COLUMNS или None для удаленной записи).
+        """
+        columns = ", ".join(ROW_COLUMNS)
+        uuids = list(uuids)
+        states = {}
+        for offset in range(0, len(uuids), UUID_BATCH):
+            chunk = uuids[offset:offset + UUID_BATCH]
+            placeholders = ", ".join("?" * len(chunk))
+            query = self.conn.executeQuery(f"SELECT uuid, modified_at, {ROW_MONTH}, {columns} "
+                                           f"FROM {schema}.expenses WHERE uuid IN ({placeholders})", chunk)
+            while query.next():
+                states[query.value(0)] = (query.value(1), False, query.value(2),
+                                          tuple(query.value(column) for column in range(3, 3 + len(ROW_COLUMNS))))
+            query = self.conn.executeQuery(f"SELECT uuid, deleted_at, month FROM {schema}.deleted_entries "
+                                           f"WHERE uuid IN ({placeholders})", chunk)
+            while query.next():
+                # Запись могла быть удалена, а затем восстановлена синхронизацией: действует запись
+                states.setdefault(query.value(0), (query.value(1), True, query.value(2), None))
+        return states
+
+    def markDirty(self, schema, month):
+        """
+        Отмечает месяц файла, хеш которого нужно вычислить заново.
+
+        Триггеры отмечают месяцы при изменении записей, а этот метод - при изменении
+        таблицы deleted_entries, у которой триггеров нет.
+
+        Args:
+            schema (str): Схема файла.
+            month (str): Месяц 'YYYY-MM'.
+        """
+        self.conn.executeQuery(f"INSERT INTO {schema}.sync_ranges (month) VALUES (?) "
+                               "ON CONFLICT (month) DO UPDATE SET hash = NULL", [month])
+
+    def applyState(self, schema, uuid, state, current):
+        """
+        Приводит запись файла к состоянию, победившему при разрешении конфликта.
+
+        Args:
+            schema (str): Схема изменяемого файла.
+            uuid (str): Идентификатор записи.
+            state (tuple): Новое состояние (см. getStates).
+            current (tuple): Текущее состояние записи в файле или None.
+        """
+        timestamp, deleted, month, row = state
+        if deleted:
+            self.conn.executeQuery(f"INSERT INTO {schema}.deleted_entries (uuid, deleted_at, month) VALUES (?, ?, ?) "
+                                   "ON CONFLICT (uuid) DO UPDATE SET deleted_at = excluded.deleted_at, "
+                                   "month = excluded.month", [uuid, timestamp, month])
+            self.markDirty(schema, month)
+            if current is not None and not current[1]:
+                self.conn.executeQuery(f"DELETE FROM {schema}.expenses WHERE uuid = ?", [uuid])
+            return
+
+        if current is not None and not current[1]:
+            assignments = ", ".join(f"{column} = ?" for column in ROW_COLUMNS)
+            self.conn.executeQuery(f"UPDATE {schema}.expenses SET {assignments}, modified_at = ? WHERE uuid = ?",
+                                   [*row, timestamp, uuid])
+        else:
+            self.conn.executeQuery(f"INSERT INTO {schema}.expenses ({', '.join(ROW_COLUMNS)}, uuid, modified_at) "
+                                   f"VALUES ({', '.join('?' * (len(ROW_COLUMNS) + 2))})", [*row, uuid, timestamp])
+        if current is not None and current[1]:
+            self.conn.executeQuery(f"DELETE FROM {schema}.deleted_entries WHERE uuid = ?", [uuid])
+            self.markDirty(schema, current[2])
+
+    def reconcile(self):
+        """
+        Сравнивает файлы и переносит различия в обе стороны.
+
+        Returns:
+            dict: Количество сравненных месяцев ('months'), различающихся записей ('rows'), записей,
+            измененных в базе данных ('pulled') и во втором файле ('pushed'), и записей,
+            различавшихся в обоих файлах ('conflicts'), или None, если синхронизация не выполнена.
+        """
+        from connection import TransactionError
+
+        if not self.attach():
+            return None
+        result = {"months": 0, "rows": 0, "pulled": 0, "pushed": 0, "conflicts": 0}
+        try:
+            # Сравнение и перенос выполняются в одной транзакции, чтобы записи не изменились между ними
+            with self.conn.transaction():
+                archived = self.getArchivedYears("main") | self.getArchivedYears(REMOTE_SCHEMA)
+                local_hashes, remote_hashes = ({month: month_hash
+                                                for month, month_hash in self.getRangeHashes(schema).items()
+                                                if int(month[:4]) not in archived}
+                                               for schema in ("main", REMOTE_SCHEMA))
+                if rootHash(local_hashes) == rootHash(remote_hashes):
+                    return result
+
+                months = sorted(month for month in set(local_hashes) | set(remote_hashes)
+                                if local_hashes.get(month) != remote_hashes.get(month))
+                # Состояние читается по uuid, поэтому находятся и записи, которые в другом файле
+                # перенесены в другой месяц
+                uuids = self.getDifferences(months)
+                local = self.getStates("main", uuids)
+                remote = self.getStates(REMOTE_SCHEMA, uuids)
+                result.update(months=len(months), rows=len(uuids))
+
+                for uuid in sorted(uuids):
+                    mine, theirs = local.get(uuid), remote.get(uuid)
+                    if mine == theirs:
+                        continue
+                    if mine is not None and theirs is not None:
+                        result["conflicts"] += 1
+                    # Побеждает более позднее действие, при равном времени - удаление
+                    if theirs is None or (mine is not None and mine[:2] > theirs[:2]):
+                        self.applyState(REMOTE_SCHEMA, uuid, mine, theirs)
+                        result["pushed"] += 1
+                    else:
+                        self.applyState("main", uuid, theirs, mine)
+                        result["pulled"] += 1
+        except TransactionError:
+            return None
+        finally:
+            self.detach()
+        return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Синхронизация двух файлов базы данных")
+    parser.add_argument("remote", help="путь ко второму файлу базы данных")
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы данных")
+    args = parser.parse_args()
+
+    app = QtCore.QCoreApplication(sys.argv)
+    from connection import Data
+
+    started = time.perf_counter()
+    result = LedgerSync(Data(args.db), args.remote).reconcile()
+    if result is None:
+        sys.exit("Синхронизация не выполнена")
+    print(f"Сравнено месяцев: {result['months']}, различающихся записей: {result['rows']}; "
+          f"получено изменений: {result['pulled']}, передано: {result['pushed']}, "
+          f"конфликтов: {result['conflicts']} ({time.perf_counter() - started:.2f} с)")
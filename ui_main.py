@@ -353,20 +353,6 @@ class Ui_MainWindow(object):
 "border: none;\n"
 "height: 50px;\n"
 "font-size: 16pt;\n"
-"}\n"
-"\n"
-"QTableView::item {\n"
-"    border-style: none;\n"
-"    border-bottom: 1px solid rgb(70, 68, 81);\n"
-"    padding-left: 5px;\n"
-"    padding-right: 0px;\n"
-"    text-align: center;\n"
-"}\n"
-"\n"
-"QTableView::item:selected{\n"
-"    border: none;\n"
-"    color: rgb(70, 68, 81);\n"
-"    background-color: rgba(255, 255, 255, 50);\n"
 "}")
         self.tableView.setTextElideMode(QtCore.Qt.TextElideMode.ElideMiddle)
         self.tableView.setShowGrid(False)